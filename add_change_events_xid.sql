@@ -0,0 +1,15 @@
+-- Ordre de validation du journal des modifications (flux /api/changes)
+-- À appliquer avec migrate.py (CREATE INDEX en CONCURRENTLY)
+
+-- L'id (BIGSERIAL) est attribué à l'insertion, pas à la validation : une transaction lente peut
+-- valider un id inférieur au dernier servi, qu'un curseur sur l'id seul sauterait. Chaque
+-- événement garde l'identifiant de la transaction qui l'a écrit ; /api/changes ne sert que les
+-- transactions inférieures à pg_snapshot_xmin(pg_current_snapshot()), toutes terminées, et
+-- reprend sur (xid, id).
+-- Les lignes existantes reçoivent le xid de la migration, leur ordre reste celui de l'id.
+ALTER TABLE change_events ADD COLUMN IF NOT EXISTS xid xid8 NOT NULL DEFAULT pg_current_xact_id();
+
+CREATE INDEX IF NOT EXISTS idx_change_events_xid_id ON change_events(xid, id);
+
+COMMENT ON COLUMN change_events.xid IS 'Transaction ayant écrit l''événement ; curseur de reprise avec l''id (xid-id)';
+COMMENT ON COLUMN change_events.id IS 'Ordre des événements d''une même transaction ; curseur de reprise avec le xid (xid-id)';
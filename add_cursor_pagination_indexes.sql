@@ -0,0 +1,13 @@
+-- Index de la pagination par curseur (cursor=) : la reprise après la dernière ligne lue
+-- ((clé1, clé2, ...) > (...)) parcourt l'index dans l'ordre de tri, sans OFFSET
+-- À appliquer avec migrate.py (CREATE INDEX en CONCURRENTLY)
+
+-- Liste des tickets : date de création puis id (départage des tickets créés à la même date)
+CREATE INDEX IF NOT EXISTS idx_tickets_date_creation_id ON tickets(date_creation DESC, id DESC);
+
+-- Fil des échanges d'un ticket
+CREATE INDEX IF NOT EXISTS idx_ticket_echanges_ticket_created_id ON ticket_echanges(ticket_id, created_at, id);
+
+-- Listes des demandeurs et des agents (tri par nom, prénom)
+CREATE INDEX IF NOT EXISTS idx_demandeurs_nom_prenom_id ON demandeurs(nom, prenom, id);
+CREATE INDEX IF NOT EXISTS idx_agents_nom_prenom_id ON agents(nom, prenom, id);
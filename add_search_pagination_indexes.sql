@@ -0,0 +1,24 @@
+-- Index de recherche et de pagination pour les gros volumes
+-- À appliquer avec migrate.py : les CREATE INDEX sont construits en CONCURRENTLY,
+-- sans bloquer les écritures sur les tickets
+
+-- Recherche partielle par numéro (ILIKE '%...%') : index trigrammes
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_tickets_numero_ticket_trgm ON tickets USING gin (numero_ticket gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_portabilites_numero_portabilite_trgm ON portabilites USING gin (numero_portabilite gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_productions_numero_production_trgm ON productions USING gin (numero_production gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_clients_nom_societe_trgm ON clients USING gin (nom_societe gin_trgm_ops);
+
+-- Tri des listes paginées (ORDER BY ... DESC LIMIT / OFFSET)
+CREATE INDEX IF NOT EXISTS idx_tickets_date_creation ON tickets(date_creation DESC);
+CREATE INDEX IF NOT EXISTS idx_tickets_status_date_creation ON tickets(status, date_creation DESC);
+CREATE INDEX IF NOT EXISTS idx_tickets_client_date_creation ON tickets(client_id, date_creation DESC);
+CREATE INDEX IF NOT EXISTS idx_portabilites_created_at ON portabilites(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_productions_date_creation ON productions(date_creation DESC);
+
+-- Réattribution des auteurs lors du transfert d'un demandeur
+CREATE INDEX IF NOT EXISTS idx_ticket_echanges_auteur_id ON ticket_echanges(auteur_id);
+CREATE INDEX IF NOT EXISTS idx_portabilite_echanges_auteur_id ON portabilite_echanges(auteur_id);
+CREATE INDEX IF NOT EXISTS idx_production_tache_commentaires_auteur_id ON production_tache_commentaires(auteur_id);
+CREATE INDEX IF NOT EXISTS idx_productions_assigned_to ON productions(assigned_to);
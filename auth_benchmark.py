@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Authentication benchmark
+Measures bcrypt verification throughput per cost factor (the CPU-bound part of a login)
+and end-to-end logins/sec against /api/auth.
+
+Usage:
+    python auth_benchmark.py [--costs 8,10,12] [--logins 50] [--concurrency 5] [--skip-http]
+
+The server-side cost is set with BCRYPT_COST; hashes are upgraded on the next successful login.
+"""
+
+import argparse
+import base64
+import os
+import statistics
+import sys
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+# Configuration - Use production URL from frontend/.env
+BACKEND_URL = os.environ.get("BACKEND_URL", "https://ticketnav-app.preview.emergentagent.com")
+API_BASE = f"{BACKEND_URL}/api"
+
+AGENT_CREDENTIALS = {
+    "email": "admin@voipservices.fr",
+    "password": "admin1234!"
+}
+
+DEMANDEUR_CREDENTIALS = {
+    "email": "sophie.martin@techcorp.fr",
+    "password": "password123"
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def benchmark_bcrypt(costs, iterations):
+    """Verify rate per cost factor using the Python bcrypt module (same algorithm as bcryptjs)"""
+    try:
+        import bcrypt
+    except ImportError:
+        print("⚠️  Python 'bcrypt' module not installed - skipping local cost benchmark (pip install bcrypt)")
+        return {}
+
+    print(f"\n{'='*60}")
+    print("BCRYPT VERIFY COST")
+    print(f"{'='*60}")
+    print(f"{'cost':>6} {'ms/verify':>12} {'verifies/sec':>14}")
+
+    results = {}
+    password = b"admin1234!"
+    for cost in costs:
+        hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds=cost))
+        runs = max(1, iterations if cost <= 10 else iterations // (2 ** (cost - 10)))
+        start = time.perf_counter()
+        for _ in range(runs):
+            bcrypt.checkpw(password, hashed)
+        elapsed = (time.perf_counter() - start) / runs
+        results[cost] = elapsed
+        print(f"{cost:>6} {elapsed * 1000:>12.1f} {1 / elapsed:>14.1f}")
+    return results
+
+
+def login(credentials):
+    payload = {
+        "email": credentials["email"],
+        "password": base64.b64encode(credentials["password"].encode()).decode()
+    }
+    start = time.perf_counter()
+    response = requests.post(f"{API_BASE}/auth", json=payload, timeout=30)
+    return response.status_code, time.perf_counter() - start
+
+
+def benchmark_http(credentials, label, logins, concurrency):
+    """End-to-end login throughput and latency"""
+    status, _ = login(credentials)
+    if status != 200:
+        print(f"❌ {label} login failed with status {status} - skipping")
+        return None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(lambda _: login(credentials), range(logins)))
+    wall = time.perf_counter() - start
+
+    latencies = [latency for status, latency in samples if status == 200]
+    failures = len(samples) - len(latencies)
+    if not latencies:
+        print(f"❌ {label}: all {failures} logins failed")
+        return None
+
+    result = {
+        "logins_per_sec": len(latencies) / wall,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "failures": failures
+    }
+    print(f"{label:>10} {result['logins_per_sec']:>12.1f} {result['p50_ms']:>10.0f} {result['p95_ms']:>10.0f} {failures:>9}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Authentication benchmark")
+    parser.add_argument("--costs", default="8,10,12", help="bcrypt cost factors to measure locally")
+    parser.add_argument("--iterations", type=int, default=20, help="verifications per cost (scaled down for high costs)")
+    parser.add_argument("--logins", type=int, default=50, help="HTTP logins per user type")
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--skip-http", action="store_true", help="only run the local bcrypt benchmark")
+    args = parser.parse_args()
+
+    print("🚀 Starting authentication benchmark")
+    print(f"Backend URL: {BACKEND_URL}")
+
+    costs = [int(c) for c in args.costs.split(",") if c.strip()]
+    bcrypt_results = benchmark_bcrypt(costs, args.iterations)
+
+    if args.skip_http:
+        return True
+
+    print(f"\n{'='*60}")
+    print(f"HTTP LOGINS ({args.logins} per user type, concurrency {args.concurrency})")
+    print(f"{'='*60}")
+    print(f"{'user':>10} {'logins/sec':>12} {'p50 ms':>10} {'p95 ms':>10} {'failures':>9}")
+    agent = benchmark_http(AGENT_CREDENTIALS, "agent", args.logins, args.concurrency)
+    demandeur = benchmark_http(DEMANDEUR_CREDENTIALS, "demandeur", args.logins, args.concurrency)
+
+    # Estimated share of login latency spent in bcrypt at each cost
+    if bcrypt_results and (agent or demandeur):
+        p50 = (demandeur or agent)["p50_ms"]
+        print(f"\n{'='*60}")
+        print("ESTIMATED BCRYPT SHARE OF p50 LOGIN LATENCY")
+        print(f"{'='*60}")
+        for cost, seconds in bcrypt_results.items():
+            print(f"cost {cost:>2}: {seconds * 1000:.1f} ms ({min(100.0, seconds * 1000 / p50 * 100):.0f}% of {p50:.0f} ms)")
+
+    return bool(agent and demandeur)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -4,14 +4,17 @@ Backend API Testing for Support Ticket Management System
 Testing Mailjet email diagnostic functionality
 """
 
+import os
+import re
 import requests
 import json
 import uuid
 import sys
 from datetime import datetime
+from urllib.parse import urlsplit
 
 # Configuration - Use production URL from frontend/.env
-BACKEND_URL = "https://ticketnav-app.preview.emergentagent.com"
+BACKEND_URL = os.environ.get("BACKEND_URL", "https://ticketnav-app.preview.emergentagent.com")
 API_BASE = f"{BACKEND_URL}/api"
 
 # Test credentials
@@ -81,29 +84,296 @@ def authenticate_user(credentials, user_type):
         print(f"❌ {user_type} authentication error: {str(e)}")
         return None, None
 
-def get_test_ticket_id(token):
-    """Get a test ticket ID from the database"""
-    try:
-        headers = {
-            "Authorization": f"Bearer {token}",
+class FixtureError(Exception):
+    """A session fixture could not be created"""
+
+
+class FixtureService:
+    """Session-scoped test data shared by every suite of a run
+
+    A fixture is created on first use, after the fixtures it depends on, then reused by
+    the following suites. teardown() deletes everything in reverse creation order, in
+    bulk through /api/batch.
+    """
+
+    # Fixture -> fixtures to create first
+    DEPENDENCIES = {
+        "agent_token": [],
+        "societe": ["agent_token"],
+        "demandeur": ["societe"],
+        "demandeur_token": ["demandeur"],
+        "client": ["societe"],
+        "ticket": ["client", "demandeur"],
+        "portabilite": ["client", "demandeur"],
+        "production": ["client", "demandeur"],
+    }
+
+    DEMANDEUR_PASSWORD = "fixture-password-123"
+    BATCH_SIZE = 20
+
+    def __init__(self):
+        self.run_id = uuid.uuid4().hex[:8]
+        self.values = {}
+        self.errors = {}
+        self.agent_info = None
+        # (fixture, chemin de suppression) dans l'ordre de création
+        self.created = []
+
+    def get(self, name):
+        """Return the fixture, creating it (and its dependencies) on first use"""
+        if name in self.errors:
+            raise self.errors[name]
+        if name not in self.values:
+            try:
+                for dependency in self.DEPENDENCIES[name]:
+                    self.get(dependency)
+                self.values[name] = getattr(self, f"_create_{name}")()
+            except FixtureError as e:
+                # Un échec n'est pas retenté par chaque suite
+                self.errors[name] = e
+                raise
+        return self.values[name]
+
+    def headers(self, token_fixture="agent_token"):
+        return {
+            "Authorization": f"Bearer {self.get(token_fixture)}",
             "Content-Type": "application/json"
         }
-        
-        response = requests.get(f"{API_BASE}/tickets", headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            tickets = response.json()
-            if tickets and len(tickets) > 0:
-                ticket_id = tickets[0]['id']
-                print(f"✅ Found test ticket: {ticket_id}")
-                return ticket_id
-            else:
-                print("⚠️  No tickets found in database")
-                return None
-        else:
-            print(f"❌ Failed to get tickets: {response.status_code}")
-            return None
-            
+
+    def _post(self, name, path, payload):
+        response = requests.post(f"{API_BASE}/{path}", headers=self.headers(), json=payload, timeout=10)
+        if response.status_code != 201:
+            raise FixtureError(f"Fixture {name}: {response.status_code} - {response.text}")
+        created = response.json()
+        self.created.append((name, f"/api/{path}/{created['id']}"))
+        print(f"🧩 Fixture {name} created: {created['id']}")
+        return created
+
+    def agent(self):
+        """(token, user info) of the shared agent session, like authenticate_user"""
+        try:
+            return self.get("agent_token"), self.agent_info
+        except FixtureError:
+            return None, None
+
+    def _token(self, credentials, label):
+        token, info = authenticate_user(credentials, label)
+        if not token:
+            raise FixtureError(f"Fixture {label}: authentication failed")
+        return token, info
+
+    def _create_agent_token(self):
+        token, self.agent_info = self._token(AGENT_CREDENTIALS, "Agent")
+        return token
+
+    def _create_demandeur_token(self):
+        credentials = {"email": self.get("demandeur")["email"], "password": self.DEMANDEUR_PASSWORD}
+        return self._token(credentials, "Fixture demandeur")[0]
+
+    def _create_societe(self):
+        return self._post("societe", "demandeurs-societe", {
+            "nom_societe": f"Fixture Société {self.run_id}",
+            "adresse": "1 rue des Tests",
+            "code_postal": "75001",
+            "ville": "Paris",
+            "email": f"societe.{self.run_id}@fixture-tests.fr"
+        })
+
+    def _create_demandeur(self):
+        return self._post("demandeur", "demandeurs", {
+            "nom": "Fixture",
+            "prenom": f"Demandeur {self.run_id}",
+            "email": f"demandeur.{self.run_id}@fixture-tests.fr",
+            "password": self.DEMANDEUR_PASSWORD,
+            "societe_id": self.get("societe")["id"]
+        })
+
+    def _create_client(self):
+        return self._post("client", "clients", {
+            "nom_societe": f"Fixture Client {self.run_id}",
+            "adresse": "2 rue des Tests",
+            "nom": "Client",
+            "prenom": "Fixture",
+            "societe_id": self.get("societe")["id"]
+        })
+
+    def _create_ticket(self):
+        return self._post("ticket", "tickets", {
+            "titre": f"Fixture ticket {self.run_id}",
+            "client_id": self.get("client")["id"],
+            "demandeur_id": self.get("demandeur")["id"],
+            "requete_initiale": "Ticket partagé par les suites de test",
+            "status": "nouveau"
+        })
+
+    def _create_portabilite(self):
+        return self._post("portabilite", "portabilites", {
+            "client_id": self.get("client")["id"],
+            "demandeur_id": self.get("demandeur")["id"],
+            "numeros_portes": "0123456789",
+            "nom_client": "Fixture",
+            "prenom_client": self.run_id,
+            "email_client": f"portabilite.{self.run_id}@fixture-tests.fr",
+            "siret_client": "12345678901234",
+            "adresse": "3 rue des Tests",
+            "code_postal": "75001",
+            "ville": "Paris",
+            "date_portabilite_demandee": "2025-02-01"
+        })
+
+    def _create_production(self):
+        return self._post("production", "productions", {
+            "client_id": self.get("client")["id"],
+            "demandeur_id": self.get("demandeur")["id"],
+            "titre": f"Fixture production {self.run_id}",
+            "description": "Production partagée par les suites de test",
+            "priorite": "normale",
+            "date_livraison_prevue": "2025-02-15"
+        })
+
+    def teardown(self):
+        """Delete every created fixture, newest first, BATCH_SIZE deletions per request"""
+        if not self.created:
+            return True
+        print(f"\n🧹 Tearing down {len(self.created)} fixtures")
+        pending = list(reversed(self.created))
+        failures = []
+        headers = self.headers()
+        for start in range(0, len(pending), self.BATCH_SIZE):
+            chunk = pending[start:start + self.BATCH_SIZE]
+            operations = [{"method": "DELETE", "path": path} for _, path in chunk]
+            try:
+                response = requests.post(f"{API_BASE}/batch", headers=headers,
+                                       json={"operations": operations, "stopOnError": False}, timeout=30)
+                if response.status_code == 200:
+                    statuses = [result["status"] for result in response.json()["results"]]
+                else:
+                    # /api/batch indisponible : suppressions une par une
+                    statuses = [requests.delete(f"{BACKEND_URL}{path}", headers=headers, timeout=10).status_code
+                                for _, path in chunk]
+            except Exception as e:
+                statuses = [str(e)] * len(chunk)
+            for (name, path), status in zip(chunk, statuses):
+                # 404 : déjà supprimée par une suite (ou en cascade)
+                if status not in (200, 204, 404):
+                    failures.append(f"{name} ({path}): {status}")
+        self.created = []
+        self.values = {}
+        if failures:
+            print(f"❌ Fixture teardown failures: {', '.join(failures)}")
+            return False
+        print("✅ Fixtures deleted")
+        return True
+
+
+class HttpCallCounter:
+    """Counts the HTTP calls made through requests, to compare the cost of a run"""
+
+    def __init__(self):
+        self.total = 0
+
+    def install(self):
+        original = requests.sessions.Session.request
+        counter = self
+
+        def counting_request(session, *args, **kwargs):
+            counter.total += 1
+            return original(session, *args, **kwargs)
+
+        requests.sessions.Session.request = counting_request
+
+
+def parse_server_timing(header):
+    """'db;dur=12.5;desc="3", total;dur=40' -> {'db': {'dur': 12.5, 'count': 3}, 'total': {'dur': 40.0, 'count': 1}}"""
+    phases = {}
+    for entry in (header or "").split(","):
+        parts = [part.strip() for part in entry.split(";") if part.strip()]
+        if not parts:
+            continue
+        phase = {"dur": 0.0, "count": 1}
+        for attribute in parts[1:]:
+            key, _, value = attribute.partition("=")
+            value = value.strip('"')
+            if key == "dur":
+                phase["dur"] = float(value or 0)
+            elif key == "desc" and value.isdigit():
+                phase["count"] = int(value)
+        phases[parts[0]] = phase
+    return phases
+
+
+class ServerTimingReport:
+    """Collects the Server-Timing header of every response and reports a per-phase breakdown by endpoint"""
+
+    ID_SEGMENT = re.compile(r"^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|\d+)$", re.IGNORECASE)
+
+    def __init__(self):
+        self.endpoints = {}
+
+    def endpoint(self, method, url):
+        path = urlsplit(url).path
+        segments = [":id" if self.ID_SEGMENT.match(segment) else segment for segment in path.split("/")]
+        return f"{method.upper()} {'/'.join(segments)}"
+
+    def record(self, method, url, header):
+        if not header:
+            return
+        calls = self.endpoints.setdefault(self.endpoint(method, url), [])
+        calls.append(parse_server_timing(header))
+
+    def install(self):
+        original = requests.sessions.Session.request
+        report = self
+
+        def timing_request(session, method, url, *args, **kwargs):
+            response = original(session, method, url, *args, **kwargs)
+            report.record(method, url, response.headers.get("Server-Timing"))
+            return response
+
+        requests.sessions.Session.request = timing_request
+
+    def summary(self, top=6):
+        """Mean duration per phase (ms), endpoints ranked by mean total"""
+        rows = []
+        for endpoint, calls in self.endpoints.items():
+            phases = {}
+            for call in calls:
+                for name, phase in call.items():
+                    entry = phases.setdefault(name, {"dur": 0.0, "count": 0})
+                    entry["dur"] += phase["dur"]
+                    entry["count"] += phase["count"]
+            means = {name: (entry["dur"] / len(calls), entry["count"] / len(calls)) for name, entry in phases.items()}
+            total = means.pop("total", (0.0, 1))[0]
+            ranked = sorted(means.items(), key=lambda item: item[1][0], reverse=True)[:top]
+            rows.append((endpoint, len(calls), total, ranked))
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def print_report(self):
+        rows = self.summary()
+        if not rows:
+            return
+        print(f"\n{'='*100}")
+        print("SERVER TIMING (mean ms per call; db count = queries per call)")
+        print(f"{'='*100}")
+        print(f"{'endpoint':<44} {'calls':>6} {'total':>8}  phases")
+        for endpoint, calls, total, ranked in rows:
+            phases = " · ".join(
+                f"{name} {duration:.1f}" + (f" ({count:.1f})" if name == "db" else "")
+                for name, (duration, count) in ranked
+            )
+            print(f"{endpoint[:44]:<44} {calls:>6} {total:>8.1f}  {phases}")
+
+
+FIXTURES = FixtureService()
+HTTP_CALLS = HttpCallCounter()
+SERVER_TIMINGS = ServerTimingReport()
+
+def get_test_ticket_id(token):
+    """Get the shared fixture ticket ID (created once per run)"""
+    try:
+        ticket_id = FIXTURES.get("ticket")["id"]
+        print(f"✅ Using fixture ticket: {ticket_id}")
+        return ticket_id
     except Exception as e:
         print(f"❌ Error getting test ticket: {str(e)}")
         return None
@@ -119,7 +389,7 @@ def test_ticket_echanges_api():
     
     # Step 1: Authenticate users
     print("\n📋 STEP 1: Authentication Tests")
-    agent_token, agent_info = authenticate_user(AGENT_CREDENTIALS, "Agent")
+    agent_token, agent_info = FIXTURES.agent()
     demandeur_token, demandeur_info = authenticate_user(DEMANDEUR_CREDENTIALS, "Demandeur")
     
     if not agent_token:
@@ -436,7 +706,7 @@ def test_clients_pagination_search_api():
     
     # Step 1: Authenticate agent
     print("\n📋 STEP 1: Authentication")
-    agent_token, agent_info = authenticate_user(AGENT_CREDENTIALS, "Agent")
+    agent_token, agent_info = FIXTURES.agent()
     
     if not agent_token:
         results.add_result("Agent Authentication", False, "Failed to authenticate agent")
@@ -751,6 +1021,134 @@ def test_clients_pagination_search_api():
     
     return results.summary()
 
+def seed_scale_tickets(database_url, client_id, demandeur_id, count):
+    """Insert tickets marked 'SCALE TEST' directly in the database (generate_series) up to count"""
+    import psycopg2
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn, conn.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM tickets WHERE titre LIKE 'SCALE TEST%'")
+            existing = cursor.fetchone()[0]
+            if existing < count:
+                # Dates réparties sur un an pour que l'ordre de tri ne suive pas l'ordre d'insertion
+                cursor.execute("""
+                    INSERT INTO tickets (titre, client_id, demandeur_id, status, requete_initiale, date_creation)
+                    SELECT 'SCALE TEST ' || n, %s, %s,
+                           (ARRAY['nouveau', 'en_cours', 'en_attente', 'repondu', 'resolu', 'ferme'])[1 + n %% 6],
+                           'Ticket généré pour la mesure de latence', NOW() - random() * INTERVAL '365 days'
+                    FROM generate_series(%s, %s) AS n
+                """, (client_id, demandeur_id, existing + 1, count))
+            cursor.execute("ANALYZE tickets")
+    finally:
+        conn.close()
+
+
+def cleanup_scale_tickets(database_url):
+    """Delete the tickets inserted by seed_scale_tickets"""
+    import psycopg2
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn, conn.cursor() as cursor:
+            cursor.execute("DELETE FROM tickets WHERE titre LIKE 'SCALE TEST%'")
+            return cursor.rowcount
+    finally:
+        conn.close()
+
+
+def measure_tickets_list_scale(headers, client_id, demandeur_id):
+    """Median latency of the ticket list variants at each volume of TICKETS_SCALE_LEVELS
+
+    The bounded paths (legacy array capped at LIST_MAX_ROWS, cursor pages) must stay under
+    TICKETS_SCALE_BUDGET_MS whatever the volume.
+    Needs DATABASE_URL (or NETLIFY_DATABASE_URL) pointing at the backend database and psycopg2.
+    Returns a list of (name, passed, message).
+    """
+    import statistics
+    import time
+    
+    database_url = os.environ.get("NETLIFY_DATABASE_URL") or os.environ.get("DATABASE_URL")
+    if not database_url:
+        print("⚠️  DATABASE_URL not set - latency at scale skipped")
+        return []
+    try:
+        import psycopg2  # noqa: F401
+    except ImportError:
+        print("⚠️  Python 'psycopg2' module not installed (pip install psycopg2-binary) - latency at scale skipped")
+        return []
+    
+    levels = [int(level) for level in os.environ.get("TICKETS_SCALE_LEVELS", "10000,100000").split(",") if level.strip()]
+    runs = int(os.environ.get("TICKETS_SCALE_RUNS", "3"))
+    # Budget de latence (médiane) des listes bornées : tableau plafonné et première page par curseur
+    budget_ms = float(os.environ.get("TICKETS_SCALE_BUDGET_MS", "1500"))
+    outcomes = []
+    
+    def median_ms(url, params=None):
+        timings = []
+        response = None
+        for _ in range(runs):
+            start = time.perf_counter()
+            response = requests.get(url, params=params, headers=headers, timeout=60)
+            timings.append((time.perf_counter() - start) * 1000)
+        return response, statistics.median(timings)
+    
+    try:
+        for level in sorted(levels):
+            print(f"   Seeding {level} tickets...")
+            seed_scale_tickets(database_url, client_id, demandeur_id, level)
+            
+            variants = {}
+            response, variants["bounded array"] = median_ms(f"{API_BASE}/tickets")
+            legacy_rows = len(response.json()) if response.status_code == 200 else -1
+            max_rows = int(response.headers.get("X-Max-Rows", "0"))
+            # Tableau historique plafonné à LIST_MAX_ROWS : tronqué et signalé (X-Has-More), jamais la table entière
+            outcomes.append((f"Scale {level} - Legacy array bounded",
+                             response.status_code == 200 and response.headers.get("X-Has-More") == "true"
+                             and 0 < legacy_rows == max_rows < level,
+                             f"{legacy_rows} rows, X-Max-Rows={max_rows}"))
+            outcomes.append((f"Scale {level} - Bounded array latency", variants["bounded array"] <= budget_ms,
+                             f"median {variants['bounded array']:.0f}ms (budget {budget_ms:.0f}ms)"))
+            
+            response, variants["page 1"] = median_ms(f"{API_BASE}/tickets", {"page": 1, "limit": 50})
+            total = (response.json().get("pagination", {}).get("total") or 0) if response.status_code == 200 else 0
+            _, variants["page 1 count=none"] = median_ms(f"{API_BASE}/tickets", {"page": 1, "limit": 50, "count": "none"})
+            _, variants["deep offset page"] = median_ms(
+                f"{API_BASE}/tickets", {"page": max(1, total // 50), "limit": 50, "count": "none"})
+            
+            response, variants["cursor page 1"] = median_ms(f"{API_BASE}/tickets", {"cursor": "", "limit": 50})
+            cursor = response.json()["pagination"]["nextCursor"] if response.status_code == 200 else None
+            # Reprise après 20 pages : le coût doit rester celui de la première
+            walk_timings = []
+            for _ in range(20):
+                if not cursor:
+                    break
+                start = time.perf_counter()
+                response = requests.get(f"{API_BASE}/tickets", params={"cursor": cursor, "limit": 50},
+                                      headers=headers, timeout=60)
+                walk_timings.append((time.perf_counter() - start) * 1000)
+                cursor = response.json()["pagination"]["nextCursor"] if response.status_code == 200 else None
+            if walk_timings:
+                variants["cursor page 21"] = walk_timings[-1]
+                variants["cursor walk avg"] = sum(walk_timings) / len(walk_timings)
+            
+            _, variants["search"] = median_ms(f"{API_BASE}/tickets", {"search": "123", "page": 1, "limit": 50})
+            
+            print(f"\n   {'variant (' + str(level) + ' tickets)':<32} {'median ms':>10}")
+            for label, value in variants.items():
+                print(f"   {label:<32} {value:>10.0f}")
+            outcomes.append((f"Scale {level} - Cursor walk completed", len(walk_timings) == 20,
+                             f"{len(walk_timings)} pages, avg {variants.get('cursor walk avg', 0):.0f}ms"))
+            outcomes.append((f"Scale {level} - Cursor page latency",
+                             max(variants["cursor page 1"], variants.get("cursor page 21", 0)) <= budget_ms,
+                             f"page 1 {variants['cursor page 1']:.0f}ms, page 21 {variants.get('cursor page 21', 0):.0f}ms "
+                             f"(budget {budget_ms:.0f}ms)"))
+    except Exception as e:
+        outcomes.append(("Latency at scale", False, str(e)))
+    finally:
+        deleted = cleanup_scale_tickets(database_url)
+        print(f"   🧹 {deleted} seeded tickets deleted")
+    
+    return outcomes
+
 def test_tickets_numero_and_search_api():
     """Test the new ticket number generation and search functionality"""
     results = TestResults()
@@ -762,7 +1160,7 @@ def test_tickets_numero_and_search_api():
     
     # Step 1: Authenticate users
     print("\n📋 STEP 1: Authentication Tests")
-    agent_token, agent_info = authenticate_user(AGENT_CREDENTIALS, "Agent")
+    agent_token, agent_info = FIXTURES.agent()
     demandeur_token, demandeur_info = authenticate_user(DEMANDEUR_CREDENTIALS, "Demandeur")
     
     if not agent_token:
@@ -782,48 +1180,14 @@ def test_tickets_numero_and_search_api():
         "Content-Type": "application/json"
     }
     
-    # Step 2: Get existing clients and demandeurs for ticket creation
+    # Step 2: Shared client and demandeur for ticket creation (session fixtures)
     print("\n📋 STEP 2: Get Test Data")
-    
-    # Get a client for ticket creation
-    try:
-        response = requests.get(f"{API_BASE}/clients", headers=headers, timeout=10)
-        if response.status_code == 200:
-            clients_data = response.json()
-            if 'data' in clients_data and len(clients_data['data']) > 0:
-                test_client_id = clients_data['data'][0]['id']
-                results.add_result("Get Test Client", True)
-            else:
-                # Try direct array response format
-                if isinstance(clients_data, list) and len(clients_data) > 0:
-                    test_client_id = clients_data[0]['id']
-                    results.add_result("Get Test Client", True)
-                else:
-                    results.add_result("Get Test Client", False, "No clients found")
-                    return results.summary()
-        else:
-            results.add_result("Get Test Client", False, f"Status: {response.status_code}")
-            return results.summary()
-    except Exception as e:
-        results.add_result("Get Test Client", False, str(e))
-        return results.summary()
-    
-    # Get a demandeur for ticket creation
     try:
-        response = requests.get(f"{API_BASE}/demandeurs", headers=headers, timeout=10)
-        if response.status_code == 200:
-            demandeurs = response.json()
-            if len(demandeurs) > 0:
-                test_demandeur_id = demandeurs[0]['id']
-                results.add_result("Get Test Demandeur", True)
-            else:
-                results.add_result("Get Test Demandeur", False, "No demandeurs found")
-                return results.summary()
-        else:
-            results.add_result("Get Test Demandeur", False, f"Status: {response.status_code}")
-            return results.summary()
-    except Exception as e:
-        results.add_result("Get Test Demandeur", False, str(e))
+        test_client_id = FIXTURES.get("client")["id"]
+        test_demandeur_id = FIXTURES.get("demandeur")["id"]
+        results.add_result("Get Test Client and Demandeur", True)
+    except FixtureError as e:
+        results.add_result("Get Test Client and Demandeur", False, str(e))
         return results.summary()
     
     # Step 3: Test POST /api/tickets - Verify numero_ticket generation
@@ -1132,8 +1496,91 @@ def test_tickets_numero_and_search_api():
     except Exception as e:
         results.add_result("GET - Invalid format search", False, str(e))
     
+    # Step 10: Bounded lists and cursor pagination
+    print("\n📋 STEP 10: Bounded lists and cursor pagination")
+    
+    # Taille de page plafonnée côté serveur
+    try:
+        response = requests.get(f"{API_BASE}/tickets?page=1&limit=100000&count=none", headers=headers, timeout=30)
+        if response.status_code == 200:
+            page = response.json()
+            limit = page.get('pagination', {}).get('limit', 0)
+            results.add_result("GET - Page size capped by server", 0 < limit <= 1000 and len(page.get('data', [])) <= limit,
+                             f"limit={limit}, rows={len(page.get('data', []))}")
+        else:
+            results.add_result("GET - Page size capped by server", False, f"Status: {response.status_code}")
+    except Exception as e:
+        results.add_result("GET - Page size capped by server", False, str(e))
+    
+    # Liste historique : tableau borné, X-Has-More si tronquée
+    try:
+        response = requests.get(f"{API_BASE}/tickets", headers=headers, timeout=30)
+        if response.status_code == 200 and isinstance(response.json(), list):
+            max_rows = int(response.headers.get("X-Max-Rows", "0"))
+            truncated = response.headers.get("X-Has-More") == "true"
+            results.add_result("GET - Legacy array still returned", True,
+                             f"{len(response.json())} tickets{' (truncated)' if truncated else ''}")
+            if truncated:
+                results.add_result("GET - Legacy array bounded", len(response.json()) == max_rows,
+                                 f"{len(response.json())} rows, X-Max-Rows={max_rows}")
+        else:
+            results.add_result("GET - Legacy array still returned", False, f"Status: {response.status_code}")
+    except Exception as e:
+        results.add_result("GET - Legacy array still returned", False, str(e))
+    
+    # Parcours par curseur : pas de doublon, ordre décroissant respecté
+    try:
+        seen_ids = []
+        dates = []
+        cursor = ""
+        pages = 0
+        while pages < 5:
+            response = requests.get(f"{API_BASE}/tickets", params={"cursor": cursor, "limit": 2},
+                                  headers=headers, timeout=30)
+            if response.status_code != 200:
+                raise Exception(f"Status: {response.status_code}, Body: {response.text}")
+            page = response.json()
+            seen_ids.extend(t['id'] for t in page['data'])
+            dates.extend(t['date_creation'] for t in page['data'])
+            pages += 1
+            if not page['pagination']['hasMore']:
+                break
+            cursor = page['pagination']['nextCursor']
+        results.add_result("GET - Cursor walk without duplicates", len(seen_ids) == len(set(seen_ids)),
+                         f"{len(seen_ids)} tickets over {pages} pages")
+        results.add_result("GET - Cursor walk ordered by date_creation DESC", dates == sorted(dates, reverse=True))
+    except Exception as e:
+        results.add_result("GET - Cursor walk", False, str(e))
+    
+    try:
+        response = requests.get(f"{API_BASE}/tickets?cursor=not-a-cursor", headers=headers, timeout=10)
+        results.add_result("GET - Invalid cursor rejected (400)", response.status_code == 400,
+                         f"Status: {response.status_code}")
+    except Exception as e:
+        results.add_result("GET - Invalid cursor rejected (400)", False, str(e))
+    
+    # Fil des échanges et listes demandeurs / agents en mode curseur
+    cursor_endpoints = ["demandeurs?cursor=&limit=5", "agents?cursor=&limit=5"]
+    if created_tickets and 'id' in created_tickets[0]:
+        cursor_endpoints.append(f"ticket-echanges?ticketId={created_tickets[0]['id']}&cursor=&limit=5")
+    for endpoint in cursor_endpoints:
+        name = endpoint.split('?')[0]
+        try:
+            response = requests.get(f"{API_BASE}/{endpoint}", headers=headers, timeout=10)
+            page = response.json() if response.status_code == 200 else {}
+            valid = isinstance(page.get('data'), list) and 'nextCursor' in page.get('pagination', {})
+            results.add_result(f"GET /{name} - Cursor page format", valid, f"Status: {response.status_code}")
+        except Exception as e:
+            results.add_result(f"GET /{name} - Cursor page format", False, str(e))
+    
+    # Step 11: Latency at scale (10k / 100k tickets)
+    print("\n📋 STEP 11: Latency at scale")
+    scale_results = measure_tickets_list_scale(headers, test_client_id, test_demandeur_id)
+    for name, passed, message in scale_results:
+        results.add_result(name, passed, message)
+    
     # Cleanup: Delete created test tickets
-    print("\n📋 STEP 10: Cleanup")
+    print("\n📋 STEP 12: Cleanup")
     
     for i, ticket in enumerate(created_tickets):
         if 'id' in ticket:
@@ -1161,7 +1608,7 @@ def test_portabilite_apis():
     
     # Step 1: Authenticate agent
     print("\n📋 STEP 1: Authentication")
-    agent_token, agent_info = authenticate_user(AGENT_CREDENTIALS, "Agent")
+    agent_token, agent_info = FIXTURES.agent()
     
     if not agent_token:
         results.add_result("Agent Authentication", False, "Failed to authenticate agent")
@@ -1418,7 +1865,7 @@ def test_database_query_debug():
     
     # Step 1: Authenticate
     print("\n📋 STEP 1: Authentication")
-    agent_token, agent_info = authenticate_user(AGENT_CREDENTIALS, "Agent")
+    agent_token, agent_info = FIXTURES.agent()
     
     if not agent_token:
         results.add_result("Agent Authentication", False, "Failed to authenticate agent")
@@ -1625,7 +2072,7 @@ def test_demandeur_transfer_debug():
     
     # Step 1: Authenticate
     print("\n📋 STEP 1: Authentication")
-    agent_token, agent_info = authenticate_user(AGENT_CREDENTIALS, "Agent")
+    agent_token, agent_info = FIXTURES.agent()
     
     if not agent_token:
         results.add_result("Agent Authentication", False, "Failed to authenticate agent")
@@ -1812,7 +2259,7 @@ def test_demandeur_transfer_functionality():
     
     # Step 1: Authenticate users
     print("\n📋 STEP 1: Authentication Tests")
-    agent_token, agent_info = authenticate_user(AGENT_CREDENTIALS, "Agent")
+    agent_token, agent_info = FIXTURES.agent()
     demandeur_token, demandeur_info = authenticate_user(DEMANDEUR_CREDENTIALS, "Demandeur")
     
     if not agent_token:
@@ -2398,7 +2845,7 @@ def test_mailjet_email_integration():
     
     # Step 1: Authenticate users
     print("\n📋 STEP 1: Authentication Tests")
-    agent_token, agent_info = authenticate_user(AGENT_CREDENTIALS, "Agent")
+    agent_token, agent_info = FIXTURES.agent()
     demandeur_token, demandeur_info = authenticate_user(DEMANDEUR_CREDENTIALS, "Demandeur")
     
     if not agent_token:
@@ -2771,7 +3218,7 @@ def test_portabilite_apis():
     
     # Step 1: Authenticate agent
     print("\n📋 STEP 1: Authentication")
-    agent_token, agent_info = authenticate_user(AGENT_CREDENTIALS, "Agent")
+    agent_token, agent_info = FIXTURES.agent()
     
     if not agent_token:
         results.add_result("Agent Authentication", False, "Failed to authenticate agent")
@@ -3028,7 +3475,7 @@ def test_portabilite_single_id_endpoint_fix():
     
     # Step 1: Authenticate users
     print("\n📋 STEP 1: Authentication Tests")
-    agent_token, agent_info = authenticate_user(AGENT_CREDENTIALS, "Agent")
+    agent_token, agent_info = FIXTURES.agent()
     demandeur_token, demandeur_info = authenticate_user(DEMANDEUR_CREDENTIALS, "Demandeur")
     
     if not agent_token:
@@ -3097,27 +3544,12 @@ def test_portabilite_single_id_endpoint_fix():
     # Step 3: Create a test portabilité to test the single ID endpoint
     print("\n📋 STEP 3: Create Test Portabilité for Single ID Testing")
     
-    # Get test data first
+    # Shared client and demandeur (session fixtures)
     try:
-        clients_response = requests.get(f"{API_BASE}/clients", headers=headers, timeout=10)
-        demandeurs_response = requests.get(f"{API_BASE}/demandeurs", headers=headers, timeout=10)
-        
-        if clients_response.status_code == 200 and demandeurs_response.status_code == 200:
-            clients_data = clients_response.json()
-            demandeurs_data = demandeurs_response.json()
-            
-            # Handle both paginated and direct array responses
-            if 'data' in clients_data:
-                test_client_id = clients_data['data'][0]['id']
-            else:
-                test_client_id = clients_data[0]['id']
-            
-            test_demandeur_id = demandeurs_data[0]['id']
-            results.add_result("Get Test Data", True)
-        else:
-            results.add_result("Get Test Data", False, "Failed to get clients or demandeurs")
-            return results.summary()
-    except Exception as e:
+        test_client_id = FIXTURES.get("client")["id"]
+        test_demandeur_id = FIXTURES.get("demandeur")["id"]
+        results.add_result("Get Test Data", True)
+    except FixtureError as e:
         results.add_result("Get Test Data", False, str(e))
         return results.summary()
     
@@ -3341,7 +3773,7 @@ def test_portabilite_delete_api():
     
     # Step 1: Authenticate users
     print("\n📋 STEP 1: Authentication")
-    agent_token, agent_info = authenticate_user(AGENT_CREDENTIALS, "Agent")
+    agent_token, agent_info = FIXTURES.agent()
     demandeur_token, demandeur_info = authenticate_user(DEMANDEUR_CREDENTIALS, "Demandeur")
     
     if not agent_token:
@@ -3584,7 +4016,7 @@ def test_clients_crud_api():
     
     # Step 1: Authenticate agent
     print("\n📋 STEP 1: Authentication")
-    agent_token, agent_info = authenticate_user(AGENT_CREDENTIALS, "Agent")
+    agent_token, agent_info = FIXTURES.agent()
     
     if not agent_token:
         results.add_result("Agent Authentication", False, "Failed to authenticate agent")
@@ -4040,7 +4472,7 @@ def test_demandeurs_societe_api():
     
     # Step 1: Authenticate users
     print("\n📋 STEP 1: Authentication Tests")
-    agent_token, agent_info = authenticate_user(AGENT_CREDENTIALS, "Agent")
+    agent_token, agent_info = FIXTURES.agent()
     demandeur_token, demandeur_info = authenticate_user(DEMANDEUR_CREDENTIALS, "Demandeur")
     
     if not agent_token:
@@ -4365,7 +4797,7 @@ def test_demandeurs_dual_management_api():
     
     # Step 1: Authenticate users
     print("\n📋 STEP 1: Authentication Tests")
-    agent_token, agent_info = authenticate_user(AGENT_CREDENTIALS, "Agent")
+    agent_token, agent_info = FIXTURES.agent()
     demandeur_token, demandeur_info = authenticate_user(DEMANDEUR_CREDENTIALS, "Demandeur")
     
     if not agent_token:
@@ -4695,7 +5127,7 @@ def test_demandeur_permissions():
     
     # Step 1: Authenticate agent to create test data
     print("\n📋 STEP 1: Agent Authentication & Setup")
-    agent_token, agent_info = authenticate_user(AGENT_CREDENTIALS, "Agent")
+    agent_token, agent_info = FIXTURES.agent()
     
     if not agent_token:
         results.add_result("Agent Authentication", False, "Failed to authenticate agent")
@@ -5088,7 +5520,7 @@ def test_portabilite_file_email_notifications():
     
     # Step 1: Authenticate users
     print("\n📋 STEP 1: Authentication Tests")
-    agent_token, agent_info = authenticate_user(AGENT_CREDENTIALS, "Agent")
+    agent_token, agent_info = FIXTURES.agent()
     demandeur_token, demandeur_info = authenticate_user(DEMANDEUR_CREDENTIALS, "Demandeur")
     
     if not agent_token:
@@ -5412,6 +5844,140 @@ def test_portabilite_file_email_notifications():
     
     return results.summary()
 
+def stress_test_demandeur_transfer(headers, client_id, results):
+    """Stress test: bulk transfer of several demandeurs owning thousands of tickets and comments.
+
+    Sizes can be tuned with TRANSFER_STRESS_TICKETS / TRANSFER_STRESS_SOURCES / TRANSFER_STRESS_COMMENTS.
+    """
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    ticket_count = int(os.environ.get("TRANSFER_STRESS_TICKETS", "2000"))
+    source_count = int(os.environ.get("TRANSFER_STRESS_SOURCES", "5"))
+    comment_count = int(os.environ.get("TRANSFER_STRESS_COMMENTS", "200"))
+    stamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    societe = f"Stress Société Transfer {stamp}"
+
+    print(f"   {source_count} sources, {ticket_count} tickets, {comment_count} comments")
+
+    def create_demandeur(label):
+        data = {
+            "nom": "StressTransfer",
+            "prenom": label,
+            "email": f"stress.transfer.{label.lower()}.{stamp}@example.com",
+            "password": "testpass123",
+            "societe": societe,
+            "telephone": "0123456789"
+        }
+        response = requests.post(f"{API_BASE}/demandeurs", headers=headers, json=data, timeout=30)
+        return (response.json()['id'], data) if response.status_code == 201 else (None, data)
+
+    created = [create_demandeur(f"Source{i}") for i in range(source_count)]
+    target_id, _ = create_demandeur("Target")
+    source_ids = [demandeur_id for demandeur_id, _ in created if demandeur_id]
+    if len(source_ids) != source_count or not target_id:
+        results.add_result("STRESS - Create demandeurs", False, "Could not create all stress demandeurs")
+        return
+    results.add_result("STRESS - Create demandeurs", True)
+
+    def create_ticket(index):
+        data = {
+            "titre": f"Stress transfer ticket {index}",
+            "client_id": client_id,
+            "demandeur_id": source_ids[index % source_count],
+            "requete_initiale": "Ticket created by the demandeur transfer stress test",
+            "status": "nouveau"
+        }
+        response = requests.post(f"{API_BASE}/tickets", headers=headers, json=data, timeout=30)
+        return response.json()['id'] if response.status_code == 201 else None
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        ticket_ids = [ticket_id for ticket_id in pool.map(create_ticket, range(ticket_count)) if ticket_id]
+    print(f"   Created {len(ticket_ids)} tickets in {time.time() - started:.1f}s")
+    results.add_result("STRESS - Create linked tickets", len(ticket_ids) == ticket_count,
+                       f"Created {len(ticket_ids)}/{ticket_count}")
+
+    # Comments authored by the first source demandeur (auteur_type = 'demandeur')
+    source_token, _ = authenticate_user({"email": created[0][1]["email"], "password": "testpass123"}, "Stress source")
+    source_tickets = ticket_ids[::source_count][:comment_count]
+    comments_created = 0
+    if source_token:
+        source_headers = {"Authorization": f"Bearer {source_token}", "Content-Type": "application/json"}
+
+        def create_comment(ticket_id):
+            response = requests.post(f"{API_BASE}/ticket-echanges?ticketId={ticket_id}", headers=source_headers,
+                                     json={"message": "Stress transfer comment"}, timeout=30)
+            return response.status_code == 201
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            comments_created = sum(pool.map(create_comment, source_tickets))
+    results.add_result("STRESS - Create demandeur comments", comments_created == len(source_tickets),
+                       f"Created {comments_created}/{len(source_tickets)}")
+
+    # An unknown destination must reject the whole batch, leaving every source untouched
+    transfers = [{"from": source_id, "to": target_id} for source_id in source_ids]
+    invalid_transfers = transfers[:-1] + [{"from": source_ids[-1], "to": str(uuid.uuid4())}]
+    response = requests.post(f"{API_BASE}/demandeurs/transfer", headers=headers,
+                             json={"transfers": invalid_transfers}, timeout=60)
+    demandeurs_after = requests.get(f"{API_BASE}/demandeurs", headers=headers, timeout=30).json()
+    remaining = {d['id'] for d in demandeurs_after} & set(source_ids)
+    results.add_result("STRESS - Invalid batch rejected without changes",
+                       response.status_code == 404 and len(remaining) == source_count,
+                       f"Status: {response.status_code}, remaining sources: {len(remaining)}")
+
+    # Bulk transfer in a single transaction
+    started = time.time()
+    response = requests.post(f"{API_BASE}/demandeurs/transfer", headers=headers,
+                             json={"transfers": transfers}, timeout=120)
+    elapsed = time.time() - started
+    if response.status_code == 200:
+        transferred_data = response.json().get('transferredData', {})
+        print(f"   Bulk transfer took {elapsed:.2f}s: {transferred_data}")
+        results.add_result("STRESS - Bulk transfer (200 response)", True)
+        results.add_result("STRESS - All tickets transferred", transferred_data.get('tickets') == len(ticket_ids),
+                           f"Expected {len(ticket_ids)}, got {transferred_data.get('tickets')}")
+        results.add_result("STRESS - Comment authorship transferred",
+                           transferred_data.get('ticket_echanges', 0) >= comments_created,
+                           f"Expected >= {comments_created}, got {transferred_data.get('ticket_echanges')}")
+        results.add_result("STRESS - Sources deleted", len(response.json().get('deleted', [])) == source_count,
+                           f"Deleted: {response.json().get('deleted')}")
+    else:
+        results.add_result("STRESS - Bulk transfer (200 response)", False,
+                           f"Status: {response.status_code}, Body: {response.text}")
+
+    # Verify that every stress ticket now belongs to the target (cursor pages: no cap on the walk)
+    wanted = set(ticket_ids)
+    stress_tickets = []
+    cursor = ""
+    status_code = 200
+    while cursor is not None:
+        response = requests.get(f"{API_BASE}/tickets", headers=headers,
+                                params={"cursor": cursor, "limit": 200}, timeout=60)
+        status_code = response.status_code
+        if status_code != 200:
+            break
+        page = response.json()
+        stress_tickets.extend(t for t in page['data'] if t['id'] in wanted)
+        cursor = page['pagination']['nextCursor'] if page['pagination']['hasMore'] else None
+    if status_code == 200:
+        misplaced = [t for t in stress_tickets if t['demandeur_id'] != target_id]
+        results.add_result("VERIFY - Stress tickets owned by target",
+                           len(stress_tickets) == len(ticket_ids) and not misplaced,
+                           f"Found {len(stress_tickets)} tickets, {len(misplaced)} misplaced")
+    else:
+        results.add_result("VERIFY - Stress tickets owned by target", False, f"Status: {status_code}")
+
+    # Cleanup
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        deleted_tickets = sum(pool.map(
+            lambda ticket_id: requests.delete(f"{API_BASE}/tickets/{ticket_id}", headers=headers,
+                                              timeout=30).status_code == 200,
+            ticket_ids))
+    response = requests.delete(f"{API_BASE}/demandeurs/{target_id}", headers=headers, timeout=30)
+    results.add_result("CLEANUP - Stress data", deleted_tickets == len(ticket_ids) and response.status_code == 200,
+                       f"Deleted {deleted_tickets}/{len(ticket_ids)} tickets, target status {response.status_code}")
+
 def test_demandeur_transfer_functionality():
     """Test the CORRECTED demandeur transfer functionality after SQL query fix"""
     results = TestResults()
@@ -5423,7 +5989,7 @@ def test_demandeur_transfer_functionality():
     
     # Step 1: Authenticate
     print("\n📋 STEP 1: Authentication")
-    agent_token, agent_info = authenticate_user(AGENT_CREDENTIALS, "Agent")
+    agent_token, agent_info = FIXTURES.agent()
     
     if not agent_token:
         results.add_result("Agent Authentication", False, "Failed to authenticate agent")
@@ -5846,8 +6412,12 @@ def test_demandeur_transfer_functionality():
         except Exception as e:
             results.add_result("DELETE - Unique demandeur (409 response)", False, str(e))
     
-    # Step 8: Cleanup
-    print("\n📋 STEP 8: Cleanup")
+    # Step 8: Stress test - bulk transfer of thousands of linked rows
+    print("\n📋 STEP 8: Stress Test - Bulk Transfer")
+    stress_test_demandeur_transfer(headers, test_client_id, results)
+    
+    # Step 9: Cleanup
+    print("\n📋 STEP 9: Cleanup")
     
     # Clean up created test tickets
     if test_ticket_id:
@@ -5889,7 +6459,7 @@ def test_productions_api():
     
     # Step 1: Authenticate users
     print("\n📋 STEP 1: Authentication Tests")
-    agent_token, agent_info = authenticate_user(AGENT_CREDENTIALS, "Agent")
+    agent_token, agent_info = FIXTURES.agent()
     demandeur_token, demandeur_info = authenticate_user(DEMANDEUR_CREDENTIALS, "Demandeur")
     
     if not agent_token:
@@ -5914,48 +6484,14 @@ def test_productions_api():
         "Content-Type": "application/json"
     } if demandeur_token else None
     
-    # Step 2: Get test data (clients and demandeurs)
+    # Step 2: Shared client and demandeur (session fixtures)
     print("\n📋 STEP 2: Get Test Data")
-    
-    # Get a client for production creation
     try:
-        response = requests.get(f"{API_BASE}/clients", headers=agent_headers, timeout=10)
-        if response.status_code == 200:
-            clients_data = response.json()
-            if 'data' in clients_data and len(clients_data['data']) > 0:
-                test_client_id = clients_data['data'][0]['id']
-                results.add_result("Get Test Client", True)
-            else:
-                # Try direct array response format
-                if isinstance(clients_data, list) and len(clients_data) > 0:
-                    test_client_id = clients_data[0]['id']
-                    results.add_result("Get Test Client", True)
-                else:
-                    results.add_result("Get Test Client", False, "No clients found")
-                    return results.summary()
-        else:
-            results.add_result("Get Test Client", False, f"Status: {response.status_code}")
-            return results.summary()
-    except Exception as e:
-        results.add_result("Get Test Client", False, str(e))
-        return results.summary()
-    
-    # Get a demandeur for production creation
-    try:
-        response = requests.get(f"{API_BASE}/demandeurs", headers=agent_headers, timeout=10)
-        if response.status_code == 200:
-            demandeurs = response.json()
-            if len(demandeurs) > 0:
-                test_demandeur_id = demandeurs[0]['id']
-                results.add_result("Get Test Demandeur", True)
-            else:
-                results.add_result("Get Test Demandeur", False, "No demandeurs found")
-                return results.summary()
-        else:
-            results.add_result("Get Test Demandeur", False, f"Status: {response.status_code}")
-            return results.summary()
-    except Exception as e:
-        results.add_result("Get Test Demandeur", False, str(e))
+        test_client_id = FIXTURES.get("client")["id"]
+        test_demandeur_id = FIXTURES.get("demandeur")["id"]
+        results.add_result("Get Test Client and Demandeur", True)
+    except FixtureError as e:
+        results.add_result("Get Test Client and Demandeur", False, str(e))
         return results.summary()
     
     # Step 3: Test GET /api/productions - Liste des productions
@@ -6497,7 +7033,7 @@ def test_productions_api_fixes():
     
     # Step 1: Authenticate
     print("\n📋 STEP 1: Authentication")
-    agent_token, agent_info = authenticate_user(AGENT_CREDENTIALS, "Agent")
+    agent_token, agent_info = FIXTURES.agent()
     
     if not agent_token:
         results.add_result("Agent Authentication", False, "Failed to authenticate agent")
@@ -6850,9 +7386,609 @@ def test_productions_api_fixes():
     
     return results.summary()
 
+def test_conditional_get_etags():
+    """Test ETag / If-None-Match (304) on list and detail endpoints, with 304 hit-rate benchmark"""
+    import time
+    results = TestResults()
+    
+    print("🚀 Starting Conditional GET (ETag) Tests")
+    print(f"Backend URL: {BACKEND_URL}")
+    print(f"API Base: {API_BASE}")
+    print("="*60)
+    
+    # Step 1: Authenticate
+    print("\n📋 STEP 1: Authentication")
+    agent_token, agent_info = FIXTURES.agent()
+    
+    if not agent_token:
+        results.add_result("Agent Authentication", False, "Failed to authenticate agent")
+        return results.summary()
+    else:
+        results.add_result("Agent Authentication", True)
+    
+    headers = {
+        "Authorization": f"Bearer {agent_token}",
+        "Content-Type": "application/json"
+    }
+    
+    endpoints = [
+        "tickets",
+        "tickets?page=1&limit=10",
+        "clients?page=1&limit=10",
+        "portabilites",
+        "productions",
+        "dashboard"
+    ]
+    
+    # Step 2: ETag present, If-None-Match -> 304 with no body
+    print("\n📋 STEP 2: ETag and 304 on unchanged resources")
+    etags = {}
+    for endpoint in endpoints:
+        try:
+            response = requests.get(f"{API_BASE}/{endpoint}", headers=headers, timeout=10)
+            etag = response.headers.get("ETag")
+            if response.status_code == 200 and etag:
+                etags[endpoint] = etag
+                results.add_result(f"GET /{endpoint} - ETag header", True)
+            else:
+                results.add_result(f"GET /{endpoint} - ETag header", False, f"Status: {response.status_code}, ETag: {etag}")
+                continue
+            
+            response = requests.get(f"{API_BASE}/{endpoint}", headers={**headers, "If-None-Match": etag}, timeout=10)
+            if response.status_code == 304 and not response.content:
+                results.add_result(f"GET /{endpoint} - 304 Not Modified", True)
+            else:
+                results.add_result(f"GET /{endpoint} - 304 Not Modified", False, f"Expected 304 without body, got {response.status_code} ({len(response.content)} bytes)")
+            
+            if response.headers.get("ETag") == etag:
+                results.add_result(f"GET /{endpoint} - 304 keeps ETag", True)
+            else:
+                results.add_result(f"GET /{endpoint} - 304 keeps ETag", False, f"Got {response.headers.get('ETag')}")
+        except Exception as e:
+            results.add_result(f"GET /{endpoint} - Conditional GET", False, str(e))
+    
+    # Step 3: Stale or weak tags
+    print("\n📋 STEP 3: Stale and weak validators")
+    if "clients?page=1&limit=10" in etags:
+        etag = etags["clients?page=1&limit=10"]
+        try:
+            response = requests.get(f"{API_BASE}/clients?page=1&limit=10", headers={**headers, "If-None-Match": '"stale-etag"'}, timeout=10)
+            results.add_result("GET - Stale ETag returns 200", response.status_code == 200, f"Got {response.status_code}")
+            
+            response = requests.get(f"{API_BASE}/clients?page=1&limit=10", headers={**headers, "If-None-Match": f'"other", W/{etag}'}, timeout=10)
+            results.add_result("GET - Weak ETag in list returns 304", response.status_code == 304, f"Got {response.status_code}")
+            
+            response = requests.get(f"{API_BASE}/clients?page=2&limit=10", headers={**headers, "If-None-Match": etag}, timeout=10)
+            results.add_result("GET - ETag is specific to the query", response.status_code == 200, f"Got {response.status_code}")
+        except Exception as e:
+            results.add_result("GET - Stale and weak validators", False, str(e))
+    
+    # Step 4: A write invalidates the ETag
+    print("\n📋 STEP 4: Invalidation after a write")
+    created_client_id = None
+    if "clients?page=1&limit=10" in etags:
+        old_etag = etags["clients?page=1&limit=10"]
+        try:
+            response = requests.post(f"{API_BASE}/clients", headers=headers, json={
+                "nom_societe": f"ETag Test {uuid.uuid4().hex[:8]}",
+                "adresse": "1 rue du Cache",
+                "nom": "Etag",
+                "prenom": "Test",
+                "numero": "ETAG001"
+            }, timeout=10)
+            
+            if response.status_code == 201:
+                created_client_id = response.json()['id']
+                results.add_result("POST - Create client for invalidation", True)
+                
+                response = requests.get(f"{API_BASE}/clients?page=1&limit=10", headers={**headers, "If-None-Match": old_etag}, timeout=10)
+                new_etag = response.headers.get("ETag")
+                if response.status_code == 200 and new_etag and new_etag != old_etag:
+                    results.add_result("GET - Old ETag invalidated after write", True)
+                else:
+                    results.add_result("GET - Old ETag invalidated after write", False, f"Status: {response.status_code}, ETag: {new_etag}")
+            else:
+                results.add_result("POST - Create client for invalidation", False, f"Status: {response.status_code}, Body: {response.text}")
+        except Exception as e:
+            results.add_result("GET - Old ETag invalidated after write", False, str(e))
+    
+    # Step 5: Benchmark - polling with If-None-Match
+    print("\n📋 STEP 5: Polling benchmark (304 hit rate)")
+    polls = int(os.environ.get("ETAG_BENCH_POLLS", "20"))
+    for endpoint in ["tickets", "clients?page=1&limit=10", "dashboard"]:
+        etag = None
+        hits = 0
+        full_times = []
+        not_modified_times = []
+        try:
+            for _ in range(polls):
+                poll_headers = dict(headers)
+                if etag:
+                    poll_headers["If-None-Match"] = etag
+                start = time.perf_counter()
+                response = requests.get(f"{API_BASE}/{endpoint}", headers=poll_headers, timeout=10)
+                elapsed = (time.perf_counter() - start) * 1000
+                if response.status_code == 304:
+                    hits += 1
+                    not_modified_times.append(elapsed)
+                else:
+                    full_times.append(elapsed)
+                    etag = response.headers.get("ETag")
+            
+            hit_rate = hits / polls * 100
+            avg_full = sum(full_times) / len(full_times) if full_times else 0
+            avg_not_modified = sum(not_modified_times) / len(not_modified_times) if not_modified_times else 0
+            print(f"   /{endpoint}: {hits}/{polls} polls → 304 ({hit_rate:.0f}%), 200 avg {avg_full:.0f}ms, 304 avg {avg_not_modified:.0f}ms")
+            # Le premier appel est toujours un 200 ; les écritures concurrentes peuvent en ajouter quelques-uns
+            results.add_result(f"Benchmark /{endpoint} - 304 hit rate ≥ 80%", hit_rate >= 80, f"{hit_rate:.0f}%")
+        except Exception as e:
+            results.add_result(f"Benchmark /{endpoint}", False, str(e))
+    
+    # Step 6: Cleanup
+    print("\n📋 STEP 6: Cleanup")
+    if created_client_id:
+        try:
+            response = requests.delete(f"{API_BASE}/clients/{created_client_id}", headers=headers, timeout=10)
+            results.add_result("DELETE - Cleanup test client", response.status_code == 200, f"Status: {response.status_code}")
+        except Exception as e:
+            results.add_result("DELETE - Cleanup test client", False, str(e))
+    
+    return results.summary()
+
+def test_payload_compression_and_fields():
+    """Test gzip/brotli negotiation and ?fields= projection, measuring bytes on the wire and latency"""
+    import statistics
+    import time
+    results = TestResults()
+    
+    print("🚀 Starting Response Compression & Sparse Fieldsets Tests")
+    print(f"Backend URL: {BACKEND_URL}")
+    print(f"API Base: {API_BASE}")
+    print("="*60)
+    
+    # Step 1: Authenticate
+    print("\n📋 STEP 1: Authentication")
+    agent_token, agent_info = FIXTURES.agent()
+    
+    if not agent_token:
+        results.add_result("Agent Authentication", False, "Failed to authenticate agent")
+        return results.summary()
+    else:
+        results.add_result("Agent Authentication", True)
+    
+    headers = {"Authorization": f"Bearer {agent_token}"}
+    runs = int(os.environ.get("PAYLOAD_BENCH_RUNS", "5"))
+    
+    endpoints = {
+        "tickets": ("tickets?page=1&limit=50", "numero_ticket,titre,status,date_creation,client_nom"),
+        "portabilites": ("portabilites?page=1&limit=50", "numero_portabilite,status,date_portabilite_demandee,date_portabilite_effective,client_display"),
+        "productions": ("productions?page=1&limit=50", "numero_production,titre,status,priorite,avancement_pourcentage,client_display")
+    }
+    
+    def measure(url, encoding):
+        """Median latency and bytes on the wire (undecoded body) over several runs"""
+        timings = []
+        wire_bytes = 0
+        content_encoding = None
+        status = None
+        for _ in range(runs):
+            start = time.perf_counter()
+            response = requests.get(url, headers={**headers, "Accept-Encoding": encoding}, timeout=30, stream=True)
+            body = response.raw.read(decode_content=False)
+            timings.append((time.perf_counter() - start) * 1000)
+            wire_bytes = len(body)
+            content_encoding = response.headers.get("Content-Encoding")
+            status = response.status_code
+        return status, wire_bytes, statistics.median(timings), content_encoding
+    
+    # Step 2: Bytes on wire and latency per endpoint
+    print("\n📋 STEP 2: Bytes on wire per endpoint")
+    print(f"   {'endpoint':<14} {'variant':<18} {'bytes':>10} {'median ms':>10} {'encoding':>10}")
+    for name, (path, fields) in endpoints.items():
+        variants = {}
+        for label, url, encoding in [
+            ("identity", f"{API_BASE}/{path}", "identity"),
+            ("gzip", f"{API_BASE}/{path}", "gzip"),
+            ("br", f"{API_BASE}/{path}", "br"),
+            ("fields", f"{API_BASE}/{path}&fields={fields}", "identity"),
+            ("fields+br", f"{API_BASE}/{path}&fields={fields}", "br")
+        ]:
+            try:
+                status, wire_bytes, median_ms, content_encoding = measure(url, encoding)
+                variants[label] = (status, wire_bytes, median_ms, content_encoding)
+                print(f"   {name:<14} {label:<18} {wire_bytes:>10} {median_ms:>10.0f} {content_encoding or '-':>10}")
+            except Exception as e:
+                results.add_result(f"GET /{name} ({label})", False, str(e))
+        
+        if len(variants) < 5 or any(v[0] != 200 for v in variants.values()):
+            results.add_result(f"GET /{name} - All variants return 200", False, f"{ {k: v[0] for k, v in variants.items()} }")
+            continue
+        results.add_result(f"GET /{name} - All variants return 200", True)
+        
+        identity_bytes = variants["identity"][1]
+        if identity_bytes >= 1024:
+            for encoding in ["gzip", "br"]:
+                status, wire_bytes, _, content_encoding = variants[encoding]
+                results.add_result(
+                    f"GET /{name} - {encoding} negotiated and smaller",
+                    content_encoding == encoding and wire_bytes < identity_bytes,
+                    f"Content-Encoding: {content_encoding}, {wire_bytes} vs {identity_bytes} bytes"
+                )
+            reduction = (1 - variants["fields+br"][1] / identity_bytes) * 100
+            print(f"   → {name}: fields+br = {reduction:.0f}% fewer bytes than full identity payload")
+        else:
+            print(f"   ⚠️  {name}: payload under 1 KB, compression not expected")
+        
+        results.add_result(
+            f"GET /{name} - fields= reduces payload",
+            variants["fields"][1] <= identity_bytes,
+            f"{variants['fields'][1]} vs {identity_bytes} bytes"
+        )
+    
+    # Step 3: Projection content
+    print("\n📋 STEP 3: Projection content")
+    for name, (path, fields) in endpoints.items():
+        try:
+            response = requests.get(f"{API_BASE}/{path}&fields={fields}", headers=headers, timeout=30)
+            if response.status_code != 200:
+                results.add_result(f"GET /{name} - Projected keys", False, f"Status: {response.status_code}")
+                continue
+            rows = response.json()["data"]
+            expected = set(["id"] + fields.split(","))
+            unexpected = [set(row.keys()) - expected for row in rows if set(row.keys()) != expected]
+            results.add_result(f"GET /{name} - Projected keys", not unexpected, f"Unexpected keys: {unexpected[:1]}")
+        except Exception as e:
+            results.add_result(f"GET /{name} - Projected keys", False, str(e))
+    
+    # Step 4: Validation
+    print("\n📋 STEP 4: Unknown fields rejected")
+    try:
+        response = requests.get(f"{API_BASE}/portabilites?fields=numero_portabilite,unknown_column", headers=headers, timeout=30)
+        results.add_result("GET - Unknown field returns 400", response.status_code == 400, f"Got {response.status_code}")
+        response = requests.get(f"{API_BASE}/tickets?page=1&fields=id;DROP", headers=headers, timeout=30)
+        results.add_result("GET - Invalid field name returns 400", response.status_code == 400, f"Got {response.status_code}")
+    except Exception as e:
+        results.add_result("GET - Field validation", False, str(e))
+    
+    return results.summary()
+
+def test_batch_api():
+    """Test /api/batch and compare batched vs sequential latency for a ticket workflow"""
+    import statistics
+    import time
+    results = TestResults()
+    
+    print("🚀 Starting Batch API Tests")
+    print(f"Backend URL: {BACKEND_URL}")
+    print(f"API Base: {API_BASE}")
+    print("="*60)
+    
+    # Step 1: Authenticate
+    print("\n📋 STEP 1: Authentication")
+    agent_token, agent_info = FIXTURES.agent()
+    
+    if not agent_token:
+        results.add_result("Agent Authentication", False, "Failed to authenticate agent")
+        return results.summary()
+    else:
+        results.add_result("Agent Authentication", True)
+    
+    agent_headers = {
+        "Authorization": f"Bearer {agent_token}",
+        "Content-Type": "application/json"
+    }
+    
+    # Step 2: Test data
+    print("\n📋 STEP 2: Get Test Client and Demandeur")
+    try:
+        test_demandeur_id = FIXTURES.get("demandeur")["id"]
+        test_client_id = FIXTURES.get("client")["id"]
+        results.add_result("Get Test Client and Demandeur", True)
+    except FixtureError as e:
+        results.add_result("Get Test Client and Demandeur", False, str(e))
+        return results.summary()
+    
+    agent_id = agent_info.get('id') if agent_info else None
+    
+    def workflow_operations(label):
+        """Create ticket + comment + take over (status en_cours, assigned agent) + reload"""
+        return [
+            {"method": "POST", "path": "/api/tickets", "body": {
+                "titre": f"BATCH Test Ticket ({label})",
+                "client_id": test_client_id,
+                "demandeur_id": test_demandeur_id,
+                "requete_initiale": "Ticket created by the batch API test",
+                "status": "nouveau"
+            }},
+            {"method": "POST", "path": "/api/ticket-echanges?ticketId={$0.id}", "body": {"message": "Prise en charge du ticket"}},
+            {"method": "PUT", "path": "/api/tickets/{$0.id}", "body": {
+                "titre": f"BATCH Test Ticket ({label})",
+                "status": "en_cours",
+                "agent_id": agent_id
+            }},
+            {"method": "GET", "path": "/api/tickets/{$0.id}"}
+        ]
+    
+    created_ticket_ids = []
+    
+    # Step 3: Batch correctness
+    print("\n📋 STEP 3: Batch workflow")
+    try:
+        response = requests.post(f"{API_BASE}/batch", headers=agent_headers,
+                                 json={"operations": workflow_operations("check")}, timeout=30)
+        if response.status_code == 200:
+            data = response.json()
+            statuses = [result['status'] for result in data['results']]
+            if data['results'][0]['status'] == 201:
+                created_ticket_ids.append(data['results'][0]['body']['id'])
+            results.add_result("POST /batch - All operations succeed", statuses == [201, 201, 200, 200], f"Statuses: {statuses}")
+            
+            ticket = data['results'][3]['body']
+            results.add_result("POST /batch - References resolved between operations",
+                               ticket.get('id') == data['results'][0]['body'].get('id') and ticket.get('status') == 'en_cours',
+                               f"Final ticket: {ticket.get('id')} / {ticket.get('status')}")
+        else:
+            results.add_result("POST /batch - All operations succeed", False, f"Status: {response.status_code}, Body: {response.text}")
+    except Exception as e:
+        results.add_result("POST /batch - All operations succeed", False, str(e))
+    
+    # Step 4: stopOnError and validation
+    print("\n📋 STEP 4: Error handling")
+    try:
+        response = requests.post(f"{API_BASE}/batch", headers=agent_headers, json={"operations": [
+            {"method": "PUT", "path": f"/api/tickets/{uuid.uuid4()}", "body": {"titre": "x", "status": "en_cours"}},
+            {"method": "GET", "path": "/api/tickets"}
+        ]}, timeout=30)
+        statuses = [result['status'] for result in response.json().get('results', [])]
+        results.add_result("POST /batch - Operations after a failure are skipped (424)", statuses == [404, 424], f"Statuses: {statuses}")
+        results.add_result("POST /batch - Response reports a non-atomic batch", response.json().get('atomic') is False,
+                           f"atomic: {response.json().get('atomic')}")
+        
+        response = requests.post(f"{API_BASE}/batch", headers=agent_headers,
+                                 json={"operations": [{"method": "POST", "path": "/api/auth"}]}, timeout=30)
+        results.add_result("POST /batch - Non-batchable function rejected", response.status_code == 400, f"Got {response.status_code}")
+        
+        response = requests.post(f"{API_BASE}/batch", json={"operations": [{"method": "GET", "path": "/api/tickets"}]}, timeout=30)
+        results.add_result("POST /batch - Requires authentication", response.status_code == 401, f"Got {response.status_code}")
+    except Exception as e:
+        results.add_result("POST /batch - Error handling", False, str(e))
+    
+    # Step 5: Benchmark batched vs sequential
+    print("\n📋 STEP 5: Batched vs sequential latency")
+    runs = int(os.environ.get("BATCH_BENCH_RUNS", "5"))
+    sequential_times = []
+    batched_times = []
+    
+    for run in range(runs):
+        # Sequential: one HTTP call per step
+        try:
+            start = time.perf_counter()
+            operations = workflow_operations(f"sequential {run + 1}")
+            response = requests.post(f"{API_BASE}/tickets", headers=agent_headers, json=operations[0]['body'], timeout=30)
+            ticket_id = response.json()['id']
+            created_ticket_ids.append(ticket_id)
+            requests.post(f"{API_BASE}/ticket-echanges?ticketId={ticket_id}", headers=agent_headers, json=operations[1]['body'], timeout=30)
+            requests.put(f"{API_BASE}/tickets/{ticket_id}", headers=agent_headers, json=operations[2]['body'], timeout=30)
+            requests.get(f"{API_BASE}/tickets/{ticket_id}", headers=agent_headers, timeout=30)
+            sequential_times.append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            print(f"   ⚠️  Sequential run {run + 1} failed: {e}")
+        
+        # Batched: the same steps in one call
+        try:
+            start = time.perf_counter()
+            response = requests.post(f"{API_BASE}/batch", headers=agent_headers,
+                                     json={"operations": workflow_operations(f"batched {run + 1}")}, timeout=30)
+            batched_times.append((time.perf_counter() - start) * 1000)
+            first = response.json()['results'][0]
+            if first['status'] == 201:
+                created_ticket_ids.append(first['body']['id'])
+        except Exception as e:
+            print(f"   ⚠️  Batched run {run + 1} failed: {e}")
+    
+    if sequential_times and batched_times:
+        sequential_median = statistics.median(sequential_times)
+        batched_median = statistics.median(batched_times)
+        print(f"   Sequential (4 calls): median {sequential_median:.0f}ms over {len(sequential_times)} runs")
+        print(f"   Batched (1 call):     median {batched_median:.0f}ms over {len(batched_times)} runs")
+        print(f"   → {(1 - batched_median / sequential_median) * 100:.0f}% faster")
+        results.add_result("Benchmark - Batched faster than sequential", batched_median < sequential_median,
+                           f"{batched_median:.0f}ms vs {sequential_median:.0f}ms")
+    else:
+        results.add_result("Benchmark - Batched vs sequential", False, "No successful runs")
+    
+    # Step 6: Cleanup (in one batch)
+    print("\n📋 STEP 6: Cleanup")
+    if created_ticket_ids:
+        try:
+            for offset in range(0, len(created_ticket_ids), 20):
+                chunk = created_ticket_ids[offset:offset + 20]
+                response = requests.post(f"{API_BASE}/batch", headers=agent_headers, json={
+                    "operations": [{"method": "DELETE", "path": f"/api/tickets/{ticket_id}"} for ticket_id in chunk],
+                    "stopOnError": False
+                }, timeout=30)
+                completed = response.json().get('completed') if response.status_code == 200 else 0
+                results.add_result(f"Cleanup - Delete {len(chunk)} test tickets", completed == len(chunk), f"Deleted {completed}/{len(chunk)}")
+        except Exception as e:
+            results.add_result("Cleanup - Delete test tickets", False, str(e))
+    
+    return results.summary()
+
+def test_change_stream_commit_order():
+    """Test that /api/changes never skips the event of a slow concurrent transaction
+
+    A transaction opened directly in the database writes an event (lower id) and stays open while
+    the API commits a comment (higher id): no event may be served until the slow transaction ends,
+    then both are delivered, the slow one first.
+    Needs DATABASE_URL (or NETLIFY_DATABASE_URL) pointing at the backend database and psycopg2.
+    """
+    import time
+    results = TestResults()
+    
+    print("🚀 Starting Change Stream Commit Order Tests")
+    print(f"Backend URL: {BACKEND_URL}")
+    print(f"API Base: {API_BASE}")
+    print("="*60)
+    
+    database_url = os.environ.get("NETLIFY_DATABASE_URL") or os.environ.get("DATABASE_URL")
+    if not database_url:
+        print("⚠️  DATABASE_URL not set - change stream commit order skipped")
+        return results.summary()
+    try:
+        import psycopg2
+    except ImportError:
+        print("⚠️  Python 'psycopg2' module not installed (pip install psycopg2-binary) - change stream commit order skipped")
+        return results.summary()
+    
+    # Step 1: Authentication and test ticket
+    print("\n📋 STEP 1: Authentication and test ticket")
+    agent_token, _ = FIXTURES.agent()
+    if not agent_token:
+        results.add_result("Agent Authentication", False, "Failed to authenticate agent")
+        return results.summary()
+    results.add_result("Agent Authentication", True)
+    
+    agent_headers = {
+        "Authorization": f"Bearer {agent_token}",
+        "Content-Type": "application/json"
+    }
+    
+    try:
+        response = requests.post(f"{API_BASE}/tickets", headers=agent_headers, json={
+            "titre": "CHANGES Test Ticket",
+            "client_id": FIXTURES.get("client")["id"],
+            "demandeur_id": FIXTURES.get("demandeur")["id"],
+            "requete_initiale": "Ticket created by the change stream test",
+            "status": "nouveau"
+        }, timeout=30)
+        if response.status_code != 201:
+            results.add_result("Create test ticket", False, f"Status {response.status_code}: {response.text}")
+            return results.summary()
+        ticket_id = response.json()['id']
+        results.add_result("Create test ticket", True)
+    except (FixtureError, requests.RequestException) as e:
+        results.add_result("Create test ticket", False, str(e))
+        return results.summary()
+    
+    params = {"entities": "ticket,ticket_echange", "wait": 0}
+    
+    def read_changes(cursor, wait=0):
+        response = requests.get(f"{API_BASE}/changes", headers=agent_headers,
+                                params={**params, "since": cursor, "wait": wait}, timeout=30)
+        response.raise_for_status()
+        return response.json()
+    
+    conn = psycopg2.connect(database_url)
+    try:
+        # Step 2: Current cursor
+        print("\n📋 STEP 2: Current cursor")
+        # Le ticket de test est validé avant la lecture du curseur : seuls les événements suivants comptent
+        time.sleep(1)
+        cursor = requests.get(f"{API_BASE}/changes", headers=agent_headers, params=params, timeout=30).json()["cursor"]
+        results.add_result("Get current cursor", bool(cursor), f"cursor {cursor}")
+        
+        # Step 3: Slow transaction writes first (lower id), the API commits a comment meanwhile (higher id)
+        print("\n📋 STEP 3: Slow transaction open while the API commits")
+        with conn.cursor() as db:
+            db.execute("UPDATE tickets SET updated_at = NOW() WHERE id = %s", (ticket_id,))
+        response = requests.post(f"{API_BASE}/ticket-echanges?ticketId={ticket_id}", headers=agent_headers,
+                                 json={"message": "Commentaire validé pendant une transaction lente"}, timeout=30)
+        results.add_result("Comment committed by the API", response.status_code == 201, f"Status {response.status_code}")
+        echange_id = response.json().get('id') if response.status_code == 201 else None
+        
+        data = read_changes(cursor)
+        held = [event for event in data["events"] if ticket_id in (event["entity_id"], event["parent_id"])]
+        results.add_result("Events held back while the slow transaction is open", not held,
+                           f"{len(held)} event(s) served before the slow transaction committed")
+        # Le curseur renvoyé pendant l'attente ne doit pas dépasser l'événement de la transaction lente
+        cursor = data["cursor"]
+        
+        # Step 4: Commit the slow transaction, both events must follow
+        print("\n📋 STEP 4: Commit the slow transaction")
+        conn.commit()
+        received = []
+        deadline = time.time() + 15
+        while time.time() < deadline:
+            data = read_changes(cursor, wait=2)
+            cursor = data["cursor"]
+            received += [event for event in data["events"] if ticket_id in (event["entity_id"], event["parent_id"])]
+            if any(event["entity"] == "ticket_echange" for event in received) and any(event["entity"] == "ticket" for event in received):
+                break
+        
+        entities = [event["entity"] for event in received]
+        results.add_result("Slow transaction event delivered", "ticket" in entities, f"received {entities}")
+        results.add_result("API comment event delivered",
+                           any(event["entity"] == "ticket_echange" and event["entity_id"] == echange_id for event in received),
+                           f"received {entities}")
+        if "ticket" in entities and "ticket_echange" in entities:
+            results.add_result("Events in transaction order", entities.index("ticket") < entities.index("ticket_echange"),
+                               f"received {entities}")
+    except Exception as e:
+        results.add_result("Change stream commit order", False, str(e))
+    finally:
+        conn.rollback()
+        conn.close()
+    
+    # Step 5: Cleanup
+    print("\n📋 STEP 5: Cleanup")
+    try:
+        response = requests.delete(f"{API_BASE}/tickets/{ticket_id}", headers=agent_headers, timeout=30)
+        results.add_result("Cleanup - Delete test ticket", response.status_code == 200, f"Status {response.status_code}")
+    except Exception as e:
+        results.add_result("Cleanup - Delete test ticket", False, str(e))
+    
+    return results.summary()
+
+
+def test_cold_start_regression():
+    """Profile function cold starts locally (fresh Node processes) and compare to the baseline"""
+    import cold_start_profiler
+    results = TestResults()
+    
+    print("🚀 Starting Cold-Start Regression Check")
+    print("="*60)
+    
+    functions = [name.strip() for name in os.environ.get(
+        "COLD_START_FUNCTIONS", "tickets,ticket-echanges,clients,portabilites,productions,auth"
+    ).split(",") if name.strip()]
+    runs = int(os.environ.get("COLD_START_RUNS", "5"))
+    max_regression = float(os.environ.get("COLD_START_MAX_REGRESSION", "25"))
+    max_load_ms = float(os.environ.get("COLD_START_MAX_LOAD_MS", "500"))
+    baseline_path = os.environ.get("COLD_START_BASELINE", cold_start_profiler.DEFAULT_BASELINE)
+    
+    # Step 1: Profile
+    print(f"\n📋 STEP 1: Profile {len(functions)} functions ({runs} cold starts each)")
+    try:
+        report = cold_start_profiler.profile(functions, runs=runs)
+        cold_start_profiler.print_report(report)
+    except Exception as e:
+        results.add_result("Cold-start profiling", False, str(e))
+        return results.summary()
+    
+    # Step 2: Limits and baseline
+    print("\n📋 STEP 2: Compare to limits and baseline")
+    baseline = cold_start_profiler.load_baseline(baseline_path)
+    if not baseline:
+        print(f"⚠️  No baseline at {baseline_path} - only the absolute limit ({max_load_ms:.0f} ms) is checked "
+              f"(create one with: python cold_start_profiler.py --save-baseline)")
+    
+    for entry in report["functions"]:
+        failures = cold_start_profiler.check_regressions(
+            {"functions": [entry]}, baseline, max_regression, max_load_ms
+        )
+        details = failures[0] if failures else (
+            f"load {entry['load_ms']:.1f} ms, first invoke {entry['first_invoke_ms'] or 0:.1f} ms, {entry['modules']} modules"
+        )
+        results.add_result(f"Cold start - {entry['function']}", not failures, details)
+    
+    return results.summary()
+
 if __name__ == "__main__":
     import sys
     
+    HTTP_CALLS.install()
+    SERVER_TIMINGS.install()
+    
     if len(sys.argv) > 1:
         test_name = sys.argv[1]
         
@@ -6874,9 +8010,19 @@ if __name__ == "__main__":
             success = test_mailjet_email_integration()
         elif test_name == "productions-fixes":
             success = test_productions_api_fixes()
+        elif test_name == "etag":
+            success = test_conditional_get_etags()
+        elif test_name == "payload":
+            success = test_payload_compression_and_fields()
+        elif test_name == "batch":
+            success = test_batch_api()
+        elif test_name == "cold-start":
+            success = test_cold_start_regression()
+        elif test_name == "changes":
+            success = test_change_stream_commit_order()
         else:
             print(f"Unknown test: {test_name}")
-            print("Available tests: ticket-echanges, clients-pagination, tickets-numero, portabilite, database-debug, demandeur-transfer-debug, demandeur-transfer, mailjet, productions-fixes")
+            print("Available tests: ticket-echanges, clients-pagination, tickets-numero, portabilite, database-debug, demandeur-transfer-debug, demandeur-transfer, mailjet, productions-fixes, etag, payload, batch, cold-start, changes")
             sys.exit(1)
     else:
         # Run all tests by default
@@ -6892,7 +8038,11 @@ if __name__ == "__main__":
             ("Demandeur Transfer Debug", test_demandeur_transfer_debug),
             ("Demandeur Transfer Functionality", test_demandeur_transfer_functionality),
             ("Mailjet Email Integration", test_mailjet_email_integration),
-            ("Productions API Fixes", test_productions_api_fixes)
+            ("Productions API Fixes", test_productions_api_fixes),
+            ("Conditional GET (ETag)", test_conditional_get_etags),
+            ("Compression & Sparse Fieldsets", test_payload_compression_and_fields),
+            ("Batch API", test_batch_api),
+            ("Change Stream Commit Order", test_change_stream_commit_order)
         ]
         
         for test_name, test_func in tests:
@@ -6900,6 +8050,7 @@ if __name__ == "__main__":
             print(f"RUNNING: {test_name}")
             print(f"{'='*80}")
             
+            calls_before = HTTP_CALLS.total
             try:
                 test_success = test_func()
                 if not test_success:
@@ -6907,5 +8058,12 @@ if __name__ == "__main__":
             except Exception as e:
                 print(f"❌ Test {test_name} failed with exception: {e}")
                 success = False
+            print(f"🌐 {test_name}: {HTTP_CALLS.total - calls_before} HTTP calls")
+    
+    # Données partagées supprimées une seule fois, en fin de run
+    if not FIXTURES.teardown():
+        success = False
+    print(f"🌐 Total HTTP calls: {HTTP_CALLS.total}")
+    SERVER_TIMINGS.print_report()
     
     sys.exit(0 if success else 1)
\ No newline at end of file
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Change stream consumer and benchmark
+Follows /api/changes (long-poll with resume cursor) and measures event latency and fan-out:
+N consumers follow the stream while comments are posted on a ticket; each consumer must
+receive every comment, and latency is measured from the POST response to reception.
+
+Usage:
+    python change_stream_consumer.py [--consumers 10] [--events 20] [--interval 0.5] [--follow]
+
+--follow only prints the events received by one consumer (Ctrl+C to stop).
+"""
+
+import argparse
+import base64
+import os
+import statistics
+import sys
+import threading
+import time
+import requests
+
+# Configuration - Use production URL from frontend/.env
+BACKEND_URL = os.environ.get("BACKEND_URL", "https://ticketnav-app.preview.emergentagent.com")
+API_BASE = f"{BACKEND_URL}/api"
+
+AGENT_CREDENTIALS = {
+    "email": "admin@voipservices.fr",
+    "password": "admin1234!"
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def login(credentials):
+    payload = {
+        "email": credentials["email"],
+        "password": base64.b64encode(credentials["password"].encode()).decode()
+    }
+    response = requests.post(f"{API_BASE}/auth", json=payload, timeout=30)
+    if response.status_code != 200:
+        return None
+    return response.json().get("access_token")
+
+
+class ChangeStreamConsumer(threading.Thread):
+    """Long-polls /api/changes from the current cursor and timestamps every event received"""
+
+    def __init__(self, token, entities=None, wait=8, on_event=None):
+        super().__init__(daemon=True)
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {token}"
+        self.entities = entities
+        self.wait = wait
+        self.on_event = on_event
+        self.cursor = None
+        self.received = {}
+        self.polls = 0
+        self.errors = 0
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+
+    def poll(self):
+        params = {"wait": self.wait}
+        if self.cursor is not None:
+            params["since"] = self.cursor
+        if self.entities:
+            params["entities"] = ",".join(self.entities)
+        response = self.session.get(f"{API_BASE}/changes", params=params, timeout=self.wait + 15)
+        response.raise_for_status()
+        return response.json()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                data = self.poll()
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️  Consumer poll error: {e}")
+                time.sleep(1)
+                continue
+            self.polls += 1
+            received_at = time.time()
+            for event in data["events"]:
+                self.received.setdefault(event["entity_id"], received_at)
+                if self.on_event:
+                    self.on_event(event)
+            self.cursor = data["cursor"]
+            self.ready.set()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def find_ticket(token):
+    response = requests.get(f"{API_BASE}/tickets", headers={"Authorization": f"Bearer {token}"}, timeout=30)
+    if response.status_code != 200:
+        return None
+    tickets = response.json()
+    tickets = tickets.get("data", []) if isinstance(tickets, dict) else tickets
+    return tickets[0]["id"] if tickets else None
+
+
+def benchmark(token, consumers_count, events_count, interval, settle_timeout):
+    ticket_id = find_ticket(token)
+    if not ticket_id:
+        print("❌ No ticket available to post comments on")
+        return False
+
+    print(f"\n{'='*60}")
+    print(f"FAN-OUT: {consumers_count} consumers, {events_count} comments on ticket {ticket_id}")
+    print(f"{'='*60}")
+
+    consumers = [ChangeStreamConsumer(token, entities=["ticket_echange"]) for _ in range(consumers_count)]
+    for consumer in consumers:
+        consumer.start()
+    for consumer in consumers:
+        if not consumer.ready.wait(timeout=30):
+            print("❌ Consumer could not obtain an initial cursor")
+            return False
+    print(f"✅ {consumers_count} consumers started")
+
+    sent = {}
+    for index in range(events_count):
+        response = requests.post(
+            f"{API_BASE}/ticket-echanges",
+            params={"ticketId": ticket_id},
+            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+            json={"message": f"[change-stream benchmark] event {index + 1}/{events_count}"},
+            timeout=30
+        )
+        if response.status_code == 201:
+            sent[response.json()["id"]] = time.time()
+        else:
+            print(f"❌ Comment {index + 1} failed: {response.status_code} - {response.text}")
+        time.sleep(interval)
+    print(f"✅ {len(sent)} comments posted")
+
+    # Attendre que chaque consommateur ait tout reçu (ou le délai maximal)
+    deadline = time.time() + settle_timeout
+    while time.time() < deadline:
+        if all(all(echange_id in consumer.received for echange_id in sent) for consumer in consumers):
+            break
+        time.sleep(0.5)
+    for consumer in consumers:
+        consumer.stop()
+
+    latencies = []
+    delivered = 0
+    for consumer in consumers:
+        for echange_id, sent_at in sent.items():
+            if echange_id in consumer.received:
+                delivered += 1
+                latencies.append(max(0.0, consumer.received[echange_id] - sent_at))
+
+    expected = len(sent) * consumers_count
+    polls = sum(consumer.polls for consumer in consumers)
+    errors = sum(consumer.errors for consumer in consumers)
+    print(f"\n{'delivered':>12} {'expected':>10} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10} {'polls':>8} {'errors':>8}")
+    if latencies:
+        print(f"{delivered:>12} {expected:>10} {statistics.median(latencies) * 1000:>10.0f} "
+              f"{percentile(latencies, 95) * 1000:>10.0f} {max(latencies) * 1000:>10.0f} {polls:>8} {errors:>8}")
+    else:
+        print(f"{delivered:>12} {expected:>10} {'-':>10} {'-':>10} {'-':>10} {polls:>8} {errors:>8}")
+
+    if delivered == expected and expected > 0:
+        print("✅ Every consumer received every event")
+        return True
+    print(f"❌ {expected - delivered} deliveries missing")
+    return False
+
+
+def follow(token, entities):
+    def show(event):
+        print(f"{event['id']:>8} {event['entity']:<20} {event['operation']:<7} {event['entity_id']} {event.get('status') or ''}")
+
+    consumer = ChangeStreamConsumer(token, entities=entities, on_event=show)
+    consumer.start()
+    print("👂 Following /api/changes (Ctrl+C to stop)")
+    try:
+        while consumer.is_alive():
+            consumer.join(timeout=1)
+    except KeyboardInterrupt:
+        consumer.stop()
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Change stream consumer and benchmark")
+    parser.add_argument("--consumers", type=int, default=10, help="concurrent consumers (fan-out)")
+    parser.add_argument("--events", type=int, default=20, help="comments posted during the benchmark")
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between two comments")
+    parser.add_argument("--settle-timeout", type=float, default=30, help="seconds to wait for late deliveries")
+    parser.add_argument("--entities", default="", help="comma-separated entities for --follow")
+    parser.add_argument("--follow", action="store_true", help="print the stream instead of benchmarking")
+    args = parser.parse_args()
+
+    print("🚀 Starting change stream consumer")
+    print(f"Backend URL: {BACKEND_URL}")
+
+    token = login(AGENT_CREDENTIALS)
+    if not token:
+        print("❌ Agent authentication failed")
+        return False
+
+    if args.follow:
+        return follow(token, [e for e in args.entities.split(",") if e.strip()] or None)
+    return benchmark(token, args.consumers, args.events, args.interval, args.settle_timeout)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
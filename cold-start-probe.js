@@ -0,0 +1,192 @@
+const path = require('path');
+const Module = require('module');
+const { performance } = require('perf_hooks');
+
+// Sonde de démarrage à froid, lancée dans un processus neuf par cold_start_profiler.py :
+// temps de chargement de la fonction (require), arbre des require, première invocation,
+// première requête SQL et invocation à chaud. Résultat en JSON sur stdout.
+//
+//   node cold-start-probe.js <fonction> [--method GET] [--path /api/tickets] [--local-db]
+//
+// Les console.* sont renvoyés sur stderr et comptés (journalisation au chargement).
+
+const bootMs = performance.now();
+const FUNCTIONS_DIR = path.join(__dirname, 'netlify', 'functions');
+
+const argument = (name, fallback) => {
+  const index = process.argv.indexOf(name);
+  return index !== -1 ? process.argv[index + 1] : fallback;
+};
+
+const functionName = process.argv[2];
+const method = argument('--method', 'GET');
+const eventPath = argument('--path', `/api/${functionName}`);
+
+if (process.argv.includes('--local-db')) {
+  require('./dev-pg-neon').useLocalPostgres();
+}
+
+const protocolOut = process.stdout.write.bind(process.stdout);
+let logLines = 0;
+['log', 'info', 'warn', 'error', 'debug'].forEach(level => {
+  console[level] = (...args) => {
+    logLines++;
+    process.stderr.write(args.map(String).join(' ') + '\n');
+  };
+});
+
+// Nom lisible d'un module : fichier de la fonction ou paquet npm
+const labelFor = (filename) => {
+  const nodeModules = filename.lastIndexOf(`node_modules${path.sep}`);
+  if (nodeModules !== -1) {
+    const parts = filename.slice(nodeModules + 'node_modules/'.length).split(path.sep);
+    return parts[0].startsWith('@') ? `${parts[0]}/${parts[1]}` : parts[0];
+  }
+  return path.relative(FUNCTIONS_DIR, filename) || filename;
+};
+
+// Arbre des require : temps inclusif et propre de chaque premier chargement
+const loads = [];
+const stack = [];
+const queries = { phase: 'load', list: [] };
+
+const instrumentQuery = (query) => {
+  if (!query || typeof query.then !== 'function') return query;
+  const then = query.then;
+  let started = false;
+  query.then = function (onFulfilled, onRejected) {
+    if (started) return then.call(this, onFulfilled, onRejected);
+    started = true;
+    const start = performance.now();
+    const record = (failed) => queries.list.push({ phase: queries.phase, ms: performance.now() - start, failed });
+    return then.call(this,
+      value => { record(false); return onFulfilled ? onFulfilled(value) : value; },
+      error => { record(true); if (onRejected) return onRejected(error); throw error; });
+  };
+  return query;
+};
+
+// neon() renvoie un sql instrumenté : durée de chaque requête attendue, par phase
+let neonModule = null;
+const wrapNeon = (exports) => {
+  if (!neonModule) {
+    neonModule = {
+      ...exports,
+      neon: (...args) => new Proxy(exports.neon(...args), {
+        apply: (target, thisArg, callArgs) => instrumentQuery(Reflect.apply(target, thisArg, callArgs))
+      })
+    };
+  }
+  return neonModule;
+};
+
+const load = Module._load;
+Module._load = function (request, parent, isMain) {
+  let filename = request;
+  try {
+    filename = Module._resolveFilename(request, parent, isMain);
+  } catch (error) {
+    // Module introuvable : l'erreur est levée par le chargement normal
+  }
+  const cached = !path.isAbsolute(filename) || Module._cache[filename];
+  if (cached) {
+    const exports = load.apply(this, arguments);
+    return request === '@netlify/neon' ? wrapNeon(exports) : exports;
+  }
+
+  const entry = { module: labelFor(filename), parent: stack.length ? stack[stack.length - 1].module : null, depth: stack.length, childMs: 0 };
+  stack.push(entry);
+  const start = performance.now();
+  try {
+    const exports = load.apply(this, arguments);
+    return request === '@netlify/neon' ? wrapNeon(exports) : exports;
+  } finally {
+    entry.inclusiveMs = performance.now() - start;
+    entry.selfMs = entry.inclusiveMs - entry.childMs;
+    stack.pop();
+    if (stack.length) stack[stack.length - 1].childMs += entry.inclusiveMs;
+    loads.push(entry);
+  }
+};
+
+const event = () => {
+  const headers = { 'content-type': 'application/json', host: 'localhost' };
+  const jwt = require('jsonwebtoken');
+  headers.authorization = 'Bearer ' + jwt.sign(
+    { sub: 'admin@voipservices.fr', id: '00000000-0000-0000-0000-000000000001', type: 'agent', type_utilisateur: 'agent' },
+    process.env.JWT_SECRET || 'dev-secret-key',
+    { expiresIn: '5m' }
+  );
+  return {
+    httpMethod: method,
+    path: eventPath,
+    rawUrl: `http://localhost${eventPath}`,
+    headers,
+    queryStringParameters: {},
+    body: null
+  };
+};
+
+const invoke = async (handler, phase) => {
+  queries.phase = phase;
+  const start = performance.now();
+  let status = null;
+  let error = null;
+  try {
+    const response = await handler(event(), { functionName });
+    status = response ? response.statusCode : null;
+  } catch (thrown) {
+    error = thrown.message;
+  }
+  const phaseQueries = queries.list.filter(query => query.phase === phase);
+  return {
+    ms: performance.now() - start,
+    status,
+    error,
+    queries: phaseQueries.length,
+    first_query_ms: phaseQueries.length ? phaseQueries[0].ms : null,
+    query_failed: phaseQueries.some(query => query.failed)
+  };
+};
+
+const run = async () => {
+  const loadStart = performance.now();
+  const loaded = require(path.join(FUNCTIONS_DIR, `${functionName}.js`));
+  const loadMs = performance.now() - loadStart;
+  const loadLogLines = logLines;
+  const handler = loaded && typeof loaded.handler === 'function' ? loaded.handler : null;
+
+  const result = {
+    function: functionName,
+    handler: Boolean(handler),
+    boot_ms: bootMs,
+    load_ms: loadMs,
+    modules: loads.length,
+    load_log_lines: loadLogLines,
+    load_queries: queries.list.length,
+    // Sous-arbres directs de la fonction et modules les plus coûteux en temps propre
+    direct_requires: loads
+      .filter(entry => entry.depth === 1)
+      .sort((a, b) => b.inclusiveMs - a.inclusiveMs)
+      .map(entry => ({ module: entry.module, inclusive_ms: entry.inclusiveMs })),
+    heaviest_modules: loads
+      .slice()
+      .sort((a, b) => b.selfMs - a.selfMs)
+      .slice(0, 10)
+      .map(entry => ({ module: entry.module, parent: entry.parent, self_ms: entry.selfMs, inclusive_ms: entry.inclusiveMs }))
+  };
+
+  if (handler) {
+    result.first_invoke = await invoke(handler, 'first');
+    result.warm_invoke = await invoke(handler, 'warm');
+  }
+  protocolOut(JSON.stringify(result) + '\n');
+};
+
+run().then(
+  () => process.exit(0),
+  error => {
+    protocolOut(JSON.stringify({ function: functionName, error: error.message }) + '\n');
+    process.exit(1);
+  }
+);
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Cold-start profiler for Netlify functions
+Runs each function in fresh Node processes (cold-start-probe.js) and measures the module load time
+(require of the function file and its require tree), the first invocation, the first SQL query and a
+warm invocation. Writes a ranked JSON report and fails when a function regresses against a baseline.
+
+Usage:
+    python cold_start_profiler.py [FUNCTION ...] [--runs 5] [--method GET] [--local-db]
+                                  [--output cold-start-report.json]
+                                  [--baseline cold-start-baseline.json] [--max-regression 25]
+                                  [--max-load-ms 500] [--save-baseline]
+
+Without FUNCTION every HTTP function of netlify/functions is profiled: files exporting a handler, minus
+the scheduled jobs (netlify.toml schedule or schedule() in the file), which would really send digests or
+purge data when invoked. Name a scheduled function explicitly to profile it anyway. Times are medians over
+--runs processes. A function fails the check when its median load time exceeds --max-load-ms, or exceeds
+its baseline by more than --max-regression percent (and by more than MIN_REGRESSION_MS, to ignore noise).
+The first query reaches NETLIFY_DATABASE_URL, or DATABASE_URL through dev-pg-neon.js with --local-db.
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+FUNCTIONS_DIR = os.path.join(ROOT, "netlify", "functions")
+PROBE_SCRIPT = os.path.join(ROOT, "cold-start-probe.js")
+NETLIFY_TOML = os.path.join(ROOT, "netlify.toml")
+
+DEFAULT_REPORT = os.path.join(ROOT, "cold-start-report.json")
+DEFAULT_BASELINE = os.path.join(ROOT, "cold-start-baseline.json")
+
+# Écart absolu minimal pour qu'une hausse en pourcentage compte comme régression (bruit de mesure)
+MIN_REGRESSION_MS = 5.0
+
+
+def scheduled_functions():
+    """Functions with a schedule in netlify.toml ([functions."name"] schedule = ...)"""
+    if not os.path.exists(NETLIFY_TOML):
+        return set()
+    with open(NETLIFY_TOML, encoding="utf-8") as f:
+        content = f.read()
+    scheduled = set()
+    for match in re.finditer(r'^\[functions\."?([\w-]+)"?\]\s*$(.*?)(?=^\[|\Z)', content, re.MULTILINE | re.DOTALL):
+        if re.search(r"^\s*schedule\s*=", match.group(2), re.MULTILINE):
+            scheduled.add(match.group(1))
+    return scheduled
+
+
+def discover_functions():
+    """HTTP functions: files exporting a handler (helpers such as list-query.js are skipped),
+    minus the scheduled jobs, which must not be invoked by the probe"""
+    scheduled = scheduled_functions()
+    names, skipped = [], []
+    for path in sorted(glob.glob(os.path.join(FUNCTIONS_DIR, "*.js"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, encoding="utf-8") as f:
+            content = f.read()
+        if "exports.handler" not in content:
+            continue
+        if name in scheduled or re.search(r"\bschedule\s*\(", content):
+            skipped.append(name)
+        else:
+            names.append(name)
+    if skipped:
+        print(f"⏭️  Scheduled functions skipped: {', '.join(skipped)}")
+    return names
+
+
+def run_probe(function, method="GET", local_db=False, timeout=60):
+    command = ["node", PROBE_SCRIPT, function, "--method", method] + (["--local-db"] if local_db else [])
+    try:
+        completed = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        # Fonction bloquée (requête ou appel réseau sans fin) : erreur de sonde, le rapport continue
+        return {"function": function, "error": f"probe timed out after {timeout}s"}
+    lines = [line for line in completed.stdout.splitlines() if line.strip()]
+    if not lines:
+        return {"function": function, "error": completed.stderr.strip().splitlines()[-1:] or "no output"}
+    return json.loads(lines[-1])
+
+
+def median_of(runs, *keys):
+    values = []
+    for run in runs:
+        value = run
+        for key in keys:
+            value = value.get(key) if isinstance(value, dict) else None
+        if isinstance(value, (int, float)):
+            values.append(value)
+    return statistics.median(values) if values else None
+
+
+def profile_function(function, runs=5, method="GET", local_db=False):
+    """Median cold-start figures of one function over `runs` fresh processes"""
+    probes = [run_probe(function, method, local_db) for _ in range(runs)]
+    failed = [probe for probe in probes if "error" in probe and "load_ms" not in probe]
+    if failed:
+        return {"function": function, "error": str(failed[0]["error"])}
+
+    # Arbre des require du run médian (le plus représentatif)
+    representative = sorted(probes, key=lambda probe: probe["load_ms"])[len(probes) // 2]
+    return {
+        "function": function,
+        "runs": runs,
+        "boot_ms": median_of(probes, "boot_ms"),
+        "load_ms": median_of(probes, "load_ms"),
+        "first_invoke_ms": median_of(probes, "first_invoke", "ms"),
+        "first_query_ms": median_of(probes, "first_invoke", "first_query_ms"),
+        "warm_invoke_ms": median_of(probes, "warm_invoke", "ms"),
+        "first_invoke_status": representative.get("first_invoke", {}).get("status"),
+        "query_failed": any(probe.get("first_invoke", {}).get("query_failed") for probe in probes),
+        "modules": representative["modules"],
+        "load_log_lines": representative["load_log_lines"],
+        "load_queries": representative["load_queries"],
+        "direct_requires": representative["direct_requires"],
+        "heaviest_modules": representative["heaviest_modules"]
+    }
+
+
+def check_regressions(report, baseline=None, max_regression=25.0, max_load_ms=None):
+    """List of failure messages (empty when every function is within its limits)"""
+    failures = []
+    previous = {entry["function"]: entry for entry in (baseline or {}).get("functions", [])}
+    for entry in report["functions"]:
+        if "error" in entry:
+            failures.append(f"{entry['function']}: probe failed ({entry['error']})")
+            continue
+        if max_load_ms is not None and entry["load_ms"] > max_load_ms:
+            failures.append(f"{entry['function']}: load {entry['load_ms']:.1f} ms > {max_load_ms:.0f} ms")
+        before = previous.get(entry["function"])
+        if before and before.get("load_ms"):
+            limit = before["load_ms"] * (1 + max_regression / 100)
+            if entry["load_ms"] > limit and entry["load_ms"] - before["load_ms"] > MIN_REGRESSION_MS:
+                failures.append(f"{entry['function']}: load {entry['load_ms']:.1f} ms vs baseline "
+                                f"{before['load_ms']:.1f} ms (+{(entry['load_ms'] / before['load_ms'] - 1) * 100:.0f}%)")
+    return failures
+
+
+def format_ms(value):
+    return f"{value:>8.1f}" if isinstance(value, (int, float)) else f"{'-':>8}"
+
+
+def print_report(report):
+    print(f"\n{'='*104}")
+    print(f"COLD START ({report['runs']} runs per function, medians, ranked by load time)")
+    print(f"{'='*104}")
+    print(f"{'function':<30} {'boot':>8} {'load':>8} {'1st inv':>8} {'1st sql':>8} {'warm':>8} {'modules':>8} {'logs':>5}  heaviest require")
+    for entry in report["functions"]:
+        if "error" in entry:
+            print(f"❌ {entry['function']:<27} {entry['error']}")
+            continue
+        heaviest = entry["direct_requires"][0] if entry["direct_requires"] else None
+        heaviest_text = f"{heaviest['module']} ({heaviest['inclusive_ms']:.1f} ms)" if heaviest else "-"
+        print(f"{entry['function']:<30} {format_ms(entry['boot_ms'])} {format_ms(entry['load_ms'])} "
+              f"{format_ms(entry['first_invoke_ms'])} {format_ms(entry['first_query_ms'])} {format_ms(entry['warm_invoke_ms'])} "
+              f"{entry['modules']:>8} {entry['load_log_lines']:>5}  {heaviest_text}")
+    if any(entry.get("query_failed") for entry in report["functions"]):
+        print("\n⚠️  Some first queries failed (no database reachable?) - first query times include the failure")
+
+
+def profile(functions, runs=5, method="GET", local_db=False):
+    entries = []
+    for function in functions:
+        print(f"⏱️  {function}...", flush=True)
+        entries.append(profile_function(function, runs, method, local_db))
+    entries.sort(key=lambda entry: entry.get("load_ms") or 0, reverse=True)
+    return {"runs": runs, "method": method, "local_db": local_db, "functions": entries}
+
+
+def load_baseline(path):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start profiler for Netlify functions")
+    parser.add_argument("functions", nargs="*", help="function names (default: every function with a handler)")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per function")
+    parser.add_argument("--method", default="GET", help="method of the first and warm invocations")
+    parser.add_argument("--local-db", action="store_true", help="use a local Postgres (DATABASE_URL) through dev-pg-neon.js")
+    parser.add_argument("--output", default=DEFAULT_REPORT)
+    parser.add_argument("--baseline", default=os.environ.get("COLD_START_BASELINE", DEFAULT_BASELINE))
+    parser.add_argument("--max-regression", type=float, default=float(os.environ.get("COLD_START_MAX_REGRESSION", "25")),
+                        help="allowed load time increase over the baseline (percent)")
+    parser.add_argument("--max-load-ms", type=float, default=float(os.environ["COLD_START_MAX_LOAD_MS"]) if os.environ.get("COLD_START_MAX_LOAD_MS") else None)
+    parser.add_argument("--save-baseline", action="store_true", help="write this report as the new baseline")
+    args = parser.parse_args()
+
+    report = profile(args.functions or discover_functions(), args.runs, args.method, args.local_db)
+    print_report(report)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Report written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📌 Baseline saved to {args.baseline}")
+        return True
+
+    failures = check_regressions(report, load_baseline(args.baseline), args.max_regression, args.max_load_ms)
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ No cold-start regression")
+    return not failures
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,49 @@
+-- Compteurs de modifications par table, utilisés pour les ETag des GET (If-None-Match -> 304)
+-- À appliquer avec migrate.py
+
+-- Une ligne par table suivie ; version est incrémentée à chaque instruction d'écriture.
+-- Vérifier qu'une liste n'a pas changé ne coûte qu'une lecture par clé primaire.
+CREATE TABLE IF NOT EXISTS change_counters (
+    scope VARCHAR(64) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Trigger au niveau instruction : un UPDATE de 500 lignes n'incrémente le compteur qu'une fois
+CREATE OR REPLACE FUNCTION bump_change_counter()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO change_counters (scope, version, updated_at)
+    VALUES (TG_TABLE_NAME, 1, NOW())
+    ON CONFLICT (scope) DO UPDATE
+        SET version = change_counters.version + 1,
+            updated_at = NOW();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    tracked TEXT;
+BEGIN
+    FOREACH tracked IN ARRAY ARRAY[
+        'tickets', 'ticket_echanges', 'clients', 'demandeurs', 'agents', 'demandeurs_societe',
+        'portabilites', 'portabilite_echanges', 'productions', 'production_taches'
+    ]
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_change_counter ON %I', tracked, tracked);
+        EXECUTE format(
+            'CREATE TRIGGER trg_%s_change_counter
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I
+                FOR EACH STATEMENT EXECUTE FUNCTION bump_change_counter()',
+            tracked, tracked
+        );
+        INSERT INTO change_counters (scope) VALUES (tracked) ON CONFLICT (scope) DO NOTHING;
+    END LOOP;
+END;
+$$;
+
+-- Commentaires pour documentation
+COMMENT ON TABLE change_counters IS 'Version de chaque table suivie, incrémentée à chaque écriture (ETag des API)';
+COMMENT ON COLUMN change_counters.scope IS 'Nom de la table suivie';
+COMMENT ON COLUMN change_counters.version IS 'Nombre d''instructions d''écriture depuis la création du compteur';
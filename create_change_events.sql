@@ -0,0 +1,118 @@
+-- Journal des modifications pour le flux de changements (/api/changes, SSE ou long-poll)
+-- À appliquer avec migrate.py
+
+-- Une ligne par écriture sur les entités suivies. L'id sert de curseur de reprise :
+-- les clients ne relisent que les événements postérieurs au dernier reçu.
+CREATE TABLE IF NOT EXISTS change_events (
+    id BIGSERIAL PRIMARY KEY,
+    entity VARCHAR(32) NOT NULL,
+    entity_id UUID NOT NULL,
+    operation VARCHAR(10) NOT NULL CHECK (operation IN ('INSERT', 'UPDATE', 'DELETE')),
+    parent_id UUID,
+    status VARCHAR(50),
+    demandeur_id UUID,
+    societe_id UUID,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_change_events_societe_id ON change_events(societe_id, id);
+CREATE INDEX IF NOT EXISTS idx_change_events_created_at ON change_events(created_at);
+
+-- Enregistre l'événement et le diffuse (NOTIFY change_events) aux processus en LISTEN
+CREATE OR REPLACE FUNCTION record_change_event()
+RETURNS TRIGGER AS $$
+DECLARE
+    row_data JSONB;
+    event_entity VARCHAR(32);
+    event_parent UUID;
+    event_demandeur UUID;
+    event_societe UUID;
+    event_id BIGINT;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        row_data := to_jsonb(OLD);
+    ELSE
+        row_data := to_jsonb(NEW);
+    END IF;
+
+    CASE TG_TABLE_NAME
+        WHEN 'tickets' THEN
+            event_entity := 'ticket';
+            event_demandeur := (row_data->>'demandeur_id')::uuid;
+        WHEN 'ticket_echanges' THEN
+            event_entity := 'ticket_echange';
+            event_parent := (row_data->>'ticket_id')::uuid;
+            SELECT demandeur_id INTO event_demandeur FROM tickets WHERE id = event_parent;
+        WHEN 'portabilites' THEN
+            event_entity := 'portabilite';
+            event_demandeur := (row_data->>'demandeur_id')::uuid;
+        WHEN 'portabilite_echanges' THEN
+            event_entity := 'portabilite_echange';
+            event_parent := (row_data->>'portabilite_id')::uuid;
+            SELECT demandeur_id INTO event_demandeur FROM portabilites WHERE id = event_parent;
+        WHEN 'productions' THEN
+            event_entity := 'production';
+            event_demandeur := (row_data->>'demandeur_id')::uuid;
+            event_societe := (row_data->>'societe_id')::uuid;
+        WHEN 'production_taches' THEN
+            event_entity := 'production_tache';
+            event_parent := (row_data->>'production_id')::uuid;
+            SELECT demandeur_id, societe_id INTO event_demandeur, event_societe FROM productions WHERE id = event_parent;
+    END CASE;
+
+    IF event_societe IS NULL AND event_demandeur IS NOT NULL THEN
+        SELECT societe_id INTO event_societe FROM demandeurs WHERE id = event_demandeur;
+    END IF;
+
+    INSERT INTO change_events (entity, entity_id, operation, parent_id, status, demandeur_id, societe_id)
+    VALUES (event_entity, (row_data->>'id')::uuid, TG_OP, event_parent, row_data->>'status', event_demandeur, event_societe)
+    RETURNING id INTO event_id;
+
+    PERFORM pg_notify('change_events', json_build_object(
+        'id', event_id,
+        'entity', event_entity,
+        'entity_id', row_data->>'id',
+        'operation', TG_OP,
+        'societe_id', event_societe
+    )::text);
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    tracked TEXT;
+BEGIN
+    FOREACH tracked IN ARRAY ARRAY[
+        'tickets', 'ticket_echanges', 'portabilites', 'portabilite_echanges', 'productions', 'production_taches'
+    ]
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_change_event ON %I', tracked, tracked);
+        EXECUTE format(
+            'CREATE TRIGGER trg_%s_change_event
+                AFTER INSERT OR UPDATE OR DELETE ON %I
+                FOR EACH ROW EXECUTE FUNCTION record_change_event()',
+            tracked, tracked
+        );
+    END LOOP;
+END;
+$$;
+
+-- Rétention : appelée par la fonction planifiée change-events-maintenance
+CREATE OR REPLACE FUNCTION purge_change_events(retention_hours INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    deleted_count INTEGER;
+BEGIN
+    DELETE FROM change_events WHERE created_at < NOW() - make_interval(hours => retention_hours);
+    GET DIAGNOSTICS deleted_count = ROW_COUNT;
+    RETURN deleted_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Commentaires pour documentation
+COMMENT ON TABLE change_events IS 'Journal des écritures sur tickets, portabilités, productions et leurs échanges (flux /api/changes)';
+COMMENT ON COLUMN change_events.id IS 'Curseur de reprise (Last-Event-ID / since)';
+COMMENT ON COLUMN change_events.parent_id IS 'Ticket, portabilité ou production parent pour les échanges et tâches';
+COMMENT ON COLUMN change_events.societe_id IS 'Société du demandeur, utilisée pour filtrer le flux des demandeurs';
@@ -0,0 +1,20 @@
+-- Création de la table de cache des recherches SIRET (API INSEE)
+-- À exécuter dans Neon Database
+
+-- Cache persistant des réponses INSEE, y compris les SIRET inexistants (cache négatif)
+CREATE TABLE IF NOT EXISTS insee_siret_cache (
+    siret VARCHAR(14) PRIMARY KEY,
+    status VARCHAR(20) NOT NULL CHECK (status IN ('found', 'not_found')),
+    data JSONB,
+    fetched_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+-- Index pour la purge des entrées expirées
+CREATE INDEX IF NOT EXISTS idx_insee_siret_cache_expires_at ON insee_siret_cache(expires_at);
+
+-- Commentaires pour documentation
+COMMENT ON TABLE insee_siret_cache IS 'Cache des recherches SIRET auprès de l''API INSEE Sirene';
+COMMENT ON COLUMN insee_siret_cache.status IS 'found : établissement trouvé, not_found : SIRET inexistant (cache négatif)';
+COMMENT ON COLUMN insee_siret_cache.data IS 'Informations extraites de l''établissement (dénomination, adresse, état)';
+COMMENT ON COLUMN insee_siret_cache.expires_at IS 'Date d''expiration (INSEE_CACHE_TTL_HOURS / INSEE_CACHE_NEGATIVE_TTL_HOURS)';
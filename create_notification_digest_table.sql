@@ -0,0 +1,33 @@
+-- Création de la table de file d'attente pour le mode digest des notifications
+-- À exécuter dans Neon Database
+
+-- Chaque ligne correspond à une notification de commentaire pour un destinataire.
+-- La fonction planifiée notification-digest regroupe les lignes par destinataire
+-- et envoie un seul email récapitulatif par fenêtre.
+CREATE TABLE IF NOT EXISTS notification_digest_queue (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    recipient_email VARCHAR(255) NOT NULL,
+    recipient_name VARCHAR(255),
+    source VARCHAR(20) NOT NULL CHECK (source IN ('ticket', 'portabilite', 'production')),
+    reference_id UUID NOT NULL,
+    reference_label VARCHAR(500) NOT NULL,
+    client_name VARCHAR(255),
+    author_name VARCHAR(255),
+    message TEXT NOT NULL DEFAULT '',
+    link_path VARCHAR(500),
+    demandeur_id UUID,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    sent_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Index partiel sur les notifications en attente (utilisé par le regroupement par destinataire)
+CREATE INDEX IF NOT EXISTS idx_notification_digest_pending
+    ON notification_digest_queue(recipient_email, created_at)
+    WHERE sent_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_notification_digest_sent_at ON notification_digest_queue(sent_at);
+
+-- Commentaires pour documentation
+COMMENT ON TABLE notification_digest_queue IS 'File d''attente des notifications de commentaires regroupées en récapitulatif';
+COMMENT ON COLUMN notification_digest_queue.source IS 'Origine : ticket, portabilite ou production';
+COMMENT ON COLUMN notification_digest_queue.link_path IS 'Chemin relatif vers l''élément, préfixé par le domaine de la société au moment de l''envoi';
+COMMENT ON COLUMN notification_digest_queue.sent_at IS 'Date d''envoi du récapitulatif (NULL = en attente)';
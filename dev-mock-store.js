@@ -0,0 +1,247 @@
+const { v4: uuidv4 } = require('uuid');
+
+// Table en mémoire du serveur de développement : lignes par id, index par colonne
+// (clés étrangères, email, numéro) et ordre de tri maintenu à l'écriture, pour que
+// les routes n'aient ni parcours complet pour une jointure ni tri par requête.
+
+class MockTable {
+  /**
+   * options :
+   *  - indexes : colonnes indexées (valeur -> ensemble d'ids), ex. ['client_id', 'status']
+   *  - unique : colonnes à valeur unique (valeur -> id), ex. ['email']
+   *  - order : comparateur de l'ordre de parcours par défaut (sorted())
+   */
+  constructor({ indexes = [], unique = [], order = null } = {}) {
+    this.rows = new Map();
+    this.indexes = new Map(indexes.map(column => [column, new Map()]));
+    this.uniques = new Map(unique.map(column => [column, new Map()]));
+    this.order = order;
+    this.ordered = [];
+  }
+
+  get size() {
+    return this.rows.size;
+  }
+
+  get(id) {
+    return this.rows.get(id);
+  }
+
+  // Ligne dont la colonne unique vaut value
+  findBy(column, value) {
+    const id = this.uniques.get(column).get(value);
+    return id === undefined ? undefined : this.rows.get(id);
+  }
+
+  // Lignes dont la colonne indexée vaut value
+  where(column, value) {
+    const ids = this.indexes.get(column).get(value);
+    return ids ? [...ids].map(id => this.rows.get(id)) : [];
+  }
+
+  countWhere(column, value) {
+    const ids = this.indexes.get(column).get(value);
+    return ids ? ids.size : 0;
+  }
+
+  // Valeurs distinctes d'une colonne indexée ou unique
+  keys(column) {
+    return (this.indexes.get(column) || this.uniques.get(column)).keys();
+  }
+
+  all() {
+    return [...this.rows.values()];
+  }
+
+  // Lignes dans l'ordre du comparateur, sans tri à la lecture
+  sorted() {
+    return this.ordered;
+  }
+
+  insert(row) {
+    const stored = { ...row, id: row.id || uuidv4() };
+    this.rows.set(stored.id, stored);
+    this.addToIndexes(stored);
+    if (this.order) {
+      this.ordered.splice(this.position(stored), 0, stored);
+    }
+    return stored;
+  }
+
+  // Insertion en masse : un seul tri de l'ordre de parcours à la fin
+  insertMany(rows) {
+    const stored = rows.map(row => ({ ...row, id: row.id || uuidv4() }));
+    stored.forEach(row => {
+      this.rows.set(row.id, row);
+      this.addToIndexes(row);
+    });
+    if (this.order) {
+      this.ordered = this.ordered.concat(stored);
+      this.ordered.sort(this.order);
+    }
+    return stored;
+  }
+
+  update(id, changes) {
+    const current = this.rows.get(id);
+    if (!current) return undefined;
+    const updated = { ...current, ...changes, id };
+    this.removeFromIndexes(current);
+    this.rows.set(id, updated);
+    this.addToIndexes(updated);
+    if (this.order) {
+      this.ordered.splice(this.locate(current), 1);
+      this.ordered.splice(this.position(updated), 0, updated);
+    }
+    return updated;
+  }
+
+  remove(id) {
+    const current = this.rows.get(id);
+    if (!current) return false;
+    this.rows.delete(id);
+    this.removeFromIndexes(current);
+    if (this.order) {
+      this.ordered.splice(this.locate(current), 1);
+    }
+    return true;
+  }
+
+  // Recherche dichotomique de la position d'insertion (après les égaux : ordre d'insertion conservé)
+  position(row) {
+    let low = 0;
+    let high = this.ordered.length;
+    while (low < high) {
+      const middle = (low + high) >>> 1;
+      if (this.order(this.ordered[middle], row) <= 0) {
+        low = middle + 1;
+      } else {
+        high = middle;
+      }
+    }
+    return low;
+  }
+
+  // Position d'une ligne présente : premier égal par dichotomie, puis parcours des égaux
+  locate(row) {
+    let low = 0;
+    let high = this.ordered.length;
+    while (low < high) {
+      const middle = (low + high) >>> 1;
+      if (this.order(this.ordered[middle], row) < 0) {
+        low = middle + 1;
+      } else {
+        high = middle;
+      }
+    }
+    while (low < this.ordered.length && this.ordered[low] !== row) low++;
+    return low;
+  }
+
+  addToIndexes(row) {
+    this.indexes.forEach((index, column) => {
+      const value = row[column];
+      if (value === undefined || value === null) return;
+      if (!index.has(value)) index.set(value, new Set());
+      index.get(value).add(row.id);
+    });
+    this.uniques.forEach((index, column) => {
+      const value = row[column];
+      if (value !== undefined && value !== null) index.set(value, row.id);
+    });
+  }
+
+  removeFromIndexes(row) {
+    this.indexes.forEach((index, column) => {
+      const ids = index.get(row[column]);
+      if (!ids) return;
+      ids.delete(row.id);
+      if (ids.size === 0) index.delete(row[column]);
+    });
+    this.uniques.forEach((index, column) => {
+      if (index.get(row[column]) === row.id) index.delete(row[column]);
+    });
+  }
+}
+
+// Collator partagé : localeCompare recrée ses règles de comparaison à chaque appel
+const collator = new Intl.Collator('fr');
+const compareText = (a, b) => collator.compare(a || '', b || '');
+
+const createMockDB = () => ({
+  agents: new MockTable({ unique: ['email'] }),
+  demandeurs_societe: new MockTable({
+    indexes: ['siret', 'email'],
+    order: (a, b) => compareText(a.nom_societe, b.nom_societe)
+  }),
+  demandeurs: new MockTable({ unique: ['email'], indexes: ['societe_id'] }),
+  clients: new MockTable({
+    order: (a, b) => compareText(a.nom_societe, b.nom_societe) || compareText(a.nom, b.nom) || compareText(a.prenom, b.prenom)
+  }),
+  tickets: new MockTable({
+    unique: ['numero_ticket'],
+    indexes: ['client_id', 'demandeur_id', 'status'],
+    // Plus récents d'abord (dates ISO : l'ordre lexicographique est l'ordre chronologique)
+    order: (a, b) => (a.date_creation < b.date_creation ? 1 : a.date_creation > b.date_creation ? -1 : 0)
+  }),
+  ticket_echanges: new MockTable({ indexes: ['ticket_id'] })
+});
+
+const STATUSES = ['nouveau', 'en_cours', 'en_attente', 'repondu', 'resolu', 'ferme'];
+
+// Jeu de données volumineux pour les tests de charge locaux (DEV_SEED_TICKETS, DEV_SEED_CLIENTS)
+const seedVolume = (db, { tickets = 0, clients = 0, passwordHash }) => {
+  const start = Date.now();
+  const societe = db.demandeurs_societe.sorted()[0];
+  const demandeurs = db.demandeurs.all();
+
+  db.clients.insertMany(Array.from({ length: clients }, (_, i) => ({
+    nom_societe: `Client ${String(i).padStart(6, '0')}`,
+    adresse: `${i} rue de la Charge, Paris`,
+    nom: `Nom${i}`,
+    prenom: `Prenom${i}`,
+    numero: `C${i}`,
+    societe_id: societe ? societe.id : null
+  })));
+  const clientIds = [...db.clients.rows.keys()];
+
+  // Quelques demandeurs supplémentaires, tous avec le même mot de passe (pas de bcrypt par ligne)
+  for (let i = 0; i < Math.min(50, Math.ceil(tickets / 1000)); i++) {
+    demandeurs.push(db.demandeurs.insert({
+      nom: `Charge${i}`,
+      prenom: 'Demandeur',
+      societe: societe ? societe.nom_societe : 'Charge',
+      societe_id: societe ? societe.id : null,
+      email: `charge${i}@load-test.local`,
+      password: passwordHash
+    }));
+  }
+
+  const now = Date.now();
+  const rows = [];
+  let numero = 100000;
+  for (let i = 0; i < tickets && clientIds.length > 0 && demandeurs.length > 0; i++) {
+    while (db.tickets.findBy('numero_ticket', String(numero))) numero++;
+    rows.push({
+      numero_ticket: String(numero++),
+      titre: `Ticket de charge ${i}`,
+      client_id: clientIds[i % clientIds.length],
+      demandeur_id: demandeurs[i % demandeurs.length].id,
+      status: STATUSES[i % STATUSES.length],
+      date_fin_prevue: null,
+      requete_initiale: 'Ticket généré pour les tests de charge',
+      date_creation: new Date(now - Math.floor(Math.random() * 365 * 24 * 3600 * 1000)).toISOString(),
+      agent_id: null,
+      date_cloture: null
+    });
+  }
+  db.tickets.insertMany(rows);
+
+  console.log(`Seeded ${clients} clients and ${tickets} tickets in ${Date.now() - start} ms`);
+};
+
+module.exports = {
+  MockTable,
+  createMockDB,
+  seedVolume
+};
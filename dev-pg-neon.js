@@ -0,0 +1,119 @@
+const path = require('path');
+const Module = require('module');
+const { Pool } = require('pg');
+
+// Remplaçant local de @netlify/neon pour dev-functions-server.js : même interface (sql`...`,
+// sql(texte, paramètres), sql.transaction([...])) sur un pool pg vers un Postgres local.
+// Les types sont convertis par pg-types comme le driver HTTP Neon (timestamp -> Date, int8 -> texte).
+
+const pools = new Map();
+
+const poolFor = (connectionString) => {
+  if (!pools.has(connectionString)) {
+    const pool = new Pool({
+      connectionString,
+      max: parseInt(process.env.DEV_PG_POOL_SIZE || '10', 10)
+    });
+    // Connexion inactive coupée par le serveur (base supprimée, redémarrage) : sans ce handler,
+    // l'événement 'error' non écouté arrête le processus ; le pool ouvre une nouvelle connexion au besoin
+    pool.on('error', error => console.error('Postgres local : connexion inactive perdue:', error.message));
+    pools.set(connectionString, pool);
+  }
+  return pools.get(connectionString);
+};
+
+// Requête paresseuse comme chez Neon : exécutée au premier await, ou par sql.transaction
+class PendingQuery {
+  constructor(pool, text, params) {
+    this.pool = pool;
+    this.text = text;
+    this.params = params;
+    this.promise = null;
+  }
+
+  run(client = this.pool) {
+    return client.query(this.text, this.params).then(result => result.rows);
+  }
+
+  then(onFulfilled, onRejected) {
+    if (!this.promise) this.promise = this.run();
+    return this.promise.then(onFulfilled, onRejected);
+  }
+
+  catch(onRejected) {
+    return this.then(undefined, onRejected);
+  }
+
+  finally(onFinally) {
+    return this.then(
+      value => Promise.resolve(onFinally()).then(() => value),
+      error => Promise.resolve(onFinally()).then(() => { throw error; })
+    );
+  }
+}
+
+// Gabarit sql`... ${valeur} ...` -> texte avec $1, $2...
+const fromTemplate = (strings, values) => ({
+  text: strings.reduce((text, part, index) => text + part + (index < values.length ? `$${index + 1}` : ''), ''),
+  params: values
+});
+
+const neon = (connectionString = process.env.NETLIFY_DATABASE_URL || process.env.DATABASE_URL) => {
+  if (!connectionString) {
+    throw new Error('NETLIFY_DATABASE_URL ou DATABASE_URL requis (Postgres local)');
+  }
+  const pool = poolFor(connectionString);
+
+  const sql = (first, ...rest) => {
+    const { text, params } = Array.isArray(first) && first.raw
+      ? fromTemplate(first, rest)
+      : { text: first, params: rest[0] || [] };
+    return new PendingQuery(pool, text, params);
+  };
+
+  sql.query = (text, params = []) => new PendingQuery(pool, text, params);
+
+  // Transaction non interactive : toutes les requêtes sur une connexion entre BEGIN et COMMIT
+  sql.transaction = async (queries) => {
+    const list = typeof queries === 'function' ? queries(sql) : queries;
+    const client = await pool.connect();
+    try {
+      await client.query('BEGIN');
+      const results = [];
+      for (const query of list) {
+        results.push(await query.run(client));
+      }
+      await client.query('COMMIT');
+      return results;
+    } catch (error) {
+      await client.query('ROLLBACK').catch(() => {});
+      throw error;
+    } finally {
+      client.release();
+    }
+  };
+
+  return sql;
+};
+
+const closePools = () => Promise.all([...pools.values()].map(pool => pool.end()));
+
+// Redirige require('@netlify/neon') vers ce module pour toutes les fonctions chargées ensuite
+const useLocalPostgres = () => {
+  // Les fonctions lisent NETLIFY_DATABASE_URL : DATABASE_URL suffit en local
+  if (!process.env.NETLIFY_DATABASE_URL && process.env.DATABASE_URL) {
+    process.env.NETLIFY_DATABASE_URL = process.env.DATABASE_URL;
+  }
+  const replacement = path.join(__dirname, 'dev-pg-neon.js');
+  const resolveFilename = Module._resolveFilename;
+  Module._resolveFilename = function (request, ...args) {
+    if (request === '@netlify/neon') return replacement;
+    return resolveFilename.call(this, request, ...args);
+  };
+};
+
+module.exports = {
+  neon,
+  closePools,
+  useLocalPostgres
+};
@@ -3,6 +3,7 @@ const cors = require('cors');
 const bcrypt = require('bcryptjs');
 const jwt = require('jsonwebtoken');
 const { v4: uuidv4 } = require('uuid');
+const { createMockDB, seedVolume } = require('./dev-mock-store');
 
 const app = express();
 const PORT = 8001;
@@ -12,7 +13,10 @@ app.use(cors());
 app.use(express.json());
 
 // Mock database - In real app, this would be Neon
-const mockDB = {
+// Tables indexées (dev-mock-store.js) : recherche par id, clé étrangère, email ou numéro sans parcours
+const mockDB = createMockDB();
+
+const seedData = {
   agents: [
     {
       id: uuidv4(),
@@ -51,11 +55,21 @@ const mockDB = {
       password: '$2a$10$GdyKzfgy3bdkrOsi6weev.8V3msbHhiuRrKM4m3PUwMCf7ShDYv6G' // password123
     }
   ],
-  clients: [],
-  tickets: [],
-  ticket_echanges: []
 };
 
+mockDB.agents.insertMany(seedData.agents);
+mockDB.demandeurs_societe.insertMany(seedData.demandeurs_societe);
+mockDB.demandeurs.insertMany(seedData.demandeurs);
+
+// Volumes de charge optionnels : DEV_SEED_TICKETS=100000 DEV_SEED_CLIENTS=1000 node dev-server.js
+if (process.env.DEV_SEED_TICKETS || process.env.DEV_SEED_CLIENTS) {
+  seedVolume(mockDB, {
+    tickets: parseInt(process.env.DEV_SEED_TICKETS || '0', 10),
+    clients: parseInt(process.env.DEV_SEED_CLIENTS || '100', 10),
+    passwordHash: seedData.demandeurs[0].password
+  });
+}
+
 // JWT Secret
 const JWT_SECRET = 'dev-secret-key';
 
@@ -65,12 +79,12 @@ app.post('/api/auth', async (req, res) => {
     const { email, password } = req.body;
 
     // Check in demandeurs first
-    let user = mockDB.demandeurs.find(u => u.email === email);
+    let user = mockDB.demandeurs.findBy('email', email);
     let userType = 'demandeur';
 
     // If not found, check in agents
     if (!user) {
-      user = mockDB.agents.find(u => u.email === email);
+      user = mockDB.agents.findBy('email', email);
       userType = 'agent';
     }
 
@@ -135,12 +149,13 @@ app.get('/api/clients', verifyToken, (req, res) => {
   const search = req.query.search || '';
   const offset = (page - 1) * limit;
 
-  let filteredClients = mockDB.clients;
+  // Clients déjà triés (nom_societe, nom, prenom) par la table
+  let filteredClients = mockDB.clients.sorted();
 
   // Ajouter la recherche si présente
   if (search) {
     const searchLower = search.toLowerCase();
-    filteredClients = mockDB.clients.filter(client => {
+    filteredClients = filteredClients.filter(client => {
       return (
         (client.nom_societe && client.nom_societe.toLowerCase().includes(searchLower)) ||
         (client.nom && client.nom.toLowerCase().includes(searchLower)) ||
@@ -150,17 +165,6 @@ app.get('/api/clients', verifyToken, (req, res) => {
     });
   }
 
-  // Trier les résultats
-  filteredClients.sort((a, b) => {
-    if (a.nom_societe < b.nom_societe) return -1;
-    if (a.nom_societe > b.nom_societe) return 1;
-    if ((a.nom || '') < (b.nom || '')) return -1;
-    if ((a.nom || '') > (b.nom || '')) return 1;
-    if ((a.prenom || '') < (b.prenom || '')) return -1;
-    if ((a.prenom || '') > (b.prenom || '')) return 1;
-    return 0;
-  });
-
   // Appliquer la pagination
   const total = filteredClients.length;
   const totalPages = Math.ceil(total / limit);
@@ -188,41 +192,37 @@ app.post('/api/clients', verifyToken, (req, res) => {
     return res.status(400).json({ detail: 'Le nom de société et l\'adresse sont requis' });
   }
   
-  const client = { 
+  const client = mockDB.clients.insert({ 
     id: uuidv4(), 
     nom_societe,
     adresse,
     nom: nom || null,
     prenom: prenom || null,
     numero: numero || null
-  };
-  mockDB.clients.push(client);
+  });
   res.status(201).json(client);
 });
 
 app.put('/api/clients/:id', verifyToken, (req, res) => {
-  const clientIndex = mockDB.clients.findIndex(c => c.id === req.params.id);
-  if (clientIndex === -1) {
+  const client = mockDB.clients.update(req.params.id, req.body);
+  if (!client) {
     return res.status(404).json({ detail: 'Client non trouvé' });
   }
   
-  mockDB.clients[clientIndex] = { ...mockDB.clients[clientIndex], ...req.body };
-  res.json(mockDB.clients[clientIndex]);
+  res.json(client);
 });
 
 app.delete('/api/clients/:id', verifyToken, (req, res) => {
-  const clientIndex = mockDB.clients.findIndex(c => c.id === req.params.id);
-  if (clientIndex === -1) {
+  if (!mockDB.clients.remove(req.params.id)) {
     return res.status(404).json({ detail: 'Client non trouvé' });
   }
   
-  mockDB.clients.splice(clientIndex, 1);
   res.json({ message: 'Client supprimé avec succès' });
 });
 
 // Agents endpoints
 app.get('/api/agents', verifyToken, (req, res) => {
-  const agents = mockDB.agents.map(a => ({
+  const agents = mockDB.agents.all().map(a => ({
     ...a,
     type_utilisateur: 'agent',
     telephone: null,
@@ -239,22 +239,20 @@ app.post('/api/agents', verifyToken, async (req, res) => {
   }
 
   // Check if email exists
-  const existingUser = [...mockDB.demandeurs, ...mockDB.agents].find(u => u.email === email);
+  const existingUser = mockDB.demandeurs.findBy('email', email) || mockDB.agents.findBy('email', email);
   if (existingUser) {
     return res.status(400).json({ detail: 'Cet email est déjà utilisé' });
   }
 
   const hashedPassword = await bcrypt.hash(password, 10);
-  const agent = {
+  const agent = mockDB.agents.insert({
     id: uuidv4(),
     nom,
     prenom,
     societe,
     email,
     password: hashedPassword
-  };
-  
-  mockDB.agents.push(agent);
+  });
   
   const { password: _, ...response } = agent;
   response.type_utilisateur = 'agent';
@@ -271,7 +269,7 @@ const generateTicketNumber = () => {
     numero = Math.floor(100000 + Math.random() * 900000).toString();
     attempts++;
     if (attempts > 100) break; // Prevent infinite loop
-  } while (mockDB.tickets.some(t => t.numero_ticket === numero));
+  } while (mockDB.tickets.findBy('numero_ticket', numero));
   return numero;
 };
 
@@ -283,29 +281,26 @@ app.get('/api/tickets', verifyToken, (req, res) => {
     const clientIdFilter = req.query.client_id;
     const searchFilter = req.query.search; // New parameter for ticket number search
     
-    let filteredTickets = mockDB.tickets;
-    
-    // Apply filters
-    if (statusFilter) {
-      const statuses = statusFilter.split(',');
-      filteredTickets = filteredTickets.filter(t => statuses.includes(t.status));
-    }
+    const statuses = statusFilter ? new Set(statusFilter.split(',')) : null;
     
-    if (clientIdFilter) {
-      filteredTickets = filteredTickets.filter(t => t.client_id === clientIdFilter);
-    }
+    // Filtre client : index client_id (seuls ses tickets sont triés) ; sinon parcours de l'ordre maintenu par date
+    let filteredTickets = clientIdFilter
+      ? mockDB.tickets.where('client_id', clientIdFilter).sort(mockDB.tickets.order)
+      : mockDB.tickets.sorted();
     
-    if (searchFilter) {
-      filteredTickets = filteredTickets.filter(t => 
-        t.numero_ticket && t.numero_ticket.includes(searchFilter)
+    // Apply filters
+    if (statuses || searchFilter) {
+      filteredTickets = filteredTickets.filter(t =>
+        (!statuses || statuses.has(t.status)) &&
+        (!searchFilter || (t.numero_ticket && t.numero_ticket.includes(searchFilter)))
       );
     }
     
-    // Add client and demandeur information to tickets
+    // Add client and demandeur information to tickets (lookups by id)
     const enrichedTickets = filteredTickets.map(ticket => {
-      const client = mockDB.clients.find(c => c.id === ticket.client_id);
-      const demandeur = mockDB.demandeurs.find(d => d.id === ticket.demandeur_id);
-      const agent = mockDB.agents.find(a => a.id === ticket.agent_id);
+      const client = mockDB.clients.get(ticket.client_id);
+      const demandeur = mockDB.demandeurs.get(ticket.demandeur_id);
+      const agent = ticket.agent_id ? mockDB.agents.get(ticket.agent_id) : undefined;
       
       return {
         ...ticket,
@@ -320,9 +315,6 @@ app.get('/api/tickets', verifyToken, (req, res) => {
       };
     });
     
-    // Sort by creation date (newest first)
-    enrichedTickets.sort((a, b) => new Date(b.date_creation) - new Date(a.date_creation));
-    
     res.json(enrichedTickets);
   } catch (error) {
     console.error('Tickets GET error:', error);
@@ -342,7 +334,7 @@ app.post('/api/tickets', verifyToken, (req, res) => {
 
     if (req.user.type === 'demandeur') {
       // For demandeurs, use their own ID
-      const demandeur = mockDB.demandeurs.find(d => d.email === req.user.sub);
+      const demandeur = mockDB.demandeurs.findBy('email', req.user.sub);
       if (!demandeur) {
         return res.status(404).json({ detail: 'Demandeur non trouvé' });
       }
@@ -360,7 +352,7 @@ app.post('/api/tickets', verifyToken, (req, res) => {
     // Generate unique ticket number
     const numero_ticket = generateTicketNumber();
 
-    const newTicket = {
+    const newTicket = mockDB.tickets.insert({
       id: uuidv4(),
       numero_ticket,
       titre,
@@ -372,9 +364,7 @@ app.post('/api/tickets', verifyToken, (req, res) => {
       date_creation: new Date().toISOString(),
       agent_id: null,
       date_cloture: null
-    };
-
-    mockDB.tickets.push(newTicket);
+    });
     
     console.log('Ticket created:', newTicket);
     res.status(201).json(newTicket);
@@ -389,22 +379,21 @@ app.put('/api/tickets/:id', verifyToken, (req, res) => {
     const ticketId = req.params.id;
     const { titre, status, agent_id, date_fin_prevue, date_cloture } = req.body;
     
-    const ticketIndex = mockDB.tickets.findIndex(t => t.id === ticketId);
-    if (ticketIndex === -1) {
+    const current = mockDB.tickets.get(ticketId);
+    if (!current) {
       return res.status(404).json({ detail: 'Ticket non trouvé' });
     }
     
     // Update ticket while preserving numero_ticket
-    mockDB.tickets[ticketIndex] = {
-      ...mockDB.tickets[ticketIndex],
-      titre: titre || mockDB.tickets[ticketIndex].titre,
-      status: status || mockDB.tickets[ticketIndex].status,
-      agent_id: agent_id !== undefined ? agent_id : mockDB.tickets[ticketIndex].agent_id,
-      date_fin_prevue: date_fin_prevue !== undefined ? date_fin_prevue : mockDB.tickets[ticketIndex].date_fin_prevue,
-      date_cloture: date_cloture !== undefined ? date_cloture : mockDB.tickets[ticketIndex].date_cloture
-    };
+    const updatedTicket = mockDB.tickets.update(ticketId, {
+      titre: titre || current.titre,
+      status: status || current.status,
+      agent_id: agent_id !== undefined ? agent_id : current.agent_id,
+      date_fin_prevue: date_fin_prevue !== undefined ? date_fin_prevue : current.date_fin_prevue,
+      date_cloture: date_cloture !== undefined ? date_cloture : current.date_cloture
+    });
     
-    res.json(mockDB.tickets[ticketIndex]);
+    res.json(updatedTicket);
   } catch (error) {
     console.error('Tickets PUT error:', error);
     res.status(500).json({ detail: 'Erreur serveur: ' + error.message });
@@ -414,13 +403,10 @@ app.put('/api/tickets/:id', verifyToken, (req, res) => {
 app.delete('/api/tickets/:id', verifyToken, (req, res) => {
   try {
     const ticketId = req.params.id;
-    const ticketIndex = mockDB.tickets.findIndex(t => t.id === ticketId);
-    
-    if (ticketIndex === -1) {
+    if (!mockDB.tickets.remove(ticketId)) {
       return res.status(404).json({ detail: 'Ticket non trouvé' });
     }
-    
-    mockDB.tickets.splice(ticketIndex, 1);
+
     res.json({ message: 'Ticket supprimé avec succès' });
   } catch (error) {
     console.error('Tickets DELETE error:', error);
@@ -436,22 +422,17 @@ app.get('/api/ticket-echanges', verifyToken, (req, res) => {
     return res.status(400).json({ detail: 'Paramètre ticketId manquant' });
   }
 
-  // Initialize mock data if not exists
-  if (!mockDB.ticket_echanges) {
-    mockDB.ticket_echanges = [];
-  }
-
-  // Get exchanges for the ticket
+  // Get exchanges for the ticket (index ticket_id)
   const echanges = mockDB.ticket_echanges
-    .filter(e => e.ticket_id === ticketId)
+    .where('ticket_id', ticketId)
     .map(e => {
       // Add author name based on type
       let auteur_nom = 'Unknown';
       if (e.auteur_type === 'agent') {
-        const agent = mockDB.agents.find(a => a.id === e.auteur_id);
+        const agent = mockDB.agents.get(e.auteur_id);
         if (agent) auteur_nom = `${agent.nom} ${agent.prenom}`;
       } else if (e.auteur_type === 'demandeur') {
-        const demandeur = mockDB.demandeurs.find(d => d.id === e.auteur_id);
+        const demandeur = mockDB.demandeurs.get(e.auteur_id);
         if (demandeur) auteur_nom = `${demandeur.nom} ${demandeur.prenom}`;
       }
       
@@ -475,16 +456,11 @@ app.post('/api/ticket-echanges', verifyToken, (req, res) => {
     return res.status(400).json({ detail: 'Le message ne peut pas être vide' });
   }
 
-  // Initialize mock data if not exists
-  if (!mockDB.ticket_echanges) {
-    mockDB.ticket_echanges = [];
-  }
-
   // Get user info based on token
   let auteurId, auteurType, auteur_nom;
   
   if (req.user.type === 'agent') {
-    const agent = mockDB.agents.find(a => a.email === req.user.sub);
+    const agent = mockDB.agents.findBy('email', req.user.sub);
     if (!agent) {
       return res.status(404).json({ detail: 'Agent non trouvé' });
     }
@@ -492,7 +468,7 @@ app.post('/api/ticket-echanges', verifyToken, (req, res) => {
     auteurType = 'agent';
     auteur_nom = `${agent.nom} ${agent.prenom}`;
   } else if (req.user.type === 'demandeur') {
-    const demandeur = mockDB.demandeurs.find(d => d.email === req.user.sub);
+    const demandeur = mockDB.demandeurs.findBy('email', req.user.sub);
     if (!demandeur) {
       return res.status(404).json({ detail: 'Demandeur non trouvé' });
     }
@@ -504,7 +480,7 @@ app.post('/api/ticket-echanges', verifyToken, (req, res) => {
   }
 
   // Create new exchange
-  const newEchange = {
+  const newEchange = mockDB.ticket_echanges.insert({
     id: uuidv4(),
     ticket_id: ticketId,
     auteur_id: auteurId,
@@ -512,9 +488,7 @@ app.post('/api/ticket-echanges', verifyToken, (req, res) => {
     message: message.trim(),
     created_at: new Date().toISOString(),
     auteur_nom
-  };
-
-  mockDB.ticket_echanges.push(newEchange);
+  });
   
   res.status(201).json(newEchange);
 });
@@ -650,7 +624,7 @@ app.post('/api/email-test', verifyToken, (req, res) => {
         // Test ticket creation email (simulate)
         try {
           // Check if we have test data
-          if (mockDB.clients.length === 0 || mockDB.demandeurs.length === 0) {
+          if (mockDB.clients.size === 0 || mockDB.demandeurs.size === 0) {
             return res.status(400).json({ 
               error: 'Test data not available',
               detail: 'Need at least one client and one demandeur for ticket email test'
@@ -672,8 +646,8 @@ app.post('/api/email-test', verifyToken, (req, res) => {
             message: 'Ticket creation email would be sent successfully (dev mode)',
             details: {
               ticket: mockTicket,
-              client: mockDB.clients[0],
-              demandeur: mockDB.demandeurs[0]
+              client: mockDB.clients.sorted()[0],
+              demandeur: mockDB.demandeurs.all()[0]
             }
           };
 
@@ -725,12 +699,13 @@ app.get('/api/demandeurs-societe', verifyToken, (req, res) => {
   const search = req.query.search || '';
   const offset = (page - 1) * limit;
 
-  let filteredSocietes = mockDB.demandeurs_societe;
+  // Sociétés déjà triées par nom_societe
+  let filteredSocietes = mockDB.demandeurs_societe.sorted();
 
   // Add search if present
   if (search) {
     const searchLower = search.toLowerCase();
-    filteredSocietes = mockDB.demandeurs_societe.filter(societe => {
+    filteredSocietes = filteredSocietes.filter(societe => {
       return (
         (societe.nom_societe && societe.nom_societe.toLowerCase().includes(searchLower)) ||
         (societe.siret && societe.siret.toLowerCase().includes(searchLower)) ||
@@ -740,9 +715,6 @@ app.get('/api/demandeurs-societe', verifyToken, (req, res) => {
     });
   }
 
-  // Sort results
-  filteredSocietes.sort((a, b) => a.nom_societe.localeCompare(b.nom_societe));
-
   // Apply pagination
   const total = filteredSocietes.length;
   const totalPages = Math.ceil(total / limit);
@@ -787,19 +759,19 @@ app.post('/api/demandeurs-societe', verifyToken, (req, res) => {
 
   // Check if SIRET already exists (if provided)
   if (siret) {
-    const existingSiret = mockDB.demandeurs_societe.find(s => s.siret === siret);
+    const existingSiret = mockDB.demandeurs_societe.countWhere('siret', siret) > 0;
     if (existingSiret) {
       return res.status(400).json({ detail: 'Ce SIRET est déjà utilisé' });
     }
   }
 
   // Check if email already exists
-  const existingEmail = mockDB.demandeurs_societe.find(s => s.email === email);
+  const existingEmail = mockDB.demandeurs_societe.countWhere('email', email) > 0;
   if (existingEmail) {
     return res.status(400).json({ detail: 'Cet email est déjà utilisé' });
   }
   
-  const newSociete = {
+  const newSociete = mockDB.demandeurs_societe.insert({
     id: uuidv4(),
     nom_societe,
     siret,
@@ -812,9 +784,8 @@ app.post('/api/demandeurs-societe', verifyToken, (req, res) => {
     logo_base64,
     created_at: new Date().toISOString(),
     updated_at: new Date().toISOString()
-  };
-  
-  mockDB.demandeurs_societe.push(newSociete);
+  });
+
   res.status(201).json(newSociete);
 });
 
@@ -837,27 +808,25 @@ app.put('/api/demandeurs-societe/:id', verifyToken, (req, res) => {
     logo_base64
   } = req.body;
   
-  const societeIndex = mockDB.demandeurs_societe.findIndex(s => s.id === societeId);
-  if (societeIndex === -1) {
+  if (!mockDB.demandeurs_societe.get(societeId)) {
     return res.status(404).json({ detail: 'Société non trouvée' });
   }
 
   // Check if SIRET already exists for another company (if provided)
   if (siret) {
-    const existingSiret = mockDB.demandeurs_societe.find(s => s.siret === siret && s.id !== societeId);
+    const existingSiret = mockDB.demandeurs_societe.where('siret', siret).some(s => s.id !== societeId);
     if (existingSiret) {
       return res.status(400).json({ detail: 'Ce SIRET est déjà utilisé par une autre société' });
     }
   }
 
   // Check if email already exists for another company
-  const existingEmail = mockDB.demandeurs_societe.find(s => s.email === email && s.id !== societeId);
+  const existingEmail = mockDB.demandeurs_societe.where('email', email).some(s => s.id !== societeId);
   if (existingEmail) {
     return res.status(400).json({ detail: 'Cet email est déjà utilisé par une autre société' });
   }
   
-  mockDB.demandeurs_societe[societeIndex] = {
-    ...mockDB.demandeurs_societe[societeIndex],
+  const updatedSociete = mockDB.demandeurs_societe.update(societeId, {
     nom_societe,
     siret,
     adresse,
@@ -868,9 +837,9 @@ app.put('/api/demandeurs-societe/:id', verifyToken, (req, res) => {
     email,
     logo_base64,
     updated_at: new Date().toISOString()
-  };
+  });
   
-  res.json(mockDB.demandeurs_societe[societeIndex]);
+  res.json(updatedSociete);
 });
 
 app.delete('/api/demandeurs-societe/:id', verifyToken, (req, res) => {
@@ -882,19 +851,17 @@ app.delete('/api/demandeurs-societe/:id', verifyToken, (req, res) => {
   const societeId = req.params.id;
   
   // Check if society has associated demandeurs
-  const associatedDemandeurs = mockDB.demandeurs.filter(d => d.societe_id === societeId);
-  if (associatedDemandeurs.length > 0) {
+  const associatedDemandeurs = mockDB.demandeurs.countWhere('societe_id', societeId);
+  if (associatedDemandeurs > 0) {
     return res.status(400).json({ 
-      detail: `Impossible de supprimer cette société. ${associatedDemandeurs.length} demandeur(s) y sont encore associés.` 
+      detail: `Impossible de supprimer cette société. ${associatedDemandeurs} demandeur(s) y sont encore associés.` 
     });
   }
 
-  const societeIndex = mockDB.demandeurs_societe.findIndex(s => s.id === societeId);
-  if (societeIndex === -1) {
+  if (!mockDB.demandeurs_societe.remove(societeId)) {
     return res.status(404).json({ detail: 'Société non trouvée' });
   }
-  
-  mockDB.demandeurs_societe.splice(societeIndex, 1);
+
   res.json({ message: 'Société supprimée avec succès' });
 });
 
@@ -904,13 +871,13 @@ app.get('/api/demandeurs', verifyToken, (req, res) => {
   
   if (req.user.type === 'demandeur') {
     // If user is demandeur, only show demandeurs from their society
-    const currentDemandeur = mockDB.demandeurs.find(d => d.email === req.user.sub);
+    const currentDemandeur = mockDB.demandeurs.findBy('email', req.user.sub);
     
     if (currentDemandeur && currentDemandeur.societe_id) {
       demandeurs = mockDB.demandeurs
-        .filter(d => d.societe_id === currentDemandeur.societe_id)
+        .where('societe_id', currentDemandeur.societe_id)
         .map(d => {
-          const societe = mockDB.demandeurs_societe.find(s => s.id === d.societe_id);
+          const societe = mockDB.demandeurs_societe.get(d.societe_id);
           return {
             ...d,
             societe_nom: societe ? societe.nom_societe : d.societe,
@@ -919,8 +886,7 @@ app.get('/api/demandeurs', verifyToken, (req, res) => {
         });
     } else {
       // If demandeur has no society, show only themselves
-      demandeurs = mockDB.demandeurs
-        .filter(d => d.id === currentDemandeur.id)
+      demandeurs = [mockDB.demandeurs.get(currentDemandeur.id)]
         .map(d => ({
           ...d,
           societe_nom: d.societe,
@@ -929,8 +895,8 @@ app.get('/api/demandeurs', verifyToken, (req, res) => {
     }
   } else {
     // If user is agent, show all demandeurs
-    demandeurs = mockDB.demandeurs.map(d => {
-      const societe = mockDB.demandeurs_societe.find(s => s.id === d.societe_id);
+    demandeurs = mockDB.demandeurs.all().map(d => {
+      const societe = d.societe_id ? mockDB.demandeurs_societe.get(d.societe_id) : undefined;
       return {
         ...d,
         societe_nom: societe ? societe.nom_societe : d.societe,
@@ -954,7 +920,7 @@ app.post('/api/demandeurs', verifyToken, (req, res) => {
   
   if (req.user.type === 'demandeur') {
     // If user is demandeur, force the society to be their own
-    const currentDemandeur = mockDB.demandeurs.find(d => d.email === req.user.sub);
+    const currentDemandeur = mockDB.demandeurs.findBy('email', req.user.sub);
     if (currentDemandeur) {
       createSocieteId = currentDemandeur.societe_id;
       createSociete = currentDemandeur.societe;
@@ -963,22 +929,22 @@ app.post('/api/demandeurs', verifyToken, (req, res) => {
 
   // If societe_id is provided, get the society name
   if (createSocieteId) {
-    const societeInfo = mockDB.demandeurs_societe.find(s => s.id === createSocieteId);
+    const societeInfo = mockDB.demandeurs_societe.get(createSocieteId);
     if (societeInfo) {
       createSociete = societeInfo.nom_societe;
     }
   }
 
   // Check if email already exists
-  const existingUser = mockDB.demandeurs.find(d => d.email === email) || 
-                      mockDB.agents.find(a => a.email === email);
+  const existingUser = mockDB.demandeurs.findBy('email', email) || 
+                      mockDB.agents.findBy('email', email);
   if (existingUser) {
     return res.status(400).json({ detail: 'Cet email est déjà utilisé' });
   }
 
   const hashedPassword = bcrypt.hashSync(password, 10);
   
-  const newDemandeur = {
+  const newDemandeur = mockDB.demandeurs.insert({
     id: uuidv4(),
     nom,
     prenom,
@@ -988,9 +954,8 @@ app.post('/api/demandeurs', verifyToken, (req, res) => {
     email,
     password: hashedPassword,
     type_utilisateur: 'demandeur'
-  };
-  
-  mockDB.demandeurs.push(newDemandeur);
+  });
+
   
   // Remove password from response
   const { password: _, ...responseDemandeur } = newDemandeur;
@@ -1003,8 +968,8 @@ app.put('/api/demandeurs/:id', verifyToken, (req, res) => {
   
   // Check if user can modify this demandeur
   if (req.user.type === 'demandeur') {
-    const currentDemandeur = mockDB.demandeurs.find(d => d.email === req.user.sub);
-    const targetDemandeur = mockDB.demandeurs.find(d => d.id === demandeurId);
+    const currentDemandeur = mockDB.demandeurs.findBy('email', req.user.sub);
+    const targetDemandeur = mockDB.demandeurs.get(demandeurId);
     
     if (currentDemandeur.id !== demandeurId) {
       // Demandeur can only modify someone from their society
@@ -1015,8 +980,8 @@ app.put('/api/demandeurs/:id', verifyToken, (req, res) => {
     }
   }
 
-  const demandeurIndex = mockDB.demandeurs.findIndex(d => d.id === demandeurId);
-  if (demandeurIndex === -1) {
+  const currentRow = mockDB.demandeurs.get(demandeurId);
+  if (!currentRow) {
     return res.status(404).json({ detail: 'Demandeur non trouvé' });
   }
 
@@ -1025,7 +990,7 @@ app.put('/api/demandeurs/:id', verifyToken, (req, res) => {
   
   if (req.user.type === 'demandeur') {
     // If user is demandeur, force the society to be their own
-    const currentDemandeur = mockDB.demandeurs.find(d => d.email === req.user.sub);
+    const currentDemandeur = mockDB.demandeurs.findBy('email', req.user.sub);
     if (currentDemandeur) {
       updateSocieteId = currentDemandeur.societe_id;
       updateSociete = currentDemandeur.societe;
@@ -1034,16 +999,15 @@ app.put('/api/demandeurs/:id', verifyToken, (req, res) => {
 
   // If societe_id is provided, get the society name
   if (updateSocieteId) {
-    const societeInfo = mockDB.demandeurs_societe.find(s => s.id === updateSocieteId);
+    const societeInfo = mockDB.demandeurs_societe.get(updateSocieteId);
     if (societeInfo) {
       updateSociete = societeInfo.nom_societe;
     }
   }
   
-  const hashedPassword = password ? bcrypt.hashSync(password, 10) : mockDB.demandeurs[demandeurIndex].password;
+  const hashedPassword = password ? bcrypt.hashSync(password, 10) : currentRow.password;
   
-  mockDB.demandeurs[demandeurIndex] = {
-    ...mockDB.demandeurs[demandeurIndex],
+  const updatedDemandeur = mockDB.demandeurs.update(demandeurId, {
     nom,
     prenom,
     societe: updateSociete,
@@ -1051,10 +1015,10 @@ app.put('/api/demandeurs/:id', verifyToken, (req, res) => {
     telephone,
     email,
     password: hashedPassword
-  };
+  });
   
   // Remove password from response
-  const { password: _, ...responseUpdatedDemandeur } = mockDB.demandeurs[demandeurIndex];
+  const { password: _, ...responseUpdatedDemandeur } = updatedDemandeur;
   responseUpdatedDemandeur.type_utilisateur = 'demandeur';
   
   res.json(responseUpdatedDemandeur);
@@ -1065,26 +1029,24 @@ app.delete('/api/demandeurs/:id', verifyToken, (req, res) => {
   
   // Check if user can delete this demandeur
   if (req.user.type === 'demandeur') {
-    const currentDemandeur = mockDB.demandeurs.find(d => d.email === req.user.sub);
+    const currentDemandeur = mockDB.demandeurs.findBy('email', req.user.sub);
     
     if (currentDemandeur.id === demandeurId) {
       return res.status(400).json({ detail: 'Vous ne pouvez pas supprimer votre propre compte' });
     }
     
     // Demandeur can only delete someone from their society
-    const targetDemandeur = mockDB.demandeurs.find(d => d.id === demandeurId);
+    const targetDemandeur = mockDB.demandeurs.get(demandeurId);
     if (!currentDemandeur.societe_id || !targetDemandeur.societe_id || 
         currentDemandeur.societe_id !== targetDemandeur.societe_id) {
       return res.status(403).json({ detail: 'Accès non autorisé' });
     }
   }
 
-  const demandeurIndex = mockDB.demandeurs.findIndex(d => d.id === demandeurId);
-  if (demandeurIndex === -1) {
+  if (!mockDB.demandeurs.remove(demandeurId)) {
     return res.status(404).json({ detail: 'Demandeur non trouvé' });
   }
-  
-  mockDB.demandeurs.splice(demandeurIndex, 1);
+
   res.json({ message: 'Demandeur supprimé avec succès' });
 });
 
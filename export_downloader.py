@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Export downloader
+Streams /api/export/<entity> (CSV or NDJSON) to disk, checks the row count against the
+X-Total-Count header sent when the export starts, and reports time to first byte and rows/sec.
+
+Usage:
+    python export_downloader.py [--entities tickets,portabilites,productions] [--format csv|ndjson]
+                                [--from 2025-01-01] [--to 2025-12-31] [--status nouveau,en_cours]
+                                [--output-dir exports]
+
+Without --output-dir the rows are counted and discarded.
+"""
+
+import argparse
+import base64
+import csv
+import io
+import json
+import os
+import sys
+import time
+import requests
+
+# Configuration - Use production URL from frontend/.env
+BACKEND_URL = os.environ.get("BACKEND_URL", "https://ticketnav-app.preview.emergentagent.com")
+API_BASE = f"{BACKEND_URL}/api"
+
+AGENT_CREDENTIALS = {
+    "email": "admin@voipservices.fr",
+    "password": "admin1234!"
+}
+
+ENTITIES = ["tickets", "portabilites", "productions"]
+
+
+def login(credentials):
+    payload = {
+        "email": credentials["email"],
+        "password": base64.b64encode(credentials["password"].encode()).decode()
+    }
+    response = requests.post(f"{API_BASE}/auth", json=payload, timeout=30)
+    if response.status_code != 200:
+        return None
+    return response.json().get("access_token")
+
+
+class CountingReader(io.RawIOBase):
+    """Wraps the response stream: counts bytes, notes the first byte and copies to an optional file"""
+
+    def __init__(self, raw, sink=None):
+        self.raw = raw
+        self.sink = sink
+        self.bytes_read = 0
+        self.first_byte_at = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.raw.read(len(buffer))
+        if not data:
+            return 0
+        if self.first_byte_at is None:
+            self.first_byte_at = time.perf_counter()
+        self.bytes_read += len(data)
+        if self.sink:
+            self.sink.write(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def download(token, entity, export_format, filters, output_dir):
+    params = {"format": export_format, **{key: value for key, value in filters.items() if value}}
+    start = time.perf_counter()
+    response = requests.get(
+        f"{API_BASE}/export/{entity}",
+        params=params,
+        headers={"Authorization": f"Bearer {token}"},
+        stream=True,
+        timeout=60
+    )
+    if response.status_code != 200:
+        print(f"❌ {entity}: {response.status_code} - {response.text}")
+        return None
+
+    expected = int(response.headers.get("X-Total-Count", "-1"))
+    response.raw.decode_content = True
+
+    sink = None
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        sink = open(os.path.join(output_dir, f"{entity}.{export_format}"), "wb")
+
+    reader = CountingReader(response.raw, sink)
+    text = io.TextIOWrapper(io.BufferedReader(reader), encoding="utf-8", newline="")
+    rows = 0
+    try:
+        if export_format == "csv":
+            # csv gère les champs entre guillemets sur plusieurs lignes ; l'en-tête n'est pas compté
+            for index, _ in enumerate(csv.reader(text)):
+                if index > 0:
+                    rows += 1
+        else:
+            for line in text:
+                if line.strip():
+                    json.loads(line)
+                    rows += 1
+    finally:
+        if sink:
+            sink.close()
+
+    elapsed = time.perf_counter() - start
+    ttfb = (reader.first_byte_at - start) if reader.first_byte_at else elapsed
+    result = {
+        "rows": rows,
+        "expected": expected,
+        "bytes": reader.bytes_read,
+        "seconds": elapsed,
+        "ttfb_ms": ttfb * 1000,
+        "rows_per_sec": rows / elapsed if elapsed > 0 else 0
+    }
+    status = "✅" if rows == expected else "❌"
+    print(f"{status} {entity:<14} {rows:>8} {expected:>9} {reader.bytes_read / 1024:>10.0f} "
+          f"{result['ttfb_ms']:>9.0f} {elapsed:>8.2f} {result['rows_per_sec']:>10.0f}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming export downloader")
+    parser.add_argument("--entities", default=",".join(ENTITIES))
+    parser.add_argument("--format", default="csv", choices=["csv", "ndjson"])
+    parser.add_argument("--from", dest="date_from", default="", help="first day included (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", default="", help="last day included (YYYY-MM-DD)")
+    parser.add_argument("--status", default="", help="comma-separated statuses")
+    parser.add_argument("--output-dir", default="", help="write the exports to this directory")
+    args = parser.parse_args()
+
+    print("🚀 Starting export download")
+    print(f"Backend URL: {BACKEND_URL}")
+
+    token = login(AGENT_CREDENTIALS)
+    if not token:
+        print("❌ Agent authentication failed")
+        return False
+
+    filters = {"from": args.date_from, "to": args.date_to, "status": args.status}
+    print(f"\n{'='*78}")
+    print(f"EXPORT ({args.format})")
+    print(f"{'='*78}")
+    print(f"   {'entity':<14} {'rows':>8} {'expected':>9} {'KB':>10} {'ttfb ms':>9} {'sec':>8} {'rows/sec':>10}")
+
+    success = True
+    for entity in [e.strip() for e in args.entities.split(",") if e.strip()]:
+        result = download(token, entity, args.format, filters, args.output_dir)
+        if not result or result["rows"] != result["expected"]:
+            success = False
+
+    # Un écart peut venir d'écritures pendant l'export (le total est lu au démarrage)
+    if not success:
+        print("\n⚠️  Row count mismatch or failed export (concurrent writes can also shift the count)")
+    return success
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '../context/AuthContext';
+import { fetchAllPages } from '../utils/pagination';
 import { Plus, Edit, Trash2, Shield, AlertCircle, Check, Mail } from 'lucide-react';
 
 const AgentsPage = () => {
@@ -23,8 +24,7 @@ const AgentsPage = () => {
 
   const fetchAgents = async () => {
     try {
-      const response = await api.get('/api/agents');
-      setAgents(response.data);
+      setAgents(await fetchAllPages(api, '/api/agents'));
     } catch (error) {
       setError('Erreur lors du chargement des agents');
     } finally {
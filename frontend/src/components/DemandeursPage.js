@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '../context/AuthContext';
+import { fetchAllPages } from '../utils/pagination';
 import { Plus, Edit, Trash2, UserCheck, AlertCircle, Check, Mail, Phone, Building, Upload, Search } from 'lucide-react';
 import SearchableSelect from './SearchableSelect';
 
@@ -71,8 +72,7 @@ const DemandeursPage = () => {
 
   const fetchDemandeurs = async () => {
     try {
-      const response = await api.get('/api/demandeurs');
-      setDemandeurs(response.data);
+      setDemandeurs(await fetchAllPages(api, '/api/demandeurs'));
     } catch (error) {
       setError('Erreur lors du chargement des demandeurs');
     } finally {
@@ -1300,6 +1300,9 @@ const DemandeursPage = () => {
                       {transferData.linkedData.portabilites > 0 && (
                         <li>{transferData.linkedData.portabilites} portabilité{transferData.linkedData.portabilites > 1 ? 's' : ''}</li>
                       )}
+                      {transferData.linkedData.productions > 0 && (
+                        <li>{transferData.linkedData.productions} production{transferData.linkedData.productions > 1 ? 's' : ''}</li>
+                      )}
                     </ul>
                   </div>
                 </div>
@@ -3,6 +3,7 @@ import { useParams, useNavigate } from 'react-router-dom';
 import { AuthContext } from '../context/AuthContext';
 import SearchableSelect from './SearchableSelect';
 import { generateMandatPDF } from '../utils/mandatPDF';
+import { fetchAllPages } from '../utils/pagination';
 
 const PortabiliteForm = () => {
   const { portabilite_uuid } = useParams();
@@ -153,10 +154,10 @@ const PortabiliteForm = () => {
     if (user.type_utilisateur !== 'agent') return;
     
     try {
-      const response = await api.get(`/api/demandeurs`);
+      const demandeursList = await fetchAllPages(api, '/api/demandeurs');
       
-      setDemandeurs(Array.isArray(response.data) ? response.data : []);
-      console.log('Demandeurs chargés:', response.data); // Debug
+      setDemandeurs(demandeursList);
+      console.log('Demandeurs chargés:', demandeursList); // Debug
     } catch (err) {
       console.error('Erreur lors du chargement des demandeurs:', err);
     }
@@ -58,7 +58,9 @@ const PortabilitesPage = () => {
       
       const params = new URLSearchParams({
         page: page.toString(),
-        limit: '10'
+        limit: '10',
+        // Seules les colonnes affichées dans le tableau (sans le PDF du mandat ni les adresses)
+        fields: 'numero_portabilite,status,date_portabilite_demandee,date_portabilite_effective,nom_societe,client_display'
       });
 
       if (newFilters.status) params.append('status', newFilters.status);
@@ -6,6 +6,7 @@ import ProductionForm from './ProductionForm';
 import ProductionTacheModal from './ProductionTacheModal';
 import SearchableSelect from './SearchableSelect';
 import { formatClientDisplay } from '../utils/clientUtils';
+import { fetchAllPages } from '../utils/pagination';
 import { 
   Plus, 
   Eye, 
@@ -150,8 +151,7 @@ const ProductionsPage = () => {
 
   const fetchDemandeurs = async () => {
     try {
-      const response = await api.get('/api/demandeurs?limit=100');
-      setDemandeurs(Array.isArray(response.data) ? response.data : response.data?.data || []);
+      setDemandeurs(await fetchAllPages(api, '/api/demandeurs'));
     } catch (error) {
       console.error('Erreur lors du chargement des demandeurs:', error);
       setDemandeurs([]);
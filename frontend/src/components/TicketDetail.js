@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
+import { fetchAllPages } from '../utils/pagination';
 import { 
   ArrowLeft, 
   Ticket, 
@@ -138,8 +139,7 @@ const TicketDetail = () => {
     
     try {
       setLoadingExchanges(true);
-      const response = await api.get(`/api/ticket-echanges?ticketId=${ticket.id}`);
-      setExchanges(response.data || []);
+      setExchanges(await fetchAllPages(api, '/api/ticket-echanges', { ticketId: ticket.id }));
       
       // Auto-scroll vers le bas après chargement des échanges
       setTimeout(() => {
@@ -155,8 +155,7 @@ const TicketDetail = () => {
   const fetchExchanges = async (ticketId) => {
     try {
       setLoadingExchanges(true);
-      const response = await api.get(`/api/ticket-echanges?ticketId=${ticketId}`);
-      setExchanges(response.data || []);
+      setExchanges(await fetchAllPages(api, '/api/ticket-echanges', { ticketId }));
     } catch (error) {
       // Pas de log console ici
     } finally {
@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
+import { fetchAllPages } from '../utils/pagination';
 import SearchableSelect from './SearchableSelect';
 import { 
   Plus, 
@@ -340,14 +341,10 @@ const TicketsPage = () => {
         }
       }
       
-      const queryString = Object.keys(params).length > 0 
-        ? '?' + new URLSearchParams(params).toString() 
-        : '';
-      
-      const response = await api.get(`/api/tickets${queryString}`);
+      const allTickets = await fetchAllPages(api, '/api/tickets', params);
       
       // Trier les tickets par échéance (les plus urgents en premier)
-      const sortedTickets = response.data.sort((a, b) => {
+      const sortedTickets = allTickets.sort((a, b) => {
         const now = new Date();
         now.setHours(0, 0, 0, 0); // Reset time to start of day for comparison
         
@@ -395,8 +392,7 @@ const TicketsPage = () => {
 
   const fetchDemandeurs = async () => {
     try {
-      const response = await api.get('/api/demandeurs');
-      setDemandeurs(response.data);
+      setDemandeurs(await fetchAllPages(api, '/api/demandeurs'));
     } catch (error) {
       console.error('Erreur lors du chargement des demandeurs:', error);
     }
@@ -589,8 +585,7 @@ const TicketsPage = () => {
   const fetchTicketEchanges = async (ticketId) => {
     setLoadingComments(true);
     try {
-      const response = await api.get(`/api/ticket-echanges?ticketId=${ticketId}`);
-      setViewingTicketEchanges(response.data);
+      setViewingTicketEchanges(await fetchAllPages(api, '/api/ticket-echanges', { ticketId }));
       
       // Auto-scroll vers le bas après chargement des commentaires
       setTimeout(() => {
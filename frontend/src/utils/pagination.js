@@ -0,0 +1,16 @@
+// Taille des pages demandées (LIST_MAX_PAGE_SIZE côté serveur)
+export const PAGE_SIZE = 200;
+
+// Lit une liste paginée par curseur ({ data, pagination: { hasMore, nextCursor } }) jusqu'à la dernière page :
+// chaque réponse reste bornée côté serveur, contrairement au tableau historique plafonné à LIST_MAX_ROWS
+export const fetchAllPages = async (api, url, params = {}) => {
+  const rows = [];
+  let cursor = '';
+  do {
+    const query = new URLSearchParams({ ...params, cursor, limit: String(PAGE_SIZE) });
+    const response = await api.get(`${url}?${query.toString()}`);
+    rows.push(...response.data.data);
+    cursor = response.data.pagination.hasMore ? response.data.pagination.nextCursor : null;
+  } while (cursor);
+  return rows;
+};
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Local stub for the INSEE Sirene API (api-sirene/3.11)
+Stands in for https://api.insee.fr in tests of the insee-api function.
+
+Usage:
+    python insee_stub.py [port]
+Then start the functions with:
+    INSEE_API_BASE_URL=http://localhost:8089/api-sirene/3.11 INSEE_API_KEY=stub netlify dev
+"""
+
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8089
+
+# Known establishments; any other well-formed SIRET answers 404
+ETABLISSEMENTS = {
+    "38846770600015": {
+        "denomination": "VOIP SERVICES TEST",
+        "numero": "12",
+        "type_voie": "RUE",
+        "voie": "DE LA PAIX",
+        "code_postal": "75002",
+        "commune": "PARIS",
+    },
+    "55203253400646": {
+        "denomination": "SOCIETE EXEMPLE",
+        "numero": "1",
+        "type_voie": "AV",
+        "voie": "DES CHAMPS ELYSEES",
+        "code_postal": "75008",
+        "commune": "PARIS",
+    },
+}
+
+SIRET_PATH = re.compile(r"^/api-sirene/3\.11/siret/(\d{14})$")
+
+
+class StubState:
+    """Call counters and behaviour switches shared by the request handlers"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.latency = 0.0
+        self.rate_limited = False
+
+    def record(self, siret):
+        with self.lock:
+            self.calls[siret] = self.calls.get(siret, 0) + 1
+
+    def stats(self):
+        with self.lock:
+            return {"total_calls": sum(self.calls.values()), "calls": dict(self.calls)}
+
+    def reset(self):
+        with self.lock:
+            self.calls = {}
+            self.latency = 0.0
+            self.rate_limited = False
+
+
+def build_etablissement(siret, info):
+    return {
+        "etablissement": {
+            "siret": siret,
+            "uniteLegale": {"denominationUniteLegale": info["denomination"]},
+            "adresseEtablissement": {
+                "numeroVoieEtablissement": info["numero"],
+                "typeVoieEtablissement": info["type_voie"],
+                "libelleVoieEtablissement": info["voie"],
+                "codePostalEtablissement": info["code_postal"],
+                "libelleCommuneEtablissement": info["commune"],
+            },
+            "periodesEtablissement": [
+                {"etatAdministratifEtablissement": "A", "activitePrincipaleEtablissement": "61.10Z"}
+            ],
+        }
+    }
+
+
+def make_handler(state):
+    class InseeStubHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/__stats":
+                return self.send_json(200, state.stats())
+
+            match = SIRET_PATH.match(self.path)
+            if not match:
+                return self.send_json(400, {"header": {"message": "Bad request"}})
+
+            if not self.headers.get("X-INSEE-Api-Key-Integration"):
+                return self.send_json(401, {"header": {"message": "Missing API key"}})
+
+            siret = match.group(1)
+            state.record(siret)
+            if state.latency:
+                time.sleep(state.latency)
+
+            if state.rate_limited:
+                return self.send_json(429, {"header": {"message": "Too many requests"}})
+
+            info = ETABLISSEMENTS.get(siret)
+            if not info:
+                return self.send_json(404, {"header": {"statut": 404, "message": "Aucun élément trouvé"}})
+            return self.send_json(200, build_etablissement(siret, info))
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/__reset":
+                state.reset()
+                return self.send_json(200, {"reset": True})
+            if self.path == "/__config":
+                state.latency = float(payload.get("latency", state.latency))
+                state.rate_limited = bool(payload.get("rate_limited", state.rate_limited))
+                return self.send_json(200, {"latency": state.latency, "rate_limited": state.rate_limited})
+            return self.send_json(404, {"error": "Not found"})
+
+    return InseeStubHandler
+
+
+def start_stub(port=DEFAULT_PORT):
+    """Start the stub in a background thread and return (server, state)"""
+    state = StubState()
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, state
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT
+    server, _ = start_stub(port)
+    print(f"🧪 INSEE stub listening on http://127.0.0.1:{port}/api-sirene/3.11")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Database migration runner
+Applies the SQL scripts at the repository root in a fixed order, records each applied
+version with its checksum in schema_migrations and reports per-migration timing.
+
+Non-unique CREATE INDEX statements on tables that already exist are taken out of the
+migration transaction and rebuilt with CREATE INDEX CONCURRENTLY once the rest of the script
+has committed, so adding an index to a large table does not block writes (partitioned tables
+are indexed normally, as PostgreSQL does not support CONCURRENTLY on them). UNIQUE indexes,
+which the rest of the script may rely on, and indexes on tables created by the same script
+stay in the transaction.
+
+Usage:
+    python migrate.py status
+    python migrate.py up [--dry-run] [--target VERSION] [--no-concurrently]
+    python migrate.py baseline [--target VERSION]    # mark scripts already run by hand as applied
+
+The connection string is read from --database-url, NETLIFY_DATABASE_URL or DATABASE_URL.
+Requires psycopg2 (pip install psycopg2-binary).
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Ordre d'application des scripts (les nouveaux scripts s'ajoutent à la fin)
+MIGRATIONS = [
+    "database_structure.sql",
+    "add_ticket_echanges_table.sql",
+    "add_ticket_number.sql",
+    "fix_status_constraint.sql",
+    "update_clients_structure.sql",
+    "fix_clients_table_structure.sql",
+    "fix_clients_trigger.sql",
+    "create_demandeurs_societe_structure.sql",
+    "fix_demandeurs_societe_trigger.sql",
+    "update_clients_societe_relation.sql",
+    "add_domaine_to_demandeurs_societe.sql",
+    "fix_domaine_constraint.sql",
+    "add_favicon_and_app_name_to_societes.sql",
+    "fix_password_reset_triggers.sql",
+    "create_portabilites_structure.sql",
+    "fix_portabilites_structure.sql",
+    "create_productions_structure.sql",
+    "fix_productions_constraints.sql",
+    "fix_production_files_constraint.sql",
+    "fix_production_taches_trigger.sql",
+    "fix_production_taches_trigger_error.sql",
+    "fix_productions_trigger_error.sql",
+    "create_connexions_logs_table.sql",
+    "partition_connexions_logs.sql",
+    "create_insee_siret_cache_table.sql",
+    "create_notification_digest_table.sql",
+    "add_search_pagination_indexes.sql",
+    "create_change_counters.sql",
+    "create_change_events.sql",
+    "add_cursor_pagination_indexes.sql",
+    "add_change_events_xid.sql",
+]
+
+# Scripts manuels, jamais appliqués par le runner
+EXCLUDED = {
+    "diagnose_global_trigger.sql",    # diagnostic, à exécuter à la main si besoin
+    "fix_admin_password.sql",         # réinitialisation ponctuelle du compte admin
+    "setup_productions_database.sql", # doublon de create_productions_structure.sql + correctifs
+}
+
+SCHEMA_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version VARCHAR(255) PRIMARY KEY,
+    checksum VARCHAR(64) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'applied' CHECK (status IN ('applied', 'indexes_pending', 'baseline')),
+    statements INTEGER,
+    duration_ms INTEGER,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+DOLLAR_TAG = re.compile(r"\$[A-Za-z_][A-Za-z0-9_]*\$|\$\$")
+TRANSACTION_CONTROL = re.compile(r"^(BEGIN|COMMIT|END|ROLLBACK|START\s+TRANSACTION)(\s+(WORK|TRANSACTION))?$", re.IGNORECASE)
+CREATE_INDEX = re.compile(
+    r"^CREATE\s+(?P<unique>UNIQUE\s+)?INDEX\s+(?P<concurrently>CONCURRENTLY\s+)?"
+    r"(?P<ifnotexists>IF\s+NOT\s+EXISTS\s+)?(?P<name>[\w\"]+)\s+ON\s+(?:ONLY\s+)?(?P<table>[\w.\"]+)",
+    re.IGNORECASE,
+)
+CREATE_TABLE = re.compile(
+    r"^CREATE\s+(?:(?:GLOBAL\s+|LOCAL\s+)?(?:TEMP|TEMPORARY|UNLOGGED)\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(?P<table>[\w.\"]+)",
+    re.IGNORECASE,
+)
+
+
+def checksum(script):
+    return hashlib.sha256(script.encode("utf-8")).hexdigest()
+
+
+def split_statements(script):
+    """Split a SQL script on top-level semicolons (quotes, dollar quotes and comments aware)"""
+    statements, current = [], []
+    i, n = 0, len(script)
+    dollar_tag = None
+
+    while i < n:
+        if dollar_tag:
+            end = script.find(dollar_tag, i)
+            end = n if end == -1 else end + len(dollar_tag)
+            current.append(script[i:end])
+            i, dollar_tag = end, None
+            continue
+
+        ch = script[i]
+        if ch == "'":
+            j = i + 1
+            while j < n:
+                if script[j] == "'":
+                    if j + 1 < n and script[j + 1] == "'":
+                        j += 2
+                        continue
+                    break
+                j += 1
+            current.append(script[i:j + 1])
+            i = j + 1
+        elif script.startswith("--", i):
+            end = script.find("\n", i)
+            i = n if end == -1 else end
+        elif script.startswith("/*", i):
+            end = script.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+        elif ch == "$" and DOLLAR_TAG.match(script, i):
+            dollar_tag = DOLLAR_TAG.match(script, i).group(0)
+            current.append(dollar_tag)
+            i += len(dollar_tag)
+        elif ch == ";":
+            statements.append("".join(current).strip())
+            current = []
+            i += 1
+        else:
+            current.append(ch)
+            i += 1
+
+    statements.append("".join(current).strip())
+    return [statement for statement in statements if statement]
+
+
+def table_key(name):
+    """Table name without quotes nor public. prefix, for comparisons"""
+    name = name.replace('"', "").lower()
+    return name[len("public."):] if name.startswith("public.") else name
+
+
+def plan_migration(script, table_exists=None):
+    """Separate transactional statements from deferred index builds.
+
+    Only non-unique indexes on tables that already exist before the script are deferred:
+    UNIQUE indexes and indexes on tables created by the script keep their place in the
+    transaction. table_exists(name) tells whether a table exists before the script (default:
+    assumed to exist). Explicit BEGIN/COMMIT lines are dropped: the runner wraps each script
+    in its own transaction.
+    """
+    transactional, indexes = [], []
+    created_tables = set()
+    for statement in split_statements(script):
+        normalized = " ".join(statement.split())
+        if TRANSACTION_CONTROL.match(normalized):
+            continue
+        table = CREATE_TABLE.match(normalized)
+        if table:
+            created_tables.add(table_key(table.group("table")))
+        match = CREATE_INDEX.match(normalized)
+        deferrable = match and not match.group("unique") and table_key(match.group("table")) not in created_tables
+        if deferrable and table_exists is not None and not table_exists(match.group("table")):
+            deferrable = False
+        if deferrable:
+            indexes.append({
+                "statement": normalized,
+                "name": match.group("name").strip('"'),
+                "table": match.group("table"),
+                "concurrently": bool(match.group("concurrently")),
+            })
+        else:
+            transactional.append(statement)
+    return transactional, indexes
+
+
+def concurrent_statement(index):
+    """Rewrite CREATE INDEX as CREATE INDEX CONCURRENTLY (IF NOT EXISTS kept)"""
+    if index["concurrently"]:
+        return index["statement"]
+    return re.sub(r"\bINDEX\s+", "INDEX CONCURRENTLY ", index["statement"], count=1, flags=re.IGNORECASE)
+
+
+class MigrationRunner:
+    def __init__(self, database_url, use_concurrently=True, dry_run=False):
+        self.database_url = database_url
+        self.use_concurrently = use_concurrently
+        self.dry_run = dry_run
+        self.conn = None
+
+    def connect(self):
+        try:
+            import psycopg2
+        except ImportError:
+            print("❌ Python 'psycopg2' module not installed (pip install psycopg2-binary)")
+            sys.exit(1)
+        self.conn = psycopg2.connect(self.database_url)
+        self.conn.autocommit = True
+        with self.conn.cursor() as cur:
+            cur.execute(SCHEMA_TABLE)
+
+    def applied(self):
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT version, checksum, status, duration_ms, applied_at FROM schema_migrations")
+            return {row[0]: {"checksum": row[1], "status": row[2], "duration_ms": row[3], "applied_at": row[4]}
+                    for row in cur.fetchall()}
+
+    def read(self, version):
+        with open(os.path.join(ROOT, version), encoding="utf-8") as handle:
+            return handle.read()
+
+    def table_exists(self, table):
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+            return cur.fetchone()[0]
+
+    def build_index(self, index):
+        """Build one index, concurrently unless the table is partitioned"""
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT c.relkind FROM pg_class c
+                WHERE c.oid = to_regclass(%s)
+            """, (index["table"],))
+            row = cur.fetchone()
+            partitioned = row is not None and row[0] == "p"
+
+            # Un build CONCURRENTLY interrompu laisse un index invalide que IF NOT EXISTS ignorerait
+            cur.execute("""
+                SELECT NOT i.indisvalid FROM pg_index i
+                WHERE i.indexrelid = to_regclass(%s)
+            """, (index["name"],))
+            invalid = cur.fetchone()
+            if invalid and invalid[0]:
+                print(f"   ⚠️  Dropping invalid index {index['name']} left by a previous run")
+                cur.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{index["name"]}"')
+
+            concurrently = self.use_concurrently and not partitioned
+            statement = concurrent_statement(index) if concurrently else index["statement"]
+            start = time.perf_counter()
+            try:
+                cur.execute(statement)
+            except Exception:
+                if concurrently:
+                    cur.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{index["name"]}"')
+                raise
+            return concurrently, time.perf_counter() - start
+
+    def apply(self, version, script, indexes_only=False):
+        transactional, indexes = plan_migration(script, self.table_exists)
+        timings = {"transaction": 0.0, "indexes": 0.0}
+
+        if self.dry_run:
+            if not indexes_only:
+                print(f"   {len(transactional)} statement(s) in one transaction")
+            for index in indexes:
+                mode = "CONCURRENTLY" if self.use_concurrently else "blocking"
+                print(f"   index {index['name']} on {index['table']} ({mode})")
+            return timings
+
+        if not indexes_only:
+            start = time.perf_counter()
+            self.conn.autocommit = False
+            try:
+                with self.conn.cursor() as cur:
+                    for statement in transactional:
+                        cur.execute(statement)
+                    cur.execute("""
+                        INSERT INTO schema_migrations (version, checksum, status, statements)
+                        VALUES (%s, %s, %s, %s)
+                        ON CONFLICT (version) DO UPDATE SET
+                            checksum = EXCLUDED.checksum, status = EXCLUDED.status,
+                            statements = EXCLUDED.statements, applied_at = CURRENT_TIMESTAMP
+                    """, (version, checksum(script), "indexes_pending" if indexes else "applied",
+                          len(transactional) + len(indexes)))
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            finally:
+                self.conn.autocommit = True
+            timings["transaction"] = time.perf_counter() - start
+
+        # CREATE INDEX CONCURRENTLY ne peut pas s'exécuter dans une transaction
+        for index in indexes:
+            concurrently, elapsed = self.build_index(index)
+            timings["indexes"] += elapsed
+            mode = "concurrently" if concurrently else "blocking"
+            print(f"   index {index['name']} built {mode} in {elapsed * 1000:.0f} ms")
+
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                UPDATE schema_migrations SET status = 'applied', duration_ms = %s WHERE version = %s
+            """, (int((timings["transaction"] + timings["indexes"]) * 1000), version))
+        return timings
+
+
+def pending_versions(target=None):
+    versions = MIGRATIONS
+    if target:
+        if target not in versions:
+            print(f"❌ Unknown migration: {target}")
+            sys.exit(1)
+        versions = versions[:versions.index(target) + 1]
+    return versions
+
+
+def report_unlisted():
+    """Warn about root SQL files that are neither ordered nor excluded"""
+    unlisted = sorted(
+        name for name in os.listdir(ROOT)
+        if name.endswith(".sql") and name not in MIGRATIONS and name not in EXCLUDED
+    )
+    for name in unlisted:
+        print(f"⚠️  {name} is not listed in MIGRATIONS and will not be applied")
+
+
+def cmd_status(runner, args):
+    applied = runner.applied()
+    print(f"{'version':<45} {'status':<16} {'ms':>8}  applied_at")
+    for version in MIGRATIONS:
+        record = applied.get(version)
+        if not record:
+            print(f"{version:<45} {'pending':<16}")
+            continue
+        status = record["status"]
+        if record["checksum"] != checksum(runner.read(version)):
+            status = "CHANGED"
+        duration = record["duration_ms"] if record["duration_ms"] is not None else ""
+        print(f"{version:<45} {status:<16} {duration:>8}  {record['applied_at']:%Y-%m-%d %H:%M}")
+    report_unlisted()
+    return True
+
+
+def cmd_baseline(runner, args):
+    applied = runner.applied()
+    with runner.conn.cursor() as cur:
+        for version in pending_versions(args.target):
+            if version in applied:
+                continue
+            cur.execute("""
+                INSERT INTO schema_migrations (version, checksum, status) VALUES (%s, %s, 'baseline')
+            """, (version, checksum(runner.read(version))))
+            print(f"✅ {version} marked as applied (baseline)")
+    return True
+
+
+def cmd_up(runner, args):
+    applied = runner.applied()
+    results = []
+
+    for version in pending_versions(args.target):
+        script = runner.read(version)
+        record = applied.get(version)
+
+        if record and record["checksum"] != checksum(script):
+            print(f"❌ {version} changed since it was applied (checksum mismatch) - "
+                  f"write a new migration instead of editing an applied one")
+            return False
+        if record and record["status"] != "indexes_pending":
+            continue
+
+        indexes_only = bool(record)
+        print(f"\n▶️  {version}{' (resuming index builds)' if indexes_only else ''}")
+        start = time.perf_counter()
+        try:
+            timings = runner.apply(version, script, indexes_only=indexes_only)
+        except Exception as error:
+            print(f"❌ {version} failed: {error}")
+            return False
+        total = time.perf_counter() - start
+        results.append((version, timings, total))
+        print(f"✅ {version} in {total * 1000:.0f} ms")
+
+    if not results:
+        print("✅ Database is up to date")
+        return True
+
+    print(f"\n{'='*60}")
+    print("MIGRATION TIMINGS" + (" (dry run)" if args.dry_run else ""))
+    print(f"{'='*60}")
+    print(f"{'version':<45} {'tx ms':>8} {'idx ms':>8} {'total':>8}")
+    for version, timings, total in results:
+        print(f"{version:<45} {timings['transaction'] * 1000:>8.0f} {timings['indexes'] * 1000:>8.0f} {total * 1000:>8.0f}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Database migration runner")
+    parser.add_argument("command", choices=["status", "up", "baseline"])
+    parser.add_argument("--database-url", default=os.environ.get("NETLIFY_DATABASE_URL") or os.environ.get("DATABASE_URL"))
+    parser.add_argument("--target", help="stop after this migration (file name)")
+    parser.add_argument("--dry-run", action="store_true", help="show what would run without executing it")
+    parser.add_argument("--no-concurrently", action="store_true", help="build indexes with a plain CREATE INDEX")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        print("❌ No database URL (use --database-url, NETLIFY_DATABASE_URL or DATABASE_URL)")
+        return False
+
+    runner = MigrationRunner(args.database_url, use_concurrently=not args.no_concurrently, dry_run=args.dry_run)
+    runner.connect()
+    commands = {"status": cmd_status, "up": cmd_up, "baseline": cmd_baseline}
+    return commands[args.command](runner, args)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,109 @@
+const fs = require('fs');
+const path = require('path');
+const readline = require('readline');
+const util = require('util');
+
+// Processus Node gardé chaud par netlify_invoker.py : appelle exports.handler(event, context)
+// d'une fonction de netlify/functions, sans HTTP ni routage.
+//
+// Protocole : une requête JSON par ligne sur stdin, une réponse JSON par ligne sur stdout.
+//   { id, type: 'invoke', function, event, context? } -> { id, response, duration_ms }
+//   { id, type: 'token', payload, expiresIn? }        -> { id, token }
+//   { id, type: 'ping' }                              -> { id, pid, loaded }
+// Une erreur non gérée par le handler donne { id, error, stack }.
+// Les console.* des fonctions sont renvoyés sur stderr pour ne pas mélanger les réponses.
+//
+// --local-db : @netlify/neon remplacé par le pool pg de dev-pg-neon.js (DATABASE_URL).
+
+const FUNCTIONS_DIR = path.join(__dirname, 'netlify', 'functions');
+
+if (process.argv.includes('--local-db')) {
+  require('./dev-pg-neon').useLocalPostgres();
+}
+
+const protocolOut = process.stdout.write.bind(process.stdout);
+['log', 'info', 'warn', 'error', 'debug'].forEach(level => {
+  console[level] = (...args) => process.stderr.write(args.map(arg => (typeof arg === 'string' ? arg : util.inspect(arg))).join(' ') + '\n');
+});
+
+const handlers = new Map();
+
+const loadHandler = (name) => {
+  if (!/^[a-z0-9-]+$/.test(name)) throw new Error(`Nom de fonction invalide : ${name}`);
+  if (!handlers.has(name)) {
+    const file = path.join(FUNCTIONS_DIR, `${name}.js`);
+    if (!fs.existsSync(file)) throw new Error(`Fonction non trouvée : ${name}`);
+    const { handler } = require(file);
+    if (typeof handler !== 'function') throw new Error(`${name} n'exporte pas de handler`);
+    handlers.set(name, handler);
+  }
+  return handlers.get(name);
+};
+
+// Les corps en flux (export) sont lus entièrement pour tenir sur une ligne de réponse
+const readBody = async (body) => {
+  if (!body || typeof body === 'string' || typeof body.getReader !== 'function') return body;
+  const reader = body.getReader();
+  const decoder = new TextDecoder();
+  let text = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) return text + decoder.decode();
+    text += decoder.decode(value, { stream: true });
+  }
+};
+
+const handle = async (message) => {
+  switch (message.type) {
+    case 'invoke': {
+      const handler = loadHandler(message.function);
+      const start = process.hrtime.bigint();
+      const response = await handler(message.event, { functionName: message.function, ...(message.context || {}) });
+      const duration = Number(process.hrtime.bigint() - start) / 1e6;
+      return {
+        response: response ? { ...response, body: await readBody(response.body) } : null,
+        duration_ms: duration
+      };
+    }
+    case 'token': {
+      const jwt = require('jsonwebtoken');
+      return { token: jwt.sign(message.payload, process.env.JWT_SECRET || 'dev-secret-key', { expiresIn: message.expiresIn || '1h' }) };
+    }
+    case 'ping':
+      return { pid: process.pid, loaded: [...handlers.keys()] };
+    default:
+      throw new Error(`Type de message inconnu : ${message.type}`);
+  }
+};
+
+// Requêtes traitées une par une : le pool Python n'envoie qu'une requête à la fois par processus
+const lines = readline.createInterface({ input: process.stdin });
+const queue = [];
+let busy = false;
+
+const next = async () => {
+  if (busy || queue.length === 0) return;
+  busy = true;
+  const line = queue.shift();
+  let message = {};
+  try {
+    message = JSON.parse(line);
+    protocolOut(JSON.stringify({ id: message.id, ...(await handle(message)) }) + '\n');
+  } catch (error) {
+    protocolOut(JSON.stringify({ id: message.id, error: error.message, stack: error.stack }) + '\n');
+  }
+  busy = false;
+  next();
+};
+
+lines.on('line', line => {
+  if (!line.trim()) return;
+  queue.push(line);
+  next();
+});
+lines.on('close', () => {
+  const wait = () => (busy || queue.length > 0 ? setTimeout(wait, 10) : process.exit(0));
+  wait();
+});
+
+protocolOut(JSON.stringify({ ready: true, pid: process.pid }) + '\n');
@@ -2,8 +2,10 @@ const { neon } = require('@netlify/neon');
 const jwt = require('jsonwebtoken');
 const bcrypt = require('bcryptjs');
 const { v4: uuidv4 } = require('uuid');
+const { hashPassword, needsRehash } = require('./password-policy');
+const { withServerTiming, timedSql } = require('./request-pipeline');
 
-const sql = neon(); // automatically uses env NETLIFY_DATABASE_URL
+const sql = timedSql(neon()); // automatically uses env NETLIFY_DATABASE_URL
 
 const headers = {
   'Access-Control-Allow-Origin': '*',
@@ -12,7 +14,7 @@ const headers = {
   'Content-Type': 'application/json',
 };
 
-exports.handler = async (event, context) => {
+exports.handler = withServerTiming('auth', async (event, context) => {
   console.log('Auth function called:', event.httpMethod);
   
   if (event.httpMethod === 'OPTIONS') {
@@ -46,21 +48,21 @@ exports.handler = async (event, context) => {
       // Si le décodage échoue, utiliser le mot de passe tel quel (rétrocompatibilité)
     }
 
-    // Check in demandeurs table first
-    let user = await sql`
-      SELECT id, email, password, nom, prenom, societe, telephone, societe_id, 'demandeur' as type_utilisateur 
-      FROM demandeurs 
-      WHERE email = ${email}
-    `;
-
-    // If not found in demandeurs, check in agents table
-    if (user.length === 0) {
-      user = await sql`
-        SELECT id, email, password, nom, prenom, societe, NULL as telephone, NULL as societe_id, 'agent' as type_utilisateur 
+    // Recherche unique dans demandeurs et agents (les demandeurs restent prioritaires)
+    const user = await sql`
+      SELECT id, email, password, nom, prenom, societe, telephone, societe_id, type_utilisateur
+      FROM (
+        SELECT id, email, password, nom, prenom, societe, telephone, societe_id, 'demandeur' as type_utilisateur, 0 as priorite
+        FROM demandeurs 
+        WHERE email = ${email}
+        UNION ALL
+        SELECT id, email, password, nom, prenom, societe, NULL::varchar as telephone, NULL::uuid as societe_id, 'agent' as type_utilisateur, 1 as priorite
         FROM agents 
         WHERE email = ${email}
-      `;
-    }
+      ) credentials
+      ORDER BY priorite
+      LIMIT 1
+    `;
 
     if (user.length === 0) {
       return {
@@ -81,6 +83,21 @@ exports.handler = async (event, context) => {
       };
     }
 
+    // Mise à niveau transparente du hachage si le coût bcrypt a changé
+    if (needsRehash(userData.password)) {
+      try {
+        const rehashed = await hashPassword(password);
+        if (userData.type_utilisateur === 'agent') {
+          await sql`UPDATE agents SET password = ${rehashed} WHERE id = ${userData.id}`;
+        } else {
+          await sql`UPDATE demandeurs SET password = ${rehashed} WHERE id = ${userData.id}`;
+        }
+      } catch (rehashError) {
+        // Ne pas bloquer la connexion si la mise à niveau échoue
+        console.error('Password rehash error:', rehashError);
+      }
+    }
+
     // Create JWT token
     const token = jwt.sign(
       { 
@@ -113,4 +130,4 @@ exports.handler = async (event, context) => {
       body: JSON.stringify({ detail: 'Erreur serveur: ' + error.message })
     };
   }
-};
\ No newline at end of file
+});
\ No newline at end of file
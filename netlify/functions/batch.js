@@ -0,0 +1,183 @@
+const { createHandler, HttpError } = require('./request-pipeline');
+
+// Exécution de plusieurs opérations en une requête : un seul aller-retour HTTP, un seul démarrage
+// à froid et une seule vérification du token pour un enchaînement (clôture + commentaire + réassignation...).
+// Chaque opération est transmise au handler de la fonction concernée, chargé dans la même instance.
+// Les lots ne sont pas atomiques (voir le handler) : la réponse porte atomic: false.
+
+// Nombre maximal d'opérations par lot
+const BATCH_MAX_OPERATIONS = parseInt(process.env.BATCH_MAX_OPERATIONS || '20', 10);
+
+// Fonctions accessibles par lot (require statiques pour que le bundler les inclue)
+const HANDLERS = {
+  'tickets': () => require('./tickets'),
+  'ticket-echanges': () => require('./ticket-echanges'),
+  'ticket-fichiers': () => require('./ticket-fichiers'),
+  'portabilites': () => require('./portabilites'),
+  'portabilite-echanges': () => require('./portabilite-echanges'),
+  'portabilite-fichiers': () => require('./portabilite-fichiers'),
+  'productions': () => require('./productions'),
+  'production-taches': () => require('./production-taches'),
+  'production-tache-commentaires': () => require('./production-tache-commentaires'),
+  'production-tache-fichiers': () => require('./production-tache-fichiers'),
+  'clients': () => require('./clients'),
+  'demandeurs': () => require('./demandeurs'),
+  'demandeurs-societe': () => require('./demandeurs-societe'),
+  'agents': () => require('./agents')
+};
+
+const METHODS = ['GET', 'POST', 'PUT', 'DELETE'];
+
+// Référence au résultat d'une opération précédente : "$0.id", "$1.data.0.id"
+const REFERENCE_PATTERN = /^\$(\d+)((?:\.[A-Za-z0-9_]+)+)$/;
+
+const resolveReference = (value, results, index) => {
+  const match = REFERENCE_PATTERN.exec(value);
+  if (!match) return value;
+
+  const source = parseInt(match[1], 10);
+  if (source >= index) {
+    throw new HttpError(400, `Opération ${index} : la référence ${value} doit viser une opération précédente`);
+  }
+  const resolved = match[2].slice(1).split('.').reduce(
+    (current, key) => (current === null || current === undefined ? undefined : current[key]),
+    results[source].body
+  );
+  if (resolved === undefined) {
+    throw new HttpError(400, `Opération ${index} : la référence ${value} ne correspond à aucune valeur`);
+  }
+  return resolved;
+};
+
+const resolveReferences = (value, results, index) => {
+  if (typeof value === 'string') {
+    // Référence seule : la valeur garde son type ; dans un chemin, "{$0.id}" est interpolé
+    if (REFERENCE_PATTERN.test(value)) return resolveReference(value, results, index);
+    return value.replace(/\{(\$\d+(?:\.[A-Za-z0-9_]+)+)\}/g, (_, reference) => resolveReference(reference, results, index));
+  }
+  if (Array.isArray(value)) return value.map(item => resolveReferences(item, results, index));
+  if (value && typeof value === 'object') {
+    return Object.fromEntries(Object.entries(value).map(([key, item]) => [key, resolveReferences(item, results, index)]));
+  }
+  return value;
+};
+
+// "/api/tickets/123" ou "ticket-echanges?ticketId=1" -> { name, path: '/api/...', query }
+const parsePath = (path, index) => {
+  const [pathname, search = ''] = path.split('?');
+  const normalized = pathname.replace(/^\/?(?:api\/|\.netlify\/functions\/)?/, '');
+  const name = normalized.split('/')[0];
+  if (!HANDLERS[name]) {
+    throw new HttpError(400, `Opération ${index} : fonction non disponible en lot (${name || path})`);
+  }
+  return { name, path: `/api/${normalized.replace(/\/+$/, '')}`, query: Object.fromEntries(new URLSearchParams(search)) };
+};
+
+const validateOperations = (operations) => {
+  if (!Array.isArray(operations) || operations.length === 0) {
+    throw new HttpError(400, 'Le champ operations doit être une liste non vide');
+  }
+  if (operations.length > BATCH_MAX_OPERATIONS) {
+    throw new HttpError(400, `Maximum ${BATCH_MAX_OPERATIONS} opérations par lot`);
+  }
+  operations.forEach((operation, index) => {
+    if (!operation || !METHODS.includes(operation.method)) {
+      throw new HttpError(400, `Opération ${index} : méthode invalide (${METHODS.join(', ')})`);
+    }
+    if (typeof operation.path !== 'string') {
+      throw new HttpError(400, `Opération ${index} : chemin manquant`);
+    }
+    // Les chemins sans référence sont vérifiés avant toute exécution
+    if (!operation.path.includes('{$')) {
+      parsePath(operation.path, index);
+    }
+  });
+};
+
+const parseResponseBody = (response) => {
+  if (!response.body) return null;
+  try {
+    return JSON.parse(response.body);
+  } catch (error) {
+    return response.body;
+  }
+};
+
+/**
+ * POST /api/batch
+ *
+ * Corps : { operations: [{ method, path, query?, body? }], stopOnError?: true }
+ *  - path : '/api/tickets/<id>', 'ticket-echanges', ...
+ *  - les chaînes "$<n>.<champ>" (ou "{$<n>.<champ>}" dans un chemin) reprennent le résultat de l'opération n
+ *
+ * Réponse : { results: [{ status, body }], completed, atomic: false } ; avec stopOnError (défaut),
+ * les opérations suivant un échec ne sont pas exécutées (status 424).
+ *
+ * Lot NON atomique : les opérations ne partagent pas de transaction. Chaque opération est un handler
+ * complet (lectures, contrôles d'accès, écritures conditionnelles, références aux résultats précédents)
+ * alors que sql.transaction du driver HTTP Neon n'accepte qu'une liste de requêtes connue d'avance.
+ * Les opérations réussies avant un échec restent donc appliquées : `completed` et les statuts indiquent
+ * où reprendre. La réponse le signale explicitement (atomic: false) ; stopOnError évite d'enchaîner
+ * sur une étape en échec.
+ */
+exports.handler = createHandler({ name: 'batch', methods: 'POST, OPTIONS' }, async ({ event, context, body, headers, time }) => {
+  if (event.httpMethod !== 'POST') {
+    throw new HttpError(405, 'Méthode non autorisée');
+  }
+
+  const { operations, stopOnError = true } = body();
+  validateOperations(operations);
+
+  const origin = (event.rawUrl || '').match(/^https?:\/\/[^/]+/)?.[0] || 'http://localhost';
+  const authorization = event.headers.authorization || event.headers.Authorization;
+  const results = [];
+  let failed = false;
+
+  for (let index = 0; index < operations.length; index++) {
+    if (failed && stopOnError) {
+      results.push({ status: 424, body: { detail: 'Opération non exécutée : une opération précédente a échoué' } });
+      continue;
+    }
+
+    let operation;
+    let target;
+    try {
+      operation = resolveReferences(operations[index], results, index);
+      target = parsePath(operation.path, index);
+    } catch (error) {
+      if (!(error instanceof HttpError)) throw error;
+      results.push({ status: error.statusCode, body: { detail: error.message } });
+      failed = true;
+      continue;
+    }
+    const query = {
+      ...target.query,
+      ...Object.fromEntries(Object.entries(operation.query || {}).map(([key, value]) => [key, String(value)]))
+    };
+    const queryString = new URLSearchParams(query).toString();
+
+    const response = await time(`op${index}:${target.name}`, () => HANDLERS[target.name]().handler({
+      httpMethod: operation.method,
+      path: target.path,
+      rawUrl: `${origin}${target.path}${queryString ? `?${queryString}` : ''}`,
+      headers: { authorization, 'content-type': 'application/json' },
+      queryStringParameters: query,
+      body: operation.body === undefined ? null : JSON.stringify(operation.body)
+    }, context));
+
+    const result = { status: response.statusCode, body: parseResponseBody(response) };
+    results.push(result);
+    if (result.status >= 400) failed = true;
+  }
+
+  return {
+    statusCode: 200,
+    headers,
+    body: JSON.stringify({
+      results,
+      completed: results.filter(result => result.status < 400).length,
+      // Pas de transaction commune : les opérations réussies ne sont pas annulées après un échec
+      atomic: false
+    })
+  };
+});
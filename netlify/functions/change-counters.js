@@ -0,0 +1,58 @@
+const crypto = require('crypto');
+const { neon } = require('@netlify/neon');
+
+// ETag des GET à partir des compteurs de modifications (table change_counters, voir create_change_counters.sql)
+
+let sql = null;
+const db = () => sql || (sql = neon()); // automatically uses env NETLIFY_DATABASE_URL
+
+// Une fois la table constatée absente, les ETag sont désactivés pour la durée de vie de l'instance
+let countersAvailable = true;
+
+// Versions des tables demandées, en une lecture par clé primaire ; null si indisponible
+const readVersions = async (scopes) => {
+  if (!countersAvailable) return null;
+  try {
+    const rows = await db()('SELECT scope, version FROM change_counters WHERE scope = ANY($1::text[])', [scopes]);
+    const versions = new Map(rows.map(row => [row.scope, String(row.version)]));
+    return scopes.map(scope => `${scope}:${versions.get(scope) || '0'}`).join(',');
+  } catch (error) {
+    if (error.code === '42P01') {
+      console.warn('change_counters absente : ETag désactivés (appliquer create_change_counters.sql)');
+      countersAvailable = false;
+    } else {
+      console.error('Lecture des compteurs de modifications impossible:', error.message);
+    }
+    return null;
+  }
+};
+
+// ETag fort : la réponse dépend des versions, de l'utilisateur (filtrage par société) et de l'URL.
+// Le jour courant en fait partie car certaines réponses sont relatives à la date (évolution du dashboard).
+const buildEtag = (versions, { userId, userType, path, query }) => {
+  const queryString = Object.keys(query || {})
+    .sort()
+    .map(key => `${key}=${query[key]}`)
+    .join('&');
+  const hash = crypto
+    .createHash('sha1')
+    .update([versions, userId || '', userType || '', path || '', queryString, new Date().toISOString().slice(0, 10)].join('|'))
+    .digest('hex');
+  return `"${hash}"`;
+};
+
+// If-None-Match peut contenir une liste d'ETag, '*' ou des ETag faibles (W/"...") ;
+// le suffixe d'encodage ajouté à la compression (-br, -gzip) est ignoré
+const matchesEtag = (ifNoneMatch, etag) => {
+  if (!ifNoneMatch || !etag) return false;
+  return ifNoneMatch
+    .split(',')
+    .map(candidate => candidate.trim().replace(/^W\//, '').replace(/-(br|gzip)"$/, '"'))
+    .some(candidate => candidate === '*' || candidate === etag);
+};
+
+module.exports = {
+  readVersions,
+  buildEtag,
+  matchesEtag
+};
@@ -0,0 +1,36 @@
+const { neon } = require('@netlify/neon');
+
+const sql = neon(); // automatically uses env NETLIFY_DATABASE_URL
+
+const headers = {
+  'Content-Type': 'application/json',
+};
+
+// Rétention du journal des modifications en heures ; un client déconnecté plus longtemps recharge ses listes
+const RETENTION_HOURS = parseInt(process.env.CHANGE_EVENTS_RETENTION_HOURS || '24', 10);
+
+// Fonction planifiée (voir netlify.toml) : purge les événements servis par /api/changes
+exports.handler = async (event, context) => {
+  try {
+    const purged = await sql`SELECT purge_change_events(${RETENTION_HOURS}) as count`;
+
+    const result = {
+      events_purged: purged[0].count,
+      retention_hours: RETENTION_HOURS
+    };
+    console.log('Change-events maintenance:', result);
+
+    return {
+      statusCode: 200,
+      headers,
+      body: JSON.stringify(result)
+    };
+  } catch (error) {
+    console.error('Change-events maintenance error:', error);
+    return {
+      statusCode: 500,
+      headers,
+      body: JSON.stringify({ detail: 'Erreur serveur: ' + error.message })
+    };
+  }
+};
@@ -0,0 +1,173 @@
+const { neon } = require('@netlify/neon');
+const { createHandler, verifyToken, HttpError, timedSql } = require('./request-pipeline');
+
+const sql = timedSql(neon()); // automatically uses env NETLIFY_DATABASE_URL ; requêtes chronométrées (Server-Timing)
+
+// Flux des modifications (table change_events, voir create_change_events.sql).
+// Une fonction Netlify ne peut pas garder une connexion LISTEN ouverte : chaque appel est un
+// long-poll borné qui renvoie les événements postérieurs au curseur, en JSON ou au format SSE
+// (EventSource se reconnecte seul et renvoie Last-Event-ID comme curseur de reprise).
+
+const ENTITIES = ['ticket', 'ticket_echange', 'portabilite', 'portabilite_echange', 'production', 'production_tache'];
+
+// Attente maximale d'un long-poll, sous la limite d'exécution des fonctions (10 s)
+const MAX_WAIT_MS = parseInt(process.env.CHANGES_MAX_WAIT_MS || '8000', 10);
+// Intervalle entre deux lectures du journal pendant l'attente
+const POLL_INTERVAL_MS = parseInt(process.env.CHANGES_POLL_INTERVAL_MS || '1000', 10);
+const MAX_EVENTS = 500;
+// Délai de reconnexion annoncé aux clients SSE
+const SSE_RETRY_MS = 1000;
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+// Périmètre visible : tout pour un agent, la société du demandeur (ou ses propres données sans société)
+const visibilityFor = async (userType, userId) => {
+  if (userType === 'agent') {
+    return { clause: 'TRUE', params: [] };
+  }
+  const demandeur = await sql`SELECT societe_id FROM demandeurs WHERE id = ${userId}`;
+  if (demandeur.length === 0) {
+    throw new HttpError(404, 'Utilisateur non trouvé');
+  }
+  if (demandeur[0].societe_id) {
+    return { clause: 'e.societe_id = $5', params: [demandeur[0].societe_id] };
+  }
+  return { clause: 'e.demandeur_id = $5', params: [userId] };
+};
+
+// Curseur (xid, id) : l'id est attribué à l'insertion, pas à la validation, et une transaction
+// lente peut valider un id inférieur au dernier servi. Seules les transactions sous le xmin du
+// snapshot courant (toutes terminées) sont servies : une transaction longue, même sans rapport
+// avec le journal (xmin couvre tout le cluster), retarde les événements sans jamais les faire sauter.
+// Les anciens curseurs numériques (id seul) restent acceptés, sans xid.
+const formatCursor = (cursor) => (cursor.xid === null ? String(cursor.id) : `${cursor.xid}-${cursor.id}`);
+
+// Événements après le curseur et dernier événement validé (head), en une requête
+const readEvents = async (cursor, visibility, entities, limit) => {
+  const rows = await sql(`
+    WITH horizon AS (
+      SELECT pg_snapshot_xmin(pg_current_snapshot()) AS xmin
+    ),
+    head AS (
+      SELECT c.xid, c.id
+      FROM change_events c, horizon
+      WHERE c.xid < horizon.xmin
+      ORDER BY c.xid DESC, c.id DESC
+      LIMIT 1
+    )
+    SELECT head.xid AS head_xid, head.id AS head_id,
+           e.xid, e.id, e.entity, e.entity_id, e.operation, e.parent_id, e.status, e.created_at
+    FROM horizon
+    LEFT JOIN head ON TRUE
+    LEFT JOIN change_events e
+      ON e.xid < horizon.xmin
+      AND (($1::xid8 IS NULL AND e.id > $2) OR (e.xid, e.id) > ($1::xid8, $2))
+      AND e.entity = ANY($3::text[]) AND ${visibility.clause}
+    ORDER BY e.xid, e.id
+    LIMIT $4
+  `, [cursor.xid, cursor.id, entities, limit, ...visibility.params]);
+
+  const first = rows[0];
+  const head = first && first.head_id !== null ? { xid: String(first.head_xid), id: parseInt(first.head_id) } : null;
+  const events = rows
+    .filter(row => row.id !== null)
+    .map(({ head_xid: _headXid, head_id: _headId, ...event }) => ({ ...event, xid: String(event.xid), id: parseInt(event.id) }));
+  return { head, events };
+};
+
+const parseCursor = (value) => {
+  if (value === undefined || value === null || value === '') return null;
+  const match = /^(?:(\d+)-)?(\d+)$/.exec(String(value));
+  if (!match) {
+    throw new HttpError(400, 'Curseur invalide');
+  }
+  return { xid: match[1] === undefined ? null : match[1], id: parseInt(match[2], 10) };
+};
+
+const parseEntities = (value) => {
+  if (!value) return ENTITIES;
+  const entities = value.split(',').map(entity => entity.trim()).filter(Boolean);
+  const unknown = entities.filter(entity => !ENTITIES.includes(entity));
+  if (unknown.length > 0) {
+    throw new HttpError(400, `Entités inconnues : ${unknown.join(', ')}`);
+  }
+  return entities;
+};
+
+const toSse = (events, cursor) => {
+  const lines = [`retry: ${SSE_RETRY_MS}`, ''];
+  events.forEach(({ xid, ...event }) => {
+    lines.push(`id: ${formatCursor({ xid, id: event.id })}`, 'event: change', `data: ${JSON.stringify(event)}`, '');
+  });
+  // Un id seul met à jour Last-Event-ID sans déclencher d'événement côté EventSource
+  lines.push(`id: ${cursor}`, '', '');
+  return lines.join('\n');
+};
+
+/**
+ * GET /api/changes
+ *
+ * Paramètres :
+ *  - since : curseur renvoyé par l'appel précédent (xid-id) ; absent = démarrer au dernier événement
+ *  - wait : attente maximale en secondes si aucun événement (défaut et plafond CHANGES_MAX_WAIT_MS)
+ *  - entities : liste séparée par des virgules (ticket, ticket_echange, ...)
+ *  - limit : nombre maximal d'événements (défaut et plafond 500)
+ *  - access_token : token JWT pour EventSource, qui ne peut pas envoyer d'en-tête Authorization
+ *
+ * Réponse JSON { events, cursor, hasMore }, ou flux SSE si Accept: text/event-stream.
+ */
+exports.handler = createHandler({ name: 'changes', methods: 'GET, OPTIONS', auth: false }, async ({ event, query, headers, time }) => {
+  if (event.httpMethod !== 'GET') {
+    throw new HttpError(405, 'Méthode non autorisée');
+  }
+
+  const authHeader = event.headers.authorization || event.headers.Authorization ||
+    (query.access_token ? `Bearer ${query.access_token}` : undefined);
+  const decoded = await time('auth', () => verifyToken(authHeader));
+  const userType = decoded.type_utilisateur || decoded.type;
+
+  const accept = event.headers.accept || event.headers.Accept || '';
+  const sse = accept.includes('text/event-stream') || query.format === 'sse';
+  const lastEventId = event.headers['last-event-id'] || event.headers['Last-Event-ID'];
+
+  const since = parseCursor(lastEventId !== undefined ? lastEventId : query.since);
+  const entities = parseEntities(query.entities);
+  const limit = Math.min(Math.max(parseInt(query.limit) || MAX_EVENTS, 1), MAX_EVENTS);
+  const waitMs = query.wait !== undefined
+    ? Math.min(Math.max(parseFloat(query.wait) * 1000 || 0, 0), MAX_WAIT_MS)
+    : MAX_WAIT_MS;
+
+  const visibility = await time('visibility', () => visibilityFor(userType, decoded.id));
+
+  let result;
+  if (since === null) {
+    // Premier appel : le client reçoit seulement le curseur courant
+    result = { head: (await time('poll', () => readEvents({ xid: null, id: Number.MAX_SAFE_INTEGER }, visibility, entities, 1))).head, events: [] };
+  } else {
+    const deadline = Date.now() + waitMs;
+    for (;;) {
+      result = await time('poll', () => readEvents(since, visibility, entities, limit));
+      if (result.events.length > 0 || Date.now() + POLL_INTERVAL_MS > deadline) break;
+      await sleep(POLL_INTERVAL_MS);
+    }
+  }
+
+  const hasMore = result.events.length === limit;
+  // Sans page pleine, le curseur avance jusqu'au head : les événements invisibles ne sont pas relus
+  const last = hasMore ? result.events[result.events.length - 1] : result.head || since;
+  const cursor = last ? formatCursor(last) : '0-0';
+
+  if (sse) {
+    return {
+      statusCode: 200,
+      headers: { ...headers, 'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache' },
+      body: toSse(result.events, cursor)
+    };
+  }
+
+  return {
+    statusCode: 200,
+    headers,
+    body: JSON.stringify({ events: result.events.map(({ xid: _xid, ...event }) => event), cursor, hasMore })
+  };
+});
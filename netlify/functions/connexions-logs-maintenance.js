@@ -0,0 +1,38 @@
+const { neon } = require('@netlify/neon');
+
+const sql = neon(); // automatically uses env NETLIFY_DATABASE_URL
+
+const headers = {
+  'Content-Type': 'application/json',
+};
+
+// Rétention des logs de connexion en mois (partitions mensuelles, voir partition_connexions_logs.sql)
+const RETENTION_MONTHS = parseInt(process.env.CONNEXIONS_LOGS_RETENTION_MONTHS || '12', 10);
+
+// Fonction planifiée (voir netlify.toml) : crée les partitions à venir et supprime les plus anciennes
+exports.handler = async (event, context) => {
+  try {
+    const created = await sql`SELECT ensure_connexions_logs_partitions(NOW()::date, 3) as count`;
+    const dropped = await sql`SELECT purge_connexions_logs_partitions(${RETENTION_MONTHS}) as count`;
+
+    const result = {
+      partitions_created: created[0].count,
+      partitions_dropped: dropped[0].count,
+      retention_months: RETENTION_MONTHS
+    };
+    console.log('Connexions-logs maintenance:', result);
+
+    return {
+      statusCode: 200,
+      headers,
+      body: JSON.stringify(result)
+    };
+  } catch (error) {
+    console.error('Connexions-logs maintenance error:', error);
+    return {
+      statusCode: 500,
+      headers,
+      body: JSON.stringify({ detail: 'Erreur serveur: ' + error.message })
+    };
+  }
+};
@@ -1,24 +1,14 @@
 const { neon } = require('@netlify/neon');
-const jwt = require('jsonwebtoken');
+const net = require('net');
+const crypto = require('crypto');
+const { createHandler, HttpError, timedSql } = require('./request-pipeline');
 
-const sql = neon();
+const sql = timedSql(neon());
 
-const headers = {
-  'Access-Control-Allow-Origin': '*',
-  'Access-Control-Allow-Headers': 'Content-Type, Authorization',
-  'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-  'Content-Type': 'application/json',
-};
-
-// Fonction pour vérifier et décoder le JWT
-const verifyToken = (token) => {
-  try {
-    return jwt.verify(token, process.env.JWT_SECRET || 'dev-secret-key');
-  } catch (error) {
-    console.error('JWT verification failed:', error);
-    return null;
-  }
-};
+// Écriture synchrone : les logs d'un POST (un seul ou un lot { logs: [...] }) sont insérés en une seule
+// requête multi-lignes avant la réponse ; rien n'est gardé en mémoire entre deux invocations
+// (une instance gelée ou recyclée perdrait les lignes d'audit).
+const MAX_LIMIT = 100;
 
 // Fonction pour obtenir l'IP réelle du client
 const getClientIP = (event) => {
@@ -45,182 +35,201 @@ const getClientIP = (event) => {
   return ip || 'unknown';
 };
 
-exports.handler = async (event, context) => {
-  console.log('Connexions-logs function called:', event.httpMethod);
-  
-  if (event.httpMethod === 'OPTIONS') {
-    return { statusCode: 200, headers };
-  }
+// Adresse IP valide pour une colonne INET, sinon NULL (évite l'échec de l'insertion)
+const toInet = (ip) => (net.isIP(ip) ? ip : null);
+
+const LOG_COLUMNS = 10;
+
+const insertLogs = async (logs) => {
+  const values = [];
+  const placeholders = logs.map((log, index) => {
+    const base = index * LOG_COLUMNS;
+    values.push(
+      log.id, log.user_id, log.user_type, log.user_email, log.user_nom, log.user_prenom,
+      log.action_type, log.ip_address, log.user_agent, log.created_at
+    );
+    return `(${Array.from({ length: LOG_COLUMNS }, (_, i) => `$${base + i + 1}`).join(', ')})`;
+  });
+
+  await sql(`
+    INSERT INTO connexions_logs (
+      id, user_id, user_type, user_email, user_nom, user_prenom,
+      action_type, ip_address, user_agent, created_at
+    )
+    VALUES ${placeholders.join(', ')}
+  `, values);
+  return logs.length;
+};
 
-  // Vérification de l'authentification pour toutes les requêtes
-  const authHeader = event.headers.authorization;
-  if (!authHeader || !authHeader.startsWith('Bearer ')) {
-    return {
-      statusCode: 401,
-      headers,
-      body: JSON.stringify({ detail: 'Token manquant' })
-    };
-  }
+// Curseur de pagination par clé (created_at, id)
+const encodeCursor = (log) => Buffer.from(`${new Date(log.created_at).toISOString()}|${log.id}`).toString('base64url');
 
-  const token = authHeader.substring(7);
-  const decoded = verifyToken(token);
-  
-  if (!decoded) {
-    return {
-      statusCode: 401,
-      headers,
-      body: JSON.stringify({ detail: 'Token invalide' })
-    };
+const decodeCursor = (cursor) => {
+  const [createdAt, id] = Buffer.from(cursor, 'base64url').toString('utf8').split('|');
+  if (!createdAt || !id || isNaN(Date.parse(createdAt))) {
+    throw new HttpError(400, 'Curseur invalide');
   }
+  return { createdAt, id };
+};
 
-  try {
-    // POST - Créer un log de connexion
-    if (event.httpMethod === 'POST') {
-      const { user_id, user_type, user_email, user_nom, user_prenom, action_type } = JSON.parse(event.body);
-      
-      // Validation des données requises
-      if (!user_id || !user_type || !user_email || !action_type) {
-        return {
-          statusCode: 400,
-          headers,
-          body: JSON.stringify({ detail: 'Données manquantes (user_id, user_type, user_email, action_type requis)' })
-        };
-      }
-
-      if (!['agent', 'demandeur'].includes(user_type)) {
-        return {
-          statusCode: 400,
-          headers,
-          body: JSON.stringify({ detail: 'user_type doit être "agent" ou "demandeur"' })
-        };
-      }
-
-      if (!['login', 'logout'].includes(action_type)) {
-        return {
-          statusCode: 400,
-          headers,
-          body: JSON.stringify({ detail: 'action_type doit être "login" ou "logout"' })
-        };
-      }
+const validateLog = (log) => {
+  const { user_id, user_type, user_email, action_type } = log || {};
+  if (!user_id || !user_type || !user_email || !action_type) {
+    return 'Données manquantes (user_id, user_type, user_email, action_type requis)';
+  }
+  if (!['agent', 'demandeur'].includes(user_type)) {
+    return 'user_type doit être "agent" ou "demandeur"';
+  }
+  if (!['login', 'logout'].includes(action_type)) {
+    return 'action_type doit être "login" ou "logout"';
+  }
+  return null;
+};
 
-      // Obtenir des informations sur la requête
-      const ip_address = getClientIP(event);
-      const user_agent = event.headers['user-agent'] || 'unknown';
-
-      console.log('Attempting to log connection:', { user_id, user_type, action_type, ip_address });
-
-      // Insérer le log avec gestion d'erreur spécifique pour l'IP
-      let result;
-      try {
-        result = await sql`
-          INSERT INTO connexions_logs (
-            user_id, user_type, user_email, user_nom, user_prenom, 
-            action_type, ip_address, user_agent, created_at
-          )
-          VALUES (
-            ${user_id}, ${user_type}, ${user_email}, ${user_nom}, ${user_prenom},
-            ${action_type}, ${ip_address}, ${user_agent}, NOW()
-          )
-          RETURNING id, created_at
-        `;
-      } catch (ipError) {
-        // Si l'erreur est liée à l'IP, retenter sans l'IP
-        if (ipError.message.includes('inet') || ipError.message.includes('22P02')) {
-          console.warn('IP address error, retrying without IP:', ipError.message);
-          result = await sql`
-            INSERT INTO connexions_logs (
-              user_id, user_type, user_email, user_nom, user_prenom, 
-              action_type, user_agent, created_at
-            )
-            VALUES (
-              ${user_id}, ${user_type}, ${user_email}, ${user_nom}, ${user_prenom},
-              ${action_type}, ${user_agent}, NOW()
-            )
-            RETURNING id, created_at
-          `;
-        } else {
-          throw ipError; // Re-lancer l'erreur si ce n'est pas lié à l'IP
-        }
-      }
+exports.handler = createHandler({ name: 'connexions-logs' }, async ({ event, userType, query, body, headers }) => {
+  // POST - Créer un log de connexion (ou un lot de logs via { logs: [...] })
+  if (event.httpMethod === 'POST') {
+    const data = body();
+    const entries = Array.isArray(data.logs) ? data.logs : [data];
 
+    if (entries.length === 0 || entries.length > MAX_LIMIT) {
       return {
-        statusCode: 201,
+        statusCode: 400,
         headers,
-        body: JSON.stringify({
-          success: true,
-          log_id: result[0].id,
-          created_at: result[0].created_at
-        })
+        body: JSON.stringify({ detail: `Entre 1 et ${MAX_LIMIT} logs par requête` })
       };
     }
 
-    // GET - Récupérer les logs (agents uniquement)
-    else if (event.httpMethod === 'GET') {
-      // Vérification que l'utilisateur est un agent
-      if (decoded.type_utilisateur !== 'agent') {
+    // Validation des données requises
+    for (const entry of entries) {
+      const validationError = validateLog(entry);
+      if (validationError) {
         return {
-          statusCode: 403,
+          statusCode: 400,
           headers,
-          body: JSON.stringify({ detail: 'Accès réservé aux agents' })
+          body: JSON.stringify({ detail: validationError })
         };
       }
+    }
+
+    // Obtenir des informations sur la requête
+    const ip_address = toInet(getClientIP(event));
+    const user_agent = event.headers['user-agent'] || 'unknown';
+    const createdAt = new Date().toISOString();
 
-      // Paramètres de pagination
-      const urlParams = new URLSearchParams(event.queryStringParameters || {});
-      const limit = parseInt(urlParams.get('limit')) || 10;
-      const offset = parseInt(urlParams.get('offset')) || 0;
-
-      // Récupérer les logs avec pagination
-      const logs = await sql`
-        SELECT 
-          id,
-          user_id,
-          user_type,
-          user_email,
-          user_nom,
-          user_prenom,
-          action_type,
-          ip_address,
-          created_at,
-          EXTRACT(EPOCH FROM created_at) * 1000 as timestamp_ms
-        FROM connexions_logs
-        ORDER BY created_at DESC
-        LIMIT ${limit}
-        OFFSET ${offset}
-      `;
-
-      // Compter le total pour la pagination
-      const totalCount = await sql`
-        SELECT COUNT(*) as total FROM connexions_logs
-      `;
+    const created = entries.map(({ user_id, user_type, user_email, user_nom, user_prenom, action_type }) => ({
+      id: crypto.randomUUID(),
+      user_id, user_type, user_email,
+      user_nom: user_nom || null,
+      user_prenom: user_prenom || null,
+      action_type, ip_address, user_agent,
+      created_at: createdAt
+    }));
 
+    // 201 seulement une fois les lignes écrites
+    await insertLogs(created);
+
+    const first = created[0];
+    return {
+      statusCode: 201,
+      headers,
+      body: JSON.stringify({
+        success: true,
+        log_id: first.id,
+        created_at: first.created_at,
+        ...(created.length > 1 && { log_ids: created.map(log => log.id) })
+      })
+    };
+  }
+
+  // GET - Récupérer les logs (agents uniquement)
+  else if (event.httpMethod === 'GET') {
+    // Vérification que l'utilisateur est un agent
+    if (userType !== 'agent') {
       return {
-        statusCode: 200,
+        statusCode: 403,
         headers,
-        body: JSON.stringify({
-          logs: logs,
-          total: parseInt(totalCount[0].total),
-          limit: limit,
-          offset: offset,
-          has_more: totalCount[0].total > (offset + limit)
-        })
+        body: JSON.stringify({ detail: 'Accès réservé aux agents' })
       };
     }
 
-    else {
-      return {
-        statusCode: 405,
-        headers,
-        body: JSON.stringify({ error: 'Method not allowed' })
-      };
+    // Paramètres de pagination : curseur (created_at, id) ; offset conservé pour compatibilité
+    const limit = Math.min(Math.max(parseInt(query.limit) || 10, 1), MAX_LIMIT);
+    const offset = query.cursor ? 0 : (parseInt(query.offset) || 0);
+    const cursor = query.cursor ? decodeCursor(query.cursor) : null;
+
+    // Bornes de dates optionnelles : permettent l'élagage des partitions mensuelles
+    const from = query.from && !isNaN(Date.parse(query.from)) ? new Date(query.from).toISOString() : null;
+    const to = query.to && !isNaN(Date.parse(query.to)) ? new Date(query.to).toISOString() : null;
+
+    const conditions = [];
+    const values = [];
+    if (cursor) {
+      values.push(cursor.createdAt, cursor.id);
+      conditions.push(`(created_at, id) < ($${values.length - 1}::timestamptz, $${values.length}::uuid)`);
+      // Borne explicite sur la clé de partition pour l'élagage
+      conditions.push(`created_at <= $${values.length - 1}::timestamptz`);
+    }
+    if (from) {
+      values.push(from);
+      conditions.push(`created_at >= $${values.length}::timestamptz`);
     }
+    if (to) {
+      values.push(to);
+      conditions.push(`created_at < $${values.length}::timestamptz`);
+    }
+
+    values.push(limit + 1, offset);
+    const rows = await sql(`
+      SELECT 
+        id,
+        user_id,
+        user_type,
+        user_email,
+        user_nom,
+        user_prenom,
+        action_type,
+        ip_address,
+        created_at,
+        EXTRACT(EPOCH FROM created_at) * 1000 as timestamp_ms
+      FROM connexions_logs
+      ${conditions.length > 0 ? `WHERE ${conditions.join(' AND ')}` : ''}
+      ORDER BY created_at DESC, id DESC
+      LIMIT $${values.length - 1}
+      OFFSET $${values.length}
+    `, values);
+
+    const hasMore = rows.length > limit;
+    const logs = hasMore ? rows.slice(0, limit) : rows;
+
+    // Total estimé à partir des statistiques des partitions (pas de COUNT(*) sur toute la table)
+    const estimate = await sql`
+      SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint as total
+      FROM pg_class c
+      WHERE c.oid = 'connexions_logs'::regclass
+         OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = 'connexions_logs'::regclass)
+    `;
+
+    return {
+      statusCode: 200,
+      headers,
+      body: JSON.stringify({
+        logs: logs,
+        total: Math.max(parseInt(estimate[0].total), offset + logs.length),
+        total_is_estimate: true,
+        limit: limit,
+        offset: offset,
+        has_more: hasMore,
+        next_cursor: hasMore ? encodeCursor(logs[logs.length - 1]) : null
+      })
+    };
+  }
 
-  } catch (error) {
-    console.error('Connexions-logs error:', error);
+  else {
     return {
-      statusCode: 500,
+      statusCode: 405,
       headers,
-      body: JSON.stringify({ detail: 'Erreur serveur: ' + error.message })
+      body: JSON.stringify({ detail: 'Method not allowed' })
     };
   }
-};
\ No newline at end of file
+});
\ No newline at end of file
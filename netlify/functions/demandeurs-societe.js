@@ -1,528 +1,480 @@
 const { neon } = require('@netlify/neon');
-const jwt = require('jsonwebtoken');
 const { v4: uuidv4 } = require('uuid');
+const { createHandler, headers, timedSql } = require('./request-pipeline');
 
-const sql = neon(); // automatically uses env NETLIFY_DATABASE_URL
+const sql = timedSql(neon()); // automatically uses env NETLIFY_DATABASE_URL
 
-const headers = {
-  'Access-Control-Allow-Origin': '*',
-  'Access-Control-Allow-Headers': 'Content-Type, Authorization',
-  'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-  'Content-Type': 'application/json',
-};
-
-const verifyToken = (authHeader) => {
-  if (!authHeader || !authHeader.startsWith('Bearer ')) {
-    throw new Error('Token manquant');
-  }
+exports.handler = createHandler({ name: 'demandeurs-societe' }, async ({ event, decoded, userType, params, query, body, log }) => {
+  // Check user permissions
+  const isAgent = userType === 'agent';
+  const isDemandeur = userType === 'demandeur';
   
-  const token = authHeader.substring(7);
-  return jwt.verify(token, process.env.JWT_SECRET || 'dev-secret-key');
-};
-
-exports.handler = async (event, context) => {
-  console.log('Demandeurs Societe function called:', event.httpMethod, event.path);
-  
-  if (event.httpMethod === 'OPTIONS') {
-    return { statusCode: 200, headers };
+  // Agents have full access, demandeurs have limited access to their own society
+  if (!isAgent && !isDemandeur) {
+    return {
+      statusCode: 403,
+      headers,
+      body: JSON.stringify({ detail: 'Accès non autorisé' })
+    };
   }
 
-  try {
-    // Verify authentication
-    const authHeader = event.headers.authorization || event.headers.Authorization;
-    const decoded = verifyToken(authHeader);
-    
-    // Check user permissions
-    const userType = decoded.type_utilisateur || decoded.type;
-    const isAgent = userType === 'agent';
-    const isDemandeur = userType === 'demandeur';
-    
-    // Agents have full access, demandeurs have limited access to their own society
-    if (!isAgent && !isDemandeur) {
-      return {
-        statusCode: 403,
-        headers,
-        body: JSON.stringify({ detail: 'Accès non autorisé' })
-      };
-    }
+  const societeId = params.id;
 
-    const pathParts = event.path.split('/');
-    const societeId = pathParts[pathParts.length - 1];
+  switch (event.httpMethod) {
+    case 'GET':
+      // Support for pagination
+      const page = parseInt(query.page) || 1;
+      const limit = parseInt(query.limit) || 10;
+      const search = query.search || '';
+      const offset = (page - 1) * limit;
 
-    switch (event.httpMethod) {
-      case 'GET':
-        console.log('Getting demandeurs societes...');
-        
-        // Support for pagination
-        const queryParams = event.queryStringParameters || {};
-        const page = parseInt(queryParams.page) || 1;
-        const limit = parseInt(queryParams.limit) || 10;
-        const search = queryParams.search || '';
-        const offset = (page - 1) * limit;
-
-        let societeQuery;
-        let countQuery;
-        
-        if (isAgent) {
-          // Agents can see all societies
-          if (search) {
-            societeQuery = sql`
-              SELECT id, nom_societe, siret, adresse, adresse_complement, 
-                     code_postal, ville, numero_tel, email, logo_base64, domaine,
-                     favicon_base64, nom_application,
-                     created_at, updated_at
-              FROM demandeurs_societe 
-              WHERE nom_societe ILIKE ${'%' + search + '%'} 
-                 OR siret ILIKE ${'%' + search + '%'}
-                 OR email ILIKE ${'%' + search + '%'}
-                 OR ville ILIKE ${'%' + search + '%'}
-                 OR domaine ILIKE ${'%' + search + '%'}
-              ORDER BY nom_societe
-              LIMIT ${limit} OFFSET ${offset}
-            `;
-            
-            countQuery = sql`
-              SELECT COUNT(*) as total 
-              FROM demandeurs_societe 
-              WHERE nom_societe ILIKE ${'%' + search + '%'} 
-                 OR siret ILIKE ${'%' + search + '%'}
-                 OR email ILIKE ${'%' + search + '%'}
-                 OR ville ILIKE ${'%' + search + '%'}
-                 OR domaine ILIKE ${'%' + search + '%'}
-            `;
-          } else {
-            societeQuery = sql`
-              SELECT id, nom_societe, siret, adresse, adresse_complement, 
-                     code_postal, ville, numero_tel, email, logo_base64, domaine,
-                     favicon_base64, nom_application,
-                     created_at, updated_at
-              FROM demandeurs_societe 
-              ORDER BY nom_societe
-              LIMIT ${limit} OFFSET ${offset}
-            `;
-            
-            countQuery = sql`
-              SELECT COUNT(*) as total FROM demandeurs_societe
-            `;
-          }
-        } else if (isDemandeur) {
-          // Demandeurs can only see their own society
-          // First, get the demandeur's society info
-          const demandeurInfo = await sql`
-            SELECT societe_id, societe 
-            FROM demandeurs 
-            WHERE id = ${decoded.id}
+      let societeQuery;
+      let countQuery;
+      
+      if (isAgent) {
+        // Agents can see all societies
+        if (search) {
+          societeQuery = sql`
+            SELECT id, nom_societe, siret, adresse, adresse_complement, 
+                   code_postal, ville, numero_tel, email, logo_base64, domaine,
+                   favicon_base64, nom_application,
+                   created_at, updated_at
+            FROM demandeurs_societe 
+            WHERE nom_societe ILIKE ${'%' + search + '%'} 
+               OR siret ILIKE ${'%' + search + '%'}
+               OR email ILIKE ${'%' + search + '%'}
+               OR ville ILIKE ${'%' + search + '%'}
+               OR domaine ILIKE ${'%' + search + '%'}
+            ORDER BY nom_societe
+            LIMIT ${limit} OFFSET ${offset}
           `;
           
-          if (demandeurInfo.length === 0) {
-            return {
-              statusCode: 404,
-              headers,
-              body: JSON.stringify({ detail: 'Utilisateur demandeur non trouvé' })
-            };
-          }
-          
-          const demandeur = demandeurInfo[0];
-          
-          // Build query based on available society identification
-          if (demandeur.societe_id) {
-            // Use societe_id if available (new system)
-            societeQuery = sql`
-              SELECT id, nom_societe, siret, adresse, adresse_complement, 
-                     code_postal, ville, numero_tel, email, logo_base64, domaine,
-                     favicon_base64, nom_application,
-                     created_at, updated_at
-              FROM demandeurs_societe 
-              WHERE id = ${demandeur.societe_id}
-            `;
-          } else if (demandeur.societe) {
-            // Fallback to society name (old system)
-            societeQuery = sql`
-              SELECT id, nom_societe, siret, adresse, adresse_complement, 
-                     code_postal, ville, numero_tel, email, logo_base64, domaine,
-                     favicon_base64, nom_application,
-                     created_at, updated_at
-              FROM demandeurs_societe 
-              WHERE nom_societe = ${demandeur.societe}
-            `;
-          } else {
-            return {
-              statusCode: 404,
-              headers,
-              body: JSON.stringify({ detail: 'Aucune société associée à votre compte' })
-            };
-          }
+          countQuery = sql`
+            SELECT COUNT(*) as total 
+            FROM demandeurs_societe 
+            WHERE nom_societe ILIKE ${'%' + search + '%'} 
+               OR siret ILIKE ${'%' + search + '%'}
+               OR email ILIKE ${'%' + search + '%'}
+               OR ville ILIKE ${'%' + search + '%'}
+               OR domaine ILIKE ${'%' + search + '%'}
+          `;
+        } else {
+          societeQuery = sql`
+            SELECT id, nom_societe, siret, adresse, adresse_complement, 
+                   code_postal, ville, numero_tel, email, logo_base64, domaine,
+                   favicon_base64, nom_application,
+                   created_at, updated_at
+            FROM demandeurs_societe 
+            ORDER BY nom_societe
+            LIMIT ${limit} OFFSET ${offset}
+          `;
           
-          // For demandeurs, we don't need pagination as they only see one society
-          countQuery = sql`SELECT 1 as total`;
+          countQuery = sql`
+            SELECT COUNT(*) as total FROM demandeurs_societe
+          `;
         }
-
-        const [societes, totalResult] = await Promise.all([societeQuery, countQuery]);
-        const total = parseInt(totalResult[0].total);
-        const totalPages = Math.ceil(total / limit);
-
-        console.log(`Demandeurs Societes found: ${societes.length} (page ${page}/${totalPages})`);
+      } else if (isDemandeur) {
+        // Demandeurs can only see their own society
+        // First, get the demandeur's society info
+        const demandeurInfo = await sql`
+          SELECT societe_id, societe 
+          FROM demandeurs 
+          WHERE id = ${decoded.id}
+        `;
         
-        return {
-          statusCode: 200,
-          headers,
-          body: JSON.stringify({
-            data: societes,
-            pagination: {
-              page,
-              limit,
-              total,
-              totalPages,
-              hasNext: page < totalPages,
-              hasPrev: page > 1
-            }
-          })
-        };
-
-      case 'POST':
-        // Vérification des permissions pour la création
-        if (isDemandeur) {
+        if (demandeurInfo.length === 0) {
           return {
-            statusCode: 403,
+            statusCode: 404,
             headers,
-            body: JSON.stringify({ detail: 'Seuls les agents peuvent créer de nouvelles sociétés' })
+            body: JSON.stringify({ detail: 'Utilisateur demandeur non trouvé' })
           };
         }
         
-        console.log('Creating demandeurs societe...');
-        const newSociete = JSON.parse(event.body);
-        const { 
-          nom_societe, 
-          siret, 
-          adresse, 
-          adresse_complement, 
-          code_postal, 
-          ville, 
-          numero_tel, 
-          email,
-          logo_base64,
-          domaine,
-          favicon_base64,
-          nom_application
-        } = newSociete;
+        const demandeur = demandeurInfo[0];
         
-        if (!nom_societe || !adresse || !code_postal || !ville || !email) {
+        // Build query based on available society identification
+        if (demandeur.societe_id) {
+          // Use societe_id if available (new system)
+          societeQuery = sql`
+            SELECT id, nom_societe, siret, adresse, adresse_complement, 
+                   code_postal, ville, numero_tel, email, logo_base64, domaine,
+                   favicon_base64, nom_application,
+                   created_at, updated_at
+            FROM demandeurs_societe 
+            WHERE id = ${demandeur.societe_id}
+          `;
+        } else if (demandeur.societe) {
+          // Fallback to society name (old system)
+          societeQuery = sql`
+            SELECT id, nom_societe, siret, adresse, adresse_complement, 
+                   code_postal, ville, numero_tel, email, logo_base64, domaine,
+                   favicon_base64, nom_application,
+                   created_at, updated_at
+            FROM demandeurs_societe 
+            WHERE nom_societe = ${demandeur.societe}
+          `;
+        } else {
           return {
-            statusCode: 400,
+            statusCode: 404,
             headers,
-            body: JSON.stringify({ 
-              detail: 'Les champs obligatoires doivent être remplis: nom_societe, adresse, code_postal, ville, email' 
-            })
+            body: JSON.stringify({ detail: 'Aucune société associée à votre compte' })
           };
         }
+        
+        // For demandeurs, we don't need pagination as they only see one society
+        countQuery = sql`SELECT 1 as total`;
+      }
 
-        // Validation du format de domaine si fourni
-        if (domaine) {
-          const domaineRegex = /^[a-zA-Z0-9][a-zA-Z0-9.-]*[a-zA-Z0-9]$/;
-          if (!domaineRegex.test(domaine) || domaine.includes('http') || domaine.length < 4 || !domaine.includes('.')) {
-            return {
-              statusCode: 400,
-              headers,
-              body: JSON.stringify({ 
-                detail: 'Format de domaine invalide. Utilisez le format: exemple.com (sans http/https, minimum 4 caractères avec un point)' 
-              })
-            };
-          }
-        }
+      const [societes, totalResult] = await Promise.all([societeQuery, countQuery]);
+      const total = parseInt(totalResult[0].total);
+      const totalPages = Math.ceil(total / limit);
 
-        // Validation du favicon (doit être au format .ico en base64)
-        if (favicon_base64) {
-          // Vérifier que c'est bien du base64 d'un fichier .ico
-          if (!favicon_base64.startsWith('data:image/x-icon;base64,') && !favicon_base64.startsWith('data:image/vnd.microsoft.icon;base64,')) {
-            return {
-              statusCode: 400,
-              headers,
-              body: JSON.stringify({ 
-                detail: 'Le favicon doit être un fichier .ico valide' 
-              })
-            };
+      log.info('Demandeurs societes found', () => ({ count: societes.length, page, totalPages }));
+      
+      return {
+        statusCode: 200,
+        headers,
+        body: JSON.stringify({
+          data: societes,
+          pagination: {
+            page,
+            limit,
+            total,
+            totalPages,
+            hasNext: page < totalPages,
+            hasPrev: page > 1
           }
-        }
+        })
+      };
 
-        // Check if domain already exists (if provided)
-        if (domaine) {
-          const existingDomaine = await sql`
-            SELECT domaine FROM demandeurs_societe WHERE domaine = ${domaine}
-          `;
-          
-          if (existingDomaine.length > 0) {
-            return {
-              statusCode: 400,
-              headers,
-              body: JSON.stringify({ detail: 'Ce domaine est déjà utilisé' })
-            };
-          }
-        }
+    case 'POST':
+      // Vérification des permissions pour la création
+      if (isDemandeur) {
+        return {
+          statusCode: 403,
+          headers,
+          body: JSON.stringify({ detail: 'Seuls les agents peuvent créer de nouvelles sociétés' })
+        };
+      }
+      
+      const newSociete = body();
+      const { 
+        nom_societe, 
+        siret, 
+        adresse, 
+        adresse_complement, 
+        code_postal, 
+        ville, 
+        numero_tel, 
+        email,
+        logo_base64,
+        domaine,
+        favicon_base64,
+        nom_application
+      } = newSociete;
+      
+      if (!nom_societe || !adresse || !code_postal || !ville || !email) {
+        return {
+          statusCode: 400,
+          headers,
+          body: JSON.stringify({ 
+            detail: 'Les champs obligatoires doivent être remplis: nom_societe, adresse, code_postal, ville, email' 
+          })
+        };
+      }
 
-        // Check if SIRET already exists (if provided)
-        if (siret) {
-          const existingSiret = await sql`
-            SELECT siret FROM demandeurs_societe WHERE siret = ${siret}
-          `;
-          
-          if (existingSiret.length > 0) {
-            return {
-              statusCode: 400,
-              headers,
-              body: JSON.stringify({ detail: 'Ce SIRET est déjà utilisé' })
-            };
-          }
+      // Validation du format de domaine si fourni
+      if (domaine) {
+        const domaineRegex = /^[a-zA-Z0-9][a-zA-Z0-9.-]*[a-zA-Z0-9]$/;
+        if (!domaineRegex.test(domaine) || domaine.includes('http') || domaine.length < 4 || !domaine.includes('.')) {
+          return {
+            statusCode: 400,
+            headers,
+            body: JSON.stringify({ 
+              detail: 'Format de domaine invalide. Utilisez le format: exemple.com (sans http/https, minimum 4 caractères avec un point)' 
+            })
+          };
         }
+      }
 
-        // Check if email already exists
-        const existingEmail = await sql`
-          SELECT email FROM demandeurs_societe WHERE email = ${email}
-        `;
-        
-        if (existingEmail.length > 0) {
+      // Validation du favicon (doit être au format .ico en base64)
+      if (favicon_base64) {
+        // Vérifier que c'est bien du base64 d'un fichier .ico
+        if (!favicon_base64.startsWith('data:image/x-icon;base64,') && !favicon_base64.startsWith('data:image/vnd.microsoft.icon;base64,')) {
           return {
             statusCode: 400,
             headers,
-            body: JSON.stringify({ detail: 'Cet email est déjà utilisé' })
+            body: JSON.stringify({ 
+              detail: 'Le favicon doit être un fichier .ico valide' 
+            })
           };
         }
-        
-        const createdSociete = await sql`
-          INSERT INTO demandeurs_societe (
-            id, nom_societe, siret, adresse, adresse_complement, 
-            code_postal, ville, numero_tel, email, logo_base64, domaine,
-            favicon_base64, nom_application
-          )
-          VALUES (
-            ${uuidv4()}, ${nom_societe}, ${siret}, ${adresse}, ${adresse_complement}, 
-            ${code_postal}, ${ville}, ${numero_tel}, ${email}, ${logo_base64}, ${domaine},
-            ${favicon_base64}, ${nom_application}
-          )
-          RETURNING id, nom_societe, siret, adresse, adresse_complement, 
-                    code_postal, ville, numero_tel, email, logo_base64, domaine,
-                    favicon_base64, nom_application,
-                    created_at, updated_at
+      }
+
+      // Check if domain already exists (if provided)
+      if (domaine) {
+        const existingDomaine = await sql`
+          SELECT domaine FROM demandeurs_societe WHERE domaine = ${domaine}
         `;
         
-        console.log('Demandeurs Societe created:', createdSociete[0]);
-        return { statusCode: 201, headers, body: JSON.stringify(createdSociete[0]) };
-
-      case 'PUT':
-        // Vérification des permissions pour la modification
-        if (isDemandeur) {
-          // Les demandeurs ne peuvent modifier que leur propre société
-          const demandeurInfo = await sql`
-            SELECT societe_id, societe 
-            FROM demandeurs 
-            WHERE id = ${decoded.id}
-          `;
-          
-          if (demandeurInfo.length === 0) {
-            return {
-              statusCode: 404,
-              headers,
-              body: JSON.stringify({ detail: 'Utilisateur demandeur non trouvé' })
-            };
-          }
-          
-          const demandeur = demandeurInfo[0];
-          let canModify = false;
-          
-          // Vérifier si la société à modifier appartient au demandeur
-          if (demandeur.societe_id && demandeur.societe_id === societeId) {
-            canModify = true;
-          } else if (demandeur.societe) {
-            // Fallback: vérifier par nom de société
-            const societeCheck = await sql`
-              SELECT id FROM demandeurs_societe WHERE id = ${societeId} AND nom_societe = ${demandeur.societe}
-            `;
-            canModify = societeCheck.length > 0;
-          }
-          
-          if (!canModify) {
-            return {
-              statusCode: 403,
-              headers,
-              body: JSON.stringify({ detail: 'Vous ne pouvez modifier que votre propre société' })
-            };
-          }
+        if (existingDomaine.length > 0) {
+          return {
+            statusCode: 400,
+            headers,
+            body: JSON.stringify({ detail: 'Ce domaine est déjà utilisé' })
+          };
         }
-        // Les agents peuvent modifier toutes les sociétés (pas de restriction supplémentaire)
+      }
 
-        const updateData = JSON.parse(event.body);
-        const { 
-          nom_societe: upd_nom, 
-          siret: upd_siret, 
-          adresse: upd_adresse, 
-          adresse_complement: upd_complement,
-          code_postal: upd_cp, 
-          ville: upd_ville, 
-          numero_tel: upd_tel, 
-          email: upd_email,
-          logo_base64: upd_logo,
-          domaine: upd_domaine,
-          favicon_base64: upd_favicon,
-          nom_application: upd_app_name
-        } = updateData;
+      // Check if SIRET already exists (if provided)
+      if (siret) {
+        const existingSiret = await sql`
+          SELECT siret FROM demandeurs_societe WHERE siret = ${siret}
+        `;
         
-        // Validation du format de domaine si fourni
-        if (upd_domaine) {
-          const domaineRegex = /^[a-zA-Z0-9][a-zA-Z0-9.-]*[a-zA-Z0-9]$/;
-          if (!domaineRegex.test(upd_domaine) || upd_domaine.includes('http') || upd_domaine.length < 4 || !upd_domaine.includes('.')) {
-            return {
-              statusCode: 400,
-              headers,
-              body: JSON.stringify({ 
-                detail: 'Format de domaine invalide. Utilisez le format: exemple.com (sans http/https, minimum 4 caractères avec un point)' 
-              })
-            };
-          }
-        }
-
-        // Validation du favicon (doit être au format .ico en base64)
-        if (upd_favicon) {
-          // Vérifier que c'est bien du base64 d'un fichier .ico
-          if (!upd_favicon.startsWith('data:image/x-icon;base64,') && !upd_favicon.startsWith('data:image/vnd.microsoft.icon;base64,')) {
-            return {
-              statusCode: 400,
-              headers,
-              body: JSON.stringify({ 
-                detail: 'Le favicon doit être un fichier .ico valide' 
-              })
-            };
-          }
-        }
-
-        // Check if domain already exists for another company (if provided)
-        if (upd_domaine) {
-          const existingDomaine = await sql`
-            SELECT domaine FROM demandeurs_societe WHERE domaine = ${upd_domaine} AND id != ${societeId}
-          `;
-          
-          if (existingDomaine.length > 0) {
-            return {
-              statusCode: 400,
-              headers,
-              body: JSON.stringify({ detail: 'Ce domaine est déjà utilisé par une autre société' })
-            };
-          }
+        if (existingSiret.length > 0) {
+          return {
+            statusCode: 400,
+            headers,
+            body: JSON.stringify({ detail: 'Ce SIRET est déjà utilisé' })
+          };
         }
+      }
 
-        // Check if SIRET already exists for another company (if provided)
-        if (upd_siret) {
-          const existingSiret = await sql`
-            SELECT siret FROM demandeurs_societe WHERE siret = ${upd_siret} AND id != ${societeId}
-          `;
-          
-          if (existingSiret.length > 0) {
-            return {
-              statusCode: 400,
-              headers,
-              body: JSON.stringify({ detail: 'Ce SIRET est déjà utilisé par une autre société' })
-            };
-          }
-        }
+      // Check if email already exists
+      const existingEmail = await sql`
+        SELECT email FROM demandeurs_societe WHERE email = ${email}
+      `;
+      
+      if (existingEmail.length > 0) {
+        return {
+          statusCode: 400,
+          headers,
+          body: JSON.stringify({ detail: 'Cet email est déjà utilisé' })
+        };
+      }
+      
+      const createdSociete = await sql`
+        INSERT INTO demandeurs_societe (
+          id, nom_societe, siret, adresse, adresse_complement, 
+          code_postal, ville, numero_tel, email, logo_base64, domaine,
+          favicon_base64, nom_application
+        )
+        VALUES (
+          ${uuidv4()}, ${nom_societe}, ${siret}, ${adresse}, ${adresse_complement}, 
+          ${code_postal}, ${ville}, ${numero_tel}, ${email}, ${logo_base64}, ${domaine},
+          ${favicon_base64}, ${nom_application}
+        )
+        RETURNING id, nom_societe, siret, adresse, adresse_complement, 
+                  code_postal, ville, numero_tel, email, logo_base64, domaine,
+                  favicon_base64, nom_application,
+                  created_at, updated_at
+      `;
+      
+      log.info('Demandeurs societe created', () => ({ id: createdSociete[0].id }));
+      return { statusCode: 201, headers, body: JSON.stringify(createdSociete[0]) };
 
-        // Check if email already exists for another company
-        const existingEmailUpdate = await sql`
-          SELECT email FROM demandeurs_societe WHERE email = ${upd_email} AND id != ${societeId}
+    case 'PUT':
+      // Vérification des permissions pour la modification
+      if (isDemandeur) {
+        // Les demandeurs ne peuvent modifier que leur propre société
+        const demandeurInfo = await sql`
+          SELECT societe_id, societe 
+          FROM demandeurs 
+          WHERE id = ${decoded.id}
         `;
         
-        if (existingEmailUpdate.length > 0) {
+        if (demandeurInfo.length === 0) {
           return {
-            statusCode: 400,
+            statusCode: 404,
             headers,
-            body: JSON.stringify({ detail: 'Cet email est déjà utilisé par une autre société' })
+            body: JSON.stringify({ detail: 'Utilisateur demandeur non trouvé' })
           };
         }
         
-        // Mise à jour de la société avec updated_at explicite pour éviter le trigger
-        const updatedSociete = await sql`
-          UPDATE demandeurs_societe 
-          SET nom_societe = ${upd_nom}, siret = ${upd_siret}, adresse = ${upd_adresse}, 
-              adresse_complement = ${upd_complement}, code_postal = ${upd_cp}, 
-              ville = ${upd_ville}, numero_tel = ${upd_tel}, email = ${upd_email},
-              logo_base64 = ${upd_logo}, domaine = ${upd_domaine}, 
-              favicon_base64 = ${upd_favicon}, nom_application = ${upd_app_name},
-              updated_at = NOW()
-          WHERE id = ${societeId}
-          RETURNING id, nom_societe, siret, adresse, adresse_complement, 
-                    code_postal, ville, numero_tel, email, logo_base64, domaine,
-                    favicon_base64, nom_application,
-                    created_at, updated_at
-        `;
+        const demandeur = demandeurInfo[0];
+        let canModify = false;
         
-        if (updatedSociete.length === 0) {
+        // Vérifier si la société à modifier appartient au demandeur
+        if (demandeur.societe_id && demandeur.societe_id === societeId) {
+          canModify = true;
+        } else if (demandeur.societe) {
+          // Fallback: vérifier par nom de société
+          const societeCheck = await sql`
+            SELECT id FROM demandeurs_societe WHERE id = ${societeId} AND nom_societe = ${demandeur.societe}
+          `;
+          canModify = societeCheck.length > 0;
+        }
+        
+        if (!canModify) {
           return {
-            statusCode: 404,
+            statusCode: 403,
             headers,
-            body: JSON.stringify({ detail: 'Société non trouvée' })
+            body: JSON.stringify({ detail: 'Vous ne pouvez modifier que votre propre société' })
           };
         }
-        
-        return { statusCode: 200, headers, body: JSON.stringify(updatedSociete[0]) };
+      }
+      // Les agents peuvent modifier toutes les sociétés (pas de restriction supplémentaire)
 
-      case 'DELETE':
-        // Vérification des permissions pour la suppression
-        if (isDemandeur) {
+      const updateData = body();
+      const { 
+        nom_societe: upd_nom, 
+        siret: upd_siret, 
+        adresse: upd_adresse, 
+        adresse_complement: upd_complement,
+        code_postal: upd_cp, 
+        ville: upd_ville, 
+        numero_tel: upd_tel, 
+        email: upd_email,
+        logo_base64: upd_logo,
+        domaine: upd_domaine,
+        favicon_base64: upd_favicon,
+        nom_application: upd_app_name
+      } = updateData;
+      
+      // Validation du format de domaine si fourni
+      if (upd_domaine) {
+        const domaineRegex = /^[a-zA-Z0-9][a-zA-Z0-9.-]*[a-zA-Z0-9]$/;
+        if (!domaineRegex.test(upd_domaine) || upd_domaine.includes('http') || upd_domaine.length < 4 || !upd_domaine.includes('.')) {
           return {
-            statusCode: 403,
+            statusCode: 400,
             headers,
-            body: JSON.stringify({ detail: 'Seuls les agents peuvent supprimer des sociétés' })
+            body: JSON.stringify({ 
+              detail: 'Format de domaine invalide. Utilisez le format: exemple.com (sans http/https, minimum 4 caractères avec un point)' 
+            })
           };
         }
-        
-        // Check if society has associated demandeurs
-        const associatedDemandeurs = await sql`
-          SELECT id FROM demandeurs WHERE societe_id = ${societeId}
-        `;
-        
-        if (associatedDemandeurs.length > 0) {
+      }
+
+      // Validation du favicon (doit être au format .ico en base64)
+      if (upd_favicon) {
+        // Vérifier que c'est bien du base64 d'un fichier .ico
+        if (!upd_favicon.startsWith('data:image/x-icon;base64,') && !upd_favicon.startsWith('data:image/vnd.microsoft.icon;base64,')) {
           return {
             statusCode: 400,
             headers,
             body: JSON.stringify({ 
-              detail: `Impossible de supprimer cette société. ${associatedDemandeurs.length} demandeur(s) y sont encore associés.` 
+              detail: 'Le favicon doit être un fichier .ico valide' 
             })
           };
         }
+      }
 
-        const deletedSociete = await sql`DELETE FROM demandeurs_societe WHERE id = ${societeId} RETURNING id`;
+      // Check if domain already exists for another company (if provided)
+      if (upd_domaine) {
+        const existingDomaine = await sql`
+          SELECT domaine FROM demandeurs_societe WHERE domaine = ${upd_domaine} AND id != ${societeId}
+        `;
         
-        if (deletedSociete.length === 0) {
+        if (existingDomaine.length > 0) {
           return {
-            statusCode: 404,
+            statusCode: 400,
             headers,
-            body: JSON.stringify({ detail: 'Société non trouvée' })
+            body: JSON.stringify({ detail: 'Ce domaine est déjà utilisé par une autre société' })
           };
         }
+      }
+
+      // Check if SIRET already exists for another company (if provided)
+      if (upd_siret) {
+        const existingSiret = await sql`
+          SELECT siret FROM demandeurs_societe WHERE siret = ${upd_siret} AND id != ${societeId}
+        `;
         
+        if (existingSiret.length > 0) {
+          return {
+            statusCode: 400,
+            headers,
+            body: JSON.stringify({ detail: 'Ce SIRET est déjà utilisé par une autre société' })
+          };
+        }
+      }
+
+      // Check if email already exists for another company
+      const existingEmailUpdate = await sql`
+        SELECT email FROM demandeurs_societe WHERE email = ${upd_email} AND id != ${societeId}
+      `;
+      
+      if (existingEmailUpdate.length > 0) {
         return {
-          statusCode: 200,
+          statusCode: 400,
           headers,
-          body: JSON.stringify({ message: 'Société supprimée avec succès' })
+          body: JSON.stringify({ detail: 'Cet email est déjà utilisé par une autre société' })
         };
+      }
+      
+      // Mise à jour de la société avec updated_at explicite pour éviter le trigger
+      const updatedSociete = await sql`
+        UPDATE demandeurs_societe 
+        SET nom_societe = ${upd_nom}, siret = ${upd_siret}, adresse = ${upd_adresse}, 
+            adresse_complement = ${upd_complement}, code_postal = ${upd_cp}, 
+            ville = ${upd_ville}, numero_tel = ${upd_tel}, email = ${upd_email},
+            logo_base64 = ${upd_logo}, domaine = ${upd_domaine}, 
+            favicon_base64 = ${upd_favicon}, nom_application = ${upd_app_name},
+            updated_at = NOW()
+        WHERE id = ${societeId}
+        RETURNING id, nom_societe, siret, adresse, adresse_complement, 
+                  code_postal, ville, numero_tel, email, logo_base64, domaine,
+                  favicon_base64, nom_application,
+                  created_at, updated_at
+      `;
+      
+      if (updatedSociete.length === 0) {
+        return {
+          statusCode: 404,
+          headers,
+          body: JSON.stringify({ detail: 'Société non trouvée' })
+        };
+      }
+      
+      return { statusCode: 200, headers, body: JSON.stringify(updatedSociete[0]) };
+
+    case 'DELETE':
+      // Vérification des permissions pour la suppression
+      if (isDemandeur) {
+        return {
+          statusCode: 403,
+          headers,
+          body: JSON.stringify({ detail: 'Seuls les agents peuvent supprimer des sociétés' })
+        };
+      }
+      
+      // Check if society has associated demandeurs
+      const associatedDemandeurs = await sql`
+        SELECT id FROM demandeurs WHERE societe_id = ${societeId}
+      `;
+      
+      if (associatedDemandeurs.length > 0) {
+        return {
+          statusCode: 400,
+          headers,
+          body: JSON.stringify({ 
+            detail: `Impossible de supprimer cette société. ${associatedDemandeurs.length} demandeur(s) y sont encore associés.` 
+          })
+        };
+      }
 
-      default:
+      const deletedSociete = await sql`DELETE FROM demandeurs_societe WHERE id = ${societeId} RETURNING id`;
+      
+      if (deletedSociete.length === 0) {
         return {
-          statusCode: 405,
+          statusCode: 404,
           headers,
-          body: JSON.stringify({ error: 'Method not allowed' })
+          body: JSON.stringify({ detail: 'Société non trouvée' })
         };
-    }
-  } catch (error) {
-    console.error('Demandeurs Societe API error:', error);
-    if (error.name === 'JsonWebTokenError') {
+      }
+      
       return {
-        statusCode: 401,
+        statusCode: 200,
         headers,
-        body: JSON.stringify({ detail: 'Token invalide' })
+        body: JSON.stringify({ message: 'Société supprimée avec succès' })
+      };
+
+    default:
+      return {
+        statusCode: 405,
+        headers,
+        body: JSON.stringify({ detail: 'Method not allowed' })
       };
-    }
-    return {
-      statusCode: 500,
-      headers,
-      body: JSON.stringify({ detail: 'Erreur serveur: ' + error.message })
-    };
   }
-};
\ No newline at end of file
+});
\ No newline at end of file
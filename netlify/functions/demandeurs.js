@@ -1,440 +1,544 @@
 const { neon } = require('@netlify/neon');
-const jwt = require('jsonwebtoken');
-const bcrypt = require('bcryptjs');
+const { hashPassword } = require('./password-policy');
 const { v4: uuidv4 } = require('uuid');
+const { createHandler, headers, timedSql } = require('./request-pipeline');
+const { parseCursorPagination, cursorQuery, boundedQuery, truncationHeaders } = require('./list-query');
+
+const sql = timedSql(neon()); // automatically uses env NETLIFY_DATABASE_URL ; requêtes chronométrées (Server-Timing)
+
+// Nombre maximum de demandeurs transférés par requête de transfert en masse
+const TRANSFER_MAX_DEMANDEURS = 200;
+
+const UUID_PATTERN = /^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$/i;
+
+// Colonnes réattribuées au demandeur de destination lors d'un transfert
+const TRANSFER_COLUMNS = [
+  { key: 'tickets', table: 'tickets', column: 'demandeur_id' },
+  { key: 'portabilites', table: 'portabilites', column: 'demandeur_id' },
+  { key: 'productions', table: 'productions', column: 'demandeur_id' },
+  { key: 'productions_assignees', table: 'productions', column: 'assigned_to' },
+  { key: 'productions_creees', table: 'productions', column: 'created_by' },
+  { key: 'ticket_echanges', table: 'ticket_echanges', column: 'auteur_id', filter: "auteur_type = 'demandeur'" },
+  { key: 'portabilite_echanges', table: 'portabilite_echanges', column: 'auteur_id', filter: "auteur_type = 'demandeur'" },
+  { key: 'production_tache_commentaires', table: 'production_tache_commentaires', column: 'auteur_id' },
+  { key: 'ticket_fichiers', table: 'ticket_fichiers', column: 'uploaded_by' },
+  { key: 'portabilite_fichiers', table: 'portabilite_fichiers', column: 'uploaded_by' },
+  { key: 'production_tache_fichiers', table: 'production_tache_fichiers', column: 'uploaded_by' }
+];
+
+/**
+ * Transfère toutes les données des demandeurs sources puis les supprime.
+ * transfers : [{ from, to }]
+ *
+ * Les requêtes partent dans une seule transaction (un aller-retour HTTP vers Neon) :
+ * soit tout est transféré et supprimé, soit rien ne change. Les demandeurs sources sont
+ * verrouillés en premier pour qu'aucun ticket ne leur soit rattaché pendant le transfert
+ * (il serait sinon supprimé par le ON DELETE CASCADE).
+ */
+const transferAndDeleteDemandeurs = async (transfers) => {
+  const sources = transfers.map(transfer => transfer.from);
+  const targets = transfers.map(transfer => transfer.to);
+
+  const queries = [
+    sql(`SELECT id FROM demandeurs WHERE id = ANY($1::uuid[]) FOR UPDATE`, [sources]),
+    ...TRANSFER_COLUMNS.map(({ table, column, filter }) => sql(`
+      WITH moved AS (
+        UPDATE ${table} AS t
+        SET ${column} = m.target_id
+        FROM unnest($1::uuid[], $2::uuid[]) AS m(source_id, target_id)
+        WHERE t.${column} = m.source_id${filter ? ` AND t.${filter}` : ''}
+        RETURNING 1
+      )
+      SELECT COUNT(*)::int AS count FROM moved
+    `, [sources, targets])),
+    sql(`DELETE FROM demandeurs WHERE id = ANY($1::uuid[]) RETURNING id`, [sources])
+  ];
+
+  const results = await sql.transaction(queries);
+  const deleted = results[results.length - 1];
+  const transferredData = {};
+  TRANSFER_COLUMNS.forEach(({ key }, index) => {
+    transferredData[key] = results[index + 1][0].count;
+  });
+
+  return { transferredData, deleted: deleted.map(row => row.id) };
+};
+
+// Valide une liste de transferts { from, to } ; retourne un message d'erreur ou null
+const validateTransfers = (transfers) => {
+  if (!Array.isArray(transfers) || transfers.length === 0) {
+    return 'transfers doit être une liste non vide de { from, to }';
+  }
+  if (transfers.length > TRANSFER_MAX_DEMANDEURS) {
+    return `Maximum ${TRANSFER_MAX_DEMANDEURS} demandeurs par transfert`;
+  }
+
+  const sources = new Set();
+  for (const transfer of transfers) {
+    if (!transfer || !UUID_PATTERN.test(transfer.from || '') || !UUID_PATTERN.test(transfer.to || '')) {
+      return 'Chaque transfert doit préciser from et to (identifiants de demandeurs)';
+    }
+    if (transfer.from === transfer.to) {
+      return 'Un demandeur ne peut pas être transféré vers lui-même';
+    }
+    if (sources.has(transfer.from)) {
+      return `Demandeur source en double: ${transfer.from}`;
+    }
+    sources.add(transfer.from);
+  }
+
+  // Pas de chaînes (A -> B puis B supprimé) : une destination ne peut pas être une source
+  const chained = transfers.find(transfer => sources.has(transfer.to));
+  if (chained) {
+    return `Le demandeur ${chained.to} ne peut pas être à la fois source et destination`;
+  }
+  return null;
+};
 
-const sql = neon(); // automatically uses env NETLIFY_DATABASE_URL
+// POST /demandeurs/transfer : fusion de sociétés, transfert de plusieurs demandeurs (agents uniquement)
+const bulkTransfer = async ({ userType, body, log }) => {
+  if (userType !== 'agent') {
+    return {
+      statusCode: 403,
+      headers,
+      body: JSON.stringify({ detail: 'Accès réservé aux agents' })
+    };
+  }
+
+  const { transfers } = body();
+  const validationError = validateTransfers(transfers);
+  if (validationError) {
+    return {
+      statusCode: 400,
+      headers,
+      body: JSON.stringify({ detail: validationError })
+    };
+  }
+
+  const ids = [...new Set(transfers.flatMap(transfer => [transfer.from, transfer.to]))];
+  const existing = await sql(`SELECT id FROM demandeurs WHERE id = ANY($1::uuid[])`, [ids]);
+  const existingIds = new Set(existing.map(row => row.id));
+  const missing = ids.filter(id => !existingIds.has(id));
+  if (missing.length > 0) {
+    return {
+      statusCode: 404,
+      headers,
+      body: JSON.stringify({ detail: 'Demandeur non trouvé', missing })
+    };
+  }
+
+  const { transferredData, deleted } = await transferAndDeleteDemandeurs(transfers);
+  log.info('Bulk transfer', () => ({ deleted: deleted.length }));
+
+  return {
+    statusCode: 200,
+    headers,
+    body: JSON.stringify({
+      message: `${deleted.length} demandeur(s) supprimé(s) après transfert`,
+      transferred: true,
+      deleted,
+      transferredData
+    })
+  };
+};
+
+// GET /demandeurs : tableau (format historique) ou page par curseur (cursor=)
+const listDemandeurs = async ({ decoded, userType, query, log }) => {
+  const listConditions = [];
+  const listParams = [];
+  if (userType === 'demandeur') {
+    // If user is demandeur, only show demandeurs from their society
+    const userInfo = await sql`
+      SELECT societe_id FROM demandeurs WHERE id = ${decoded.id}
+    `;
+    
+    if (userInfo.length > 0 && userInfo[0].societe_id) {
+      listParams.push(userInfo[0].societe_id);
+      listConditions.push(`d.societe_id = $${listParams.length}`);
+    } else {
+      // If demandeur has no society, show only themselves
+      listParams.push(decoded.id);
+      listConditions.push(`d.id = $${listParams.length}`);
+    }
+  }
+  // If user is agent, show all demandeurs
+
+  const listSelect = `
+    d.id, d.email, d.nom, d.prenom, d.societe, d.telephone, d.societe_id,
+    ds.nom_societe as societe_nom, 'demandeur' as type_utilisateur
+  `;
+  const listFrom = `
+    FROM demandeurs d
+    LEFT JOIN demandeurs_societe ds ON d.societe_id = ds.id
+  `;
+
+  // Pagination par curseur : cursor= (vide pour la première page)
+  if (query.cursor !== undefined) {
+    const { rows, pagination } = await cursorQuery(sql, {
+      select: listSelect,
+      from: listFrom,
+      where: listConditions,
+      params: listParams,
+      keys: [
+        { column: 'd.nom', type: 'text' },
+        { column: 'd.prenom', type: 'text' },
+        { column: 'd.id', type: 'uuid' }
+      ],
+      ...parseCursorPagination(query)
+    });
+    log.info('Demandeurs found', () => ({ count: rows.length, hasMore: pagination.hasMore }));
+    return { statusCode: 200, headers, body: JSON.stringify({ data: rows, pagination }) };
+  }
 
-const headers = {
-  'Access-Control-Allow-Origin': '*',
-  'Access-Control-Allow-Headers': 'Content-Type, Authorization',
-  'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-  'Content-Type': 'application/json',
+  // Sinon tableau (format historique), plafonné à LIST_MAX_ROWS demandeurs (X-Has-More au-delà)
+  const { rows: demandeurs, truncated } = await boundedQuery(sql, {
+    select: listSelect,
+    from: `${listFrom} ${listConditions.length > 0 ? 'WHERE ' + listConditions.join(' AND ') : ''}`,
+    params: listParams,
+    orderBy: 'd.nom, d.prenom, d.id'
+  });
+  
+  log.info('Demandeurs found', () => ({ count: demandeurs.length, truncated }));
+  return { statusCode: 200, headers: truncationHeaders(headers, truncated), body: JSON.stringify(demandeurs) };
 };
 
-const verifyToken = (authHeader) => {
-  if (!authHeader || !authHeader.startsWith('Bearer ')) {
-    throw new Error('Token manquant');
+// POST /demandeurs : création
+const createDemandeur = async ({ decoded, userType, body, log }) => {
+  const newDemandeur = body();
+  const { nom, prenom, societe, societe_id, telephone, email, password } = newDemandeur;
+  
+  if (!nom || !prenom || !email || !password) {
+    return {
+      statusCode: 400,
+      headers,
+      body: JSON.stringify({ detail: 'Les champs obligatoires doivent être remplis: nom, prenom, email, password' })
+    };
+  }
+  
+  let createSocieteId = societe_id;
+  let createSociete = societe;
+  
+  if (userType === 'demandeur') {
+    // If user is demandeur, force the society to be their own
+    const userInfo = await sql`
+      SELECT societe_id, societe FROM demandeurs WHERE id = ${decoded.id}
+    `;
+    
+    if (userInfo.length > 0) {
+      createSocieteId = userInfo[0].societe_id;
+      createSociete = userInfo[0].societe;
+    }
+  }
+
+  // If societe_id is provided, get the society name
+  if (createSocieteId) {
+    const societeInfo = await sql`
+      SELECT nom_societe FROM demandeurs_societe WHERE id = ${createSocieteId}
+    `;
+    
+    if (societeInfo.length > 0) {
+      createSociete = societeInfo[0].nom_societe;
+    }
   }
+
+  // Check if email already exists
+  const existingUser = await sql`
+    SELECT email FROM demandeurs WHERE email = ${email}
+    UNION
+    SELECT email FROM agents WHERE email = ${email}
+  `;
   
-  const token = authHeader.substring(7);
-  return jwt.verify(token, process.env.JWT_SECRET || 'dev-secret-key');
+  if (existingUser.length > 0) {
+    return {
+      statusCode: 400,
+      headers,
+      body: JSON.stringify({ detail: 'Cet email est déjà utilisé' })
+    };
+  }
+
+  const hashedPassword = await hashPassword(password);
+  
+  const createdDemandeur = await sql`
+    INSERT INTO demandeurs (id, nom, prenom, societe, societe_id, telephone, email, password)
+    VALUES (${uuidv4()}, ${nom}, ${prenom}, ${createSociete}, ${createSocieteId}, ${telephone}, ${email}, ${hashedPassword})
+    RETURNING id, email, nom, prenom, societe, societe_id, telephone
+  `;
+  
+  const responseDemandeur = {
+    ...createdDemandeur[0],
+    type_utilisateur: 'demandeur'
+  };
+  
+  log.info('Demandeur created', () => ({ id: responseDemandeur.id }));
+  return { statusCode: 201, headers, body: JSON.stringify(responseDemandeur) };
 };
 
-exports.handler = async (event, context) => {
-  console.log('Demandeurs function called:', event.httpMethod, event.path);
+// PUT /demandeurs/:id
+const updateDemandeur = async ({ decoded, userType, params, body }) => {
+  const demandeurId = params.id;
+  const updateData = body();
+  const { nom: upd_nom, prenom: upd_prenom, societe: upd_societe, societe_id: upd_societe_id, telephone: upd_telephone, email: upd_email, password: upd_password } = updateData;
   
-  if (event.httpMethod === 'OPTIONS') {
-    return { statusCode: 200, headers };
+  // Check if user can modify this demandeur
+  if (userType === 'demandeur' && decoded.id !== demandeurId) {
+    // Demandeur can only modify someone from their society
+    const [userInfo, targetInfo] = await Promise.all([
+      sql`SELECT societe_id FROM demandeurs WHERE id = ${decoded.id}`,
+      sql`SELECT societe_id FROM demandeurs WHERE id = ${demandeurId}`
+    ]);
+    
+    if (userInfo.length === 0 || targetInfo.length === 0 || 
+        !userInfo[0].societe_id || userInfo[0].societe_id !== targetInfo[0].societe_id) {
+      return {
+        statusCode: 403,
+        headers,
+        body: JSON.stringify({ detail: 'Accès non autorisé' })
+      };
+    }
   }
 
+  let updateSocieteId = upd_societe_id;
+  let updateSociete = upd_societe;
+  
+  if (userType === 'demandeur') {
+    // If user is demandeur, force the society to be their own
+    const userInfo = await sql`
+      SELECT societe_id, societe FROM demandeurs WHERE id = ${decoded.id}
+    `;
+    
+    if (userInfo.length > 0) {
+      updateSocieteId = userInfo[0].societe_id;
+      updateSociete = userInfo[0].societe;
+    }
+  }
+
+  // If societe_id is provided, get the society name
+  if (updateSocieteId) {
+    const societeInfo = await sql`
+      SELECT nom_societe FROM demandeurs_societe WHERE id = ${updateSocieteId}
+    `;
+    
+    if (societeInfo.length > 0) {
+      updateSociete = societeInfo[0].nom_societe;
+    }
+  }
+  
+  let updatedDemandeur;
+  
+  // Update with or without password
+  if (upd_password) {
+    // Password provided - update it
+    const hashedNewPassword = await hashPassword(upd_password);
+    
+    updatedDemandeur = await sql`
+      UPDATE demandeurs 
+      SET nom = ${upd_nom}, prenom = ${upd_prenom}, societe = ${updateSociete}, 
+          societe_id = ${updateSocieteId}, telephone = ${upd_telephone}, email = ${upd_email}, 
+          password = ${hashedNewPassword}
+      WHERE id = ${demandeurId}
+      RETURNING id, email, nom, prenom, societe, societe_id, telephone
+    `;
+  } else {
+    // No password provided - don't update password
+    updatedDemandeur = await sql`
+      UPDATE demandeurs 
+      SET nom = ${upd_nom}, prenom = ${upd_prenom}, societe = ${updateSociete}, 
+          societe_id = ${updateSocieteId}, telephone = ${upd_telephone}, email = ${upd_email}
+      WHERE id = ${demandeurId}
+      RETURNING id, email, nom, prenom, societe, societe_id, telephone
+    `;
+  }
+  
+  if (updatedDemandeur.length === 0) {
+    return {
+      statusCode: 404,
+      headers,
+      body: JSON.stringify({ detail: 'Demandeur non trouvé' })
+    };
+  }
+  
+  const responseUpdatedDemandeur = {
+    ...updatedDemandeur[0],
+    type_utilisateur: 'demandeur'
+  };
+  
+  return { statusCode: 200, headers, body: JSON.stringify(responseUpdatedDemandeur) };
+};
+
+// DELETE /demandeurs/:id (avec { transferTo } si des données sont liées)
+const deleteDemandeur = async ({ decoded, userType, params, body }) => {
+  const demandeurId = params.id;
+
+  // Parse request body to check if it's a transfer request
+  let requestData = {};
   try {
-    // Verify authentication
-    const authHeader = event.headers.authorization || event.headers.Authorization;
-    const decoded = verifyToken(authHeader);
-    const userType = decoded.type_utilisateur || decoded.type;
-
-    const pathParts = event.path.split('/');
-    const demandeurId = pathParts[pathParts.length - 1];
-
-    switch (event.httpMethod) {
-      case 'GET':
-        console.log('Getting demandeurs...');
-        
-        let demandeurs;
-        if (userType === 'demandeur') {
-          // If user is demandeur, only show demandeurs from their society
-          const userInfo = await sql`
-            SELECT societe_id FROM demandeurs WHERE id = ${decoded.id}
-          `;
-          
-          if (userInfo.length > 0 && userInfo[0].societe_id) {
-            demandeurs = await sql`
-              SELECT d.id, d.email, d.nom, d.prenom, d.societe, d.telephone, d.societe_id,
-                     ds.nom_societe as societe_nom, 'demandeur' as type_utilisateur 
-              FROM demandeurs d
-              LEFT JOIN demandeurs_societe ds ON d.societe_id = ds.id
-              WHERE d.societe_id = ${userInfo[0].societe_id}
-              ORDER BY d.nom, d.prenom
-            `;
-          } else {
-            // If demandeur has no society, show only themselves
-            demandeurs = await sql`
-              SELECT d.id, d.email, d.nom, d.prenom, d.societe, d.telephone, d.societe_id,
-                     ds.nom_societe as societe_nom, 'demandeur' as type_utilisateur 
-              FROM demandeurs d
-              LEFT JOIN demandeurs_societe ds ON d.societe_id = ds.id
-              WHERE d.id = ${decoded.id}
-              ORDER BY d.nom, d.prenom
-            `;
-          }
-        } else {
-          // If user is agent, show all demandeurs
-          demandeurs = await sql`
-            SELECT d.id, d.email, d.nom, d.prenom, d.societe, d.telephone, d.societe_id,
-                   ds.nom_societe as societe_nom, 'demandeur' as type_utilisateur 
-            FROM demandeurs d
-            LEFT JOIN demandeurs_societe ds ON d.societe_id = ds.id
-            ORDER BY d.nom, d.prenom
-          `;
-        }
-        
-        console.log('Demandeurs found:', demandeurs.length);
-        return { statusCode: 200, headers, body: JSON.stringify(demandeurs) };
-
-      case 'POST':
-        console.log('Creating demandeur...');
-        const newDemandeur = JSON.parse(event.body);
-        const { nom, prenom, societe, societe_id, telephone, email, password } = newDemandeur;
-        
-        if (!nom || !prenom || !email || !password) {
-          return {
-            statusCode: 400,
-            headers,
-            body: JSON.stringify({ detail: 'Les champs obligatoires doivent être remplis: nom, prenom, email, password' })
-          };
-        }
-        
-        let createSocieteId = societe_id;
-        let createSociete = societe;
-        
-        if (userType === 'demandeur') {
-          // If user is demandeur, force the society to be their own
-          const userInfo = await sql`
-            SELECT societe_id, societe FROM demandeurs WHERE id = ${decoded.id}
-          `;
-          
-          if (userInfo.length > 0) {
-            createSocieteId = userInfo[0].societe_id;
-            createSociete = userInfo[0].societe;
-          }
-        }
-
-        // If societe_id is provided, get the society name
-        if (createSocieteId) {
-          const societeInfo = await sql`
-            SELECT nom_societe FROM demandeurs_societe WHERE id = ${createSocieteId}
-          `;
-          
-          if (societeInfo.length > 0) {
-            createSociete = societeInfo[0].nom_societe;
-          }
-        }
-
-        // Check if email already exists
-        const existingUser = await sql`
-          SELECT email FROM demandeurs WHERE email = ${email}
-          UNION
-          SELECT email FROM agents WHERE email = ${email}
-        `;
-        
-        if (existingUser.length > 0) {
-          return {
-            statusCode: 400,
-            headers,
-            body: JSON.stringify({ detail: 'Cet email est déjà utilisé' })
-          };
-        }
-
-        const hashedPassword = await bcrypt.hash(password, 10);
-        
-        const createdDemandeur = await sql`
-          INSERT INTO demandeurs (id, nom, prenom, societe, societe_id, telephone, email, password)
-          VALUES (${uuidv4()}, ${nom}, ${prenom}, ${createSociete}, ${createSocieteId}, ${telephone}, ${email}, ${hashedPassword})
-          RETURNING id, email, nom, prenom, societe, societe_id, telephone
-        `;
-        
-        const responseDemandeur = {
-          ...createdDemandeur[0],
-          type_utilisateur: 'demandeur'
-        };
-        
-        console.log('Demandeur created:', responseDemandeur);
-        return { statusCode: 201, headers, body: JSON.stringify(responseDemandeur) };
-
-      case 'PUT':
-        const updateData = JSON.parse(event.body);
-        const { nom: upd_nom, prenom: upd_prenom, societe: upd_societe, societe_id: upd_societe_id, telephone: upd_telephone, email: upd_email, password: upd_password } = updateData;
-        
-        // Check if user can modify this demandeur
-        if (userType === 'demandeur' && decoded.id !== demandeurId) {
-          // Demandeur can only modify someone from their society
-          const [userInfo, targetInfo] = await Promise.all([
-            sql`SELECT societe_id FROM demandeurs WHERE id = ${decoded.id}`,
-            sql`SELECT societe_id FROM demandeurs WHERE id = ${demandeurId}`
-          ]);
-          
-          if (userInfo.length === 0 || targetInfo.length === 0 || 
-              !userInfo[0].societe_id || userInfo[0].societe_id !== targetInfo[0].societe_id) {
-            return {
-              statusCode: 403,
-              headers,
-              body: JSON.stringify({ detail: 'Accès non autorisé' })
-            };
-          }
-        }
-
-        let updateSocieteId = upd_societe_id;
-        let updateSociete = upd_societe;
-        
-        if (userType === 'demandeur') {
-          // If user is demandeur, force the society to be their own
-          const userInfo = await sql`
-            SELECT societe_id, societe FROM demandeurs WHERE id = ${decoded.id}
-          `;
-          
-          if (userInfo.length > 0) {
-            updateSocieteId = userInfo[0].societe_id;
-            updateSociete = userInfo[0].societe;
-          }
-        }
-
-        // If societe_id is provided, get the society name
-        if (updateSocieteId) {
-          const societeInfo = await sql`
-            SELECT nom_societe FROM demandeurs_societe WHERE id = ${updateSocieteId}
-          `;
-          
-          if (societeInfo.length > 0) {
-            updateSociete = societeInfo[0].nom_societe;
-          }
-        }
-        
-        let updatedDemandeur;
-        
-        // Update with or without password
-        if (upd_password) {
-          // Password provided - update it
-          const hashedNewPassword = await bcrypt.hash(upd_password, 10);
-          
-          updatedDemandeur = await sql`
-            UPDATE demandeurs 
-            SET nom = ${upd_nom}, prenom = ${upd_prenom}, societe = ${updateSociete}, 
-                societe_id = ${updateSocieteId}, telephone = ${upd_telephone}, email = ${upd_email}, 
-                password = ${hashedNewPassword}
-            WHERE id = ${demandeurId}
-            RETURNING id, email, nom, prenom, societe, societe_id, telephone
-          `;
-        } else {
-          // No password provided - don't update password
-          updatedDemandeur = await sql`
-            UPDATE demandeurs 
-            SET nom = ${upd_nom}, prenom = ${upd_prenom}, societe = ${updateSociete}, 
-                societe_id = ${updateSocieteId}, telephone = ${upd_telephone}, email = ${upd_email}
-            WHERE id = ${demandeurId}
-            RETURNING id, email, nom, prenom, societe, societe_id, telephone
-          `;
-        }
-        
-        if (updatedDemandeur.length === 0) {
-          return {
-            statusCode: 404,
-            headers,
-            body: JSON.stringify({ detail: 'Demandeur non trouvé' })
-          };
-        }
-        
-        const responseUpdatedDemandeur = {
-          ...updatedDemandeur[0],
-          type_utilisateur: 'demandeur'
-        };
-        
-        return { statusCode: 200, headers, body: JSON.stringify(responseUpdatedDemandeur) };
-
-      case 'DELETE':
-        // Parse request body to check if it's a transfer request
-        let requestData = {};
-        try {
-          if (event.body) {
-            requestData = JSON.parse(event.body);
-          }
-        } catch (e) {
-          // No body or invalid JSON, proceed with normal deletion
-        }
-
-        // Check if user can delete this demandeur
-        if (userType === 'demandeur') {
-          if (decoded.id === demandeurId) {
-            return {
-              statusCode: 400,
-              headers,
-              body: JSON.stringify({ detail: 'Vous ne pouvez pas supprimer votre propre compte' })
-            };
-          }
-          
-          // Demandeur can only delete someone from their society
-          const [userInfo, targetInfo] = await Promise.all([
-            sql`SELECT societe_id FROM demandeurs WHERE id = ${decoded.id}`,
-            sql`SELECT societe_id FROM demandeurs WHERE id = ${demandeurId}`
-          ]);
-          
-          if (userInfo.length === 0 || targetInfo.length === 0 || 
-              !userInfo[0].societe_id || userInfo[0].societe_id !== targetInfo[0].societe_id) {
-            return {
-              statusCode: 403,
-              headers,
-              body: JSON.stringify({ detail: 'Accès non autorisé' })
-            };
-          }
-        }
-
-        // Get demandeur info and check for linked data
-        const demandeurInfo = await sql`
-          SELECT d.* 
-          FROM demandeurs d 
-          WHERE d.id = ${demandeurId}
-        `;
-        
-        if (demandeurInfo.length === 0) {
-          return {
-            statusCode: 404,
-            headers,
-            body: JSON.stringify({ detail: 'Demandeur non trouvé' })
-          };
-        }
-
-        const demandeur = demandeurInfo[0];
-
-        // Check for linked tickets and portabilites separately  
-        const ticketsCount = await sql`
-          SELECT COUNT(*) as count FROM tickets WHERE demandeur_id = ${demandeurId}
-        `;
-        
-        const portabilitesCount = await sql`
-          SELECT COUNT(*) as count FROM portabilites WHERE demandeur_id = ${demandeurId}
-        `;
-
-        demandeur.tickets_count = parseInt(ticketsCount[0].count) || 0;
-        demandeur.portabilites_count = parseInt(portabilitesCount[0].count) || 0;
-
-        const hasLinkedData = demandeur.tickets_count > 0 || demandeur.portabilites_count > 0;
-
-        // If no linked data, proceed with simple deletion
-        if (!hasLinkedData) {
-          const deletedDemandeur = await sql`DELETE FROM demandeurs WHERE id = ${demandeurId} RETURNING id`;
-          return {
-            statusCode: 200,
-            headers,
-            body: JSON.stringify({ 
-              message: 'Demandeur supprimé avec succès',
-              transferred: false
-            })
-          };
-        }
-
-        // If linked data exists but no transfer target specified, return info for frontend
-        if (!requestData.transferTo) {
-          // Get other demandeurs from the same society
-          const otherDemandeurs = await sql`
-            SELECT id, nom, prenom, email 
-            FROM demandeurs 
-            WHERE societe_id = ${demandeur.societe_id} 
-            AND id != ${demandeurId}
-            ORDER BY nom, prenom
-          `;
-
-          return {
-            statusCode: 409, // Conflict - requires transfer
-            headers,
-            body: JSON.stringify({
-              detail: 'Ce demandeur a des tickets ou portabilités liés',
-              demandeur: {
-                nom: demandeur.nom,
-                prenom: demandeur.prenom,
-                email: demandeur.email
-              },
-              linkedData: {
-                tickets: demandeur.tickets_count,
-                portabilites: demandeur.portabilites_count
-              },
-              otherDemandeurs: otherDemandeurs,
-              canDelete: otherDemandeurs.length > 0
-            })
-          };
-        }
-
-        // Transfer requested - validate target demandeur
-        const transferTarget = requestData.transferTo;
-        const targetDemandeur = await sql`
-          SELECT id, societe_id 
-          FROM demandeurs 
-          WHERE id = ${transferTarget} 
-          AND societe_id = ${demandeur.societe_id}
-        `;
-
-        if (targetDemandeur.length === 0) {
-          return {
-            statusCode: 400,
-            headers,
-            body: JSON.stringify({ detail: 'Demandeur de destination invalide ou pas dans la même société' })
-          };
-        }
-
-        // Perform transfer in a transaction
-        try {
-          // Transfer tickets
-          if (demandeur.tickets_count > 0) {
-            await sql`
-              UPDATE tickets 
-              SET demandeur_id = ${transferTarget}
-              WHERE demandeur_id = ${demandeurId}
-            `;
-          }
-
-          // Transfer portabilites
-          if (demandeur.portabilites_count > 0) {
-            await sql`
-              UPDATE portabilites 
-              SET demandeur_id = ${transferTarget}
-              WHERE demandeur_id = ${demandeurId}
-            `;
-          }
-
-          // Delete the original demandeur
-          await sql`DELETE FROM demandeurs WHERE id = ${demandeurId}`;
-
-          return {
-            statusCode: 200,
-            headers,
-            body: JSON.stringify({ 
-              message: 'Demandeur supprimé avec succès après transfert',
-              transferred: true,
-              transferredData: {
-                tickets: demandeur.tickets_count,
-                portabilites: demandeur.portabilites_count
-              }
-            })
-          };
-
-        } catch (transferError) {
-          console.error('Transfer error:', transferError);
-          return {
-            statusCode: 500,
-            headers,
-            body: JSON.stringify({ detail: 'Erreur lors du transfert des données' })
-          };
-        }
-
-      default:
-        return {
-          statusCode: 405,
-          headers,
-          body: JSON.stringify({ error: 'Method not allowed' })
-        };
+    requestData = body();
+  } catch (e) {
+    // No body or invalid JSON, proceed with normal deletion
+  }
+
+  // Check if user can delete this demandeur
+  if (userType === 'demandeur') {
+    if (decoded.id === demandeurId) {
+      return {
+        statusCode: 400,
+        headers,
+        body: JSON.stringify({ detail: 'Vous ne pouvez pas supprimer votre propre compte' })
+      };
     }
-  } catch (error) {
-    console.error('Demandeurs API error:', error);
-    if (error.name === 'JsonWebTokenError') {
+    
+    // Demandeur can only delete someone from their society
+    const [userInfo, targetInfo] = await Promise.all([
+      sql`SELECT societe_id FROM demandeurs WHERE id = ${decoded.id}`,
+      sql`SELECT societe_id FROM demandeurs WHERE id = ${demandeurId}`
+    ]);
+    
+    if (userInfo.length === 0 || targetInfo.length === 0 || 
+        !userInfo[0].societe_id || userInfo[0].societe_id !== targetInfo[0].societe_id) {
       return {
-        statusCode: 401,
+        statusCode: 403,
         headers,
-        body: JSON.stringify({ detail: 'Token invalide' })
+        body: JSON.stringify({ detail: 'Accès non autorisé' })
       };
     }
+  }
+
+  // Get demandeur info and check for linked data
+  const demandeurInfo = await sql`
+    SELECT d.* 
+    FROM demandeurs d 
+    WHERE d.id = ${demandeurId}
+  `;
+  
+  if (demandeurInfo.length === 0) {
+    return {
+      statusCode: 404,
+      headers,
+      body: JSON.stringify({ detail: 'Demandeur non trouvé' })
+    };
+  }
+
+  const demandeur = demandeurInfo[0];
+
+  // Compter les données liées en une seule requête
+  const linkedCounts = await sql`
+    SELECT
+      (SELECT COUNT(*) FROM tickets WHERE demandeur_id = ${demandeurId})::int AS tickets,
+      (SELECT COUNT(*) FROM portabilites WHERE demandeur_id = ${demandeurId})::int AS portabilites,
+      (SELECT COUNT(*) FROM productions
+       WHERE demandeur_id = ${demandeurId} OR assigned_to = ${demandeurId})::int AS productions
+  `;
+
+  demandeur.tickets_count = linkedCounts[0].tickets;
+  demandeur.portabilites_count = linkedCounts[0].portabilites;
+  demandeur.productions_count = linkedCounts[0].productions;
+
+  const hasLinkedData = demandeur.tickets_count > 0 || demandeur.portabilites_count > 0 ||
+    demandeur.productions_count > 0;
+
+  // If no linked data, proceed with simple deletion
+  if (!hasLinkedData) {
+    const deletedDemandeur = await sql`DELETE FROM demandeurs WHERE id = ${demandeurId} RETURNING id`;
+    return {
+      statusCode: 200,
+      headers,
+      body: JSON.stringify({ 
+        message: 'Demandeur supprimé avec succès',
+        transferred: false
+      })
+    };
+  }
+
+  // If linked data exists but no transfer target specified, return info for frontend
+  if (!requestData.transferTo) {
+    // Get other demandeurs from the same society
+    const otherDemandeurs = await sql`
+      SELECT id, nom, prenom, email 
+      FROM demandeurs 
+      WHERE societe_id = ${demandeur.societe_id} 
+      AND id != ${demandeurId}
+      ORDER BY nom, prenom
+    `;
+
+    return {
+      statusCode: 409, // Conflict - requires transfer
+      headers,
+      body: JSON.stringify({
+        detail: 'Ce demandeur a des tickets, portabilités ou productions liés',
+        demandeur: {
+          nom: demandeur.nom,
+          prenom: demandeur.prenom,
+          email: demandeur.email
+        },
+        linkedData: {
+          tickets: demandeur.tickets_count,
+          portabilites: demandeur.portabilites_count,
+          productions: demandeur.productions_count
+        },
+        otherDemandeurs: otherDemandeurs,
+        canDelete: otherDemandeurs.length > 0
+      })
+    };
+  }
+
+  // Transfer requested - validate target demandeur
+  const transferTarget = requestData.transferTo;
+  if (transferTarget === demandeurId) {
+    return {
+      statusCode: 400,
+      headers,
+      body: JSON.stringify({ detail: 'Un demandeur ne peut pas être transféré vers lui-même' })
+    };
+  }
+
+  const targetDemandeur = await sql`
+    SELECT id, societe_id 
+    FROM demandeurs 
+    WHERE id = ${transferTarget} 
+    AND societe_id = ${demandeur.societe_id}
+  `;
+
+  if (targetDemandeur.length === 0) {
+    return {
+      statusCode: 400,
+      headers,
+      body: JSON.stringify({ detail: 'Demandeur de destination invalide ou pas dans la même société' })
+    };
+  }
+
+  // Transfert et suppression dans une seule transaction
+  try {
+    const { transferredData } = await transferAndDeleteDemandeurs([
+      { from: demandeurId, to: transferTarget }
+    ]);
+
+    return {
+      statusCode: 200,
+      headers,
+      body: JSON.stringify({ 
+        message: 'Demandeur supprimé avec succès après transfert',
+        transferred: true,
+        transferredData
+      })
+    };
+
+  } catch (transferError) {
+    console.error('Transfer error:', transferError);
     return {
       statusCode: 500,
       headers,
-      body: JSON.stringify({ detail: 'Erreur serveur: ' + error.message })
+      body: JSON.stringify({ detail: 'Erreur lors du transfert des données' })
     };
   }
-};
\ No newline at end of file
+};
+
+exports.handler = createHandler({
+  name: 'demandeurs',
+  routes: [
+    { method: 'GET', path: '/', handler: listDemandeurs },
+    { method: 'POST', path: '/transfer', handler: bulkTransfer },
+    { method: 'POST', path: '/', handler: createDemandeur },
+    { method: 'PUT', path: '/:id', handler: updateDemandeur },
+    { method: 'DELETE', path: '/:id', handler: deleteDemandeur }
+  ]
+});
@@ -683,7 +683,65 @@ Client : ${clientName}
 Titre de production : ${production.titre}
 
 VoIP Services - Système de production`
-  })
+  }),
+
+  // Template pour le récapitulatif (digest) des commentaires
+  notificationDigest: (recipientName, items) => {
+    const sourceLabels = { ticket: 'Ticket', portabilite: 'Portabilité', production: 'Production' };
+    const itemsHtml = items.map(item => `
+            <div class="comment">
+              <strong>${sourceLabels[item.source] || item.source} :</strong> ${item.reference_label}<br>
+              ${item.client_name ? `<strong>Client :</strong> ${item.client_name}<br>` : ''}
+              <strong>Auteur :</strong> ${item.author_name || 'Utilisateur inconnu'}<br>
+              <strong>Date :</strong> ${new Date(item.created_at).toLocaleString('fr-FR')}<br><br>
+              ${(item.message || '').replace(/\n/g, '<br>')}
+              ${item.link ? `<br><a href="${item.link}">Voir</a>` : ''}
+            </div>`).join('');
+    const itemsText = items.map(item => `- ${sourceLabels[item.source] || item.source} ${item.reference_label}${item.client_name ? ` (${item.client_name})` : ''}
+  ${item.author_name || 'Utilisateur inconnu'} - ${new Date(item.created_at).toLocaleString('fr-FR')}
+  ${item.message || ''}${item.link ? `
+  ${item.link}` : ''}`).join('\n\n');
+
+    return {
+      subject: `Récapitulatif - ${items.length} nouveau${items.length > 1 ? 'x' : ''} commentaire${items.length > 1 ? 's' : ''}`,
+      html: `
+      <!DOCTYPE html>
+      <html>
+      <head>
+        <meta charset="utf-8">
+        <style>
+          body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+          .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+          .header { background-color: #2563eb; color: white; padding: 20px; text-align: center; }
+          .content { padding: 20px; background-color: #f9fafb; }
+          .footer { padding: 20px; text-align: center; color: #666; font-size: 12px; }
+          .comment { background-color: white; padding: 15px; margin: 10px 0; border-radius: 5px; border-left: 4px solid #2563eb; }
+        </style>
+      </head>
+      <body>
+        <div class="container">
+          <div class="header">
+            <h1>Récapitulatif des commentaires</h1>
+          </div>
+          <div class="content">
+            <p>Bonjour ${recipientName || ''},</p>
+            <p>${items.length} nouveau${items.length > 1 ? 'x' : ''} commentaire${items.length > 1 ? 's ont été ajoutés' : ' a été ajouté'} depuis la dernière notification :</p>
+            ${itemsHtml}
+          </div>
+          <div class="footer">
+            <p>VoIP Services - Système de gestion des tickets</p>
+          </div>
+        </div>
+      </body>
+      </html>
+    `,
+      text: `Récapitulatif des commentaires
+
+${itemsText}
+
+VoIP Services - Système de gestion des tickets`
+    };
+  }
 };
 
 // Fonction principale pour envoyer un email avec Brevo
@@ -747,6 +805,124 @@ const sendEmail = async (to, subject, htmlContent, textContent) => {
   }
 };
 
+// Mode digest : les notifications de commentaires sont mises en file d'attente
+// puis regroupées par destinataire sur une fenêtre configurable (voir notification-digest.js)
+const isDigestEnabled = () => process.env.NOTIFICATION_DIGEST_MODE === 'digest';
+
+const getDigestWindowMinutes = () => {
+  const minutes = parseInt(process.env.NOTIFICATION_DIGEST_WINDOW_MINUTES, 10);
+  return Number.isFinite(minutes) && minutes > 0 ? minutes : 15;
+};
+
+// Insertion multi-lignes : une ligne par destinataire pour la même notification
+const queueDigestNotification = async (recipients, item) => {
+  const list = (Array.isArray(recipients) ? recipients : [recipients]).filter(r => r && r.email);
+  if (list.length === 0) {
+    return { success: false, error: 'No recipient email available' };
+  }
+
+  const values = [];
+  const placeholders = list.map((recipient, index) => {
+    const base = index * 11;
+    values.push(
+      recipient.email.toLowerCase(),
+      recipient.name || null,
+      item.source,
+      item.reference_id,
+      item.reference_label,
+      item.client_name || null,
+      item.author_name || null,
+      item.message || '',
+      item.link_path || null,
+      item.demandeur_id || null,
+      item.created_at || new Date().toISOString()
+    );
+    return `($${base + 1}, $${base + 2}, $${base + 3}, $${base + 4}, $${base + 5}, $${base + 6}, $${base + 7}, $${base + 8}, $${base + 9}, $${base + 10}, $${base + 11})`;
+  });
+
+  await sql(`
+    INSERT INTO notification_digest_queue
+      (recipient_email, recipient_name, source, reference_id, reference_label, client_name,
+       author_name, message, link_path, demandeur_id, created_at)
+    VALUES ${placeholders.join(', ')}
+  `, values);
+
+  return { success: true, queued: list.length };
+};
+
+// Envoie un email récapitulatif par destinataire dont la plus ancienne notification
+// en attente a dépassé la fenêtre de regroupement
+const flushNotificationDigests = async ({ force = false } = {}) => {
+  const windowMinutes = force ? 0 : getDigestWindowMinutes();
+
+  // Réservation atomique des lignes pour éviter un double envoi entre deux exécutions concurrentes
+  const claimed = await sql(`
+    UPDATE notification_digest_queue
+    SET sent_at = NOW()
+    WHERE sent_at IS NULL
+      AND recipient_email IN (
+        SELECT recipient_email
+        FROM notification_digest_queue
+        WHERE sent_at IS NULL
+        GROUP BY recipient_email
+        HAVING MIN(created_at) <= NOW() - make_interval(mins => $1)
+      )
+    RETURNING *
+  `, [windowMinutes]);
+
+  const byRecipient = new Map();
+  for (const row of claimed) {
+    if (!byRecipient.has(row.recipient_email)) {
+      byRecipient.set(row.recipient_email, []);
+    }
+    byRecipient.get(row.recipient_email).push(row);
+  }
+
+  const baseUrls = new Map();
+  const resolveBaseUrl = async (demandeurId) => {
+    if (!baseUrls.has(demandeurId)) {
+      baseUrls.set(demandeurId, await getBaseUrl(demandeurId));
+    }
+    return baseUrls.get(demandeurId);
+  };
+
+  let sent = 0;
+  let failed = 0;
+  for (const [recipientEmail, rows] of byRecipient) {
+    rows.sort((a, b) => new Date(a.created_at) - new Date(b.created_at));
+    const items = [];
+    for (const row of rows) {
+      const baseUrl = row.link_path ? await resolveBaseUrl(row.demandeur_id) : '';
+      items.push({ ...row, link: row.link_path ? `${baseUrl}${row.link_path}` : null });
+    }
+
+    const recipientName = rows.find(r => r.recipient_name)?.recipient_name || '';
+    const template = createEmailTemplate.notificationDigest(recipientName, items);
+    const result = await sendEmail(
+      { email: recipientEmail, name: recipientName },
+      template.subject,
+      template.html,
+      template.text
+    );
+
+    if (result.success) {
+      sent++;
+    } else {
+      // Remettre en file d'attente pour la prochaine exécution
+      failed++;
+      await sql(
+        'UPDATE notification_digest_queue SET sent_at = NULL WHERE id = ANY($1::uuid[])',
+        [rows.map(r => r.id)]
+      );
+    }
+  }
+
+  // Purge des notifications envoyées depuis plus de 7 jours
+  await sql(`DELETE FROM notification_digest_queue WHERE sent_at < NOW() - INTERVAL '7 days'`);
+
+  return { recipients: byRecipient.size, notifications: claimed.length, sent, failed };
+};
+
 // Fonctions spécialisées pour chaque type d'email
 const emailService = {
   // Envoi d'email lors de la création d'un ticket
@@ -765,6 +941,20 @@ const emailService = {
 
   // Envoi d'email lors de l'ajout d'un commentaire
   sendCommentEmail: async (ticket, comment, author, recipientEmail, recipientName, clientName = '') => {
+    if (isDigestEnabled()) {
+      return await queueDigestNotification({ email: recipientEmail, name: recipientName }, {
+        source: 'ticket',
+        reference_id: ticket.id,
+        reference_label: `#${ticket.numero_ticket} - ${ticket.titre}`,
+        client_name: clientName,
+        author_name: `${author?.prenom || ''} ${author?.nom || ''}`.trim(),
+        message: comment?.message,
+        link_path: `/tickets/${ticket.id}`,
+        demandeur_id: ticket.demandeur_id,
+        created_at: comment?.created_at
+      });
+    }
+
     const baseUrl = await getBaseUrl(ticket?.demandeur_id);
     const template = createEmailTemplate.commentAdded(ticket, comment, author, recipientEmail, baseUrl, clientName);
     
@@ -854,9 +1044,7 @@ const emailService = {
 
   // Envoi d'email pour commentaire sur portabilité
   sendPortabiliteCommentEmail: async (portabiliteInfo, commentDetail, userType) => {
-    const baseUrl = await getBaseUrl(portabiliteInfo?.demandeur_id);
     const clientName = portabiliteInfo.nom_societe || portabiliteInfo.nom_client + ' ' + (portabiliteInfo.prenom_client || '');
-    const template = createEmailTemplate.portabiliteCommentAdded(portabiliteInfo, commentDetail, commentDetail, baseUrl, clientName);
     
     // Déterminer le destinataire selon le type d'utilisateur qui commente
     let recipients = [{ email: 'contact@voipservices.fr', name: 'Support VoIP Services' }];
@@ -869,6 +1057,23 @@ const emailService = {
       });
     }
 
+    if (isDigestEnabled()) {
+      return await queueDigestNotification(recipients, {
+        source: 'portabilite',
+        reference_id: portabiliteInfo.id,
+        reference_label: `#${portabiliteInfo.numero_portabilite}`,
+        client_name: clientName,
+        author_name: commentDetail?.auteur_nom,
+        message: commentDetail?.message,
+        link_path: `/portabilites/${portabiliteInfo.id}`,
+        demandeur_id: portabiliteInfo.demandeur_id,
+        created_at: commentDetail?.created_at
+      });
+    }
+
+    const baseUrl = await getBaseUrl(portabiliteInfo?.demandeur_id);
+    const template = createEmailTemplate.portabiliteCommentAdded(portabiliteInfo, commentDetail, commentDetail, baseUrl, clientName);
+
     return await sendEmail(recipients, template.subject, template.html, template.text);
   },
 
@@ -902,7 +1107,6 @@ const emailService = {
   // Envoi d'email pour commentaire sur production
   sendProductionCommentEmail: async (productionInfo, tache, comment, author) => {
     const clientName = productionInfo.nom_societe || productionInfo.client_display || 'N/A';
-    const template = createEmailTemplate.productionCommentAdded(productionInfo, tache, comment, author, clientName);
     
     // Déterminer le destinataire selon le type d'utilisateur qui commente
     let recipients = [{ email: 'contact@voipservices.fr', name: 'Support VoIP Services' }];
@@ -915,8 +1119,28 @@ const emailService = {
       });
     }
 
+    if (isDigestEnabled()) {
+      return await queueDigestNotification(recipients, {
+        source: 'production',
+        reference_id: productionInfo.id,
+        reference_label: `#${productionInfo.numero_production} - ${tache?.nom_tache || 'Tâche'}`,
+        client_name: clientName,
+        author_name: `${author?.prenom || ''} ${author?.nom || ''}`.trim(),
+        message: comment?.contenu,
+        demandeur_id: productionInfo.demandeur_id,
+        created_at: comment?.created_at
+      });
+    }
+
+    const template = createEmailTemplate.productionCommentAdded(productionInfo, tache, comment, author, clientName);
+
     return await sendEmail(recipients, template.subject, template.html, template.text);
-  }
+  },
+
+  // Mode digest
+  isDigestEnabled,
+  queueDigestNotification,
+  flushNotificationDigests
 };
 
 // Export du service - Export direct des fonctions pour compatibilité
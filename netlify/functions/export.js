@@ -0,0 +1,244 @@
+const { neon } = require('@netlify/neon');
+const { stream } = require('@netlify/functions');
+const { createHandler, HttpError, timedSql } = require('./request-pipeline');
+
+const sql = timedSql(neon()); // automatically uses env NETLIFY_DATABASE_URL ; requêtes chronométrées (Server-Timing)
+
+// Export complet des tickets, portabilités et productions en CSV ou NDJSON, envoyé en flux.
+// Le driver HTTP Neon n'a pas de curseur serveur : les lignes sont lues par tranches avec une
+// pagination par clé (date, id) sur l'index de date, en mémoire constante, sans OFFSET ni COUNT par page.
+
+// Nombre de lignes lues par requête
+const EXPORT_CHUNK_SIZE = parseInt(process.env.EXPORT_CHUNK_SIZE || '500', 10);
+
+const FORMATS = {
+  csv: 'text/csv; charset=utf-8',
+  ndjson: 'application/x-ndjson; charset=utf-8'
+};
+
+const DATE_PATTERN = /^\d{4}-\d{2}-\d{2}$/;
+
+// Colonnes exportées par entité ; les contenus binaires (PDF des mandats) sont exclus
+const ENTITIES = {
+  tickets: {
+    alias: 't',
+    dateColumn: 't.date_creation',
+    societeColumn: 'd.societe_id',
+    columns: `
+      t.id, t.numero_ticket, t.titre, t.status, t.date_creation, t.date_fin_prevue, t.date_cloture,
+      c.nom_societe as client_nom, d.nom as demandeur_nom, d.prenom as demandeur_prenom,
+      a.nom as agent_nom, a.prenom as agent_prenom, t.requete_initiale
+    `,
+    from: `
+      FROM tickets t
+      JOIN clients c ON t.client_id = c.id
+      JOIN demandeurs d ON t.demandeur_id = d.id
+      LEFT JOIN agents a ON t.agent_id = a.id
+    `
+  },
+  portabilites: {
+    alias: 'p',
+    dateColumn: 'p.created_at',
+    societeColumn: 'd.societe_id',
+    columns: `
+      p.id, p.numero_portabilite, p.status, p.created_at, p.date_portabilite_demandee, p.date_portabilite_effective,
+      c.nom_societe as client_nom, d.nom as demandeur_nom, d.prenom as demandeur_prenom,
+      a.nom as agent_nom, a.prenom as agent_prenom,
+      p.nom_client, p.prenom_client, p.email_client, p.siret_client, p.adresse, p.code_postal, p.ville,
+      p.numeros_portes, p.fiabilisation_demandee, p.demande_signee
+    `,
+    from: `
+      FROM portabilites p
+      LEFT JOIN clients c ON p.client_id = c.id
+      LEFT JOIN demandeurs d ON p.demandeur_id = d.id
+      LEFT JOIN agents a ON p.agent_id = a.id
+    `
+  },
+  productions: {
+    alias: 'p',
+    dateColumn: 'p.date_creation',
+    societeColumn: 'p.societe_id',
+    columns: `
+      p.id, p.numero_production, p.titre, p.status, p.priorite, p.date_creation, p.date_livraison_prevue,
+      c.nom_societe as client_nom, d.nom as demandeur_nom, d.prenom as demandeur_prenom,
+      ds.nom_societe as societe_nom, p.description
+    `,
+    from: `
+      FROM productions p
+      LEFT JOIN clients c ON p.client_id = c.id
+      LEFT JOIN demandeurs d ON p.demandeur_id = d.id
+      LEFT JOIN demandeurs_societe ds ON p.societe_id = ds.id
+    `
+  }
+};
+
+// Filtres communs : périmètre du demandeur, plage de dates (bornes incluses) et statuts
+const buildFilters = async (entity, { userType, userId, query }) => {
+  const conditions = [];
+  const params = [];
+
+  if (userType !== 'agent') {
+    const demandeur = await sql`SELECT societe_id FROM demandeurs WHERE id = ${userId}`;
+    if (demandeur.length === 0) {
+      throw new HttpError(404, 'Utilisateur non trouvé');
+    }
+    if (demandeur[0].societe_id) {
+      params.push(demandeur[0].societe_id);
+      conditions.push(`${entity.societeColumn} = $${params.length}`);
+    } else {
+      params.push(userId);
+      conditions.push(`${entity.alias}.demandeur_id = $${params.length}`);
+    }
+  }
+
+  if (query.from) {
+    if (!DATE_PATTERN.test(query.from)) throw new HttpError(400, 'Paramètre from invalide (AAAA-MM-JJ)');
+    params.push(query.from);
+    conditions.push(`${entity.dateColumn} >= $${params.length}::date`);
+  }
+
+  if (query.to) {
+    if (!DATE_PATTERN.test(query.to)) throw new HttpError(400, 'Paramètre to invalide (AAAA-MM-JJ)');
+    params.push(query.to);
+    conditions.push(`${entity.dateColumn} < $${params.length}::date + 1`);
+  }
+
+  if (query.status) {
+    params.push(query.status.split(',').map(status => status.trim()).filter(Boolean));
+    conditions.push(`${entity.alias}.status = ANY($${params.length}::text[])`);
+  }
+
+  return { conditions, params };
+};
+
+// Lecture par tranches : chaque requête reprend après le dernier couple (date, id) lu ; une tranche est produite à la fois
+async function* readRows(entity, { conditions, params }) {
+  let last = null;
+  for (;;) {
+    const chunkConditions = [...conditions];
+    const chunkParams = [...params];
+    // Les dates NULL viennent en dernier (NULLS LAST, ordre par défaut de l'index) : après une date,
+    // la suite inclut toutes les lignes sans date ; après une ligne sans date, seules celles d'id supérieur
+    if (last && last.date === null) {
+      chunkParams.push(last.id);
+      chunkConditions.push(`(${entity.dateColumn} IS NULL AND ${entity.alias}.id > $${chunkParams.length}::uuid)`);
+    } else if (last) {
+      chunkParams.push(last.date, last.id);
+      chunkConditions.push(
+        `((${entity.dateColumn}, ${entity.alias}.id) > ($${chunkParams.length - 1}::timestamp, $${chunkParams.length}::uuid)` +
+        ` OR ${entity.dateColumn} IS NULL)`
+      );
+    }
+    chunkParams.push(EXPORT_CHUNK_SIZE);
+
+    // La date du curseur est relue en texte : un Date JavaScript perdrait les microsecondes
+    const rows = await sql(`
+      SELECT ${entity.columns}, ${entity.dateColumn}::text AS cursor_date
+      ${entity.from}
+      ${chunkConditions.length > 0 ? 'WHERE ' + chunkConditions.join(' AND ') : ''}
+      ORDER BY ${entity.dateColumn} NULLS LAST, ${entity.alias}.id
+      LIMIT $${chunkParams.length}
+    `, chunkParams);
+
+    yield rows.map(({ cursor_date, ...row }) => row);
+    if (rows.length < EXPORT_CHUNK_SIZE) return;
+    last = { date: rows[rows.length - 1].cursor_date, id: rows[rows.length - 1].id };
+  }
+}
+
+const csvValue = (value) => {
+  if (value === null || value === undefined) return '';
+  let text = value instanceof Date ? value.toISOString() : String(value);
+  // Neutralise les formules à l'ouverture dans un tableur
+  if (/^[=+@\t\r]/.test(text)) text = `'${text}`;
+  return /[",\r\n]/.test(text) ? `"${text.replace(/"/g, '""')}"` : text;
+};
+
+// Une chaîne par tranche : le flux est écrit en quelques gros morceaux plutôt que ligne à ligne
+async function* formatRows(chunks, format) {
+  let columns = null;
+  for await (const rows of chunks) {
+    if (rows.length === 0) continue;
+    if (format === 'ndjson') {
+      yield rows.map(row => JSON.stringify(row) + '\n').join('');
+      continue;
+    }
+    let text = '';
+    if (!columns) {
+      columns = Object.keys(rows[0]);
+      text += columns.join(',') + '\r\n';
+    }
+    yield text + rows.map(row => columns.map(column => csvValue(row[column])).join(',') + '\r\n').join('');
+  }
+}
+
+// Flux web piloté par le consommateur : une tranche n'est lue que lorsque la précédente est envoyée
+const toReadableStream = (iterator) => {
+  const encoder = new TextEncoder();
+  return new ReadableStream({
+    async pull(controller) {
+      try {
+        const { value, done } = await iterator.next();
+        if (done) {
+          controller.close();
+        } else {
+          controller.enqueue(encoder.encode(value));
+        }
+      } catch (error) {
+        console.error('export stream error:', error);
+        controller.error(error);
+      }
+    },
+    async cancel() {
+      await iterator.return();
+    }
+  });
+};
+
+/**
+ * GET /api/export/:entity
+ *
+ * entity : tickets, portabilites ou productions
+ * Paramètres : format (csv par défaut, ndjson), from / to (AAAA-MM-JJ, bornes incluses), status (liste séparée par des virgules)
+ *
+ * L'en-tête X-Total-Count donne le nombre de lignes attendues au démarrage de l'export.
+ */
+exports.handler = stream(createHandler({
+  name: 'export',
+  methods: 'GET, OPTIONS',
+  path: '/:entity'
+}, async ({ event, params, query, userType, userId, headers, time }) => {
+  if (event.httpMethod !== 'GET') {
+    throw new HttpError(405, 'Méthode non autorisée');
+  }
+
+  const entity = ENTITIES[params.entity];
+  if (!entity) {
+    throw new HttpError(404, `Export inconnu (${Object.keys(ENTITIES).join(', ')})`);
+  }
+  const format = query.format || 'csv';
+  if (!FORMATS[format]) {
+    throw new HttpError(400, 'Format invalide (csv ou ndjson)');
+  }
+
+  const filters = await time('filters', () => buildFilters(entity, { userType, userId, query }));
+  const counted = await time('count', () => sql(`
+    SELECT COUNT(*) AS total
+    ${entity.from}
+    ${filters.conditions.length > 0 ? 'WHERE ' + filters.conditions.join(' AND ') : ''}
+  `, filters.params));
+
+  const filename = `${params.entity}-${new Date().toISOString().slice(0, 10)}.${format}`;
+  return {
+    statusCode: 200,
+    headers: {
+      ...headers,
+      'Content-Type': FORMATS[format],
+      'Content-Disposition': `attachment; filename="${filename}"`,
+      'Cache-Control': 'no-store',
+      'X-Total-Count': String(counted[0].total),
+      'Access-Control-Expose-Headers': 'X-Total-Count, Content-Disposition, Server-Timing'
+    },
+    body: toReadableStream(formatRows(readRows(entity, filters), format))
+  };
+}));
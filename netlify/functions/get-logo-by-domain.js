@@ -1,6 +1,7 @@
 const { neon } = require('@netlify/neon');
+const { withServerTiming, timedSql } = require('./request-pipeline');
 
-const sql = neon(); // automatically uses env NETLIFY_DATABASE_URL
+const sql = timedSql(neon()); // automatically uses env NETLIFY_DATABASE_URL
 
 const headers = {
   'Access-Control-Allow-Origin': '*',
@@ -9,7 +10,7 @@ const headers = {
   'Content-Type': 'application/json',
 };
 
-exports.handler = async (event, context) => {
+exports.handler = withServerTiming('get-logo-by-domain', async (event, context) => {
   console.log('Get logo by domain function called:', event.httpMethod, event.path);
   
   if (event.httpMethod === 'OPTIONS') {
@@ -76,4 +77,4 @@ exports.handler = async (event, context) => {
       body: JSON.stringify({ detail: 'Erreur serveur: ' + error.message })
     };
   }
-};
\ No newline at end of file
+});
\ No newline at end of file
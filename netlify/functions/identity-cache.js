@@ -0,0 +1,51 @@
+// Résolution des noms d'utilisateurs (agents et demandeurs) pour les commentaires et notifications.
+// Un cache est créé par invocation : les mêmes auteurs ne sont lus qu'une fois par requête,
+// sans risque de servir un nom modifié entre deux invocations.
+
+const UNKNOWN_USER = { prenom: 'Utilisateur', nom: 'inconnu' };
+
+const createIdentityCache = (sql) => {
+  const identities = new Map();
+
+  // Charge en une requête tous les identifiants absents du cache
+  const load = async (ids) => {
+    const missing = [...new Set(ids.filter(id => id && !identities.has(id)))];
+    if (missing.length === 0) return;
+
+    const pending = sql(`
+      SELECT id, nom, prenom, 'agent' as type_utilisateur FROM agents WHERE id = ANY($1::uuid[])
+      UNION ALL
+      SELECT id, nom, prenom, 'demandeur' as type_utilisateur FROM demandeurs WHERE id = ANY($1::uuid[])
+    `, [missing]).then(rows => new Map(rows.map(row => [row.id, row])));
+
+    missing.forEach(id => {
+      const lookup = pending.then(rows => rows.get(id) || null);
+      // En cas d'échec, l'identifiant sera relu au prochain appel
+      lookup.catch(() => identities.delete(id));
+      identities.set(id, lookup);
+    });
+    await pending;
+  };
+
+  const resolveMany = async (ids) => {
+    await load(ids);
+    const entries = await Promise.all(ids.map(async id => [id, id ? await identities.get(id) : null]));
+    return new Map(entries);
+  };
+
+  const resolve = async (id) => (await resolveMany([id])).get(id);
+
+  // Auteur au format attendu par email-service : { nom, prenom, type_utilisateur }
+  const authorInfo = async (decoded) => {
+    const type = decoded.type_utilisateur || decoded.type || 'inconnu';
+    const identity = await resolve(decoded.id);
+    if (!identity) {
+      return { ...UNKNOWN_USER, type_utilisateur: type };
+    }
+    return { nom: identity.nom, prenom: identity.prenom, type_utilisateur: identity.type_utilisateur };
+  };
+
+  return { resolve, resolveMany, authorInfo };
+};
+
+module.exports = { createIdentityCache };
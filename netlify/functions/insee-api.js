@@ -1,127 +1,306 @@
-const headers = {
-  'Access-Control-Allow-Origin': '*',
-  'Access-Control-Allow-Headers': 'Content-Type, Authorization',
-  'Access-Control-Allow-Methods': 'GET, OPTIONS',
-  'Content-Type': 'application/json',
+const { neon } = require('@netlify/neon');
+const { createHandler, verifyToken, timedSql } = require('./request-pipeline');
+
+const sql = timedSql(neon()); // automatically uses env NETLIFY_DATABASE_URL
+
+// URL de base surchargeable pour pointer vers un stub local en test (insee_stub.py)
+const INSEE_API_BASE_URL = process.env.INSEE_API_BASE_URL || 'https://api.insee.fr/api-sirene/3.11';
+
+// Durées de vie du cache : résultats trouvés et SIRET inexistants (cache négatif)
+const CACHE_TTL_HOURS = parseInt(process.env.INSEE_CACHE_TTL_HOURS || '168', 10);
+const NEGATIVE_CACHE_TTL_HOURS = parseInt(process.env.INSEE_CACHE_NEGATIVE_TTL_HOURS || '24', 10);
+
+// Validation en masse : nombre max de SIRET par requête (import de plusieurs centaines de sociétés,
+// la durée de chaque appel reste bornée par BULK_DEADLINE_MS) et appels INSEE simultanés
+const BULK_MAX_SIRETS = parseInt(process.env.INSEE_BULK_MAX_SIRETS || '500', 10);
+const BULK_CONCURRENCY = parseInt(process.env.INSEE_BULK_CONCURRENCY || '4', 10);
+
+// Budget de la validation en masse (ms), sous la limite de 10 s des fonctions Netlify : au-delà,
+// les SIRET restants sont renvoyés dans `unprocessed` pour être soumis à nouveau
+const BULK_DEADLINE_MS = parseInt(process.env.INSEE_BULK_DEADLINE_MS || '8000', 10);
+
+// Requêtes INSEE en cours, partagées entre les appels concurrents d'une même instance
+const pendingLookups = new Map();
+
+// Nettoyer le SIRET (supprimer espaces et points)
+const cleanSiretValue = (siret) => String(siret || '').replace(/[\s\.]/g, '');
+
+const isValidSiret = (siret) => /^\d{14}$/.test(siret);
+
+// Extraire les informations utiles de la réponse INSEE
+const formatEtablissement = (data) => {
+  const etablissement = data.etablissement;
+  const adresse = etablissement.adresseEtablissement;
+  const uniteLegale = etablissement.uniteLegale;
+
+  return {
+    siret: etablissement.siret,
+    denomination: uniteLegale.denominationUniteLegale ||
+                 (uniteLegale.nomUniteLegale && uniteLegale.prenom1UniteLegale ?
+                  `${uniteLegale.prenom1UniteLegale} ${uniteLegale.nomUniteLegale}` : ''),
+    adresse: {
+      numeroVoie: adresse.numeroVoieEtablissement || '',
+      typeVoie: adresse.typeVoieEtablissement || '',
+      libelleVoie: adresse.libelleVoieEtablissement || '',
+      codePostal: adresse.codePostalEtablissement || '',
+      commune: adresse.libelleCommuneEtablissement || '',
+      adresseComplete: [
+        adresse.numeroVoieEtablissement,
+        adresse.typeVoieEtablissement,
+        adresse.libelleVoieEtablissement
+      ].filter(Boolean).join(' ')
+    },
+    etatAdministratif: etablissement.periodesEtablissement &&
+                      etablissement.periodesEtablissement.length > 0 ?
+                      etablissement.periodesEtablissement[0].etatAdministratifEtablissement : null,
+    activitePrincipale: etablissement.periodesEtablissement &&
+                       etablissement.periodesEtablissement.length > 0 ?
+                       etablissement.periodesEtablissement[0].activitePrincipaleEtablissement : null
+  };
 };
 
-exports.handler = async (event, context) => {
-  console.log('INSEE API function called:', event.httpMethod);
-  
-  if (event.httpMethod === 'OPTIONS') {
-    return { statusCode: 200, headers };
+// Lecture du cache pour une liste de SIRET (une seule requête)
+const readCache = async (sirets) => {
+  try {
+    const rows = await sql(`
+      SELECT siret, status, data
+      FROM insee_siret_cache
+      WHERE siret = ANY($1::varchar[]) AND expires_at > NOW()
+    `, [sirets]);
+    return new Map(rows.map(row => [row.siret, row]));
+  } catch (error) {
+    // Le cache est une optimisation : en cas d'erreur on interroge directement l'INSEE
+    console.error('INSEE cache read error:', error.message);
+    return new Map();
   }
+};
 
-  if (event.httpMethod !== 'GET') {
-    return {
-      statusCode: 405,
-      headers,
-      body: JSON.stringify({ error: 'Method not allowed' })
-    };
+const writeCache = async (siret, status, data) => {
+  const ttlHours = status === 'found' ? CACHE_TTL_HOURS : NEGATIVE_CACHE_TTL_HOURS;
+  try {
+    await sql(`
+      INSERT INTO insee_siret_cache (siret, status, data, fetched_at, expires_at)
+      VALUES ($1, $2, $3, NOW(), NOW() + make_interval(hours => $4))
+      ON CONFLICT (siret) DO UPDATE SET
+        status = EXCLUDED.status,
+        data = EXCLUDED.data,
+        fetched_at = EXCLUDED.fetched_at,
+        expires_at = EXCLUDED.expires_at
+    `, [siret, status, data ? JSON.stringify(data) : null, ttlHours]);
+  } catch (error) {
+    console.error('INSEE cache write error:', error.message);
   }
+};
 
-  try {
-    const { siret } = event.queryStringParameters || {};
-    
-    if (!siret) {
-      return {
-        statusCode: 400,
-        headers,
-        body: JSON.stringify({ error: 'SIRET is required' })
-      };
+// Appel à l'API INSEE ; seuls les résultats définitifs (200 / 404) sont mis en cache
+const fetchFromInsee = async (siret) => {
+  const INSEE_API_KEY = process.env.INSEE_API_KEY;
+  if (!INSEE_API_KEY) {
+    return { status: 'error', statusCode: 500, error: 'INSEE API key not configured' };
+  }
+
+  const response = await fetch(`${INSEE_API_BASE_URL}/siret/${siret}`, {
+    method: 'GET',
+    headers: {
+      'Accept': 'application/json',
+      'X-INSEE-Api-Key-Integration': INSEE_API_KEY
+    }
+  });
+
+  if (response.status === 404) {
+    await writeCache(siret, 'not_found', null);
+    return { status: 'not_found', statusCode: 404, error: 'SIRET not found' };
+  }
+
+  if (!response.ok) {
+    return { status: 'error', statusCode: response.status, error: `INSEE API error: ${response.status}` };
+  }
+
+  const data = formatEtablissement(await response.json());
+  await writeCache(siret, 'found', data);
+  return { status: 'found', statusCode: 200, data };
+};
+
+// Regroupe les recherches concurrentes d'un même SIRET sur un seul appel INSEE
+const fetchCoalesced = (siret) => {
+  if (!pendingLookups.has(siret)) {
+    const lookup = fetchFromInsee(siret).finally(() => pendingLookups.delete(siret));
+    pendingLookups.set(siret, lookup);
+  }
+  return pendingLookups.get(siret);
+};
+
+const fromCacheRow = (row) => (
+  row.status === 'found'
+    ? { status: 'found', statusCode: 200, data: row.data, cache: 'HIT' }
+    : { status: 'not_found', statusCode: 404, error: 'SIRET not found', cache: 'HIT' }
+);
+
+const lookupSiret = async (siret) => {
+  const cached = await readCache([siret]);
+  if (cached.has(siret)) {
+    return fromCacheRow(cached.get(siret));
+  }
+  return { ...(await fetchCoalesced(siret)), cache: 'MISS' };
+};
+
+// Validation en masse : lecture groupée du cache puis appels INSEE à concurrence limitée
+const lookupSirets = async (rawSirets) => {
+  const results = new Map();
+  const toResolve = new Set();
+
+  for (const raw of rawSirets) {
+    const siret = cleanSiretValue(raw);
+    if (!isValidSiret(siret)) {
+      results.set(siret, { siret, status: 'invalid', error: 'SIRET must be exactly 14 digits' });
+    } else {
+      toResolve.add(siret);
+    }
+  }
+
+  const cached = await readCache([...toResolve]);
+  const misses = [...toResolve].filter(siret => !cached.has(siret));
+  for (const [siret, row] of cached) {
+    results.set(siret, { siret, ...fromCacheRow(row) });
+  }
+
+  // Aucun nouvel appel INSEE après l'échéance ; les appels en cours terminent et alimentent le cache
+  const deadline = Date.now() + BULK_DEADLINE_MS;
+  let cursor = 0;
+  let started = 0;
+  const worker = async () => {
+    while (cursor < misses.length && Date.now() < deadline) {
+      const siret = misses[cursor++];
+      started++;
+      try {
+        results.set(siret, { siret, ...(await fetchCoalesced(siret)), cache: 'MISS' });
+      } catch (error) {
+        results.set(siret, { siret, status: 'error', error: error.message, cache: 'MISS' });
+      }
+    }
+  };
+
+  let timer;
+  const expired = new Promise(resolve => { timer = setTimeout(resolve, BULK_DEADLINE_MS); });
+  await Promise.race([
+    Promise.all(Array.from({ length: Math.min(BULK_CONCURRENCY, misses.length) }, worker)),
+    expired
+  ]);
+  clearTimeout(timer);
+
+  const unprocessed = misses.filter(siret => !results.has(siret));
+  const ordered = rawSirets.map(raw => {
+    const siret = cleanSiretValue(raw);
+    const { statusCode, ...result } = results.get(siret) || { siret, status: 'unprocessed' };
+    return result;
+  });
+
+  return {
+    results: ordered,
+    partial: unprocessed.length > 0,
+    unprocessed,
+    stats: {
+      total: ordered.length,
+      cache_hits: cached.size,
+      insee_calls: started,
+      found: ordered.filter(r => r.status === 'found').length,
+      not_found: ordered.filter(r => r.status === 'not_found').length,
+      invalid: ordered.filter(r => r.status === 'invalid').length,
+      errors: ordered.filter(r => r.status === 'error').length,
+      unprocessed: unprocessed.length
     }
+  };
+};
 
-    // Nettoyer le SIRET (supprimer espaces et points)
-    const cleanSiret = siret.replace(/[\s\.]/g, '');
-    
-    // Vérifier que le SIRET fait exactement 14 chiffres
-    if (!/^\d{14}$/.test(cleanSiret)) {
+/**
+ * GET /api/insee-api?siret=... : recherche d'un SIRET (cache puis API INSEE)
+ *
+ * POST /api/insee-api { sirets: [...] } : validation en masse, réservée aux agents (BULK_MAX_SIRETS au plus).
+ * Réponse { results, partial, unprocessed, stats } : un résultat par SIRET soumis, dans l'ordre.
+ * Les SIRET non traités avant l'échéance (BULK_DEADLINE_MS) ont le statut 'unprocessed' et sont listés
+ * dans `unprocessed` ; tant que `partial` est vrai, le client soumet à nouveau `unprocessed` et fusionne
+ * les résultats. Les appels INSEE déjà lancés alimentent le cache : chaque nouvel appel progresse.
+ */
+exports.handler = createHandler({ name: 'insee-api', methods: 'GET, POST, OPTIONS', auth: false }, async ({ event, query, body, headers }) => {
+  if (event.httpMethod === 'POST') {
+    // Validation en masse (import de sociétés) réservée aux agents
+    const decoded = verifyToken(event.headers.authorization || event.headers.Authorization);
+    if ((decoded.type_utilisateur || decoded.type) !== 'agent') {
       return {
-        statusCode: 400,
+        statusCode: 403,
         headers,
-        body: JSON.stringify({ error: 'SIRET must be exactly 14 digits' })
+        body: JSON.stringify({ error: 'Accès réservé aux agents' })
       };
     }
 
-    const INSEE_API_KEY = process.env.INSEE_API_KEY;
-    
-    if (!INSEE_API_KEY) {
+    const { sirets } = body();
+    if (!Array.isArray(sirets) || sirets.length === 0) {
       return {
-        statusCode: 500,
+        statusCode: 400,
         headers,
-        body: JSON.stringify({ error: 'INSEE API key not configured' })
+        body: JSON.stringify({ error: 'sirets must be a non-empty array' })
       };
     }
 
-    // Appeler l'API INSEE
-    const response = await fetch(`https://api.insee.fr/api-sirene/3.11/siret/${cleanSiret}`, {
-      method: 'GET',
-      headers: {
-        'Accept': 'application/json',
-        'X-INSEE-Api-Key-Integration': INSEE_API_KEY
-      }
-    });
-
-    if (!response.ok) {
-      if (response.status === 404) {
-        return {
-          statusCode: 404,
-          headers,
-          body: JSON.stringify({ error: 'SIRET not found' })
-        };
-      }
-      
+    if (sirets.length > BULK_MAX_SIRETS) {
       return {
-        statusCode: response.status,
+        statusCode: 400,
         headers,
-        body: JSON.stringify({ error: `INSEE API error: ${response.status}` })
+        body: JSON.stringify({ error: `Maximum ${BULK_MAX_SIRETS} SIRET per request` })
       };
     }
 
-    const data = await response.json();
-    
-    // Extraire les informations utiles
-    const etablissement = data.etablissement;
-    const adresse = etablissement.adresseEtablissement;
-    const uniteLegale = etablissement.uniteLegale;
-    
-    const result = {
-      siret: etablissement.siret,
-      denomination: uniteLegale.denominationUniteLegale || 
-                   (uniteLegale.nomUniteLegale && uniteLegale.prenom1UniteLegale ? 
-                    `${uniteLegale.prenom1UniteLegale} ${uniteLegale.nomUniteLegale}` : ''),
-      adresse: {
-        numeroVoie: adresse.numeroVoieEtablissement || '',
-        typeVoie: adresse.typeVoieEtablissement || '',
-        libelleVoie: adresse.libelleVoieEtablissement || '',
-        codePostal: adresse.codePostalEtablissement || '',
-        commune: adresse.libelleCommuneEtablissement || '',
-        adresseComplete: [
-          adresse.numeroVoieEtablissement,
-          adresse.typeVoieEtablissement,
-          adresse.libelleVoieEtablissement
-        ].filter(Boolean).join(' ')
-      },
-      etatAdministratif: etablissement.periodesEtablissement && 
-                        etablissement.periodesEtablissement.length > 0 ? 
-                        etablissement.periodesEtablissement[0].etatAdministratifEtablissement : null,
-      activitePrincipale: etablissement.periodesEtablissement && 
-                         etablissement.periodesEtablissement.length > 0 ? 
-                         etablissement.periodesEtablissement[0].activitePrincipaleEtablissement : null
-    };
-
+    const result = await lookupSirets(sirets);
     return {
       statusCode: 200,
       headers,
       body: JSON.stringify(result)
     };
+  }
 
-  } catch (error) {
-    console.error('INSEE API error:', error);
+  if (event.httpMethod !== 'GET') {
     return {
-      statusCode: 500,
+      statusCode: 405,
       headers,
-      body: JSON.stringify({ error: 'Internal server error: ' + error.message })
+      body: JSON.stringify({ error: 'Method not allowed' })
     };
   }
-};
\ No newline at end of file
+
+  const { siret } = query;
+
+  if (!siret) {
+    return {
+      statusCode: 400,
+      headers,
+      body: JSON.stringify({ error: 'SIRET is required' })
+    };
+  }
+
+  const cleanSiret = cleanSiretValue(siret);
+
+  // Vérifier que le SIRET fait exactement 14 chiffres
+  if (!isValidSiret(cleanSiret)) {
+    return {
+      statusCode: 400,
+      headers,
+      body: JSON.stringify({ error: 'SIRET must be exactly 14 digits' })
+    };
+  }
+
+  const result = await lookupSiret(cleanSiret);
+  const responseHeaders = { ...headers, 'X-Cache': result.cache };
+
+  if (result.status !== 'found') {
+    return {
+      statusCode: result.statusCode,
+      headers: responseHeaders,
+      body: JSON.stringify({ error: result.error })
+    };
+  }
+
+  return {
+    statusCode: 200,
+    headers: responseHeaders,
+    body: JSON.stringify(result.data)
+  };
+});
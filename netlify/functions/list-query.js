@@ -0,0 +1,288 @@
+const { HttpError } = require('./request-pipeline');
+
+// Moteur des listes paginées : la page et le total sont obtenus en une seule requête (COUNT(*) OVER())
+
+// Durée de vie des totaux mis en cache (mode count=cached), par instance chaude
+const COUNT_CACHE_TTL_MS = parseInt(process.env.LIST_COUNT_CACHE_TTL_MS || '30000', 10);
+const COUNT_CACHE_SIZE = 200;
+
+// Taille de page maximale acceptée (page / limit et curseur)
+const LIST_MAX_PAGE_SIZE = parseInt(process.env.LIST_MAX_PAGE_SIZE || '200', 10);
+// Plafond des listes sans pagination (format historique en tableau, même forme de réponse) : au-delà,
+// la liste est tronquée et signalée par X-Has-More ; les listes complètes se lisent par curseur. 0 = pas de plafond.
+const LIST_MAX_ROWS = parseInt(process.env.LIST_MAX_ROWS || '500', 10);
+
+const COUNT_MODES = ['exact', 'cached', 'estimate', 'none'];
+
+const countCache = new Map();
+
+const readCachedTotal = (key) => {
+  const entry = countCache.get(key);
+  if (!entry) return undefined;
+  if (entry.expiresAt <= Date.now()) {
+    countCache.delete(key);
+    return undefined;
+  }
+  return entry.total;
+};
+
+const writeCachedTotal = (key, total) => {
+  countCache.delete(key);
+  countCache.set(key, { total, expiresAt: Date.now() + COUNT_CACHE_TTL_MS });
+  if (countCache.size > COUNT_CACHE_SIZE) {
+    countCache.delete(countCache.keys().next().value);
+  }
+};
+
+// Lecture des paramètres page / limit / count d'une query string
+const parsePagination = (query = {}, defaultLimit = 10) => {
+  const page = Math.max(parseInt(query.page) || 1, 1);
+  const limit = Math.min(Math.max(parseInt(query.limit) || defaultLimit, 1), LIST_MAX_PAGE_SIZE);
+  const count = COUNT_MODES.includes(query.count) ? query.count : 'exact';
+  return { page, limit, count };
+};
+
+// Lecture des paramètres cursor / limit d'une query string (cursor vide = première page)
+const parseCursorPagination = (query = {}, defaultLimit = 50) => ({
+  cursor: query.cursor || null,
+  limit: Math.min(Math.max(parseInt(query.limit) || defaultLimit, 1), LIST_MAX_PAGE_SIZE)
+});
+
+const countTotal = async (sql, from, params) => {
+  const result = await sql(`SELECT COUNT(*) AS total ${from}`, params);
+  return parseInt(result[0].total);
+};
+
+// Estimation du planificateur : aucune ligne n'est lue
+const estimateTotal = async (sql, from, params) => {
+  const result = await sql(`EXPLAIN (FORMAT JSON) SELECT 1 ${from}`, params);
+  const plan = result[0]['QUERY PLAN'];
+  return Math.round((typeof plan === 'string' ? JSON.parse(plan) : plan)[0].Plan['Plan Rows']);
+};
+
+// Colonnes de chaque table, lues une fois par instance pour valider ?fields=
+const FIELD_PATTERN = /^[a-z_][a-z0-9_]*$/;
+const tableColumns = new Map();
+
+const columnsOf = (sql, table) => {
+  if (!tableColumns.has(table)) {
+    const lookup = sql(
+      'SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = $1',
+      [table]
+    ).then(rows => new Set(rows.map(row => row.column_name)));
+    lookup.catch(() => tableColumns.delete(table));
+    tableColumns.set(table, lookup);
+  }
+  return tableColumns.get(table);
+};
+
+// SELECT complet d'une liste : toutes les colonnes de la table et les colonnes jointes
+const selectAll = (alias, joined = {}) => [
+  `${alias}.*`,
+  ...Object.entries(joined).map(([name, expression]) => `${expression} as ${name}`)
+].join(',\n');
+
+/**
+ * Projection ?fields=a,b,c poussée dans le SELECT.
+ *
+ * options :
+ *  - table, alias : table principale de la liste, ex. 'productions', 'p'
+ *  - joined : colonnes jointes ou calculées en SQL, { nom: 'expression' }
+ *  - computed : champs calculés en JavaScript après la requête, { nom: [colonnes nécessaires] }
+ *
+ * Retourne null sans ?fields, sinon { select, fields } ; id est toujours inclus.
+ */
+const parseFields = async (sql, fieldsParam, { table, alias, joined = {}, computed = {} }) => {
+  if (!fieldsParam) return null;
+
+  const fields = [...new Set(['id', ...fieldsParam.split(',').map(field => field.trim()).filter(Boolean)])];
+  const columns = await columnsOf(sql, table);
+  const unknown = fields.filter(field =>
+    !FIELD_PATTERN.test(field) || !(columns.has(field) || field in joined || field in computed)
+  );
+  if (unknown.length > 0) {
+    throw new HttpError(400, `Champs inconnus : ${unknown.join(', ')}`);
+  }
+
+  const needed = [...new Set(fields.flatMap(field => computed[field] || [field]))];
+  const select = needed
+    .map(field => (field in joined ? `${joined[field]} as ${field}` : `${alias}.${field}`))
+    .join(', ');
+  return { select, fields };
+};
+
+// Ne garde que les champs demandés (retire les colonnes lues pour les champs calculés)
+const pickFields = (rows, projection) => {
+  if (!projection) return rows;
+  return rows.map(row => Object.fromEntries(projection.fields.map(field => [field, row[field]])));
+};
+
+/**
+ * Exécute une requête de liste paginée.
+ *
+ * options :
+ *  - select : colonnes, ex. 'p.*, c.nom_societe'
+ *  - from : clause FROM ... WHERE ... (sans ORDER BY)
+ *  - params : paramètres positionnels utilisés par `from`
+ *  - orderBy : clause de tri, ex. 'p.created_at DESC'
+ *  - page, limit : pagination
+ *  - count : 'exact' (défaut), 'cached' (total exact réutilisé pendant LIST_COUNT_CACHE_TTL_MS),
+ *            'estimate' (estimation du planificateur) ou 'none' (pas de total)
+ *
+ * Retourne { rows, pagination }.
+ */
+const paginatedQuery = async (sql, { select, from, params = [], orderBy, page, limit, count = 'exact' }) => {
+  const offset = (page - 1) * limit;
+  const cacheKey = count === 'cached' ? JSON.stringify([from, params]) : null;
+  const cachedTotal = cacheKey ? readCachedTotal(cacheKey) : undefined;
+  const withWindow = count === 'exact' || (count === 'cached' && cachedTotal === undefined);
+
+  // Sans total exact, une ligne supplémentaire indique s'il existe une page suivante
+  const pageQuery = `
+    SELECT ${select}${withWindow ? ', COUNT(*) OVER() AS total_count' : ''}
+    ${from}
+    ORDER BY ${orderBy}
+    LIMIT $${params.length + 1} OFFSET $${params.length + 2}
+  `;
+  const [result, estimate] = await Promise.all([
+    sql(pageQuery, [...params, withWindow ? limit : limit + 1, offset]),
+    count === 'estimate' ? estimateTotal(sql, from, params) : null
+  ]);
+
+  let rows;
+  let total;
+  let hasNext;
+  if (withWindow) {
+    if (result.length > 0) {
+      total = parseInt(result[0].total_count);
+    } else {
+      // Page au-delà de la dernière : la fenêtre ne renvoie rien, on compte à part
+      total = offset > 0 ? await countTotal(sql, from, params) : 0;
+    }
+    rows = result.map(({ total_count, ...row }) => row);
+    hasNext = page * limit < total;
+    if (cacheKey) writeCachedTotal(cacheKey, total);
+  } else {
+    rows = result.slice(0, limit);
+    hasNext = result.length > limit;
+    if (count === 'cached') {
+      total = cachedTotal;
+    } else if (count === 'estimate') {
+      total = Math.max(estimate, offset + rows.length + (hasNext ? 1 : 0));
+    } else {
+      total = null;
+    }
+  }
+
+  return {
+    rows,
+    pagination: {
+      page,
+      limit,
+      total,
+      pages: total === null ? null : Math.ceil(total / limit),
+      hasNext,
+      hasPrev: page > 1,
+      totalMode: count
+    }
+  };
+};
+
+// Curseur opaque : valeurs (en texte) des clés de tri de la dernière ligne renvoyée
+const encodeCursor = (values) => Buffer.from(JSON.stringify(values)).toString('base64url');
+
+const decodeCursor = (cursor, size) => {
+  let values;
+  try {
+    values = JSON.parse(Buffer.from(cursor, 'base64url').toString());
+  } catch (error) {
+    values = null;
+  }
+  if (!Array.isArray(values) || values.length !== size || values.some(value => typeof value !== 'string')) {
+    throw new HttpError(400, 'Curseur de pagination invalide');
+  }
+  return values;
+};
+
+/**
+ * Exécute une requête de liste paginée par curseur (pagination par clé, sans OFFSET ni COUNT).
+ * Le coût d'une page ne dépend pas de sa position : la reprise se fait sur l'index des clés de tri.
+ *
+ * options :
+ *  - select, from : colonnes et clause FROM ... JOIN (sans WHERE)
+ *  - where, params : conditions (combinées par AND) et leurs paramètres positionnels
+ *  - keys : clés de tri uniques et non nulles, ex. [{ column: 't.date_creation', type: 'timestamp' }, { column: 't.id', type: 'uuid' }]
+ *  - direction : 'ASC' ou 'DESC', commune à toutes les clés
+ *  - limit, cursor : taille de page et curseur renvoyé par la page précédente
+ *
+ * Retourne { rows, pagination: { limit, hasMore, nextCursor } }.
+ */
+const cursorQuery = async (sql, { select, from, where = [], params = [], keys, direction = 'ASC', limit, cursor }) => {
+  const conditions = [...where];
+  const queryParams = [...params];
+
+  if (cursor) {
+    const placeholders = decodeCursor(cursor, keys.length).map((value, index) => {
+      queryParams.push(value);
+      return `$${queryParams.length}::${keys[index].type}`;
+    });
+    conditions.push(`(${keys.map(key => key.column).join(', ')}) ${direction === 'DESC' ? '<' : '>'} (${placeholders.join(', ')})`);
+  }
+  queryParams.push(limit + 1);
+
+  // Les clés sont relues en texte : un Date JavaScript perdrait les microsecondes
+  const result = await sql(`
+    SELECT ${select}, ${keys.map((key, index) => `${key.column}::text AS cursor_key_${index}`).join(', ')}
+    ${from}
+    ${conditions.length > 0 ? 'WHERE ' + conditions.join(' AND ') : ''}
+    ORDER BY ${keys.map(key => `${key.column} ${direction}`).join(', ')}
+    LIMIT $${queryParams.length}
+  `, queryParams);
+
+  const hasMore = result.length > limit;
+  const page = result.slice(0, limit);
+  const last = page[page.length - 1];
+  const nextCursor = hasMore ? encodeCursor(keys.map((_, index) => last[`cursor_key_${index}`])) : null;
+  const rows = page.map(row => {
+    const cleaned = { ...row };
+    keys.forEach((_, index) => delete cleaned[`cursor_key_${index}`]);
+    return cleaned;
+  });
+
+  return { rows, pagination: { limit, hasMore, nextCursor } };
+};
+
+// Liste au format historique (tableau), plafonnée à LIST_MAX_ROWS lignes (sauf LIST_MAX_ROWS=0).
+// latestOrderBy (ordre inverse de orderBy) : le plafond garde les dernières lignes, renvoyées dans l'ordre
+// de orderBy (fil de discussion : les messages les plus récents ne doivent pas être coupés).
+const boundedQuery = async (sql, { select, from, params = [], orderBy, latestOrderBy }) => {
+  if (LIST_MAX_ROWS <= 0) {
+    return { rows: await sql(`SELECT ${select} ${from} ORDER BY ${orderBy}`, params), truncated: false };
+  }
+  const result = await sql(
+    `SELECT ${select} ${from} ORDER BY ${latestOrderBy || orderBy} LIMIT $${params.length + 1}`,
+    [...params, LIST_MAX_ROWS + 1]
+  );
+  const rows = result.slice(0, LIST_MAX_ROWS);
+  return { rows: latestOrderBy ? rows.reverse() : rows, truncated: result.length > LIST_MAX_ROWS };
+};
+
+// En-têtes signalant une liste tronquée (le client doit passer à la pagination par curseur)
+const truncationHeaders = (responseHeaders, truncated) => (truncated
+  ? { ...responseHeaders, 'X-Has-More': 'true', 'X-Max-Rows': String(LIST_MAX_ROWS) }
+  : responseHeaders);
+
+module.exports = {
+  COUNT_MODES,
+  LIST_MAX_PAGE_SIZE,
+  LIST_MAX_ROWS,
+  parsePagination,
+  parseCursorPagination,
+  paginatedQuery,
+  cursorQuery,
+  boundedQuery,
+  truncationHeaders,
+  selectAll,
+  parseFields,
+  pickFields
+};
@@ -0,0 +1,84 @@
+// Journalisation structurée des fonctions : une ligne JSON par enregistrement, niveaux, échantillonnage
+// par fonction et formatage paresseux (les champs ne sont calculés que si l'enregistrement est émis).
+//
+//   const log = createLogger('tickets');
+//   log.info('Tickets found', () => ({ count: rows.length, filters }));
+//
+// En production (CONTEXT=production ou NODE_ENV=production) le niveau par défaut est 'error' :
+// seules les erreurs et les requêtes lentes (log.slow) sont écrites.
+
+const LEVELS = { debug: 10, info: 20, warn: 30, error: 40, silent: 100 };
+
+const isProduction = process.env.CONTEXT === 'production' || process.env.NODE_ENV === 'production';
+
+// Niveau minimal écrit (debug, info, warn, error, silent)
+const LOG_LEVEL = LEVELS[process.env.LOG_LEVEL] !== undefined ? process.env.LOG_LEVEL : (isProduction ? 'error' : 'info');
+
+// Part des requêtes dont les enregistrements debug / info sont écrits (0 à 1), par défaut et par fonction :
+// LOG_SAMPLE_RATES="tickets=0.01,ticket-fichiers=0.1"
+const LOG_SAMPLE_RATE = parseFloat(process.env.LOG_SAMPLE_RATE || '1');
+const LOG_SAMPLE_RATES = Object.fromEntries(
+  (process.env.LOG_SAMPLE_RATES || '')
+    .split(',')
+    .map(entry => entry.split('='))
+    .filter(([name, rate]) => name && rate !== undefined && !Number.isNaN(parseFloat(rate)))
+    .map(([name, rate]) => [name.trim(), parseFloat(rate)])
+);
+
+const threshold = LEVELS[LOG_LEVEL];
+
+// Les erreurs sont réduites à leur nom, message et pile (JSON.stringify d'une Error donne {})
+const serializeValue = (key, value) => {
+  if (value instanceof Error) {
+    return { name: value.name, message: value.message, stack: value.stack };
+  }
+  return value;
+};
+
+const write = (level, record) => {
+  let line;
+  try {
+    line = JSON.stringify(record, serializeValue);
+  } catch (error) {
+    line = JSON.stringify({ ...record, fields_error: error.message, level, fn: record.fn, msg: record.msg });
+  }
+  if (level === 'error' || level === 'warn') {
+    console.error(line);
+  } else {
+    console.log(line);
+  }
+};
+
+const createLogger = (name, bindings = {}, sampled) => {
+  const rate = LOG_SAMPLE_RATES[name] !== undefined ? LOG_SAMPLE_RATES[name] : LOG_SAMPLE_RATE;
+  // Décision d'échantillonnage : une fois par requête (forRequest), sinon à chaque appel
+  const keep = () => (sampled !== undefined ? sampled : rate >= 1 || Math.random() < rate);
+
+  const enabled = (level) => LEVELS[level] >= threshold && (LEVELS[level] >= LEVELS.warn || keep());
+
+  const emit = (level, msg, fields) => {
+    if (!enabled(level)) return;
+    const values = typeof fields === 'function' ? fields() : fields;
+    write(level, { level, fn: name, msg, ...bindings, ...values, ts: new Date().toISOString() });
+  };
+
+  return {
+    enabled,
+    debug: (msg, fields) => emit('debug', msg, fields),
+    info: (msg, fields) => emit('info', msg, fields),
+    warn: (msg, fields) => emit('warn', msg, fields),
+    error: (msg, fields) => emit('error', msg, fields),
+    // Requêtes lentes (slow_request, slow_query) : écrites quel que soit le niveau (sauf silent)
+    slow: (fields, msg = 'slow_request') => {
+      if (threshold >= LEVELS.silent) return;
+      write('warn', { level: 'warn', fn: name, msg, ...bindings, ...fields, ts: new Date().toISOString() });
+    },
+    // Logger d'une requête : champs communs et échantillonnage décidé une seule fois
+    forRequest: (requestBindings = {}) => createLogger(name, { ...bindings, ...requestBindings }, rate >= 1 || Math.random() < rate)
+  };
+};
+
+module.exports = {
+  LEVELS,
+  createLogger
+};
@@ -0,0 +1,35 @@
+const emailService = require('./email-service');
+
+const headers = {
+  'Content-Type': 'application/json',
+};
+
+// Fonction planifiée (voir netlify.toml) : envoie les récapitulatifs de commentaires
+// lorsque NOTIFICATION_DIGEST_MODE=digest
+exports.handler = async (event, context) => {
+  if (!emailService.isDigestEnabled()) {
+    return {
+      statusCode: 200,
+      headers,
+      body: JSON.stringify({ message: 'Mode digest désactivé', sent: 0 })
+    };
+  }
+
+  try {
+    const result = await emailService.flushNotificationDigests();
+    console.log('Notification digest flush:', result);
+
+    return {
+      statusCode: 200,
+      headers,
+      body: JSON.stringify(result)
+    };
+  } catch (error) {
+    console.error('Notification digest error:', error);
+    return {
+      statusCode: 500,
+      headers,
+      body: JSON.stringify({ detail: 'Erreur serveur: ' + error.message })
+    };
+  }
+};
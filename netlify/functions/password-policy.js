@@ -0,0 +1,26 @@
+const bcrypt = require('bcryptjs');
+
+// Coût bcrypt configurable (BCRYPT_COST) ; les hachages plus faibles sont mis à niveau à la connexion
+const DEFAULT_BCRYPT_COST = 10;
+
+const getBcryptCost = () => {
+  const cost = parseInt(process.env.BCRYPT_COST, 10);
+  return Number.isInteger(cost) && cost >= 4 && cost <= 31 ? cost : DEFAULT_BCRYPT_COST;
+};
+
+const hashPassword = (password) => bcrypt.hash(password, getBcryptCost());
+
+// Un hachage doit être recalculé si son coût diffère de la politique courante
+const needsRehash = (hash) => {
+  try {
+    return bcrypt.getRounds(hash) !== getBcryptCost();
+  } catch (error) {
+    return false;
+  }
+};
+
+module.exports = {
+  getBcryptCost,
+  hashPassword,
+  needsRehash
+};
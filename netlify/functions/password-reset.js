@@ -1,8 +1,9 @@
 const { neon } = require('@netlify/neon');
 const crypto = require('crypto');
-const bcrypt = require('bcrypt');
+const { hashPassword } = require('./password-policy');
+const { withServerTiming, timedSql } = require('./request-pipeline');
 
-const sql = neon(); // automatically uses env NETLIFY_DATABASE_URL
+const sql = timedSql(neon()); // automatically uses env NETLIFY_DATABASE_URL
 
 // Import conditionnel du service email
 const loadEmailService = () => {
@@ -74,7 +75,7 @@ const sendPasswordResetEmail = async (user, newPassword) => {
   }
 };
 
-exports.handler = async (event, context) => {
+exports.handler = withServerTiming('password-reset', async (event, context) => {
   console.log('Password reset function called:', event.httpMethod);
   
   // Debug des variables d'environnement
@@ -205,7 +206,7 @@ exports.handler = async (event, context) => {
 
     // Générer un nouveau mot de passe sécurisé
     const newPassword = generateSecurePassword();
-    const hashedPassword = await bcrypt.hash(newPassword, 10);
+    const hashedPassword = await hashPassword(newPassword);
 
     // Mettre à jour le mot de passe dans la base de données (sans déclencher les triggers)
     if (userType === 'agent') {
@@ -263,4 +264,4 @@ exports.handler = async (event, context) => {
       body: JSON.stringify({ error: 'Erreur serveur lors de la réinitialisation' })
     };
   }
-};
\ No newline at end of file
+});
\ No newline at end of file
@@ -1,287 +1,223 @@
 const { neon } = require('@netlify/neon');
-const jwt = require('jsonwebtoken');
 const emailService = require('./email-service');
+const { createHandler, timedSql } = require('./request-pipeline');
 
-const sql = neon(); // automatically uses env NETLIFY_DATABASE_URL
+const sql = timedSql(neon()); // automatically uses env NETLIFY_DATABASE_URL
 
-// Configuration JWT
-const JWT_SECRET = process.env.JWT_SECRET || 'dev-secret-key';
+exports.handler = createHandler({ name: 'portabilite-echanges', methods: 'GET, POST, DELETE, OPTIONS' }, async ({ event, decoded, query, body, headers }) => {
+  const method = event.httpMethod;
 
-// Fonction pour vérifier le token JWT
-function verifyToken(token) {
-  try {
-    return jwt.verify(token, JWT_SECRET);
-  } catch (error) {
-    return null;
-  }
-}
-
-exports.handler = async (event, context) => {
-  // Configuration CORS
-  const headers = {
-    'Access-Control-Allow-Origin': '*',
-    'Access-Control-Allow-Headers': 'Content-Type, Authorization',
-    'Access-Control-Allow-Methods': 'GET, POST, DELETE, OPTIONS'
-  };
-
-  // Gestion des requêtes OPTIONS (pré-vol CORS)
-  if (event.httpMethod === 'OPTIONS') {
-    return {
-      statusCode: 200,
-      headers
-    };
-  }
-
-  try {
-    // Vérification du token JWT
-    const authHeader = event.headers.authorization || event.headers.Authorization;
-    if (!authHeader || !authHeader.startsWith('Bearer ')) {
+  if (method === 'GET') {
+    // Récupération des commentaires d'une portabilité
+    const portabiliteId = query.portabiliteId;
+    
+    if (!portabiliteId) {
       return {
-        statusCode: 401,
+        statusCode: 400,
         headers,
-        body: JSON.stringify({ error: 'Token manquant' })
+        body: JSON.stringify({ error: 'ID de portabilité requis' })
       };
     }
 
-    const token = authHeader.substring(7);
-    const decoded = verifyToken(token);
+    // Vérification que l'utilisateur peut accéder à cette portabilité
+    const accessQuery = `
+      SELECT 1 FROM portabilites 
+      WHERE id = $1 AND (
+        demandeur_id = $2 OR 
+        agent_id = $2 OR 
+        $3 = 'agent'
+      )
+    `;
     
-    if (!decoded) {
+    const accessResult = await sql(accessQuery, [
+      portabiliteId, 
+      decoded.id, 
+      decoded.type_utilisateur || decoded.type
+    ]);
+
+    if (accessResult.length === 0) {
       return {
-        statusCode: 401,
+        statusCode: 403,
         headers,
-        body: JSON.stringify({ error: 'Token invalide' })
+        body: JSON.stringify({ error: 'Accès interdit à cette portabilité' })
       };
     }
 
-    // Initialisation du client Neon - using consistent syntax
-    // const sql is already initialized at the top of the file
-
-    const method = event.httpMethod;
-    const { queryStringParameters } = event;
-
-    if (method === 'GET') {
-      // Récupération des commentaires d'une portabilité
-      const portabiliteId = queryStringParameters?.portabiliteId;
-      
-      if (!portabiliteId) {
-        return {
-          statusCode: 400,
-          headers,
-          body: JSON.stringify({ error: 'ID de portabilité requis' })
-        };
-      }
-
-      // Vérification que l'utilisateur peut accéder à cette portabilité
-      const accessQuery = `
-        SELECT 1 FROM portabilites 
-        WHERE id = $1 AND (
-          demandeur_id = $2 OR 
-          agent_id = $2 OR 
-          $3 = 'agent'
-        )
-      `;
-      
-      const accessResult = await sql(accessQuery, [
-        portabiliteId, 
-        decoded.id, 
-        decoded.type_utilisateur || decoded.type
-      ]);
+    // Récupération des commentaires
+    const commentsQuery = `
+      SELECT 
+        pe.*,
+        CASE 
+          WHEN pe.auteur_type = 'agent' THEN a.nom || ' ' || a.prenom
+          WHEN pe.auteur_type = 'demandeur' THEN d.nom || ' ' || d.prenom
+          ELSE 'Utilisateur inconnu'
+        END as auteur_nom
+      FROM portabilite_echanges pe
+      LEFT JOIN agents a ON pe.auteur_id = a.id AND pe.auteur_type = 'agent'
+      LEFT JOIN demandeurs d ON pe.auteur_id = d.id AND pe.auteur_type = 'demandeur'
+      WHERE pe.portabilite_id = $1
+      ORDER BY pe.created_at ASC
+    `;
+
+    const result = await sql(commentsQuery, [portabiliteId]);
 
-      if (accessResult.length === 0) {
-        return {
-          statusCode: 403,
-          headers,
-          body: JSON.stringify({ error: 'Accès interdit à cette portabilité' })
-        };
-      }
-
-      // Récupération des commentaires
-      const commentsQuery = `
-        SELECT 
-          pe.*,
-          CASE 
-            WHEN pe.auteur_type = 'agent' THEN a.nom || ' ' || a.prenom
-            WHEN pe.auteur_type = 'demandeur' THEN d.nom || ' ' || d.prenom
-            ELSE 'Utilisateur inconnu'
-          END as auteur_nom
-        FROM portabilite_echanges pe
-        LEFT JOIN agents a ON pe.auteur_id = a.id AND pe.auteur_type = 'agent'
-        LEFT JOIN demandeurs d ON pe.auteur_id = d.id AND pe.auteur_type = 'demandeur'
-        WHERE pe.portabilite_id = $1
-        ORDER BY pe.created_at ASC
-      `;
+    return {
+      statusCode: 200,
+      headers,
+      body: JSON.stringify(result)
+    };
 
-      const result = await sql(commentsQuery, [portabiliteId]);
+  } else if (method === 'POST') {
+    // Ajout d'un nouveau commentaire
+    const { portabiliteId, message } = body();
 
+    if (!portabiliteId || !message || message.trim() === '') {
       return {
-        statusCode: 200,
+        statusCode: 400,
         headers,
-        body: JSON.stringify(result)
+        body: JSON.stringify({ error: 'ID de portabilité et message requis' })
       };
+    }
 
-    } else if (method === 'POST') {
-      // Ajout d'un nouveau commentaire
-      const body = JSON.parse(event.body);
-      const { portabiliteId, message } = body;
-
-      if (!portabiliteId || !message || message.trim() === '') {
-        return {
-          statusCode: 400,
-          headers,
-          body: JSON.stringify({ error: 'ID de portabilité et message requis' })
-        };
-      }
-
-      // Vérification que l'utilisateur peut commenter cette portabilité
-      const accessQuery = `
-        SELECT 
-          p.*,
-          c.nom_societe,
-          c.nom as client_nom,
-          c.prenom as client_prenom,
-          d.nom as demandeur_nom,
-          d.prenom as demandeur_prenom,
-          d.email as demandeur_email,
-          a.nom as agent_nom,
-          a.prenom as agent_prenom,
-          a.email as agent_email
-        FROM portabilites p
-        LEFT JOIN clients c ON p.client_id = c.id
-        LEFT JOIN demandeurs d ON p.demandeur_id = d.id
-        LEFT JOIN agents a ON p.agent_id = a.id
-        WHERE p.id = $1 AND (
-          p.demandeur_id = $2 OR 
-          p.agent_id = $2 OR 
-          $3 = 'agent'
-        )
-      `;
-
-      const accessResult = await sql(accessQuery, [
-        portabiliteId, 
-        decoded.id, 
-        decoded.type_utilisateur || decoded.type
-      ]);
-
-      if (accessResult.length === 0) {
-        return {
-          statusCode: 403,
-          headers,
-          body: JSON.stringify({ error: 'Accès interdit à cette portabilité' })
-        };
-      }
-
-      const portabiliteInfo = accessResult[0];
-
-      // Insertion du commentaire
-      const insertQuery = `
-        INSERT INTO portabilite_echanges (portabilite_id, auteur_id, auteur_type, message)
-        VALUES ($1, $2, $3, $4)
-        RETURNING *
-      `;
-
-      const result = await sql(insertQuery, [
-        portabiliteId,
-        decoded.id,
-        decoded.type_utilisateur || decoded.type,
-        message.trim()
-      ]);
-
-      const newComment = result[0];
-
-      // Récupération des informations complètes du commentaire
-      const commentDetailQuery = `
-        SELECT 
-          pe.*,
-          CASE 
-            WHEN pe.auteur_type = 'agent' THEN a.nom || ' ' || a.prenom
-            WHEN pe.auteur_type = 'demandeur' THEN d.nom || ' ' || d.prenom
-            ELSE 'Utilisateur inconnu'
-          END as auteur_nom
-        FROM portabilite_echanges pe
-        LEFT JOIN agents a ON pe.auteur_id = a.id AND pe.auteur_type = 'agent'
-        LEFT JOIN demandeurs d ON pe.auteur_id = d.id AND pe.auteur_type = 'demandeur'
-        WHERE pe.id = $1
-      `;
-
-      const commentDetailResult = await sql(commentDetailQuery, [newComment.id]);
-      const commentDetail = commentDetailResult[0];
-
-      // Envoi d'email de notification
-      try {
-        await emailService.sendPortabiliteCommentEmail(
-          portabiliteInfo,
-          commentDetail,
-          decoded.type
-        );
-      } catch (emailError) {
-        console.error('Erreur envoi email commentaire:', emailError);
-        // Ne pas faire échouer l'ajout du commentaire pour un problème d'email
-      }
-
+    // Vérification que l'utilisateur peut commenter cette portabilité
+    const accessQuery = `
+      SELECT 
+        p.*,
+        c.nom_societe,
+        c.nom as client_nom,
+        c.prenom as client_prenom,
+        d.nom as demandeur_nom,
+        d.prenom as demandeur_prenom,
+        d.email as demandeur_email,
+        a.nom as agent_nom,
+        a.prenom as agent_prenom,
+        a.email as agent_email
+      FROM portabilites p
+      LEFT JOIN clients c ON p.client_id = c.id
+      LEFT JOIN demandeurs d ON p.demandeur_id = d.id
+      LEFT JOIN agents a ON p.agent_id = a.id
+      WHERE p.id = $1 AND (
+        p.demandeur_id = $2 OR 
+        p.agent_id = $2 OR 
+        $3 = 'agent'
+      )
+    `;
+
+    const accessResult = await sql(accessQuery, [
+      portabiliteId, 
+      decoded.id, 
+      decoded.type_utilisateur || decoded.type
+    ]);
+
+    if (accessResult.length === 0) {
       return {
-        statusCode: 201,
+        statusCode: 403,
         headers,
-        body: JSON.stringify(commentDetail)
+        body: JSON.stringify({ error: 'Accès interdit à cette portabilité' })
       };
+    }
 
-    } else if (method === 'DELETE') {
-      // Suppression d'un commentaire (agents uniquement)
-      if ((decoded.type_utilisateur || decoded.type) !== 'agent') {
-        return {
-          statusCode: 403,
-          headers,
-          body: JSON.stringify({ error: 'Accès interdit' })
-        };
-      }
-
-      const body = JSON.parse(event.body);
-      const { commentId } = body;
-
-      if (!commentId) {
-        return {
-          statusCode: 400,
-          headers,
-          body: JSON.stringify({ error: 'ID du commentaire requis' })
-        };
-      }
+    const portabiliteInfo = accessResult[0];
+
+    // Insertion du commentaire
+    const insertQuery = `
+      INSERT INTO portabilite_echanges (portabilite_id, auteur_id, auteur_type, message)
+      VALUES ($1, $2, $3, $4)
+      RETURNING *
+    `;
+
+    const result = await sql(insertQuery, [
+      portabiliteId,
+      decoded.id,
+      decoded.type_utilisateur || decoded.type,
+      message.trim()
+    ]);
+
+    const newComment = result[0];
+
+    // Récupération des informations complètes du commentaire
+    const commentDetailQuery = `
+      SELECT 
+        pe.*,
+        CASE 
+          WHEN pe.auteur_type = 'agent' THEN a.nom || ' ' || a.prenom
+          WHEN pe.auteur_type = 'demandeur' THEN d.nom || ' ' || d.prenom
+          ELSE 'Utilisateur inconnu'
+        END as auteur_nom
+      FROM portabilite_echanges pe
+      LEFT JOIN agents a ON pe.auteur_id = a.id AND pe.auteur_type = 'agent'
+      LEFT JOIN demandeurs d ON pe.auteur_id = d.id AND pe.auteur_type = 'demandeur'
+      WHERE pe.id = $1
+    `;
+
+    const commentDetailResult = await sql(commentDetailQuery, [newComment.id]);
+    const commentDetail = commentDetailResult[0];
+
+    // Envoi d'email de notification
+    try {
+      await emailService.sendPortabiliteCommentEmail(
+        portabiliteInfo,
+        commentDetail,
+        decoded.type
+      );
+    } catch (emailError) {
+      console.error('Erreur envoi email commentaire:', emailError);
+      // Ne pas faire échouer l'ajout du commentaire pour un problème d'email
+    }
 
-      const deleteQuery = `
-        DELETE FROM portabilite_echanges 
-        WHERE id = $1 
-        RETURNING *
-      `;
+    return {
+      statusCode: 201,
+      headers,
+      body: JSON.stringify(commentDetail)
+    };
 
-      const result = await sql(deleteQuery, [commentId]);
+  } else if (method === 'DELETE') {
+    // Suppression d'un commentaire (agents uniquement)
+    if ((decoded.type_utilisateur || decoded.type) !== 'agent') {
+      return {
+        statusCode: 403,
+        headers,
+        body: JSON.stringify({ error: 'Accès interdit' })
+      };
+    }
 
-      if (result.length === 0) {
-        return {
-          statusCode: 404,
-          headers,
-          body: JSON.stringify({ error: 'Commentaire non trouvé' })
-        };
-      }
+    const { commentId } = body();
 
+    if (!commentId) {
       return {
-        statusCode: 200,
+        statusCode: 400,
         headers,
-        body: JSON.stringify({ message: 'Commentaire supprimé avec succès' })
+        body: JSON.stringify({ error: 'ID du commentaire requis' })
       };
+    }
+
+    const deleteQuery = `
+      DELETE FROM portabilite_echanges 
+      WHERE id = $1 
+      RETURNING *
+    `;
 
-    } else {
+    const result = await sql(deleteQuery, [commentId]);
+
+    if (result.length === 0) {
       return {
-        statusCode: 405,
+        statusCode: 404,
         headers,
-        body: JSON.stringify({ error: 'Méthode non autorisée' })
+        body: JSON.stringify({ error: 'Commentaire non trouvé' })
       };
     }
 
-  } catch (error) {
-    console.error('Erreur:', error);
     return {
-      statusCode: 500,
+      statusCode: 200,
+      headers,
+      body: JSON.stringify({ message: 'Commentaire supprimé avec succès' })
+    };
+
+  } else {
+    return {
+      statusCode: 405,
       headers,
-      body: JSON.stringify({ error: 'Erreur interne du serveur' })
+      body: JSON.stringify({ error: 'Méthode non autorisée' })
     };
   }
-};
\ No newline at end of file
+});
\ No newline at end of file
@@ -1,8 +1,9 @@
 const { neon } = require('@netlify/neon');
-const jwt = require('jsonwebtoken');
 const { v4: uuidv4 } = require('uuid');
+const { createIdentityCache } = require('./identity-cache');
+const { createHandler, headers, timedSql } = require('./request-pipeline');
 
-const sql = neon(); // automatically uses env NETLIFY_DATABASE_URL
+const sql = timedSql(neon()); // automatically uses env NETLIFY_DATABASE_URL
 
 // Import conditionnel du service email
 const loadEmailService = () => {
@@ -14,314 +15,476 @@ const loadEmailService = () => {
   }
 };
 
-const headers = {
-  'Access-Control-Allow-Origin': '*',
-  'Access-Control-Allow-Headers': 'Content-Type, Authorization',
-  'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-  'Content-Type': 'application/json',
-};
+// Nombre maximum de tâches modifiées par une mise à jour groupée
+const BULK_MAX_TACHES = 200;
+
+// Statuts autorisés (contrainte CHECK de production_taches.status)
+const TACHE_STATUSES = ['a_faire', 'en_cours', 'hors_scope', 'bloque', 'attente_installation', 'termine'];
+
+const UUID_PATTERN = /^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$/i;
+
+// Vérifie que l'utilisateur peut modifier toutes les tâches (lignes avec societe_id / demandeur_id de la production)
+const canModifyTaches = async (decoded, taches) => {
+  const userType = decoded.type_utilisateur || decoded.type;
+  if (userType === 'agent') {
+    return true;
+  }
+  if (userType !== 'demandeur') {
+    return false;
+  }
 
-const verifyToken = (authHeader) => {
-  if (!authHeader || !authHeader.startsWith('Bearer ')) {
-    throw new Error('Token manquant');
+  const demandeur = await sql`
+    SELECT societe_id FROM demandeurs WHERE id = ${decoded.id}
+  `;
+  if (demandeur.length === 0) {
+    return false;
   }
-  
-  const token = authHeader.substring(7);
-  return jwt.verify(token, process.env.JWT_SECRET || 'dev-secret-key');
+
+  return taches.every(tache => (
+    demandeur[0].societe_id
+      ? tache.societe_id === demandeur[0].societe_id
+      : tache.demandeur_id === decoded.id
+  ));
 };
 
-exports.handler = async (event, context) => {
-  console.log('Production-taches function called:', event.httpMethod, event.path);
-  
-  if (event.httpMethod === 'OPTIONS') {
-    return { statusCode: 200, headers };
+// Mise à jour groupée : toutes les tâches et leurs commentaires de changement de statut
+// sont écrits par une seule requête (donc dans une seule transaction)
+const bulkUpdateTaches = async (decoded, updates, identities) => {
+  if (!Array.isArray(updates) || updates.length === 0) {
+    return {
+      statusCode: 400,
+      headers,
+      body: JSON.stringify({ error: 'updates doit être une liste non vide' })
+    };
   }
 
-  try {
-    // Vérification du token JWT
-    const authHeader = event.headers.authorization || event.headers.Authorization;
-    const decoded = verifyToken(authHeader);
-
-    const method = event.httpMethod;
-    const pathParts = event.path.split('/');
-    const tacheId = pathParts[pathParts.length - 1];
-
-    if (method === 'GET') {
-      // Récupération des tâches par production_id
-      const { queryStringParameters } = event;
-      const productionId = queryStringParameters?.production_id;
-
-      if (!productionId) {
-        return {
-          statusCode: 400,
-          headers,
-          body: JSON.stringify({ error: 'production_id requis' })
-        };
-      }
+  if (updates.length > BULK_MAX_TACHES) {
+    return {
+      statusCode: 400,
+      headers,
+      body: JSON.stringify({ error: `Maximum ${BULK_MAX_TACHES} tâches par mise à jour` })
+    };
+  }
 
-      // Vérifier que l'utilisateur peut accéder à cette production
-      const productionQuery = `
-        SELECT p.* FROM productions p
-        LEFT JOIN demandeurs d ON p.demandeur_id = d.id
-        WHERE p.id = $1
-      `;
+  const ids = updates.map(update => update && update.id);
+  if (ids.some(id => !id) || new Set(ids).size !== ids.length) {
+    return {
+      statusCode: 400,
+      headers,
+      body: JSON.stringify({ error: 'Chaque mise à jour doit avoir un id unique' })
+    };
+  }
 
-      let canAccess = false;
-      const production = await sql(productionQuery, [productionId]);
-      
-      if (production.length === 0) {
-        return {
-          statusCode: 404,
-          headers,
-          body: JSON.stringify({ error: 'Production non trouvée' })
-        };
-      }
+  // Entrées invalides refusées avant la requête (sinon erreur de conversion SQL -> 500)
+  const invalidIds = ids.filter(id => typeof id !== 'string' || !UUID_PATTERN.test(id));
+  if (invalidIds.length > 0) {
+    return {
+      statusCode: 400,
+      headers,
+      body: JSON.stringify({ error: 'Identifiants de tâche invalides', invalid: invalidIds })
+    };
+  }
 
-      // Vérification des permissions
-      if ((decoded.type_utilisateur || decoded.type) === 'agent') {
-        canAccess = true;
-      } else if ((decoded.type_utilisateur || decoded.type) === 'demandeur') {
-        // Vérifier via la société
-        const demandeur = await sql`
-          SELECT societe_id FROM demandeurs WHERE id = ${decoded.id}
-        `;
-        
-        if (demandeur.length > 0) {
-          if (demandeur[0].societe_id && production[0].societe_id === demandeur[0].societe_id) {
-            canAccess = true;
-          } else if (!demandeur[0].societe_id && production[0].demandeur_id === decoded.id) {
-            canAccess = true;
-          }
-        }
-      }
+  const invalidStatuses = updates
+    .filter(update => update.status && !TACHE_STATUSES.includes(update.status))
+    .map(update => update.id);
+  if (invalidStatuses.length > 0) {
+    return {
+      statusCode: 400,
+      headers,
+      body: JSON.stringify({ error: `Statut invalide (${TACHE_STATUSES.join(', ')})`, invalid: invalidStatuses })
+    };
+  }
 
-      if (!canAccess) {
-        return {
-          statusCode: 403,
-          headers,
-          body: JSON.stringify({ error: 'Accès interdit' })
-        };
-      }
+  const invalidDates = updates
+    .filter(update => update.date_livraison && Number.isNaN(Date.parse(update.date_livraison)))
+    .map(update => update.id);
+  if (invalidDates.length > 0) {
+    return {
+      statusCode: 400,
+      headers,
+      body: JSON.stringify({ error: 'date_livraison invalide', invalid: invalidDates })
+    };
+  }
+
+  const taches = await sql(`
+    SELECT pt.id, p.societe_id, p.demandeur_id
+    FROM production_taches pt
+    JOIN productions p ON pt.production_id = p.id
+    WHERE pt.id = ANY($1::uuid[])
+  `, [ids]);
+
+  if (taches.length !== ids.length) {
+    const found = new Set(taches.map(tache => tache.id));
+    return {
+      statusCode: 404,
+      headers,
+      body: JSON.stringify({ error: 'Tâche non trouvée', missing: ids.filter(id => !found.has(id)) })
+    };
+  }
+
+  if (!(await canModifyTaches(decoded, taches))) {
+    return {
+      statusCode: 403,
+      headers,
+      body: JSON.stringify({ error: 'Accès interdit' })
+    };
+  }
+
+  const input = updates.map(({ id, status, descriptif, date_livraison, commentaire_interne }) => ({
+    id,
+    status: status || null,
+    descriptif: descriptif ?? null,
+    date_livraison: date_livraison || null,
+    commentaire_interne: commentaire_interne ?? null
+  }));
+
+  // Les sous-requêtes d'un WITH voient l'état avant modification : "previous" donne l'ancien statut
+  const [result] = await sql(`
+    WITH input AS (
+      SELECT * FROM jsonb_to_recordset($1::jsonb)
+        AS u(id uuid, status varchar, descriptif text, date_livraison date, commentaire_interne text)
+    ),
+    previous AS (
+      SELECT pt.id, pt.status FROM production_taches pt JOIN input u ON u.id = pt.id
+    ),
+    updated AS (
+      UPDATE production_taches pt SET
+        status = COALESCE(u.status, pt.status),
+        descriptif = COALESCE(u.descriptif, pt.descriptif),
+        date_livraison = COALESCE(u.date_livraison, pt.date_livraison),
+        commentaire_interne = COALESCE(u.commentaire_interne, pt.commentaire_interne),
+        date_modification = CURRENT_TIMESTAMP
+      FROM input u
+      WHERE pt.id = u.id
+      RETURNING pt.*
+    ),
+    commentaires AS (
+      INSERT INTO production_tache_commentaires (production_tache_id, auteur_id, contenu, type_commentaire)
+      SELECT prev.id, $2, '📝 Statut changé: ' || prev.status || ' → ' || u.status, 'status_change'
+      FROM previous prev
+      JOIN input u ON u.id = prev.id
+      WHERE u.status IS NOT NULL AND u.status IS DISTINCT FROM prev.status
+      RETURNING *
+    )
+    SELECT
+      (SELECT COALESCE(json_agg(updated), '[]'::json) FROM updated) AS taches,
+      (SELECT COALESCE(json_agg(commentaires), '[]'::json) FROM commentaires) AS commentaires
+  `, [JSON.stringify(input), decoded.id]);
+
+  const { taches: updatedTaches, commentaires } = result;
+
+  if (commentaires.length > 0) {
+    await notifyStatusChanges(decoded, updatedTaches, commentaires, identities);
+  }
 
-      // Récupération des tâches avec commentaires et fichiers
-      const tachesQuery = `
+  return {
+    statusCode: 200,
+    headers,
+    body: JSON.stringify({
+      taches: updatedTaches,
+      commentaires,
+      updated: updatedTaches.length
+    })
+  };
+};
+
+// Emails de changement de statut d'une mise à jour groupée :
+// une requête pour les productions concernées, l'auteur n'est résolu qu'une fois
+const notifyStatusChanges = async (decoded, taches, commentaires, identities) => {
+  const emailService = loadEmailService();
+  if (!emailService) {
+    return;
+  }
+
+  try {
+    const tacheIds = commentaires.map(commentaire => commentaire.production_tache_id);
+    const [productionRows, authorInfo] = await Promise.all([
+      sql(`
         SELECT 
-          pt.*,
-          COALESCE(commentaires.nb_commentaires, 0) as nb_commentaires,
-          COALESCE(fichiers.nb_fichiers, 0) as nb_fichiers
+          p.*,
+          c.nom_societe,
+          c.nom as client_nom,
+          c.prenom as client_prenom,
+          d.nom as demandeur_nom,
+          d.prenom as demandeur_prenom,
+          d.email as demandeur_email,
+          ds.nom_societe as societe_nom,
+          pt.nom_tache,
+          pt.id as tache_id
         FROM production_taches pt
-        LEFT JOIN (
-          SELECT production_tache_id, COUNT(*) as nb_commentaires
-          FROM production_tache_commentaires
-          GROUP BY production_tache_id
-        ) commentaires ON pt.id = commentaires.production_tache_id
-        LEFT JOIN (
-          SELECT production_tache_id, COUNT(*) as nb_fichiers
-          FROM production_tache_fichiers
-          GROUP BY production_tache_id
-        ) fichiers ON pt.id = fichiers.production_tache_id
-        WHERE pt.production_id = $1
-        ORDER BY pt.ordre_tache ASC
-      `;
+        JOIN productions p ON pt.production_id = p.id
+        LEFT JOIN clients c ON p.client_id = c.id
+        LEFT JOIN demandeurs d ON p.demandeur_id = d.id
+        LEFT JOIN demandeurs_societe ds ON p.societe_id = ds.id
+        WHERE pt.id = ANY($1::uuid[])
+      `, [tacheIds]),
+      identities.authorInfo(decoded)
+    ]);
+
+    const productionsByTache = new Map(productionRows.map(({ tache_id, ...row }) => [tache_id, row]));
+    const tachesById = new Map(taches.map(tache => [tache.id, tache]));
+
+    for (const commentaire of commentaires) {
+      const productionInfo = productionsByTache.get(commentaire.production_tache_id);
+      if (!productionInfo) continue;
+      try {
+        await emailService.sendProductionCommentEmail(
+          productionInfo,
+          tachesById.get(commentaire.production_tache_id),
+          commentaire,
+          authorInfo
+        );
+      } catch (emailError) {
+        console.error('Erreur envoi email changement statut:', emailError);
+      }
+    }
+  } catch (error) {
+    console.error('Erreur notifications changement statut:', error);
+    // Ne pas faire échouer la mise à jour des tâches
+  }
+};
+
+exports.handler = createHandler({ name: 'production-taches' }, async ({ event, decoded, params, query, body }) => {
+  // Un cache d'identités par invocation, partagé par les helpers (auteurs lus une seule fois)
+  const identities = createIdentityCache(sql);
 
-      const taches = await sql(tachesQuery, [productionId]);
+  const method = event.httpMethod;
+  const tacheId = params.id;
 
+  if (method === 'GET') {
+    // Récupération des tâches par production_id
+    const productionId = query.production_id;
+
+    if (!productionId) {
       return {
-        statusCode: 200,
+        statusCode: 400,
         headers,
-        body: JSON.stringify(taches)
+        body: JSON.stringify({ error: 'production_id requis' })
       };
+    }
 
-    } else if (method === 'PUT') {
-      // Mise à jour d'une tâche
-      const body = JSON.parse(event.body);
-      const {
-        status,
-        descriptif,
-        date_livraison,
-        commentaire_interne
-      } = body;
-
-      // Vérifier que la tâche existe et que l'utilisateur peut la modifier
-      const tacheQuery = `
-        SELECT pt.*, p.societe_id, p.demandeur_id 
-        FROM production_taches pt
-        JOIN productions p ON pt.production_id = p.id
-        WHERE pt.id = $1
-      `;
+    // Vérifier que l'utilisateur peut accéder à cette production
+    const productionQuery = `
+      SELECT p.* FROM productions p
+      LEFT JOIN demandeurs d ON p.demandeur_id = d.id
+      WHERE p.id = $1
+    `;
+
+    let canAccess = false;
+    const production = await sql(productionQuery, [productionId]);
+    
+    if (production.length === 0) {
+      return {
+        statusCode: 404,
+        headers,
+        body: JSON.stringify({ error: 'Production non trouvée' })
+      };
+    }
 
-      const tache = await sql(tacheQuery, [tacheId]);
+    // Vérification des permissions
+    if ((decoded.type_utilisateur || decoded.type) === 'agent') {
+      canAccess = true;
+    } else if ((decoded.type_utilisateur || decoded.type) === 'demandeur') {
+      // Vérifier via la société
+      const demandeur = await sql`
+        SELECT societe_id FROM demandeurs WHERE id = ${decoded.id}
+      `;
       
-      if (tache.length === 0) {
-        return {
-          statusCode: 404,
-          headers,
-          body: JSON.stringify({ error: 'Tâche non trouvée' })
-        };
-      }
-
-      // Vérification des permissions
-      let canModify = false;
-      if ((decoded.type_utilisateur || decoded.type) === 'agent') {
-        canModify = true;
-      } else if ((decoded.type_utilisateur || decoded.type) === 'demandeur') {
-        const demandeur = await sql`
-          SELECT societe_id FROM demandeurs WHERE id = ${decoded.id}
-        `;
-        
-        if (demandeur.length > 0) {
-          if (demandeur[0].societe_id && tache[0].societe_id === demandeur[0].societe_id) {
-            canModify = true;
-          } else if (!demandeur[0].societe_id && tache[0].demandeur_id === decoded.id) {
-            canModify = true;
-          }
+      if (demandeur.length > 0) {
+        if (demandeur[0].societe_id && production[0].societe_id === demandeur[0].societe_id) {
+          canAccess = true;
+        } else if (!demandeur[0].societe_id && production[0].demandeur_id === decoded.id) {
+          canAccess = true;
         }
       }
+    }
 
-      if (!canModify) {
-        return {
-          statusCode: 403,
-          headers,
-          body: JSON.stringify({ error: 'Accès interdit' })
-        };
-      }
+    if (!canAccess) {
+      return {
+        statusCode: 403,
+        headers,
+        body: JSON.stringify({ error: 'Accès interdit' })
+      };
+    }
 
-      const oldStatus = tache[0].status;
-
-      // Mise à jour de la tâche
-      const updateQuery = `
-        UPDATE production_taches SET
-          status = COALESCE($1, status),
-          descriptif = COALESCE($2, descriptif),
-          date_livraison = COALESCE($3, date_livraison),
-          commentaire_interne = COALESCE($4, commentaire_interne),
-          date_modification = CURRENT_TIMESTAMP
-        WHERE id = $5
-        RETURNING *
-      `;
+    // Récupération des tâches avec commentaires et fichiers
+    const tachesQuery = `
+      SELECT 
+        pt.*,
+        COALESCE(commentaires.nb_commentaires, 0) as nb_commentaires,
+        COALESCE(fichiers.nb_fichiers, 0) as nb_fichiers
+      FROM production_taches pt
+      LEFT JOIN (
+        SELECT production_tache_id, COUNT(*) as nb_commentaires
+        FROM production_tache_commentaires
+        GROUP BY production_tache_id
+      ) commentaires ON pt.id = commentaires.production_tache_id
+      LEFT JOIN (
+        SELECT production_tache_id, COUNT(*) as nb_fichiers
+        FROM production_tache_fichiers
+        GROUP BY production_tache_id
+      ) fichiers ON pt.id = fichiers.production_tache_id
+      WHERE pt.production_id = $1
+      ORDER BY pt.ordre_tache ASC
+    `;
+
+    const taches = await sql(tachesQuery, [productionId]);
 
-      const result = await sql(updateQuery, [
-        status,
-        descriptif,
-        date_livraison,
-        commentaire_interne,
-        tacheId
-      ]);
-
-      const updatedTache = result[0];
-
-      // Si le statut a changé, ajouter un commentaire automatique
-      if (status && status !== oldStatus) {
-        try {
-          const commentQuery = `
-            INSERT INTO production_tache_commentaires (production_tache_id, auteur_id, contenu, type_commentaire)
-            VALUES ($1, $2, $3, $4)
-            RETURNING *
-          `;
-
-          const commentResult = await sql(commentQuery, [
-            tacheId,
-            decoded.id,
-            `📝 Statut changé: ${oldStatus} → ${status}`,
-            'status_change'
-          ]);
-
-          // Envoyer un email pour le changement de statut
-          if (commentResult.length > 0) {
-            try {
-              // Récupération des informations pour l'email avec les données de l'auteur
-              const emailInfoQuery = `
-                SELECT 
-                  p.*,
-                  c.nom_societe,
-                  c.nom as client_nom,
-                  c.prenom as client_prenom,
-                  d.nom as demandeur_nom,
-                  d.prenom as demandeur_prenom,
-                  d.email as demandeur_email,
-                  ds.nom_societe as societe_nom,
-                  pt.nom_tache,
-                  COALESCE(da.nom, aa.nom) as auteur_nom,
-                  COALESCE(da.prenom, aa.prenom) as auteur_prenom
-                FROM productions p
-                LEFT JOIN clients c ON p.client_id = c.id
-                LEFT JOIN demandeurs d ON p.demandeur_id = d.id
-                LEFT JOIN demandeurs_societe ds ON p.societe_id = ds.id
-                LEFT JOIN production_taches pt ON p.id = pt.production_id
-                LEFT JOIN demandeurs da ON da.id = $2
-                LEFT JOIN agents aa ON aa.id = $2
-                WHERE p.id = (SELECT production_id FROM production_taches WHERE id = $1)
-                AND pt.id = $1
-              `;
-
-              const productionInfo = await sql(emailInfoQuery, [tacheId, decoded.id]);
-
-              if (productionInfo.length > 0) {
-                const emailService = loadEmailService();
-                if (emailService) {
-                  // Récupérer les informations de l'auteur depuis la base de données
-                  let authorInfo = { 
-                    prenom: 'Utilisateur', 
-                    nom: 'inconnu', 
-                    type_utilisateur: decoded.type_utilisateur || decoded.type || 'inconnu'
-                  };
-                  
-                  if ((decoded.type_utilisateur || decoded.type) === 'agent') {
-                    const agentInfo = await sql`SELECT nom, prenom FROM agents WHERE id = ${decoded.id}`;
-                    if (agentInfo.length > 0) {
-                      authorInfo = {
-                        ...agentInfo[0],
-                        type_utilisateur: 'agent'
-                      };
-                    }
-                  } else if ((decoded.type_utilisateur || decoded.type) === 'demandeur') {
-                    const demandeurInfo = await sql`SELECT nom, prenom FROM demandeurs WHERE id = ${decoded.id}`;
-                    if (demandeurInfo.length > 0) {
-                      authorInfo = {
-                        ...demandeurInfo[0],
-                        type_utilisateur: 'demandeur'
-                      };
-                    }
-                  }
-                  
-                  await emailService.sendProductionCommentEmail(
-                    productionInfo[0],
-                    updatedTache,
-                    commentResult[0],
-                    authorInfo
-                  );
-                }
-              }
-            } catch (emailError) {
-              console.error('Erreur envoi email changement statut:', emailError);
-              // Ne pas faire échouer la mise à jour de la tâche
-            }
-          }
-        } catch (commentError) {
-          console.error('Erreur ajout commentaire status:', commentError);
-        }
-      }
+    return {
+      statusCode: 200,
+      headers,
+      body: JSON.stringify(taches)
+    };
 
+  } else if (method === 'PUT' && tacheId === 'bulk') {
+    // Mise à jour groupée : { updates: [{ id, status, descriptif, date_livraison, commentaire_interne }] }
+    const { updates } = body();
+    return await bulkUpdateTaches(decoded, updates, identities);
+
+  } else if (method === 'PUT') {
+    // Mise à jour d'une tâche
+    const {
+      status,
+      descriptif,
+      date_livraison,
+      commentaire_interne
+    } = body();
+
+    // Vérifier que la tâche existe et que l'utilisateur peut la modifier
+    const tacheQuery = `
+      SELECT pt.*, p.societe_id, p.demandeur_id 
+      FROM production_taches pt
+      JOIN productions p ON pt.production_id = p.id
+      WHERE pt.id = $1
+    `;
+
+    const tache = await sql(tacheQuery, [tacheId]);
+    
+    if (tache.length === 0) {
       return {
-        statusCode: 200,
+        statusCode: 404,
         headers,
-        body: JSON.stringify(updatedTache)
+        body: JSON.stringify({ error: 'Tâche non trouvée' })
       };
+    }
+
+    // Vérification des permissions
+    const canModify = await canModifyTaches(decoded, tache);
 
-    } else {
+    if (!canModify) {
       return {
-        statusCode: 405,
+        statusCode: 403,
         headers,
-        body: JSON.stringify({ error: 'Méthode non autorisée' })
+        body: JSON.stringify({ error: 'Accès interdit' })
       };
     }
 
-  } catch (error) {
-    console.error('Erreur:', error);
+    const oldStatus = tache[0].status;
+
+    // Mise à jour de la tâche
+    const updateQuery = `
+      UPDATE production_taches SET
+        status = COALESCE($1, status),
+        descriptif = COALESCE($2, descriptif),
+        date_livraison = COALESCE($3, date_livraison),
+        commentaire_interne = COALESCE($4, commentaire_interne),
+        date_modification = CURRENT_TIMESTAMP
+      WHERE id = $5
+      RETURNING *
+    `;
+
+    const result = await sql(updateQuery, [
+      status,
+      descriptif,
+      date_livraison,
+      commentaire_interne,
+      tacheId
+    ]);
+
+    const updatedTache = result[0];
+
+    // Si le statut a changé, ajouter un commentaire automatique
+    if (status && status !== oldStatus) {
+      try {
+        const commentQuery = `
+          INSERT INTO production_tache_commentaires (production_tache_id, auteur_id, contenu, type_commentaire)
+          VALUES ($1, $2, $3, $4)
+          RETURNING *
+        `;
+
+        const commentResult = await sql(commentQuery, [
+          tacheId,
+          decoded.id,
+          `📝 Statut changé: ${oldStatus} → ${status}`,
+          'status_change'
+        ]);
+
+        // Envoyer un email pour le changement de statut
+        if (commentResult.length > 0) {
+          try {
+            // Récupération des informations pour l'email avec les données de l'auteur
+            const emailInfoQuery = `
+              SELECT 
+                p.*,
+                c.nom_societe,
+                c.nom as client_nom,
+                c.prenom as client_prenom,
+                d.nom as demandeur_nom,
+                d.prenom as demandeur_prenom,
+                d.email as demandeur_email,
+                ds.nom_societe as societe_nom,
+                pt.nom_tache,
+                COALESCE(da.nom, aa.nom) as auteur_nom,
+                COALESCE(da.prenom, aa.prenom) as auteur_prenom
+              FROM productions p
+              LEFT JOIN clients c ON p.client_id = c.id
+              LEFT JOIN demandeurs d ON p.demandeur_id = d.id
+              LEFT JOIN demandeurs_societe ds ON p.societe_id = ds.id
+              LEFT JOIN production_taches pt ON p.id = pt.production_id
+              LEFT JOIN demandeurs da ON da.id = $2
+              LEFT JOIN agents aa ON aa.id = $2
+              WHERE p.id = (SELECT production_id FROM production_taches WHERE id = $1)
+              AND pt.id = $1
+            `;
+
+            const productionInfo = await sql(emailInfoQuery, [tacheId, decoded.id]);
+
+            if (productionInfo.length > 0) {
+              const emailService = loadEmailService();
+              if (emailService) {
+                // Récupérer les informations de l'auteur depuis la base de données
+                const authorInfo = await identities.authorInfo(decoded);
+                
+                await emailService.sendProductionCommentEmail(
+                  productionInfo[0],
+                  updatedTache,
+                  commentResult[0],
+                  authorInfo
+                );
+              }
+            }
+          } catch (emailError) {
+            console.error('Erreur envoi email changement statut:', emailError);
+            // Ne pas faire échouer la mise à jour de la tâche
+          }
+        }
+      } catch (commentError) {
+        console.error('Erreur ajout commentaire status:', commentError);
+      }
+    }
+
+    return {
+      statusCode: 200,
+      headers,
+      body: JSON.stringify(updatedTache)
+    };
+
+  } else {
     return {
-      statusCode: 500,
+      statusCode: 405,
       headers,
-      body: JSON.stringify({ error: 'Erreur interne du serveur: ' + error.message })
+      body: JSON.stringify({ error: 'Méthode non autorisée' })
     };
   }
-};
\ No newline at end of file
+});
\ No newline at end of file
@@ -1,8 +1,10 @@
 const { neon } = require('@netlify/neon');
-const jwt = require('jsonwebtoken');
 const { v4: uuidv4 } = require('uuid');
+const { createHandler, headers, timed, timedSql } = require('./request-pipeline');
+const { parsePagination, paginatedQuery, selectAll, parseFields, pickFields } = require('./list-query');
+const { createIdentityCache } = require('./identity-cache');
 
-const sql = neon(); // automatically uses env NETLIFY_DATABASE_URL
+const sql = timedSql(neon()); // automatically uses env NETLIFY_DATABASE_URL ; requêtes chronométrées (Server-Timing)
 
 // Import conditionnel du service email
 const loadEmailService = () => {
@@ -14,22 +16,6 @@ const loadEmailService = () => {
   }
 };
 
-const headers = {
-  'Access-Control-Allow-Origin': '*',
-  'Access-Control-Allow-Headers': 'Content-Type, Authorization',
-  'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-  'Content-Type': 'application/json',
-};
-
-const verifyToken = (authHeader) => {
-  if (!authHeader || !authHeader.startsWith('Bearer ')) {
-    throw new Error('Token manquant');
-  }
-  
-  const token = authHeader.substring(7);
-  return jwt.verify(token, process.env.JWT_SECRET || 'dev-secret-key');
-};
-
 // Fonction pour obtenir le nom du client formaté
 function formatClientDisplay(client) {
   if (!client.nom_societe) return 'Client sans nom';
@@ -47,537 +33,508 @@ function formatClientDisplay(client) {
   return display;
 }
 
-exports.handler = async (event, context) => {
-  console.log('Productions function called:', event.httpMethod, event.path);
-  
-  if (event.httpMethod === 'OPTIONS') {
-    return { statusCode: 200, headers };
-  }
-
-  try {
-    // Vérification du token JWT
-    const authHeader = event.headers.authorization || event.headers.Authorization;
-    const decoded = verifyToken(authHeader);
-
-    const method = event.httpMethod;
-    const pathParts = event.path.split('/');
-    const productionId = pathParts[pathParts.length - 1];
-
-    if (method === 'GET') {
-      // Vérifier si c'est une demande pour une production spécifique
-      const isSpecificProduction = productionId && 
-        productionId !== 'productions' && 
-        productionId.length > 10; // UUID plus long que 10 caractères
-
-      if (isSpecificProduction) {
-        // Requête pour une production spécifique
-        let specificQuery = `
-          SELECT 
-            p.*,
-            c.nom_societe,
-            c.nom as client_nom,
-            c.prenom as client_prenom,
-            d.nom as demandeur_nom,
-            d.prenom as demandeur_prenom,
-            ds.nom_societe as societe_nom
-          FROM productions p
-          LEFT JOIN clients c ON p.client_id = c.id
-          LEFT JOIN demandeurs d ON p.demandeur_id = d.id
-          LEFT JOIN demandeurs_societe ds ON p.societe_id = ds.id
-          WHERE p.id = $1
-        `;
-
-        let queryParams = [productionId];
+// Colonnes jointes de la liste des productions (en plus de p.*), sélectionnables via ?fields=
+const LIST_JOINED_COLUMNS = {
+  nom_societe: 'c.nom_societe',
+  client_nom: 'c.nom',
+  client_prenom: 'c.prenom',
+  demandeur_nom: 'd.nom',
+  demandeur_prenom: 'd.prenom',
+  societe_nom: 'ds.nom_societe',
+  // Calcul de l'avancement (tâches terminées / tâches non hors scope)
+  avancement_pourcentage: `CASE
+    WHEN COALESCE(pt_stats.total_in_scope, 0) = 0 THEN 0
+    ELSE ROUND((COALESCE(pt_stats.termine, 0)::float / pt_stats.total_in_scope::float) * 100)
+  END`
+};
 
-        // Vérification des permissions pour les demandeurs
-        if ((decoded.type_utilisateur || decoded.type) === 'demandeur') {
-          // Pour les demandeurs, vérifier qu'ils peuvent accéder à cette production via leur société
-          const demandeur = await sql`
-            SELECT societe_id FROM demandeurs WHERE id = ${decoded.id}
-          `;
-          
-          if (demandeur.length === 0) {
-            return {
-              statusCode: 404,
-              headers,
-              body: JSON.stringify({ error: 'Utilisateur non trouvé' })
-            };
-          }
-
-          if (demandeur[0].societe_id) {
-            // Vérifier via la société
-            specificQuery += ` AND p.societe_id = $2`;
-            queryParams.push(demandeur[0].societe_id);
-          } else {
-            // Si pas de société, voir seulement ses propres productions
-            specificQuery += ` AND p.demandeur_id = $2`;
-            queryParams.push(decoded.id);
-          }
-        }
+exports.handler = createHandler({ name: 'productions', etag: ['productions', 'production_taches', 'clients', 'demandeurs', 'demandeurs_societe'] }, async ({ event, decoded, params }) => {
+  const method = event.httpMethod;
+  const productionId = params.id;
+  // Un cache d'identités par invocation, réutilisé pour chaque auteur à résoudre
+  const identities = createIdentityCache(sql);
+
+  if (method === 'GET') {
+    // Vérifier si c'est une demande pour une production spécifique
+    const isSpecificProduction = productionId && 
+      productionId !== 'productions' && 
+      productionId.length > 10; // UUID plus long que 10 caractères
+
+    if (isSpecificProduction) {
+      // Requête pour une production spécifique
+      let specificQuery = `
+        SELECT 
+          p.*,
+          c.nom_societe,
+          c.nom as client_nom,
+          c.prenom as client_prenom,
+          d.nom as demandeur_nom,
+          d.prenom as demandeur_prenom,
+          ds.nom_societe as societe_nom
+        FROM productions p
+        LEFT JOIN clients c ON p.client_id = c.id
+        LEFT JOIN demandeurs d ON p.demandeur_id = d.id
+        LEFT JOIN demandeurs_societe ds ON p.societe_id = ds.id
+        WHERE p.id = $1
+      `;
 
-        const result = await sql(specificQuery, queryParams);
+      let queryParams = [productionId];
 
-        if (result.length === 0) {
+      // Vérification des permissions pour les demandeurs
+      if ((decoded.type_utilisateur || decoded.type) === 'demandeur') {
+        // Pour les demandeurs, vérifier qu'ils peuvent accéder à cette production via leur société
+        const demandeur = await sql`
+          SELECT societe_id FROM demandeurs WHERE id = ${decoded.id}
+        `;
+        
+        if (demandeur.length === 0) {
           return {
             statusCode: 404,
             headers,
-            body: JSON.stringify({ error: 'Production non trouvée' })
+            body: JSON.stringify({ error: 'Utilisateur non trouvé' })
           };
         }
 
-        // Récupération des tâches associées
-        const tachesQuery = `
-          SELECT * FROM production_taches 
-          WHERE production_id = $1 
-          ORDER BY ordre_tache ASC
-        `;
-        const taches = await sql(tachesQuery, [productionId]);
-
-        // Formatage du résultat unique
-        const production = {
-          ...result[0],
-          client_display: formatClientDisplay({
-            nom_societe: result[0].nom_societe,
-            nom: result[0].client_nom,
-            prenom: result[0].client_prenom
-          }),
-          taches: taches
-        };
-
-        return {
-          statusCode: 200,
-          headers,
-          body: JSON.stringify(production)
-        };
-
-      } else {
-        // Récupération de la liste des productions
-        const { queryStringParameters } = event;
-        const page = parseInt(queryStringParameters?.page) || 1;
-        const limit = parseInt(queryStringParameters?.limit) || 10;
-        const offset = (page - 1) * limit;
-        const status = queryStringParameters?.status;
-        const clientId = queryStringParameters?.client;
-        const search = queryStringParameters?.search;
-
-        let baseQuery = `
-          SELECT 
-            p.*,
-            c.nom_societe,
-            c.nom as client_nom,
-            c.prenom as client_prenom,
-            d.nom as demandeur_nom,
-            d.prenom as demandeur_prenom,
-            ds.nom_societe as societe_nom,
-            -- Calcul de l'avancement (tâches terminées / tâches non hors scope)
-            CASE 
-              WHEN COALESCE(pt_stats.total_in_scope, 0) = 0 THEN 0
-              ELSE ROUND((COALESCE(pt_stats.termine, 0)::float / pt_stats.total_in_scope::float) * 100)
-            END as avancement_pourcentage
-          FROM productions p
-          LEFT JOIN clients c ON p.client_id = c.id
-          LEFT JOIN demandeurs d ON p.demandeur_id = d.id
-          LEFT JOIN demandeurs_societe ds ON p.societe_id = ds.id
-          LEFT JOIN (
-            SELECT 
-              production_id,
-              COUNT(CASE WHEN status != 'hors_scope' THEN 1 END) as total_in_scope,
-              COUNT(CASE WHEN status = 'termine' THEN 1 END) as termine
-            FROM production_taches
-            GROUP BY production_id
-          ) pt_stats ON p.id = pt_stats.production_id
-          WHERE 1=1
-        `;
-
-        let queryParams = [];
-        let paramCount = 0;
-
-        // Filtrage par utilisateur selon le type
-        if ((decoded.type_utilisateur || decoded.type) === 'demandeur') {
-          // Pour les demandeurs, utiliser societe_id pour voir toutes les productions de la société
-          const demandeur = await sql`
-            SELECT societe_id FROM demandeurs WHERE id = ${decoded.id}
-          `;
-          
-          if (demandeur.length === 0) {
-            return {
-              statusCode: 404,
-              headers,
-              body: JSON.stringify({ error: 'Utilisateur non trouvé' })
-            };
-          }
-
-          if (demandeur[0].societe_id) {
-            // Filtrer par société
-            paramCount++;
-            baseQuery += ` AND p.societe_id = $${paramCount}`;
-            queryParams.push(demandeur[0].societe_id);
-          } else {
-            // Si pas de société, voir seulement ses propres productions
-            paramCount++;
-            baseQuery += ` AND p.demandeur_id = $${paramCount}`;
-            queryParams.push(decoded.id);
-          }
-        }
-
-        // Filtrage par statut
-        if (status) {
-          paramCount++;
-          if (status.includes(',')) {
-            // Statuts multiples séparés par virgule
-            const statuses = status.split(',').map(s => s.trim());
-            const placeholders = statuses.map((_, index) => `$${paramCount + index}`).join(', ');
-            baseQuery += ` AND p.status IN (${placeholders})`;
-            queryParams.push(...statuses);
-            paramCount += statuses.length - 1; // -1 car on a déjà incrémenté paramCount
-          } else {
-            // Statut unique
-            baseQuery += ` AND p.status = $${paramCount}`;
-            queryParams.push(status);
-          }
-        }
-
-        // Filtrage par client
-        if (clientId) {
-          paramCount++;
-          baseQuery += ` AND p.client_id = $${paramCount}`;
-          queryParams.push(clientId);
-        }
-
-        // Recherche par numéro de production
-        if (search) {
-          paramCount++;
-          baseQuery += ` AND p.numero_production ILIKE $${paramCount}`;
-          queryParams.push(`%${search}%`);
+        if (demandeur[0].societe_id) {
+          // Vérifier via la société
+          specificQuery += ` AND p.societe_id = $2`;
+          queryParams.push(demandeur[0].societe_id);
+        } else {
+          // Si pas de société, voir seulement ses propres productions
+          specificQuery += ` AND p.demandeur_id = $2`;
+          queryParams.push(decoded.id);
         }
+      }
 
-        // Récupération du total
-        const countQuery = `SELECT COUNT(*) as total FROM (${baseQuery}) as subquery`;
-        const totalResult = await sql(countQuery, queryParams);
-        const total = parseInt(totalResult[0].total);
-
-        // Récupération des données paginées
-        baseQuery += ` ORDER BY p.date_creation DESC LIMIT $${paramCount + 1} OFFSET $${paramCount + 2}`;
-        queryParams.push(limit, offset);
-
-        const result = await sql(baseQuery, queryParams);
-        
-        // Formatage des résultats
-        const productions = result.map(row => ({
-          ...row,
-          client_display: formatClientDisplay({
-            nom_societe: row.nom_societe,
-            nom: row.client_nom,
-            prenom: row.client_prenom
-          })
-        }));
+      const result = await sql(specificQuery, queryParams);
 
+      if (result.length === 0) {
         return {
-          statusCode: 200,
+          statusCode: 404,
           headers,
-          body: JSON.stringify({
-            data: productions,
-            pagination: {
-              page,
-              limit,
-              total,
-              pages: Math.ceil(total / limit),
-              hasNext: page < Math.ceil(total / limit),
-              hasPrev: page > 1
-            }
-          })
+          body: JSON.stringify({ error: 'Production non trouvée' })
         };
       }
 
-    } else if (method === 'POST') {
-      // Création d'une nouvelle production
-      const body = JSON.parse(event.body);
-      const {
-        client_id,
-        demandeur_id,
-        titre,
-        description,
-        priorite = 'normale',
-        date_livraison_prevue
-      } = body;
-
-      // Validation des champs requis
-      if (!client_id || !titre) {
-        return {
-          statusCode: 400,
-          headers,
-          body: JSON.stringify({ error: 'Client et titre requis' })
-        };
-      }
+      // Récupération des tâches associées
+      const tachesQuery = `
+        SELECT * FROM production_taches 
+        WHERE production_id = $1 
+        ORDER BY ordre_tache ASC
+      `;
+      const taches = await sql(tachesQuery, [productionId]);
+
+      // Formatage du résultat unique
+      const production = {
+        ...result[0],
+        client_display: formatClientDisplay({
+          nom_societe: result[0].nom_societe,
+          nom: result[0].client_nom,
+          prenom: result[0].client_prenom
+        }),
+        taches: taches
+      };
 
-      // Détermination du demandeur et de la société
-      let finalDemandeurId = demandeur_id;
-      let societeId;
-      
+      return {
+        statusCode: 200,
+        headers,
+        body: JSON.stringify(production)
+      };
+
+    } else {
+      // Récupération de la liste des productions
+      const { queryStringParameters } = event;
+      const { page, limit, count } = parsePagination(queryStringParameters || {});
+      const status = queryStringParameters?.status;
+      const clientId = queryStringParameters?.client;
+      const search = queryStringParameters?.search;
+
+      const projection = await parseFields(sql, queryStringParameters?.fields, {
+        table: 'productions',
+        alias: 'p',
+        joined: LIST_JOINED_COLUMNS,
+        computed: { client_display: ['nom_societe', 'client_nom', 'client_prenom'] }
+      });
+      const selectColumns = projection ? projection.select : selectAll('p', LIST_JOINED_COLUMNS);
+
+      let fromClause = `
+        FROM productions p
+        LEFT JOIN clients c ON p.client_id = c.id
+        LEFT JOIN demandeurs d ON p.demandeur_id = d.id
+        LEFT JOIN demandeurs_societe ds ON p.societe_id = ds.id
+        LEFT JOIN (
+          SELECT 
+            production_id,
+            COUNT(CASE WHEN status != 'hors_scope' THEN 1 END) as total_in_scope,
+            COUNT(CASE WHEN status = 'termine' THEN 1 END) as termine
+          FROM production_taches
+          GROUP BY production_id
+        ) pt_stats ON p.id = pt_stats.production_id
+        WHERE 1=1
+      `;
+
+      let queryParams = [];
+      let paramCount = 0;
+
+      // Filtrage par utilisateur selon le type
       if ((decoded.type_utilisateur || decoded.type) === 'demandeur') {
-        // Pour les demandeurs, utiliser leur propre ID et récupérer leur société
-        finalDemandeurId = decoded.id;
+        // Pour les demandeurs, utiliser societe_id pour voir toutes les productions de la société
         const demandeur = await sql`
           SELECT societe_id FROM demandeurs WHERE id = ${decoded.id}
         `;
         
-        if (demandeur.length === 0 || !demandeur[0].societe_id) {
+        if (demandeur.length === 0) {
           return {
-            statusCode: 400,
+            statusCode: 404,
             headers,
-            body: JSON.stringify({ error: 'Demandeur non trouvé ou sans société associée' })
+            body: JSON.stringify({ error: 'Utilisateur non trouvé' })
           };
         }
-        societeId = demandeur[0].societe_id;
-      } else if ((decoded.type_utilisateur || decoded.type) === 'agent') {
-        // Pour les agents, ils doivent spécifier un demandeur_id
-        if (!demandeur_id) {
-          return {
-            statusCode: 400,
-            headers,
-            body: JSON.stringify({ error: 'Un agent doit spécifier un demandeur pour la production' })
-          };
+
+        if (demandeur[0].societe_id) {
+          // Filtrer par société
+          paramCount++;
+          fromClause += ` AND p.societe_id = $${paramCount}`;
+          queryParams.push(demandeur[0].societe_id);
+        } else {
+          // Si pas de société, voir seulement ses propres productions
+          paramCount++;
+          fromClause += ` AND p.demandeur_id = $${paramCount}`;
+          queryParams.push(decoded.id);
         }
-        
-        // Récupérer la société du demandeur spécifié
-        const demandeur = await sql`
-          SELECT societe_id FROM demandeurs WHERE id = ${demandeur_id}
-        `;
-        
-        if (demandeur.length === 0 || !demandeur[0].societe_id) {
-          return {
-            statusCode: 400,
-            headers,
-            body: JSON.stringify({ error: 'Demandeur spécifié non trouvé ou sans société associée' })
-          };
+      }
+
+      // Filtrage par statut
+      if (status) {
+        paramCount++;
+        if (status.includes(',')) {
+          // Statuts multiples séparés par virgule
+          const statuses = status.split(',').map(s => s.trim());
+          const placeholders = statuses.map((_, index) => `$${paramCount + index}`).join(', ');
+          fromClause += ` AND p.status IN (${placeholders})`;
+          queryParams.push(...statuses);
+          paramCount += statuses.length - 1; // -1 car on a déjà incrémenté paramCount
+        } else {
+          // Statut unique
+          fromClause += ` AND p.status = $${paramCount}`;
+          queryParams.push(status);
         }
-        societeId = demandeur[0].societe_id;
       }
 
-      // Insertion de la production
-      const insertQuery = `
-        INSERT INTO productions (
-          client_id, demandeur_id, societe_id, titre, description, priorite, 
-          date_livraison_prevue, created_by
-        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-        RETURNING *
-      `;
+      // Filtrage par client
+      if (clientId) {
+        paramCount++;
+        fromClause += ` AND p.client_id = $${paramCount}`;
+        queryParams.push(clientId);
+      }
 
-      const result = await sql(insertQuery, [
-        client_id,
-        finalDemandeurId,
-        societeId,
-        titre,
-        description,
-        priorite,
-        date_livraison_prevue,
-        decoded.id
-      ]);
-
-      const newProduction = result[0];
-
-      // Récupération des informations complètes pour l'email
-      const detailQuery = `
-        SELECT 
-          p.*,
-          c.nom_societe,
-          c.nom as client_nom,
-          c.prenom as client_prenom,
-          d.nom as demandeur_nom,
-          d.prenom as demandeur_prenom,
-          d.email as demandeur_email,
-          ds.nom_societe as societe_nom
-        FROM productions p
-        LEFT JOIN clients c ON p.client_id = c.id
-        LEFT JOIN demandeurs d ON p.demandeur_id = d.id
-        LEFT JOIN demandeurs_societe ds ON p.societe_id = ds.id
-        WHERE p.id = $1
-      `;
+      // Recherche par numéro de production
+      if (search) {
+        paramCount++;
+        fromClause += ` AND p.numero_production ILIKE $${paramCount}`;
+        queryParams.push(`%${search}%`);
+      }
 
-      const detailResult = await sql(detailQuery, [newProduction.id]);
-      const productionDetail = detailResult[0];
+      // Page et total en une seule requête
+      const { rows: result, pagination } = await paginatedQuery(sql, {
+        select: selectColumns,
+        from: fromClause,
+        params: queryParams,
+        orderBy: 'p.date_creation DESC',
+        page,
+        limit,
+        count
+      });
+
+      // Formatage des résultats
+      const productions = pickFields(result.map(row => ({
+        ...row,
+        client_display: formatClientDisplay({
+          nom_societe: row.nom_societe,
+          nom: row.client_nom,
+          prenom: row.client_prenom
+        })
+      })), projection);
 
-      // Envoi d'email de notification
-      try {
-        const emailService = loadEmailService();
-        if (emailService) {
-          // Utiliser une fonction d'email similaire aux portabilités
-          await emailService.sendProductionCreationEmail(productionDetail);
-        }
-      } catch (emailError) {
-        console.error('Erreur envoi email:', emailError);
-        // Ne pas faire échouer la création pour un problème d'email
-      }
+      return {
+        statusCode: 200,
+        headers,
+        body: JSON.stringify({
+          data: productions,
+          pagination
+        })
+      };
+    }
 
+  } else if (method === 'POST') {
+    // Création d'une nouvelle production
+    const body = JSON.parse(event.body);
+    const {
+      client_id,
+      demandeur_id,
+      titre,
+      description,
+      priorite = 'normale',
+      date_livraison_prevue
+    } = body;
+
+    // Validation des champs requis
+    if (!client_id || !titre) {
       return {
-        statusCode: 201,
+        statusCode: 400,
         headers,
-        body: JSON.stringify(newProduction)
+        body: JSON.stringify({ error: 'Client et titre requis' })
       };
+    }
 
-    } else if (method === 'PUT') {
-      // Mise à jour d'une production
-      const body = JSON.parse(event.body);
-      const {
-        client_id,
-        status,
-        titre,
-        description,
-        priorite,
-        date_livraison_prevue,
-        assigned_to
-      } = body;
-
-      // Récupération du statut actuel
-      const currentQuery = `SELECT * FROM productions WHERE id = $1`;
-      const currentResult = await sql(currentQuery, [productionId]);
+    // Détermination du demandeur et de la société
+    let finalDemandeurId = demandeur_id;
+    let societeId;
+    
+    if ((decoded.type_utilisateur || decoded.type) === 'demandeur') {
+      // Pour les demandeurs, utiliser leur propre ID et récupérer leur société
+      finalDemandeurId = decoded.id;
+      const demandeur = await sql`
+        SELECT societe_id FROM demandeurs WHERE id = ${decoded.id}
+      `;
       
-      if (currentResult.length === 0) {
+      if (demandeur.length === 0 || !demandeur[0].societe_id) {
         return {
-          statusCode: 404,
+          statusCode: 400,
           headers,
-          body: JSON.stringify({ error: 'Production non trouvée' })
+          body: JSON.stringify({ error: 'Demandeur non trouvé ou sans société associée' })
         };
       }
-
-      const currentProduction = currentResult[0];
-
-      // Mise à jour
-      const updateQuery = `
-        UPDATE productions SET
-          client_id = COALESCE($1, client_id),
-          status = COALESCE($2, status),
-          titre = COALESCE($3, titre),
-          description = COALESCE($4, description),
-          priorite = COALESCE($5, priorite),
-          date_livraison_prevue = COALESCE($6, date_livraison_prevue),
-          assigned_to = COALESCE($7, assigned_to),
-          date_modification = CURRENT_TIMESTAMP
-        WHERE id = $8
-        RETURNING *
+      societeId = demandeur[0].societe_id;
+    } else if ((decoded.type_utilisateur || decoded.type) === 'agent') {
+      // Pour les agents, ils doivent spécifier un demandeur_id
+      if (!demandeur_id) {
+        return {
+          statusCode: 400,
+          headers,
+          body: JSON.stringify({ error: 'Un agent doit spécifier un demandeur pour la production' })
+        };
+      }
+      
+      // Récupérer la société du demandeur spécifié
+      const demandeur = await sql`
+        SELECT societe_id FROM demandeurs WHERE id = ${demandeur_id}
       `;
+      
+      if (demandeur.length === 0 || !demandeur[0].societe_id) {
+        return {
+          statusCode: 400,
+          headers,
+          body: JSON.stringify({ error: 'Demandeur spécifié non trouvé ou sans société associée' })
+        };
+      }
+      societeId = demandeur[0].societe_id;
+    }
 
-      const result = await sql(updateQuery, [
-        client_id,
-        status,
-        titre,
-        description,
-        priorite,
-        date_livraison_prevue,
-        assigned_to,
-        productionId
-      ]);
-
-      const updatedProduction = result[0];
-
-      // Si le statut a changé, envoyer un email
-      if (status && status !== currentProduction.status) {
-        try {
-          const emailService = loadEmailService();
-          if (emailService) {
-            const detailQuery = `
-              SELECT 
-                p.*,
-                c.nom_societe,
-                c.nom as client_nom,
-                c.prenom as client_prenom,
-                d.nom as demandeur_nom,
-                d.prenom as demandeur_prenom,
-                d.email as demandeur_email,
-                ds.nom_societe as societe_nom
-              FROM productions p
-              LEFT JOIN clients c ON p.client_id = c.id
-              LEFT JOIN demandeurs d ON p.demandeur_id = d.id
-              LEFT JOIN demandeurs_societe ds ON p.societe_id = ds.id
-              WHERE p.id = $1
-            `;
-
-            const detailResult = await sql(detailQuery, [productionId]);
-            const productionDetail = detailResult[0];
-
-            // Récupérer les informations de l'auteur depuis la base de données
-            let authorInfo = { prenom: 'Utilisateur', nom: 'inconnu' };
-            if ((decoded.type_utilisateur || decoded.type) === 'agent') {
-              const agentInfo = await sql`SELECT nom, prenom FROM agents WHERE id = ${decoded.id}`;
-              if (agentInfo.length > 0) {
-                authorInfo = agentInfo[0];
-              }
-            } else if ((decoded.type_utilisateur || decoded.type) === 'demandeur') {
-              const demandeurInfo = await sql`SELECT nom, prenom FROM demandeurs WHERE id = ${decoded.id}`;
-              if (demandeurInfo.length > 0) {
-                authorInfo = demandeurInfo[0];
-              }
-            }
-
-            // Déterminer le nom du client
-            const clientName = productionDetail.nom_societe || 
-                             (productionDetail.client_nom ? 
-                               `${productionDetail.client_nom} ${productionDetail.client_prenom || ''}`.trim() : 
-                               'N/A');
-
-            await emailService.sendProductionStatusChangeEmail(
-              productionDetail, 
-              currentProduction.status, 
-              status,
-              authorInfo,
-              productionDetail.demandeur_email,
-              `${productionDetail.demandeur_prenom || ''} ${productionDetail.demandeur_nom || ''}`.trim(),
-              clientName
-            );
-          }
-        } catch (emailError) {
-          console.error('Erreur envoi email:', emailError);
-          // Ne pas faire échouer la mise à jour pour un problème d'email
-        }
+    // Insertion de la production
+    const insertQuery = `
+      INSERT INTO productions (
+        client_id, demandeur_id, societe_id, titre, description, priorite, 
+        date_livraison_prevue, created_by
+      ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+      RETURNING *
+    `;
+
+    const result = await sql(insertQuery, [
+      client_id,
+      finalDemandeurId,
+      societeId,
+      titre,
+      description,
+      priorite,
+      date_livraison_prevue,
+      decoded.id
+    ]);
+
+    const newProduction = result[0];
+
+    // Récupération des informations complètes pour l'email
+    const detailQuery = `
+      SELECT 
+        p.*,
+        c.nom_societe,
+        c.nom as client_nom,
+        c.prenom as client_prenom,
+        d.nom as demandeur_nom,
+        d.prenom as demandeur_prenom,
+        d.email as demandeur_email,
+        ds.nom_societe as societe_nom
+      FROM productions p
+      LEFT JOIN clients c ON p.client_id = c.id
+      LEFT JOIN demandeurs d ON p.demandeur_id = d.id
+      LEFT JOIN demandeurs_societe ds ON p.societe_id = ds.id
+      WHERE p.id = $1
+    `;
+
+    const detailResult = await sql(detailQuery, [newProduction.id]);
+    const productionDetail = detailResult[0];
+
+    // Envoi d'email de notification
+    try {
+      const emailService = loadEmailService();
+      if (emailService) {
+        // Utiliser une fonction d'email similaire aux portabilités
+        await timed('email', () => emailService.sendProductionCreationEmail(productionDetail));
       }
+    } catch (emailError) {
+      console.error('Erreur envoi email:', emailError);
+      // Ne pas faire échouer la création pour un problème d'email
+    }
+
+    return {
+      statusCode: 201,
+      headers,
+      body: JSON.stringify(newProduction)
+    };
 
+  } else if (method === 'PUT') {
+    // Mise à jour d'une production
+    const body = JSON.parse(event.body);
+    const {
+      client_id,
+      status,
+      titre,
+      description,
+      priorite,
+      date_livraison_prevue,
+      assigned_to
+    } = body;
+
+    // Récupération du statut actuel
+    const currentQuery = `SELECT * FROM productions WHERE id = $1`;
+    const currentResult = await sql(currentQuery, [productionId]);
+    
+    if (currentResult.length === 0) {
       return {
-        statusCode: 200,
+        statusCode: 404,
         headers,
-        body: JSON.stringify(updatedProduction)
+        body: JSON.stringify({ error: 'Production non trouvée' })
       };
+    }
 
-    } else if (method === 'DELETE') {
-      // Suppression d'une production (agents uniquement)
-      if ((decoded.type_utilisateur || decoded.type) !== 'agent') {
-        return {
-          statusCode: 403,
-          headers,
-          body: JSON.stringify({ error: 'Accès interdit' })
-        };
-      }
-
-      const deleteQuery = `DELETE FROM productions WHERE id = $1 RETURNING *`;
-      const result = await sql(deleteQuery, [productionId]);
+    const currentProduction = currentResult[0];
+
+    // Mise à jour
+    const updateQuery = `
+      UPDATE productions SET
+        client_id = COALESCE($1, client_id),
+        status = COALESCE($2, status),
+        titre = COALESCE($3, titre),
+        description = COALESCE($4, description),
+        priorite = COALESCE($5, priorite),
+        date_livraison_prevue = COALESCE($6, date_livraison_prevue),
+        assigned_to = COALESCE($7, assigned_to),
+        date_modification = CURRENT_TIMESTAMP
+      WHERE id = $8
+      RETURNING *
+    `;
+
+    const result = await sql(updateQuery, [
+      client_id,
+      status,
+      titre,
+      description,
+      priorite,
+      date_livraison_prevue,
+      assigned_to,
+      productionId
+    ]);
+
+    const updatedProduction = result[0];
+
+    // Si le statut a changé, envoyer un email
+    if (status && status !== currentProduction.status) {
+      try {
+        const emailService = loadEmailService();
+        if (emailService) {
+          const detailQuery = `
+            SELECT 
+              p.*,
+              c.nom_societe,
+              c.nom as client_nom,
+              c.prenom as client_prenom,
+              d.nom as demandeur_nom,
+              d.prenom as demandeur_prenom,
+              d.email as demandeur_email,
+              ds.nom_societe as societe_nom
+            FROM productions p
+            LEFT JOIN clients c ON p.client_id = c.id
+            LEFT JOIN demandeurs d ON p.demandeur_id = d.id
+            LEFT JOIN demandeurs_societe ds ON p.societe_id = ds.id
+            WHERE p.id = $1
+          `;
 
-      if (result.length === 0) {
-        return {
-          statusCode: 404,
-          headers,
-          body: JSON.stringify({ error: 'Production non trouvée' })
-        };
+          const detailResult = await sql(detailQuery, [productionId]);
+          const productionDetail = detailResult[0];
+
+          // Récupérer les informations de l'auteur depuis la base de données
+          const authorInfo = await identities.authorInfo(decoded);
+
+          // Déterminer le nom du client
+          const clientName = productionDetail.nom_societe || 
+                           (productionDetail.client_nom ? 
+                             `${productionDetail.client_nom} ${productionDetail.client_prenom || ''}`.trim() : 
+                             'N/A');
+
+          await timed('email', () => emailService.sendProductionStatusChangeEmail(
+            productionDetail, 
+            currentProduction.status, 
+            status,
+            authorInfo,
+            productionDetail.demandeur_email,
+            `${productionDetail.demandeur_prenom || ''} ${productionDetail.demandeur_nom || ''}`.trim(),
+            clientName
+          ));
+        }
+      } catch (emailError) {
+        console.error('Erreur envoi email:', emailError);
+        // Ne pas faire échouer la mise à jour pour un problème d'email
       }
+    }
 
+    return {
+      statusCode: 200,
+      headers,
+      body: JSON.stringify(updatedProduction)
+    };
+
+  } else if (method === 'DELETE') {
+    // Suppression d'une production (agents uniquement)
+    if ((decoded.type_utilisateur || decoded.type) !== 'agent') {
       return {
-        statusCode: 200,
+        statusCode: 403,
         headers,
-        body: JSON.stringify({ message: 'Production supprimée avec succès' })
+        body: JSON.stringify({ error: 'Accès interdit' })
       };
+    }
 
-    } else {
+    const deleteQuery = `DELETE FROM productions WHERE id = $1 RETURNING *`;
+    const result = await sql(deleteQuery, [productionId]);
+
+    if (result.length === 0) {
       return {
-        statusCode: 405,
+        statusCode: 404,
         headers,
-        body: JSON.stringify({ error: 'Méthode non autorisée' })
+        body: JSON.stringify({ error: 'Production non trouvée' })
       };
     }
 
-  } catch (error) {
-    console.error('Erreur:', error);
     return {
-      statusCode: 500,
+      statusCode: 200,
+      headers,
+      body: JSON.stringify({ message: 'Production supprimée avec succès' })
+    };
+
+  } else {
+    return {
+      statusCode: 405,
       headers,
-      body: JSON.stringify({ error: 'Erreur interne du serveur: ' + error.message })
+      body: JSON.stringify({ error: 'Méthode non autorisée' })
     };
   }
-};
\ No newline at end of file
+});
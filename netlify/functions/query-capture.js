@@ -0,0 +1,126 @@
+const fs = require('fs');
+const crypto = require('crypto');
+
+// Capture des requêtes SQL lentes pour les rejouer avec slow_query_replay.py (EXPLAIN ANALYZE sur un
+// instantané local). Activée par QUERY_CAPTURE_MS : chaque requête attendue plus longtemps que ce seuil
+// pendant une requête HTTP est écrite en enregistrement 'slow_query' (texte, paramètres expurgés, durée),
+// dans les logs de la fonction et, si QUERY_CAPTURE_FILE est défini (serveur local), dans ce fichier JSON-lines.
+//
+// Les paramètres sont expurgés : seuls les identifiants (UUID), nombres, booléens, dates, les valeurs
+// d'énumération connues (statuts, types, priorités) et les noms listés dans QUERY_CAPTURE_KEEP (colonnes
+// de tri, par exemple) sont conservés ; toute autre chaîne, même courte ou numérique (code postal, numéro),
+// est remplacée par sa forme ({ $redacted: 'text' | 'digits', length, like }) pour que le rejeu garde le même plan.
+
+// Seuil de capture (ms) ; absent = capture désactivée, 0 = toutes les requêtes
+const QUERY_CAPTURE_MS = process.env.QUERY_CAPTURE_MS ? parseFloat(process.env.QUERY_CAPTURE_MS) : null;
+
+// Fichier JSON-lines où ajouter les requêtes capturées (en plus des logs)
+const QUERY_CAPTURE_FILE = process.env.QUERY_CAPTURE_FILE || null;
+
+// Valeurs des contraintes CHECK du schéma (statuts, priorités, types d'auteur et d'action, sources)
+const ENUM_VALUES = [
+  'nouveau', 'en_cours', 'en_attente', 'repondu', 'resolu', 'ferme', 'bloque', 'rejete', 'demande', 'valide',
+  'termine', 'annule', 'a_faire', 'hors_scope', 'attente_installation',
+  'basse', 'normale', 'haute', 'urgente',
+  'agent', 'demandeur', 'login', 'logout', 'found', 'not_found',
+  'ticket', 'portabilite', 'production', 'INSERT', 'UPDATE', 'DELETE',
+  'commentaire', 'status_change', 'file_upload', 'file_delete',
+  'asc', 'desc', 'ASC', 'DESC'
+];
+
+// Autres valeurs conservées telles quelles (colonnes ou tables passées en paramètre), séparées par des virgules
+const KEPT_VALUES = new Set([
+  ...ENUM_VALUES,
+  ...(process.env.QUERY_CAPTURE_KEEP || '').split(',').map(value => value.trim()).filter(Boolean)
+]);
+
+const UUID = /^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$/i;
+const ISO_DATE = /^\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?$/;
+const DIGITS = /^\d+$/;
+const EMAIL = /@/;
+
+const captureEnabled = (duration) => QUERY_CAPTURE_MS !== null && duration >= QUERY_CAPTURE_MS;
+
+// Texte et paramètres d'un appel sql : gabarit sql`... ${valeur}` ou sql(texte, paramètres)
+const describeQuery = (args) => {
+  const [first, ...rest] = args;
+  if (Array.isArray(first) && first.raw) {
+    return {
+      text: first.reduce((text, part, index) => text + part + (index < rest.length ? `$${index + 1}` : ''), ''),
+      params: rest
+    };
+  }
+  return { text: String(first), params: rest[0] || [] };
+};
+
+const redactString = (value) => {
+  if (KEPT_VALUES.has(value) || UUID.test(value) || ISO_DATE.test(value)) {
+    return value;
+  }
+  if (EMAIL.test(value)) {
+    return { $redacted: 'email', length: value.length };
+  }
+  // Chiffres seuls (SIRET, code postal, numéro) : rejoués en chiffres, les casts ::int restent valides
+  if (DIGITS.test(value)) {
+    return { $redacted: 'digits', length: value.length };
+  }
+  // Motifs ILIKE : la position des jokers change le plan (index trigramme, préfixe), elle est gardée
+  const like = value.length > 1 && value.startsWith('%') && value.endsWith('%') ? 'both'
+    : value.startsWith('%') ? 'suffix'
+      : value.endsWith('%') ? 'prefix'
+        : undefined;
+  return { $redacted: 'text', length: value.length, ...(like ? { like } : {}) };
+};
+
+const redactValue = (value) => {
+  if (value === null || value === undefined || typeof value === 'number' || typeof value === 'boolean') {
+    return value === undefined ? null : value;
+  }
+  if (typeof value === 'bigint') return value.toString();
+  if (value instanceof Date) return value.toISOString();
+  if (typeof value === 'string') return redactString(value);
+  if (Buffer.isBuffer(value) || value instanceof Uint8Array) return { $redacted: 'bytes', length: value.length };
+  if (Array.isArray(value)) return value.map(redactValue);
+  return { $redacted: 'json' };
+};
+
+const redactParams = (params) => (Array.isArray(params) ? params.map(redactValue) : []);
+
+const queryId = (query) => crypto.createHash('sha1').update(query).digest('hex').slice(0, 12);
+
+// Écrit l'enregistrement d'une requête lente ; request = { log, name, method, path } de la requête en cours
+const captureQuery = (request, args, duration, failed) => {
+  try {
+    const { text, params } = describeQuery(args);
+    const query = text.replace(/\s+/g, ' ').trim();
+    const record = {
+      query_id: queryId(query),
+      query,
+      params: redactParams(params),
+      duration_ms: duration,
+      ...(failed ? { failed: true } : {})
+    };
+    request.log.slow(record, 'slow_query');
+    if (QUERY_CAPTURE_FILE) {
+      fs.appendFileSync(QUERY_CAPTURE_FILE, JSON.stringify({
+        msg: 'slow_query',
+        fn: request.name,
+        method: request.method,
+        path: request.path,
+        ...record,
+        ts: new Date().toISOString()
+      }) + '\n');
+    }
+  } catch (error) {
+    // La capture ne doit jamais faire échouer la requête
+    console.error('Capture de requête lente impossible:', error.message);
+  }
+};
+
+module.exports = {
+  QUERY_CAPTURE_MS,
+  captureEnabled,
+  describeQuery,
+  redactParams,
+  captureQuery
+};
@@ -0,0 +1,407 @@
+const zlib = require('zlib');
+const { AsyncLocalStorage } = require('async_hooks');
+const { performance } = require('perf_hooks');
+const jwt = require('jsonwebtoken');
+const { readVersions, buildEtag, matchesEtag } = require('./change-counters');
+const { createLogger } = require('./logger');
+const { captureEnabled, captureQuery } = require('./query-capture');
+
+// Pipeline commun des fonctions Netlify : CORS, authentification JWT, routage et gestion des erreurs
+
+const JWT_SECRET = process.env.JWT_SECRET || 'dev-secret-key';
+
+// Taille du cache des tokens décodés (par instance chaude)
+const TOKEN_CACHE_SIZE = parseInt(process.env.TOKEN_CACHE_SIZE || '500', 10);
+
+// Durée au-delà de laquelle une requête est journalisée comme lente (ms)
+const SLOW_REQUEST_MS = parseInt(process.env.SLOW_REQUEST_MS || '1000', 10);
+
+// Taille à partir de laquelle les réponses sont compressées (gzip / brotli, octets) ; 0 = désactivée
+const COMPRESSION_MIN_BYTES = parseInt(process.env.COMPRESSION_MIN_BYTES || '1024', 10);
+
+// En-tête Server-Timing (phases et requêtes SQL de chaque réponse) ; SERVER_TIMING=off pour le retirer
+const SERVER_TIMING = process.env.SERVER_TIMING !== 'off';
+
+const corsHeaders = (methods = 'GET, POST, PUT, DELETE, OPTIONS') => ({
+  'Access-Control-Allow-Origin': '*',
+  'Access-Control-Allow-Headers': 'Content-Type, Authorization, If-None-Match, Last-Event-ID',
+  'Access-Control-Allow-Methods': methods,
+  'Access-Control-Expose-Headers': 'ETag, X-Has-More, X-Max-Rows, Server-Timing',
+  'Content-Type': 'application/json',
+});
+
+const headers = corsHeaders();
+
+// Erreur HTTP levée par les handlers et convertie en réponse par le pipeline
+class HttpError extends Error {
+  constructor(statusCode, detail) {
+    super(detail);
+    this.name = 'HttpError';
+    this.statusCode = statusCode;
+  }
+}
+
+// Cache LRU des tokens : Map conserve l'ordre d'insertion, la plus ancienne entrée est évincée
+const tokenCache = new Map();
+
+const verifyToken = (authHeader) => {
+  if (!authHeader || !authHeader.startsWith('Bearer ')) {
+    throw new HttpError(401, 'Token manquant');
+  }
+
+  const token = authHeader.substring(7);
+  const cached = tokenCache.get(token);
+  if (cached) {
+    if (!cached.exp || cached.exp * 1000 > Date.now()) {
+      tokenCache.delete(token);
+      tokenCache.set(token, cached);
+      return cached;
+    }
+    tokenCache.delete(token);
+  }
+
+  const decoded = jwt.verify(token, JWT_SECRET);
+  tokenCache.set(token, decoded);
+  if (tokenCache.size > TOKEN_CACHE_SIZE) {
+    tokenCache.delete(tokenCache.keys().next().value);
+  }
+  return decoded;
+};
+
+// Compile un motif de route ('/:id', '/:id/fichiers', '/:id?') en expression régulière
+// ancrée sur /api/<name> ou /.netlify/functions/<name>
+const compileRoute = (name, pattern = '') => {
+  const keys = [];
+  const source = pattern
+    .split('/')
+    .filter(Boolean)
+    .map(segment => {
+      if (segment.startsWith(':')) {
+        const optional = segment.endsWith('?');
+        keys.push(segment.slice(1, optional ? -1 : undefined));
+        return optional ? '(?:/([^/]+))?' : '/([^/]+)';
+      }
+      return '/' + segment.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
+    })
+    .join('');
+
+  const regex = new RegExp(`^(?:/\\.netlify/functions|/api)/${name}${source}/?$`);
+  return (path) => {
+    const match = regex.exec(path || '');
+    if (!match) return null;
+    const params = {};
+    keys.forEach((key, index) => {
+      if (match[index + 1] !== undefined) {
+        params[key] = decodeURIComponent(match[index + 1]);
+      }
+    });
+    return params;
+  };
+};
+
+const parseBody = (event) => {
+  if (!event.body) return {};
+  try {
+    return JSON.parse(event.body);
+  } catch (error) {
+    throw new HttpError(400, 'Corps de requête JSON invalide');
+  }
+};
+
+const toErrorResponse = (error, responseHeaders) => {
+  if (error instanceof HttpError) {
+    return { statusCode: error.statusCode, headers: responseHeaders, body: JSON.stringify({ detail: error.message }) };
+  }
+  if (error.name === 'TokenExpiredError') {
+    return { statusCode: 401, headers: responseHeaders, body: JSON.stringify({ detail: 'Token expiré' }) };
+  }
+  if (error.name === 'JsonWebTokenError') {
+    return { statusCode: 401, headers: responseHeaders, body: JSON.stringify({ detail: 'Token invalide' }) };
+  }
+  return {
+    statusCode: 500,
+    headers: responseHeaders,
+    body: JSON.stringify({ detail: 'Erreur serveur: ' + error.message })
+  };
+};
+
+// Encodage préféré parmi ceux acceptés par le client (Accept-Encoding, q=0 exclut)
+const negotiateEncoding = (acceptEncoding) => {
+  if (!acceptEncoding) return null;
+  const accepted = new Map(acceptEncoding.split(',').map(part => {
+    const [encoding, ...attributes] = part.trim().toLowerCase().split(';');
+    const quality = attributes.map(attribute => attribute.trim()).find(attribute => attribute.startsWith('q='));
+    return [encoding.trim(), quality ? parseFloat(quality.slice(2)) : 1];
+  }));
+  return ['br', 'gzip'].find(encoding => (accepted.get(encoding) ?? accepted.get('*') ?? 0) > 0) || null;
+};
+
+// Compresse le corps JSON ; l'ETag reçoit un suffixe par encodage (les représentations diffèrent)
+const compressResponse = (response, acceptEncoding) => {
+  // Les corps en flux (export) ne sont pas des chaînes et sont envoyés tels quels
+  if (COMPRESSION_MIN_BYTES <= 0 || typeof response.body !== 'string' || response.isBase64Encoded) return response;
+  if ((response.headers['Content-Type'] || '').startsWith('text/event-stream')) return response;
+
+  const size = Buffer.byteLength(response.body);
+  if (size < COMPRESSION_MIN_BYTES) return response;
+
+  const encoding = negotiateEncoding(acceptEncoding);
+  if (!encoding) {
+    return { ...response, headers: { ...response.headers, Vary: 'Accept-Encoding' } };
+  }
+
+  // Brotli qualité 5 : l'essentiel du gain de taille pour une fraction du temps CPU de la qualité 11
+  const compressed = encoding === 'br'
+    ? zlib.brotliCompressSync(response.body, {
+      params: {
+        [zlib.constants.BROTLI_PARAM_QUALITY]: 5,
+        [zlib.constants.BROTLI_PARAM_SIZE_HINT]: size
+      }
+    })
+    : zlib.gzipSync(response.body);
+
+  const responseHeaders = { ...response.headers, 'Content-Encoding': encoding, Vary: 'Accept-Encoding' };
+  if (responseHeaders.ETag) {
+    responseHeaders.ETag = responseHeaders.ETag.replace(/"$/, `-${encoding}"`);
+  }
+  return { ...response, headers: responseHeaders, body: compressed.toString('base64'), isBase64Encoded: true };
+};
+
+// Requête en cours ({ timings, log, name, method, path }), accessible hors du handler (services, helpers)
+// sans passer le contexte
+const currentRequest = new AsyncLocalStorage();
+
+const round = (duration) => Math.round(duration * 10) / 10;
+
+// Mesure une phase de la requête en cours ; sans requête en cours (tâche planifiée), exécute simplement fn
+const timed = async (label, fn) => {
+  const request = currentRequest.getStore();
+  if (!request) return fn();
+  const start = performance.now();
+  try {
+    return await fn();
+  } finally {
+    request.timings.push({ label, duration: round(performance.now() - start) });
+  }
+};
+
+// Chaque requête attendue est chronométrée au premier then (les requêtes Neon sont paresseuses) ;
+// au-delà de QUERY_CAPTURE_MS, son texte et ses paramètres expurgés sont capturés (query-capture.js)
+const timeQuery = (query, args) => {
+  if (!query || typeof query.then !== 'function') return query;
+  const then = query.then;
+  let started = false;
+  query.then = function (onFulfilled, onRejected) {
+    const request = currentRequest.getStore();
+    if (started || !request) return then.call(this, onFulfilled, onRejected);
+    started = true;
+    const start = performance.now();
+    const record = (failed) => {
+      const duration = round(performance.now() - start);
+      request.timings.push({ label: 'db', duration });
+      if (captureEnabled(duration)) captureQuery(request, args, duration, failed);
+    };
+    return then.call(this,
+      value => { record(false); return onFulfilled ? onFulfilled(value) : value; },
+      error => { record(true); if (onRejected) return onRejected(error); throw error; });
+  };
+  return query;
+};
+
+// sql instrumenté : mêmes appels (gabarit, sql(texte, paramètres), sql.transaction), durées ajoutées en 'db'
+const timedSql = (sql) => new Proxy(sql, {
+  apply: (target, thisArg, args) => timeQuery(Reflect.apply(target, thisArg, args), args)
+});
+
+// Server-Timing : une entrée par phase (durées cumulées, nombre d'occurrences en desc) et le total
+const serverTimingHeader = (timings, total) => {
+  const phases = new Map();
+  timings.forEach(({ label, duration }) => {
+    const name = label.replace(/[^A-Za-z0-9_.-]/g, '-');
+    const phase = phases.get(name) || { duration: 0, count: 0 };
+    phase.duration += duration;
+    phase.count += 1;
+    phases.set(name, phase);
+  });
+  return [...phases.entries()]
+    .map(([name, { duration, count }]) => `${name};dur=${round(duration)}${count > 1 ? `;desc="${count}"` : ''}`)
+    .concat(`total;dur=${round(total)}`)
+    .join(', ');
+};
+
+// Fin de requête commune : en-tête Server-Timing et journalisation (lente ou debug) avec les timings
+const finishRequest = (response, request, startedAt) => {
+  const { timings, log } = request;
+  const duration = round(performance.now() - startedAt);
+  if (SERVER_TIMING) {
+    response = {
+      ...response,
+      headers: { ...response.headers, 'Server-Timing': serverTimingHeader(timings, duration), 'Timing-Allow-Origin': '*' }
+    };
+  }
+
+  if (duration >= SLOW_REQUEST_MS) {
+    log.slow({ status: response.statusCode, duration_ms: duration, timings });
+  } else {
+    log.debug('request', () => ({ status: response.statusCode, duration_ms: duration, timings }));
+  }
+
+  return response;
+};
+
+// Contexte d'une invocation : timings et logger propres, lus par timed() et timedSql() via AsyncLocalStorage
+const requestContext = (logger, name, event) => ({
+  timings: [],
+  log: logger.forRequest({ method: event.httpMethod, path: event.path }),
+  name,
+  method: event.httpMethod,
+  path: event.path
+});
+
+/**
+ * Instrumente un handler Netlify écrit sans createHandler (CORS, auth et erreurs restent à sa charge) :
+ * son sql doit passer par timedSql. La réponse reçoit le même en-tête Server-Timing (phase handler,
+ * requêtes db, total) et les requêtes lentes sont journalisées et capturées comme dans le pipeline.
+ */
+const withServerTiming = (name, handler) => {
+  const logger = createLogger(name);
+  return (event, context) => {
+    const request = requestContext(logger, name, event);
+    return currentRequest.run(request, async () => {
+      const startedAt = performance.now();
+      const response = await timed('handler', () => handler(event, context));
+      if (!response || event.httpMethod === 'OPTIONS') return response;
+      return finishRequest({ ...response, headers: response.headers || {} }, request, startedAt);
+    });
+  };
+};
+
+/**
+ * Crée un handler Netlify.
+ *
+ * options :
+ *  - name : nom de la fonction (segment d'URL), ex. 'tickets'
+ *  - methods : méthodes annoncées en CORS
+ *  - auth : vérifier le JWT (défaut true)
+ *  - path : motif des paramètres d'URL (défaut '/:id?')
+ *  - routes : [{ method, path, handler }] ; sinon `handler` reçoit toutes les méthodes
+ *  - etag : tables dont dépendent les GET (ex. ['tickets', 'clients']) ; un ETag fort est calculé
+ *           depuis change_counters et un If-None-Match identique renvoie 304 sans exécuter le handler ;
+ *           un handler renvoyant Cache-Control: no-store n'en reçoit pas
+ *
+ * Les réponses de plus de COMPRESSION_MIN_BYTES sont compressées selon Accept-Encoding (brotli ou gzip).
+ * L'en-tête Server-Timing reprend les phases mesurées (auth, etag, handler, db via timedSql, timed(...)) et le total.
+ * Les requêtes timedSql plus longues que QUERY_CAPTURE_MS sont capturées pour slow_query_replay.py (query-capture.js).
+ *
+ * Le handler reçoit un contexte { event, context, decoded, userType, userId, params, query, body(), headers, timings, log }
+ * et retourne une réponse Netlify ; les en-têtes CORS sont ajoutés s'ils sont absents.
+ * `log` est un logger structuré (logger.js) propre à la requête : échantillonnage décidé une fois par requête.
+ */
+const createHandler = (options, handler) => {
+  const { name, methods, auth = true, path = '/:id?', etag: etagScopes } = options;
+  const responseHeaders = corsHeaders(methods);
+  const logger = createLogger(name);
+  const matchDefault = compileRoute(name, path);
+  const routes = (options.routes || []).map(route => ({
+    method: route.method,
+    match: compileRoute(name, route.path),
+    handler: route.handler
+  }));
+
+  const handle = async (event, context, request) => {
+    const startedAt = performance.now();
+    const { timings, log } = request;
+    const time = timed;
+
+    if (event.httpMethod === 'OPTIONS') {
+      return { statusCode: 200, headers: responseHeaders };
+    }
+
+    let response;
+    try {
+      let decoded = null;
+      if (auth) {
+        const authHeader = event.headers.authorization || event.headers.Authorization;
+        decoded = await time('auth', () => verifyToken(authHeader));
+      }
+
+      let routeHandler = handler;
+      let params = matchDefault(event.path) || {};
+      if (routes.length > 0) {
+        const candidates = routes
+          .map(route => ({ route, params: route.match(event.path) }))
+          .filter(candidate => candidate.params);
+        const selected = candidates.find(candidate => candidate.route.method === event.httpMethod);
+        if (!selected) {
+          throw new HttpError(candidates.length > 0 ? 405 : 404, candidates.length > 0 ? 'Method not allowed' : 'Route non trouvée');
+        }
+        routeHandler = selected.route.handler;
+        params = selected.params;
+      }
+
+      let parsedBody;
+      const ctx = {
+        event,
+        context,
+        decoded,
+        userType: decoded ? (decoded.type_utilisateur || decoded.type) : null,
+        userId: decoded ? decoded.id : null,
+        params,
+        query: event.queryStringParameters || {},
+        body: () => (parsedBody === undefined ? (parsedBody = parseBody(event)) : parsedBody),
+        headers: responseHeaders,
+        timings,
+        time,
+        log
+      };
+
+      // GET conditionnel : une lecture des compteurs suffit si rien n'a changé
+      let etag = null;
+      if (etagScopes && event.httpMethod === 'GET') {
+        const versions = await time('etag', () => readVersions(etagScopes));
+        if (versions) {
+          etag = buildEtag(versions, { userId: ctx.userId, userType: ctx.userType, path: event.path, query: ctx.query });
+          const ifNoneMatch = event.headers['if-none-match'] || event.headers['If-None-Match'];
+          if (matchesEtag(ifNoneMatch, etag)) {
+            response = { statusCode: 304, headers: { ...responseHeaders, ETag: etag, 'Cache-Control': 'private, no-cache' } };
+          }
+        }
+      }
+
+      if (!response) {
+        response = await time('handler', () => routeHandler(ctx));
+        response = { ...response, headers: response.headers || responseHeaders };
+        // Une réponse en Cache-Control: no-store (données de secours, non issues de la base) n'a pas d'ETag
+        if (etag && response.statusCode === 200 && response.headers['Cache-Control'] !== 'no-store') {
+          response.headers = { ...response.headers, ETag: etag, 'Cache-Control': 'private, no-cache' };
+        }
+      }
+    } catch (error) {
+      if (!(error instanceof HttpError) && !['JsonWebTokenError', 'TokenExpiredError'].includes(error.name)) {
+        log.error('API error', { error });
+      }
+      response = toErrorResponse(error, responseHeaders);
+    }
+
+    response = await time('compress', () => compressResponse(response, event.headers['accept-encoding'] || event.headers['Accept-Encoding']));
+
+    return finishRequest(response, request, startedAt);
+  };
+
+  return (event, context) => {
+    const request = requestContext(logger, name, event);
+    return currentRequest.run(request, () => handle(event, context, request));
+  };
+};
+
+module.exports = {
+  headers,
+  corsHeaders,
+  HttpError,
+  verifyToken,
+  compileRoute,
+  createHandler,
+  withServerTiming,
+  timed,
+  timedSql
+};
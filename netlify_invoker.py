@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Netlify function invoker
+Keeps a pool of warm Node processes (netlify-invoker-worker.js) and calls exports.handler(event, context)
+of any function in netlify/functions with synthetic events over a JSON-lines pipe: no HTTP, no routing,
+no cold start after the first call of each function in a process.
+
+Usage:
+    python netlify_invoker.py call clients --method POST --body '{"nom_societe": "X"}' [--user agent]
+    python netlify_invoker.py bench clients [--method GET] [--path /api/clients] [--runs 200] [--workers 4]
+
+From Python:
+    with InvokerPool(size=2) as pool:
+        token = pool.token(agent_payload())
+        result = pool.invoke("clients", "POST", body={...}, token=token)
+        result.status_code, result.json()
+
+--local-db (or local_db=True) replaces @netlify/neon with the pg pool of dev-pg-neon.js on DATABASE_URL;
+without it the functions use NETLIFY_DATABASE_URL as in production.
+
+Each call waits at most --timeout seconds (timeout=...); a worker that does not answer in time is killed
+and replaced, and the call raises InvokerError.
+"""
+
+import argparse
+import base64
+import gzip
+import itertools
+import json
+import os
+import queue
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+WORKER_SCRIPT = os.path.join(ROOT, "netlify-invoker-worker.js")
+
+# Seconds to wait for a worker reply (start-up or call) before killing it; functions time out at 10 s on Netlify
+DEFAULT_TIMEOUT = 30
+
+
+class InvokerError(Exception):
+    """The worker could not run the handler (unknown function, exception thrown by the handler)"""
+
+
+class InvokeResult:
+    def __init__(self, response, duration_ms):
+        self.response = response or {}
+        self.duration_ms = duration_ms
+
+    @property
+    def status_code(self):
+        return self.response.get("statusCode")
+
+    @property
+    def headers(self):
+        return self.response.get("headers") or {}
+
+    @property
+    def text(self):
+        body = self.response.get("body")
+        if body is None:
+            return ""
+        if self.response.get("isBase64Encoded"):
+            # Corps binaires, ou compressés si l'événement envoie Accept-Encoding: gzip / br
+            raw = base64.b64decode(body)
+            encoding = self.headers.get("Content-Encoding")
+            if encoding == "gzip":
+                raw = gzip.decompress(raw)
+            elif encoding == "br":
+                try:
+                    import brotli
+                except ImportError:
+                    raise InvokerError("brotli response body: pip install brotli, or omit 'br' from Accept-Encoding")
+                raw = brotli.decompress(raw)
+            return raw.decode("utf-8", errors="replace")
+        return body
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def agent_payload(agent_id="00000000-0000-0000-0000-000000000001", email="admin@voipservices.fr"):
+    return {"sub": email, "id": agent_id, "type": "agent", "type_utilisateur": "agent"}
+
+
+def demandeur_payload(demandeur_id="00000000-0000-0000-0000-000000000002", email="sophie.martin@techcorp.fr"):
+    return {"sub": email, "id": demandeur_id, "type": "demandeur", "type_utilisateur": "demandeur"}
+
+
+def build_event(function, method="GET", path=None, query=None, body=None, headers=None, token=None):
+    """Netlify event as received by a function behind the /api/* redirect"""
+    path = path or f"/api/{function}"
+    query = {key: str(value) for key, value in (query or {}).items()}
+    event_headers = {"content-type": "application/json", "host": "localhost"}
+    event_headers.update({key.lower(): value for key, value in (headers or {}).items()})
+    if token:
+        event_headers["authorization"] = f"Bearer {token}"
+    query_string = urlencode(query)
+    return {
+        "httpMethod": method,
+        "path": path,
+        "rawUrl": f"http://localhost{path}" + (f"?{query_string}" if query_string else ""),
+        "rawQuery": query_string,
+        "headers": event_headers,
+        "queryStringParameters": query,
+        "multiValueQueryStringParameters": {key: [value] for key, value in query.items()},
+        "body": body if body is None or isinstance(body, str) else json.dumps(body),
+        "isBase64Encoded": False
+    }
+
+
+class NodeWorker:
+    """One warm Node process; one request at a time"""
+
+    def __init__(self, env=None, local_db=False, node="node", timeout=DEFAULT_TIMEOUT):
+        command = [node, WORKER_SCRIPT] + (["--local-db"] if local_db else [])
+        self.timeout = timeout
+        self.stderr = open(os.devnull, "w") if not os.environ.get("INVOKER_VERBOSE") else None
+        self.process = subprocess.Popen(
+            command, cwd=ROOT, env={**os.environ, **(env or {})},
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=self.stderr,
+            text=True, encoding="utf-8", bufsize=1
+        )
+        self.ids = itertools.count(1)
+        # Lignes de stdout lues par un thread : readline() seul bloquerait sans limite sur un handler figé
+        self.lines = queue.Queue()
+        threading.Thread(target=self._pump, daemon=True).start()
+        ready = self._read()
+        if not ready.get("ready"):
+            raise InvokerError(f"worker did not start: {ready}")
+        self.pid = ready["pid"]
+
+    def _pump(self):
+        for line in self.process.stdout:
+            self.lines.put(line)
+        self.lines.put("")
+
+    def _read(self):
+        try:
+            line = self.lines.get(timeout=self.timeout)
+        except queue.Empty:
+            # Handler figé (promesse jamais résolue, requête bloquée) : le processus est tué puis remplacé par le pool
+            self.kill()
+            raise InvokerError(f"worker {self.process.pid} did not answer within {self.timeout}s")
+        if not line:
+            raise InvokerError(f"worker exited (code {self.process.wait()})")
+        return json.loads(line)
+
+    def request(self, message):
+        message = {**message, "id": next(self.ids)}
+        self.process.stdin.write(json.dumps(message) + "\n")
+        self.process.stdin.flush()
+        reply = self._read()
+        if reply.get("id") != message["id"]:
+            raise InvokerError(f"out of order reply: {reply.get('id')} != {message['id']}")
+        if "error" in reply:
+            raise InvokerError(reply["error"])
+        return reply
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def kill(self):
+        self.process.kill()
+        self.process.wait()
+
+    def close(self):
+        if self.alive():
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.stderr:
+            self.stderr.close()
+
+
+class InvokerPool:
+    """Pool of warm workers; invoke() is thread-safe (one worker per call)"""
+
+    def __init__(self, size=2, env=None, local_db=False, timeout=DEFAULT_TIMEOUT):
+        self.env = {"JWT_SECRET": os.environ.get("JWT_SECRET", "dev-secret-key"), **(env or {})}
+        self.local_db = local_db
+        self.timeout = timeout
+        self.workers = [self._spawn() for _ in range(size)]
+        self.idle = queue.Queue()
+        for worker in self.workers:
+            self.idle.put(worker)
+        self.lock = threading.Lock()
+
+    def _spawn(self):
+        return NodeWorker(self.env, self.local_db, timeout=self.timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _request(self, message):
+        worker = self.idle.get()
+        try:
+            return worker.request(message)
+        finally:
+            if not worker.alive():
+                # Processus mort (crash du handler, délai dépassé) : remplacé pour garder la taille du pool
+                with self.lock:
+                    self.workers.remove(worker)
+                    worker = self._spawn()
+                    self.workers.append(worker)
+            self.idle.put(worker)
+
+    def token(self, payload, expires_in="1h"):
+        """JWT signed with the same JWT_SECRET as the functions"""
+        return self._request({"type": "token", "payload": payload, "expiresIn": expires_in})["token"]
+
+    def invoke(self, function, method="GET", path=None, query=None, body=None, headers=None, token=None):
+        event = build_event(function, method, path, query, body, headers, token)
+        reply = self._request({"type": "invoke", "function": function, "event": event})
+        return InvokeResult(reply["response"], reply["duration_ms"])
+
+    def warm(self, function):
+        """Load the function in every worker (first require outside measurements)"""
+        for _ in self.workers:
+            self.invoke(function, "OPTIONS")
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def cmd_call(pool, args):
+    token = None if args.user == "none" else pool.token(agent_payload() if args.user == "agent" else demandeur_payload())
+    result = pool.invoke(args.function, args.method, args.path, json.loads(args.query or "{}"), args.body, token=token)
+    print(f"{'✅' if result.status_code < 400 else '❌'} {args.method} {args.function}: {result.status_code} "
+          f"in {result.duration_ms:.2f} ms")
+    print(result.text)
+    return result.status_code < 400
+
+
+def cmd_bench(pool, args):
+    token = None if args.user == "none" else pool.token(agent_payload() if args.user == "agent" else demandeur_payload())
+    query = json.loads(args.query or "{}")
+    pool.warm(args.function)
+
+    def one(_):
+        start = time.perf_counter()
+        result = pool.invoke(args.function, args.method, args.path, query, args.body, token=token)
+        return result.status_code, result.duration_ms, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(pool.workers)) as executor:
+        results = list(executor.map(one, range(args.runs)))
+    elapsed = time.perf_counter() - start
+
+    handler_ms = [result[1] for result in results]
+    roundtrip_ms = [result[2] for result in results]
+    statuses = sorted({result[0] for result in results})
+    print(f"\n{'='*70}")
+    print(f"HANDLER BENCHMARK {args.method} {args.function} ({args.runs} runs, {len(pool.workers)} workers)")
+    print(f"{'='*70}")
+    print(f"{'':<12} {'p50 ms':>9} {'p95 ms':>9} {'mean ms':>9}")
+    for label, values in (("handler", handler_ms), ("round trip", roundtrip_ms)):
+        print(f"{label:<12} {percentile(values, 50):>9.2f} {percentile(values, 95):>9.2f} {statistics.mean(values):>9.2f}")
+    print(f"\nStatuses: {statuses} - {args.runs / elapsed:.0f} calls/sec")
+    return all(status < 500 for status in statuses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm Node invoker for netlify/functions handlers")
+    parser.add_argument("command", choices=["call", "bench"])
+    parser.add_argument("function", help="function name (clients, tickets, ...)")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--path", default=None, help="event path (default /api/<function>)")
+    parser.add_argument("--query", default="", help="query parameters as JSON")
+    parser.add_argument("--body", default=None, help="JSON body")
+    parser.add_argument("--user", default="agent", choices=["agent", "demandeur", "none"], help="token sent with the event")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--local-db", action="store_true", help="use a local Postgres (DATABASE_URL) through dev-pg-neon.js")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="seconds before a stuck worker is killed")
+    args = parser.parse_args()
+
+    with InvokerPool(size=args.workers if args.command == "bench" else 1, local_db=args.local_db,
+                     timeout=args.timeout) as pool:
+        return cmd_call(pool, args) if args.command == "call" else cmd_bench(pool, args)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
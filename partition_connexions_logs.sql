@@ -0,0 +1,122 @@
+-- Partitionnement mensuel de la table connexions_logs
+-- À exécuter dans Neon Database (après create_connexions_logs_table.sql)
+
+-- La table est recréée en table partitionnée par plage sur created_at (un mois par partition).
+-- Les données existantes sont recopiées puis l'ancienne table est supprimée.
+-- Le script peut être relancé : la conversion est ignorée si connexions_logs est déjà partitionnée
+-- (relkind = 'p'), seules les fonctions sont remplacées.
+
+BEGIN;
+
+-- Création des partitions mensuelles de start_month à start_month + months_ahead
+CREATE OR REPLACE FUNCTION ensure_connexions_logs_partitions(start_month DATE, months_ahead INTEGER DEFAULT 3)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE := date_trunc('month', start_month)::date;
+    last_month DATE := (date_trunc('month', NOW()) + make_interval(months => months_ahead))::date;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        partition_name := 'connexions_logs_' || to_char(month_start, 'YYYY_MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF connexions_logs FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, (month_start + INTERVAL '1 month')::date
+            );
+            created := created + 1;
+        END IF;
+        month_start := (month_start + INTERVAL '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Suppression des partitions entièrement antérieures à la période de rétention
+CREATE OR REPLACE FUNCTION purge_connexions_logs_partitions(retention_months INTEGER DEFAULT 12)
+RETURNS INTEGER AS $$
+DECLARE
+    cutoff DATE := (date_trunc('month', NOW()) - make_interval(months => retention_months))::date;
+    partition RECORD;
+    dropped INTEGER := 0;
+BEGIN
+    FOR partition IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'connexions_logs'::regclass
+          AND c.relname ~ '^connexions_logs_[0-9]{4}_[0-9]{2}$'
+    LOOP
+        IF to_date(substring(partition.relname from '[0-9]{4}_[0-9]{2}$'), 'YYYY_MM') < cutoff THEN
+            EXECUTE format('DROP TABLE %I', partition.relname);
+            dropped := dropped + 1;
+        END IF;
+    END LOOP;
+
+    -- Les lignes anciennes tombées dans la partition par défaut sont supprimées
+    DELETE FROM connexions_logs_default WHERE created_at < cutoff;
+    RETURN dropped;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('connexions_logs')) = 'p' THEN
+        RAISE NOTICE 'connexions_logs est déjà partitionnée : conversion ignorée';
+        RETURN;
+    END IF;
+
+    ALTER TABLE connexions_logs RENAME TO connexions_logs_old;
+    ALTER INDEX IF EXISTS connexions_logs_pkey RENAME TO connexions_logs_old_pkey;
+    DROP INDEX IF EXISTS idx_connexions_logs_created_at;
+    DROP INDEX IF EXISTS idx_connexions_logs_user_id;
+    DROP INDEX IF EXISTS idx_connexions_logs_user_type;
+    DROP INDEX IF EXISTS idx_connexions_logs_action_type;
+
+    -- La clé de partition doit faire partie de la clé primaire
+    CREATE TABLE connexions_logs (
+        id UUID NOT NULL DEFAULT gen_random_uuid(),
+        user_id UUID NOT NULL,
+        user_type VARCHAR(20) NOT NULL CHECK (user_type IN ('agent', 'demandeur')),
+        user_email VARCHAR(255) NOT NULL,
+        user_nom VARCHAR(100),
+        user_prenom VARCHAR(100),
+        action_type VARCHAR(20) NOT NULL CHECK (action_type IN ('login', 'logout')),
+        ip_address INET,
+        user_agent TEXT,
+        created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (created_at, id)
+    ) PARTITION BY RANGE (created_at);
+
+    -- Partition par défaut pour les dates hors des partitions créées
+    CREATE TABLE connexions_logs_default PARTITION OF connexions_logs DEFAULT;
+
+    -- Index propagés à chaque partition ; (created_at DESC, id DESC) sert la pagination par curseur
+    CREATE INDEX idx_connexions_logs_created_at_id ON connexions_logs(created_at DESC, id DESC);
+    CREATE INDEX idx_connexions_logs_user_id ON connexions_logs(user_id, created_at DESC);
+
+    PERFORM ensure_connexions_logs_partitions(
+        COALESCE((SELECT MIN(created_at) FROM connexions_logs_old), NOW())::date,
+        3
+    );
+
+    INSERT INTO connexions_logs (
+        id, user_id, user_type, user_email, user_nom, user_prenom,
+        action_type, ip_address, user_agent, created_at
+    )
+    SELECT id, user_id, user_type, user_email, user_nom, user_prenom,
+           action_type, ip_address, user_agent, COALESCE(created_at, NOW())
+    FROM connexions_logs_old;
+
+    DROP TABLE connexions_logs_old;
+END
+$$;
+
+COMMIT;
+
+ANALYZE connexions_logs;
+
+-- Commentaires pour documentation
+COMMENT ON TABLE connexions_logs IS 'Logs de connexions et déconnexions, partitionnés par mois sur created_at';
+COMMENT ON FUNCTION ensure_connexions_logs_partitions(DATE, INTEGER) IS 'Crée les partitions mensuelles manquantes (appelée par connexions-logs-maintenance)';
+COMMENT ON FUNCTION purge_connexions_logs_partitions(INTEGER) IS 'Supprime les partitions au-delà de la période de rétention (en mois)';
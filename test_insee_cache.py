@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Backend API Testing for INSEE SIRET cache
+Testing cache hits, negative caching, request coalescing and bulk validation
+
+Requires the functions running locally against the INSEE stub, e.g.:
+    INSEE_API_BASE_URL=http://localhost:8089/api-sirene/3.11 INSEE_API_KEY=stub netlify dev
+The stub itself is started by this script (see insee_stub.py).
+"""
+
+import os
+import sys
+import uuid
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+from insee_stub import start_stub, DEFAULT_PORT
+
+# Configuration - local Netlify dev server pointed at the INSEE stub
+BACKEND_URL = os.environ.get("BACKEND_URL", "http://localhost:8888")
+API_BASE = f"{BACKEND_URL}/api"
+
+AGENT_CREDENTIALS = {
+    "email": "admin@voipservices.fr",
+    "password": "admin1234!"
+}
+
+# Maximum SIRET per bulk request (INSEE_BULK_MAX_SIRETS of the function)
+BULK_MAX_SIRETS = int(os.environ.get("INSEE_BULK_MAX_SIRETS", "500"))
+
+KNOWN_SIRET = "38846770600015"
+OTHER_KNOWN_SIRET = "55203253400646"
+
+
+class TestResults:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.tests_failed = 0
+        self.failures = []
+
+    def add_result(self, test_name, passed, message=""):
+        self.tests_run += 1
+        if passed:
+            self.tests_passed += 1
+            print(f"✅ {test_name}")
+        else:
+            self.tests_failed += 1
+            self.failures.append(f"{test_name}: {message}")
+            print(f"❌ {test_name}: {message}")
+
+    def summary(self):
+        print(f"\n{'='*60}")
+        print("TEST SUMMARY")
+        print(f"{'='*60}")
+        print(f"Total tests: {self.tests_run}")
+        print(f"Passed: {self.tests_passed}")
+        print(f"Failed: {self.tests_failed}")
+
+        if self.failures:
+            print("\nFAILURES:")
+            for failure in self.failures:
+                print(f"- {failure}")
+
+        return self.tests_failed == 0
+
+
+def authenticate_agent():
+    """Authenticate agent and return token"""
+    try:
+        response = requests.post(f"{API_BASE}/auth", json=AGENT_CREDENTIALS, timeout=10)
+        if response.status_code == 200:
+            return response.json().get('access_token')
+        print(f"❌ Agent authentication failed: {response.status_code} - {response.text}")
+    except Exception as e:
+        print(f"❌ Agent authentication error: {str(e)}")
+    return None
+
+
+def random_unknown_siret():
+    """A well-formed SIRET the stub does not know (fresh per run to avoid stale cache rows)"""
+    return str(uuid.uuid4().int)[:14].rjust(14, "9")
+
+
+def validate_sirets(sirets, headers, max_rounds=20):
+    """Bulk-validate any number of SIRETs: resubmit `unprocessed` until the response is complete
+
+    Returns ({siret: status}, number of calls).
+    """
+    statuses = {}
+    pending = list(sirets)
+    rounds = 0
+    while pending and rounds < max_rounds:
+        rounds += 1
+        response = requests.post(f"{API_BASE}/insee-api", json={"sirets": pending}, headers=headers, timeout=30)
+        response.raise_for_status()
+        data = response.json()
+        statuses.update({r["siret"]: r["status"] for r in data["results"] if r["status"] != "unprocessed"})
+        pending = data["unprocessed"] if data["partial"] else []
+    return statuses, rounds
+
+
+def test_insee_cache():
+    results = TestResults()
+    _, stub = start_stub(DEFAULT_PORT)
+
+    print("🚀 Starting INSEE SIRET cache tests")
+    print(f"Backend URL: {BACKEND_URL}")
+    print("="*60)
+
+    # Test 1: two lookups of the same SIRET hit INSEE at most once
+    try:
+        first = requests.get(f"{API_BASE}/insee-api", params={"siret": KNOWN_SIRET}, timeout=10)
+        second = requests.get(f"{API_BASE}/insee-api", params={"siret": KNOWN_SIRET}, timeout=10)
+        calls = stub.stats()["calls"].get(KNOWN_SIRET, 0)
+        results.add_result(
+            "Repeated lookup served from cache",
+            first.status_code == 200 and second.status_code == 200
+            and second.headers.get("X-Cache") == "HIT" and calls <= 1,
+            f"Status: {first.status_code}/{second.status_code}, X-Cache: {second.headers.get('X-Cache')}, INSEE calls: {calls}"
+        )
+        results.add_result(
+            "Cached payload matches live payload",
+            first.json() == second.json(),
+            f"{first.text} != {second.text}"
+        )
+    except Exception as e:
+        results.add_result("Repeated lookup served from cache", False, str(e))
+
+    # Test 2: unknown SIRET is negatively cached
+    unknown = random_unknown_siret()
+    try:
+        first = requests.get(f"{API_BASE}/insee-api", params={"siret": unknown}, timeout=10)
+        second = requests.get(f"{API_BASE}/insee-api", params={"siret": unknown}, timeout=10)
+        calls = stub.stats()["calls"].get(unknown, 0)
+        results.add_result(
+            "Unknown SIRET negatively cached",
+            first.status_code == 404 and second.status_code == 404 and calls == 1,
+            f"Status: {first.status_code}/{second.status_code}, INSEE calls: {calls}"
+        )
+    except Exception as e:
+        results.add_result("Unknown SIRET negatively cached", False, str(e))
+
+    # Test 3: rate-limited INSEE responses are not cached
+    limited = random_unknown_siret()
+    try:
+        requests.post(f"http://127.0.0.1:{DEFAULT_PORT}/__config", json={"rate_limited": True}, timeout=5)
+        first = requests.get(f"{API_BASE}/insee-api", params={"siret": limited}, timeout=10)
+        requests.post(f"http://127.0.0.1:{DEFAULT_PORT}/__config", json={"rate_limited": False}, timeout=5)
+        second = requests.get(f"{API_BASE}/insee-api", params={"siret": limited}, timeout=10)
+        results.add_result(
+            "429 from INSEE is not cached",
+            first.status_code == 429 and second.status_code == 404,
+            f"Status: {first.status_code}/{second.status_code}"
+        )
+    except Exception as e:
+        results.add_result("429 from INSEE is not cached", False, str(e))
+
+    # Test 4: concurrent identical lookups are coalesced
+    concurrent = random_unknown_siret()
+    try:
+        requests.post(f"http://127.0.0.1:{DEFAULT_PORT}/__config", json={"latency": 0.5}, timeout=5)
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            statuses = list(pool.map(
+                lambda _: requests.get(f"{API_BASE}/insee-api", params={"siret": concurrent}, timeout=15).status_code,
+                range(10)
+            ))
+        requests.post(f"http://127.0.0.1:{DEFAULT_PORT}/__config", json={"latency": 0}, timeout=5)
+        calls = stub.stats()["calls"].get(concurrent, 0)
+        # One warm instance coalesces to a single call; allow a few for parallel cold instances
+        results.add_result(
+            "Concurrent lookups coalesced",
+            all(s == 404 for s in statuses) and calls < len(statuses),
+            f"Statuses: {statuses}, INSEE calls: {calls}"
+        )
+    except Exception as e:
+        results.add_result("Concurrent lookups coalesced", False, str(e))
+
+    # Test 5: bulk endpoint
+    token = authenticate_agent()
+    if not token:
+        results.add_result("Bulk validation", False, "No agent token")
+        return results.summary()
+
+    auth_headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    try:
+        unknowns = [random_unknown_siret() for _ in range(40)]
+        sirets = [KNOWN_SIRET, OTHER_KNOWN_SIRET, "123", KNOWN_SIRET.replace("0", " 0", 1)] + unknowns
+        calls_before = stub.stats()["total_calls"]
+        response = requests.post(f"{API_BASE}/insee-api", json={"sirets": sirets}, headers=auth_headers, timeout=120)
+        calls_made = stub.stats()["total_calls"] - calls_before
+        data = response.json() if response.status_code == 200 else {}
+        statuses = [r.get("status") for r in data.get("results", [])]
+        results.add_result(
+            "Bulk validation returns one result per input in order",
+            response.status_code == 200 and len(statuses) == len(sirets)
+            and statuses[:4] == ["found", "found", "invalid", "found"],
+            f"Status: {response.status_code}, first statuses: {statuses[:4]}"
+        )
+        results.add_result(
+            "Bulk validation skips cached and duplicate SIRETs",
+            calls_made <= len(unknowns) + 1,
+            f"INSEE calls: {calls_made}, stats: {data.get('stats')}"
+        )
+    except Exception as e:
+        results.add_result("Bulk validation", False, str(e))
+
+    # A slow INSEE API must not push the bulk call past the function timeout: leftovers come back unprocessed
+    try:
+        stub.latency = 1.0
+        unknowns = [random_unknown_siret() for _ in range(BULK_MAX_SIRETS)]
+        response = requests.post(f"{API_BASE}/insee-api", json={"sirets": unknowns}, headers=auth_headers, timeout=30)
+        data = response.json() if response.status_code == 200 else {}
+        elapsed = response.elapsed.total_seconds()
+        unprocessed = data.get("unprocessed", [])
+        results.add_result(
+            "Bulk validation returns partial results before the deadline",
+            response.status_code == 200 and elapsed < 10 and data.get("partial") is True
+            and len(unprocessed) > 0 and set(unprocessed) <= set(unknowns),
+            f"Status: {response.status_code}, elapsed: {elapsed:.1f}s, unprocessed: {len(unprocessed)}"
+        )
+    except Exception as e:
+        results.add_result("Bulk validation returns partial results before the deadline", False, str(e))
+    finally:
+        stub.latency = 0.0
+
+    # Hundreds of SIRETs: the client resubmits `unprocessed` until every SIRET has a result
+    try:
+        stub.latency = 0.1
+        sirets = [random_unknown_siret() for _ in range(300)]
+        statuses, rounds = validate_sirets(sirets, auth_headers)
+        results.add_result(
+            "Bulk validation of hundreds of SIRETs by resubmitting unprocessed",
+            len(statuses) == len(sirets) and all(status == "not_found" for status in statuses.values()),
+            f"{len(statuses)}/{len(sirets)} resolved in {rounds} calls"
+        )
+    except Exception as e:
+        results.add_result("Bulk validation of hundreds of SIRETs by resubmitting unprocessed", False, str(e))
+    finally:
+        stub.latency = 0.0
+
+    try:
+        response = requests.post(f"{API_BASE}/insee-api", json={"sirets": [KNOWN_SIRET]}, timeout=10)
+        results.add_result("Bulk validation requires authentication", response.status_code == 401,
+                           f"Status: {response.status_code}")
+        response = requests.post(f"{API_BASE}/insee-api", json={"sirets": [KNOWN_SIRET] * (BULK_MAX_SIRETS + 1)},
+                                 headers=auth_headers, timeout=10)
+        results.add_result("Bulk validation enforces max size", response.status_code == 400,
+                           f"Status: {response.status_code}")
+    except Exception as e:
+        results.add_result("Bulk validation limits", False, str(e))
+
+    return results.summary()
+
+
+if __name__ == "__main__":
+    success = test_insee_cache()
+    sys.exit(0 if success else 1)
@@ -4,6 +4,7 @@ Backend API Testing for Portabilités System
 Testing the new portability management functionality
 """
 
+import os
 import requests
 import json
 import uuid
@@ -11,7 +12,7 @@ import sys
 from datetime import datetime
 
 # Configuration - Use production URL from frontend/.env
-BACKEND_URL = "https://ticketnav-app.preview.emergentagent.com"
+BACKEND_URL = os.environ.get("BACKEND_URL", "https://ticketnav-app.preview.emergentagent.com")
 API_BASE = f"{BACKEND_URL}/api"
 
 # Test credentials